@@ -3,19 +3,38 @@ accounts.py — Multi-tenant account system for Code Gen as a Service.
 
 No Discord dependencies. Accounts are identified by account_id (acc_xxxx),
 authenticated via API keys (sk_live_xxxx), and credentials are encrypted at rest.
+
+Every API request authenticates, so reads are served from memory:
+get_manager() is the shared AccountManager; authenticate() / get() /
+list_accounts() return cached read-only Account views (rebuilt only when that
+data changes); unknown key hashes are remembered for AUTH_NEGATIVE_CACHE_SECS.
+
+Accounts are stored one document each in the accounts store (storage.py,
+next to ACCOUNTS_PATH; accounts.json is imported once). At most every
+ACCOUNTS_RELOAD_CHECK_SECS the manager asks the store whether another process
+committed, and if so applies just the accounts that changed, so edits from
+the bot process show up without a restart. Edits run in a store transaction
+against the latest copy of the account (_edit), and write only that account.
+
+Decrypted credentials are cached per (account, type) for
+CREDENTIAL_CACHE_TTL_SECS, so extract endpoints don't run Fernet on every
+request (see _CredentialCache).
 """
 
 import hashlib
 import json
-import os
 import secrets
 import string
 import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import Iterator, Optional
 
 import config
+import storage
 
 
 # ── Encryption helpers ──────────────────────────────────────────────────────
@@ -48,10 +67,6 @@ def _encrypt(data: str) -> str:
     return _get_fernet().encrypt(data.encode()).decode()
 
 
-def _decrypt(data: str) -> str:
-    return _get_fernet().decrypt(data.encode()).decode()
-
-
 # ── Data model ──────────────────────────────────────────────────────────────
 
 @dataclass
@@ -67,14 +82,19 @@ class Account:
     created_at: str = ""
     daily_cap_usd: float = 10.0
 
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"Account {self.account_id} is a read-only cached view")
+        super().__setattr__(name, value)
+
     def to_dict(self) -> dict:
         return {
             "account_id": self.account_id,
             "display_name": self.display_name,
             "email": self.email,
             "role": self.role,
-            "api_keys": self.api_keys,
-            "credentials": self.credentials,
+            "api_keys": [dict(k) for k in self.api_keys],
+            "credentials": dict(self.credentials),
             "discord_user_id": self.discord_user_id,
             "shared_store_access": self.shared_store_access,
             "created_at": self.created_at,
@@ -96,6 +116,15 @@ class Account:
             daily_cap_usd=d.get("daily_cap_usd", config.DEFAULT_USER_DAILY_CAP_USD),
         )
 
+    @classmethod
+    def view(cls, d: dict) -> "Account":
+        """Read-only copy that AccountManager can hand to any number of callers."""
+        acct = cls.from_dict(d)
+        acct.api_keys = tuple(MappingProxyType(dict(k)) for k in acct.api_keys)
+        acct.credentials = MappingProxyType(dict(acct.credentials))
+        object.__setattr__(acct, "_frozen", True)
+        return acct
+
 
 # ── Helpers ─────────────────────────────────────────────────────────────────
 
@@ -112,6 +141,82 @@ def _hash_key(raw_key: str) -> str:
     return hashlib.sha256(raw_key.encode()).hexdigest()
 
 
+_metrics = {"requests": 0, "hits": 0, "misses": 0, "negative_hits": 0, "reloads": 0}
+_auth_latencies: deque[float] = deque(maxlen=1000)
+
+
+def metrics() -> dict:
+    """Auth counters plus p50/p99 authenticate() latency in microseconds."""
+    ordered = sorted(_auth_latencies)
+
+    def pct(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6, 1) if ordered else 0.0
+
+    lookups = _cred_metrics["hits"] + _cred_metrics["misses"]
+    return {
+        **_metrics,
+        "latency_p50_us": pct(0.5),
+        "latency_p99_us": pct(0.99),
+        "credential_cache": {
+            **_cred_metrics,
+            "hit_rate": round(_cred_metrics["hits"] / lookups, 3) if lookups else 0.0,
+        },
+    }
+
+
+_cred_metrics = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+
+def _wipe(buf: bytearray) -> None:
+    buf[:] = bytes(len(buf))
+
+
+class _CredentialCache:
+    """Decrypted credentials, LRU-bounded, each valid for CREDENTIAL_CACHE_TTL_SECS.
+
+    Plaintext is held in a bytearray that is zeroed when the entry goes away.
+    That is best effort: Fernet's own bytes and the dicts handed to callers
+    are ordinary immutable objects. An entry is only used while the stored
+    ciphertext is unchanged, so a credential replaced by another process (seen
+    via hot reload) is never served stale.
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[tuple[str, str], tuple[float, str, bytearray]] = OrderedDict()
+
+    def get(self, key: tuple[str, str], ciphertext: str) -> Optional[bytearray]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expiry, cached_ciphertext, buf = entry
+        if expiry <= time.monotonic() or cached_ciphertext != ciphertext:
+            self.discard(key)
+            return None
+        self._entries.move_to_end(key)
+        _cred_metrics["hits"] += 1
+        return buf
+
+    def put(self, key: tuple[str, str], ciphertext: str, plaintext: bytes) -> bytearray:
+        buf = bytearray(plaintext)
+        if config.CREDENTIAL_CACHE_TTL_SECS <= 0 or config.CREDENTIAL_CACHE_MAX <= 0:
+            return buf
+        self.discard(key)
+        now = time.monotonic()
+        for stale in [k for k, (expiry, _, _) in self._entries.items() if expiry <= now]:
+            self.discard(stale)
+        self._entries[key] = (now + config.CREDENTIAL_CACHE_TTL_SECS, ciphertext, buf)
+        while len(self._entries) > config.CREDENTIAL_CACHE_MAX:
+            _, (_, _, old) = self._entries.popitem(last=False)
+            _wipe(old)
+            _cred_metrics["evictions"] += 1
+        return buf
+
+    def discard(self, key: tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            _wipe(entry[2])
+
+
 # ── Capability definitions ──────────────────────────────────────────────────
 
 CREDENTIAL_TYPES = {"llm", "supabase", "apple", "google"}
@@ -140,35 +245,125 @@ _CAPABILITY_MAP = {
 
 # ── AccountManager ──────────────────────────────────────────────────────────
 
+def _account_index(acct: dict):
+    """Store lookup fields for an account document."""
+    for key_entry in acct.get("api_keys", []):
+        yield "key_hash", key_entry["key_hash"]
+    yield "discord_user_id", acct.get("discord_user_id")
+    yield "email", (acct.get("email") or "").lower()
+
+
 class AccountManager:
     def __init__(self, path: Optional[str] = None):
         self._path = Path(path or config.ACCOUNTS_PATH)
+        self._store = storage.open_store(self._path, indexes={"accounts": _account_index})
+        self._store.import_json("accounts", self._path)
         self._accounts: dict[str, dict] = {}  # account_id -> raw dict
         self._key_index: dict[str, str] = {}  # key_hash -> account_id
         self._discord_index: dict[int, str] = {}  # discord_user_id -> account_id
+        self._views: dict[str, Account] = {}  # account_id -> read-only Account
+        self._creds = _CredentialCache()
+        self._negative: dict[str, float] = {}  # unknown key_hash -> expiry
+        self._admin_id: Optional[str] = None
+        self._seq = 0  # last store sequence applied to memory
+        self._next_check = 0.0
         self._load()
 
     def _load(self):
-        if self._path.exists():
-            try:
-                raw = json.loads(self._path.read_text())
-                self._accounts = raw
-            except (json.JSONDecodeError, OSError):
-                self._accounts = {}
-        self._rebuild_indexes()
-
-    def _rebuild_indexes(self):
+        self._store.changed()  # start watching from here
+        self._seq = self._store.last_seq()
+        self._accounts = self._store.items("accounts")
         self._key_index.clear()
         self._discord_index.clear()
+        self._views.clear()
+        self._negative.clear()
         for acct_id, acct in self._accounts.items():
-            for key_entry in acct.get("api_keys", []):
-                self._key_index[key_entry["key_hash"]] = acct_id
-            discord_id = acct.get("discord_user_id")
-            if discord_id is not None:
-                self._discord_index[int(discord_id)] = acct_id
-
-    def _save(self):
-        self._path.write_text(json.dumps(self._accounts, indent=2) + "\n")
+            self._index(acct_id, acct)
+        self._find_admin()
+
+    def _maybe_reload(self, force: bool = False):
+        """Apply accounts another process changed in the store since we last looked."""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return
+        self._next_check = now + config.ACCOUNTS_RELOAD_CHECK_SECS
+        if not self._store.changed():
+            return
+        self._seq, changes = self._store.changes(self._seq, ["accounts"])
+        if changes:
+            _metrics["reloads"] += 1
+        for _, acct_id, acct in changes:
+            self._apply(acct_id, acct)
+
+    def _index(self, account_id: str, acct: dict):
+        for key_entry in acct.get("api_keys", []):
+            self._key_index[key_entry["key_hash"]] = account_id
+        discord_id = acct.get("discord_user_id")
+        if discord_id is not None:
+            self._discord_index[int(discord_id)] = account_id
+
+    def _unindex(self, account_id: str, acct: dict):
+        for key_entry in acct.get("api_keys", []):
+            if self._key_index.get(key_entry["key_hash"]) == account_id:
+                del self._key_index[key_entry["key_hash"]]
+        discord_id = acct.get("discord_user_id")
+        if discord_id is not None and self._discord_index.get(int(discord_id)) == account_id:
+            del self._discord_index[int(discord_id)]
+
+    def _find_admin(self):
+        self._admin_id = next(
+            (acct_id for acct_id, acct in self._accounts.items() if acct.get("role") == "admin"), None)
+
+    def _apply(self, account_id: str, acct: Optional[dict]):
+        """Bring one account's memory state (indexes, view, caches) in line with `acct` (None = deleted)."""
+        old = self._accounts.get(account_id)
+        if old is not None:
+            self._unindex(account_id, old)
+        if acct is None:
+            self._accounts.pop(account_id, None)
+        else:
+            self._accounts[account_id] = acct
+            self._index(account_id, acct)
+        self._views.pop(account_id, None)
+        self._negative.clear()  # the account may carry a key we recently rejected
+        if "admin" in ((old or {}).get("role"), (acct or {}).get("role")):
+            self._find_admin()
+
+    def _put(self, account_id: str, acct: dict):
+        seq = self._store.put("accounts", account_id, acct)
+        if seq == self._seq + 1:
+            self._seq = seq  # our own write; nothing else happened in between
+        self._apply(account_id, acct)
+
+    @contextmanager
+    def _edit(self, account_id: str) -> Iterator[Optional[dict]]:
+        """Yield a copy of the stored account (None if unknown) to modify.
+
+        Runs inside a store transaction after catching up with other
+        processes, and writes the account back on exit if it changed, so
+        concurrent edits from the bot and the API can't clobber each other.
+        """
+        with self._store.transaction():
+            self._maybe_reload(force=True)
+            current = self._accounts.get(account_id)
+            before = json.dumps(current, sort_keys=True)
+            acct = json.loads(before)
+            yield acct
+            if acct is not None and json.dumps(acct, sort_keys=True) != before:
+                self._put(account_id, acct)
+
+    def _raw(self, account_id: str) -> Optional[dict]:
+        self._maybe_reload()
+        return self._accounts.get(account_id)
+
+    def _view(self, account_id: Optional[str]) -> Optional[Account]:
+        view = self._views.get(account_id)
+        if view is None:
+            acct_data = self._accounts.get(account_id)
+            if not acct_data:
+                return None
+            view = self._views[account_id] = Account.view(acct_data)
+        return view
 
     # ── Registration ────────────────────────────────────────────────────
 
@@ -196,73 +391,91 @@ class AccountManager:
             "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
             "daily_cap_usd": config.DEFAULT_USER_DAILY_CAP_USD,
         }
-        self._accounts[account_id] = acct_data
-        self._key_index[key_hash] = account_id
-        self._save()
+        self._put(account_id, acct_data)
         return Account.from_dict(acct_data), raw_key
 
     # ── Authentication ──────────────────────────────────────────────────
 
     def authenticate(self, raw_api_key: str) -> Optional[Account]:
-        """Look up account by raw API key. Returns None if invalid."""
-        key_hash = _hash_key(raw_api_key)
-        acct_id = self._key_index.get(key_hash)
-        if not acct_id:
-            return None
-        acct_data = self._accounts.get(acct_id)
-        if not acct_data:
-            return None
-        return Account.from_dict(acct_data)
+        """Look up account by raw API key. Returns None if invalid.
+
+        The key is only ever compared as its SHA-256 digest (a dict lookup),
+        so response time doesn't depend on how much of a guess is right.
+        """
+        start = time.perf_counter()
+        _metrics["requests"] += 1
+        try:
+            key_hash = _hash_key(raw_api_key)
+            self._maybe_reload()  # clears the negative cache if keys changed elsewhere
+            expiry = self._negative.get(key_hash)
+            if expiry is not None:
+                if expiry > start:
+                    _metrics["negative_hits"] += 1
+                    return None
+                del self._negative[key_hash]
+            acct = self._view(self._key_index.get(key_hash))
+            if acct is None:
+                _metrics["misses"] += 1
+                if len(self._negative) >= config.AUTH_NEGATIVE_CACHE_MAX:
+                    self._negative.pop(next(iter(self._negative)))
+                self._negative[key_hash] = start + config.AUTH_NEGATIVE_CACHE_SECS
+                return None
+            _metrics["hits"] += 1
+            return acct
+        finally:
+            _auth_latencies.append(time.perf_counter() - start)
 
     # ── CRUD ────────────────────────────────────────────────────────────
 
     def get(self, account_id: str) -> Optional[Account]:
-        acct_data = self._accounts.get(account_id)
-        return Account.from_dict(acct_data) if acct_data else None
+        self._maybe_reload()
+        return self._view(account_id)
 
     def get_by_discord_id(self, discord_user_id: int) -> Optional[str]:
         """Return account_id for a Discord user, or None."""
+        self._maybe_reload()
         return self._discord_index.get(discord_user_id)
 
     def list_accounts(self) -> list[Account]:
-        return [Account.from_dict(d) for d in self._accounts.values()]
+        self._maybe_reload()
+        return [self._view(acct_id) for acct_id in self._accounts]
+
+    def first_admin(self) -> Optional[Account]:
+        """The first admin account in file order (the legacy .api-token maps to it)."""
+        self._maybe_reload()
+        return self._view(self._admin_id)
 
     # ── API Key management ──────────────────────────────────────────────
 
     def create_api_key(self, account_id: str, label: str = "default") -> Optional[str]:
         """Create a new API key. Returns the raw key (shown once) or None."""
-        acct = self._accounts.get(account_id)
-        if not acct:
-            return None
-        raw_key = _gen_api_key()
-        key_hash = _hash_key(raw_key)
-        acct.setdefault("api_keys", []).append({
-            "key_hash": key_hash,
-            "prefix": raw_key[:8],
-            "label": label,
-            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        })
-        self._key_index[key_hash] = account_id
-        self._save()
+        with self._edit(account_id) as acct:
+            if not acct:
+                return None
+            raw_key = _gen_api_key()
+            acct.setdefault("api_keys", []).append({
+                "key_hash": _hash_key(raw_key),
+                "prefix": raw_key[:8],
+                "label": label,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            })
         return raw_key
 
     def revoke_api_key(self, account_id: str, prefix: str) -> bool:
         """Revoke an API key by its prefix. Returns True if found and removed."""
-        acct = self._accounts.get(account_id)
-        if not acct:
-            return False
-        keys = acct.get("api_keys", [])
-        for i, entry in enumerate(keys):
-            if entry["prefix"] == prefix:
-                del keys[i]
-                self._key_index.pop(entry["key_hash"], None)
-                self._save()
-                return True
+        with self._edit(account_id) as acct:
+            if not acct:
+                return False
+            keys = acct.get("api_keys", [])
+            for i, entry in enumerate(keys):
+                if entry["prefix"] == prefix:
+                    del keys[i]
+                    return True
         return False
 
     def list_api_keys(self, account_id: str) -> list[dict]:
         """Return API key metadata (prefix, label, created_at) — never the hash."""
-        acct = self._accounts.get(account_id)
+        acct = self._raw(account_id)
         if not acct:
             return []
         return [
@@ -276,40 +489,44 @@ class AccountManager:
         """Encrypt and store a credential. Returns False if account not found."""
         if cred_type not in CREDENTIAL_TYPES:
             return False
-        acct = self._accounts.get(account_id)
-        if not acct:
-            return False
-        acct.setdefault("credentials", {})[cred_type] = _encrypt(json.dumps(data))
-        self._save()
+        with self._edit(account_id) as acct:
+            if not acct:
+                return False
+            acct.setdefault("credentials", {})[cred_type] = _encrypt(json.dumps(data))
+        self._creds.discard((account_id, cred_type))
+        _cred_metrics["invalidations"] += 1
         return True
 
     def get_credential(self, account_id: str, cred_type: str) -> Optional[dict]:
         """Decrypt and return a credential, or None."""
-        acct = self._accounts.get(account_id)
+        acct = self._raw(account_id)
         if not acct:
             return None
         encrypted = acct.get("credentials", {}).get(cred_type)
         if not encrypted:
             return None
+        key = (account_id, cred_type)
         try:
-            return json.loads(_decrypt(encrypted))
+            buf = self._creds.get(key, encrypted)
+            if buf is None:
+                _cred_metrics["misses"] += 1
+                buf = self._creds.put(key, encrypted, _get_fernet().decrypt(encrypted.encode()))
+            return json.loads(buf)  # a fresh dict per call; callers may mutate it
         except Exception:
             return None
 
     def delete_credential(self, account_id: str, cred_type: str) -> bool:
-        acct = self._accounts.get(account_id)
-        if not acct:
-            return False
-        creds = acct.get("credentials", {})
-        if cred_type in creds:
-            del creds[cred_type]
-            self._save()
-            return True
-        return False
+        with self._edit(account_id) as acct:
+            if not acct or cred_type not in acct.get("credentials", {}):
+                return False
+            del acct["credentials"][cred_type]
+        self._creds.discard((account_id, cred_type))
+        _cred_metrics["invalidations"] += 1
+        return True
 
     def list_credentials(self, account_id: str) -> dict[str, bool]:
         """Return which credential types are set (no decryption)."""
-        acct = self._accounts.get(account_id)
+        acct = self._raw(account_id)
         if not acct:
             return {}
         creds = acct.get("credentials", {})
@@ -319,7 +536,7 @@ class AccountManager:
 
     def get_capabilities(self, account_id: str) -> dict:
         """Return capabilities dict based on which credentials are set."""
-        acct = self._accounts.get(account_id)
+        acct = self._raw(account_id)
         if not acct:
             return {}
         creds = set(acct.get("credentials", {}).keys())
@@ -342,7 +559,7 @@ class AccountManager:
 
     def get_setup_checklist(self, account_id: str) -> list[dict]:
         """Return a checklist of setup steps with status and hints."""
-        acct = self._accounts.get(account_id)
+        acct = self._raw(account_id)
         if not acct:
             return []
         creds = set(acct.get("credentials", {}).keys())
@@ -379,53 +596,50 @@ class AccountManager:
     # ── Discord linking ─────────────────────────────────────────────────
 
     def link_discord(self, account_id: str, discord_user_id: int) -> bool:
-        acct = self._accounts.get(account_id)
-        if not acct:
-            return False
-        # Remove old link if exists
-        old_id = acct.get("discord_user_id")
-        if old_id is not None:
-            self._discord_index.pop(int(old_id), None)
-        acct["discord_user_id"] = discord_user_id
-        self._discord_index[discord_user_id] = account_id
-        self._save()
+        with self._edit(account_id) as acct:
+            if not acct:
+                return False
+            acct["discord_user_id"] = discord_user_id  # replaces any old link
         return True
 
     def unlink_discord(self, account_id: str) -> bool:
-        acct = self._accounts.get(account_id)
-        if not acct:
-            return False
-        old_id = acct.get("discord_user_id")
-        if old_id is not None:
-            self._discord_index.pop(int(old_id), None)
-        acct["discord_user_id"] = None
-        self._save()
+        with self._edit(account_id) as acct:
+            if not acct:
+                return False
+            acct["discord_user_id"] = None
         return True
 
     # ── Shared store access (admin-only) ────────────────────────────────
 
     def set_shared_store_access(self, account_id: str, enabled: bool) -> bool:
-        acct = self._accounts.get(account_id)
-        if not acct:
-            return False
-        acct["shared_store_access"] = enabled
-        self._save()
+        with self._edit(account_id) as acct:
+            if not acct:
+                return False
+            acct["shared_store_access"] = enabled
         return True
 
     # ── Legacy key registration (for migration) ────────────────────────
 
     def register_legacy_key(self, account_id: str, raw_key: str, label: str = "legacy") -> bool:
         """Register an existing raw key (e.g. from .api-token) into an account."""
-        acct = self._accounts.get(account_id)
-        if not acct:
-            return False
-        key_hash = _hash_key(raw_key)
-        acct.setdefault("api_keys", []).append({
-            "key_hash": key_hash,
-            "prefix": raw_key[:8],
-            "label": label,
-            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        })
-        self._key_index[key_hash] = account_id
-        self._save()
+        with self._edit(account_id) as acct:
+            if not acct:
+                return False
+            acct.setdefault("api_keys", []).append({
+                "key_hash": _hash_key(raw_key),
+                "prefix": raw_key[:8],
+                "label": label,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            })
         return True
+
+
+_manager: Optional[AccountManager] = None
+
+
+def get_manager() -> AccountManager:
+    """Process-wide AccountManager; prefer this over constructing one per call."""
+    global _manager
+    if _manager is None:
+        _manager = AccountManager()
+    return _manager
@@ -3,7 +3,8 @@ agent_factory.py — runner selection and provider metadata.
 
 Today we default to Claude Code for full coding workflows, but the rest of the
 application can depend on this module instead of hard-coding Claude-specific
-construction everywhere.
+construction everywhere. Short stateless sub-tasks can use get_light_runner(),
+which routes across API providers (llm_router.py) when any are configured.
 """
 
 from __future__ import annotations
@@ -11,6 +12,7 @@ from __future__ import annotations
 import os
 from dataclasses import dataclass
 
+import llm_router
 from agent_protocol import AgentRunner
 from claude_runner import ClaudeRunner
 
@@ -50,6 +52,14 @@ _CAPABILITIES = {
         recommended_for_codegen=False,
         notes="Reserved for future Codex-native runner integration.",
     ),
+    "router": ProviderCapabilities(
+        provider="router",
+        supports_sessions=False,
+        supports_tool_streaming=False,
+        supports_vision=False,
+        recommended_for_codegen=False,
+        notes="One-shot prompts routed across API providers (llm_router.py); no workspace tools.",
+    ),
 }
 
 
@@ -65,7 +75,22 @@ def create_agent_runner(provider: str | None = None) -> AgentRunner:
     selected = provider or get_provider_name()
     if selected in {"claude", "anthropic"}:
         return ClaudeRunner()
+    if selected == "router":
+        return llm_router.RoutingRunner(llm_router.get_router())
     raise ValueError(
         f"Unsupported AGENT_PROVIDER '{selected}'. "
-        "Supported values: claude. OpenAI/Codex adapters are not wired yet."
+        "Supported values: claude, router. OpenAI/Codex adapters are not wired yet."
     )
+
+
+_light_runner: AgentRunner | None = None
+
+
+def get_light_runner(fallback: AgentRunner) -> AgentRunner:
+    """Runner for short stateless prompts: the provider router, or fallback if none is configured."""
+    global _light_runner
+    if not llm_router.available():
+        return fallback
+    if _light_runner is None:
+        _light_runner = llm_router.RoutingRunner(llm_router.get_router())
+    return _light_runner
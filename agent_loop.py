@@ -9,11 +9,16 @@ from dataclasses import dataclass, field
 from typing import Optional, Callable, Awaitable
 
 from agent_protocol import AgentRunner
+import build_cache
 import config
+import eta_model
+import fix_index
+import telemetry
 from commands.build_log import log_build
 from commands.fixes_cmd import log_fix, get_recent_fixes
 from helpers.budget import BudgetTracker
 from platforms import build_platform, extract_build_error
+import workspaces
 
 
 @dataclass
@@ -42,6 +47,138 @@ def _error_is_same(prev: str, new: str) -> bool:
     return len(prev_set & new_set) / max(len(prev_set), len(new_set)) > 0.8
 
 
+ALL_PLATFORMS = ("android", "ios", "web")
+
+
+def split_platforms(platform: str) -> list[str]:
+    """'all' or a comma/plus separated list ('android,web') → platform names."""
+    if platform == "all":
+        return list(ALL_PLATFORMS)
+    return [p.strip() for p in platform.replace("+", ",").split(",") if p.strip()]
+
+
+def merge_build_errors(errors: dict[str, str]) -> str:
+    """Combine per-platform error snippets, printing lines shared by several
+    platforms (typically commonMain errors) once under a joint heading."""
+    owners: dict[str, list[str]] = {}
+    for platform, snippet in errors.items():
+        for line in snippet.splitlines():
+            key = line.strip()
+            if key and platform not in owners.setdefault(key, []):
+                owners[key].append(platform)
+    if len(errors) == 1:
+        return next(iter(errors.values()))
+
+    sections: dict[tuple, list[str]] = {}
+    for line, platforms in owners.items():
+        sections.setdefault(tuple(platforms), []).append(line)
+    # Shared errors first — fixing them usually fixes every target
+    ordered = sorted(sections.items(), key=lambda kv: -len(kv[0]))
+    return "\n\n".join(
+        f"[{' + '.join(p.upper() for p in platforms)}]\n" + "\n".join(lines)
+        for platforms, lines in ordered
+    )
+
+
+def _ios_sim_hint() -> str:
+    return (
+        f"IMPORTANT: When running xcodebuild, always use: -destination 'name={config.IOS_SIMULATOR_NAME}'\n"
+        "NEVER use 'simctl launch --console' — it blocks forever. Use 'simctl launch' without --console.\n"
+    )
+
+
+async def _request_fix(claude: AgentRunner, fix_prompt: str, workspace_key: str,
+                       workspace_path: str, context_prefix: str,
+                       on_status: Optional[Callable[[str], Awaitable[None]]],
+                       budget: Optional[BudgetTracker], platform: str = ""):
+    """Ask Claude for a fix, retrying once with a fresh session on failure."""
+    fix_result = None
+    for fix_try in range(1, 3):
+        with eta_model.labels(kind="fix", platform=platform):
+            fix_result = await claude.run(
+                fix_prompt, workspace_key, workspace_path,
+                context_prefix=context_prefix,
+                on_progress=on_status,
+            )
+        if budget:
+            budget.record(fix_result.total_cost_usd)
+        if fix_result.exit_code == 0:
+            break
+        claude.clear_session(workspace_key)
+        if fix_try < 2 and on_status:
+            await on_status("⚠️ Claude failed on fix, retrying...")
+        await asyncio.sleep(2)
+    return fix_result
+
+
+def _fix_scope(workspace_key: str) -> Optional[str]:
+    """Tenant whose recorded fixes a workspace may reuse: its account, else its
+    Discord owner. None (unregistered workspace) keeps it out of the fix index."""
+    try:
+        registry = workspaces.get_registry()
+        account_id = registry.get_account_id(workspace_key)
+        owner_id = registry.get_owner(workspace_key)
+    except Exception as e:
+        print(f"[fix-index] Could not resolve owner of {workspace_key}: {e}")
+        return None
+    if account_id:
+        return f"account:{account_id}"
+    return f"user:{owner_id}" if owner_id else None
+
+
+async def _replay_known_fix(error_snippet: str, platforms: list[str], workspace_key: str,
+                            workspace_path: str,
+                            on_status: Optional[Callable[[str], Awaitable[None]]]) -> bool:
+    """Apply an edit that fixed this error before (in a workspace of the same
+    tenant) and rebuild. On failure the edit is reverted, leaving the workspace
+    as it was."""
+    if not config.FIX_REPLAY_ENABLED:
+        return False
+    scope = _fix_scope(workspace_key)
+    if scope is None:
+        return False
+    index = fix_index.get_index()
+    try:
+        candidates = index.candidates(fix_index.fingerprint(error_snippet), scope)
+    except Exception as e:
+        print(f"[fix-index] Lookup failed: {e}")
+        return False
+    for fix in candidates:
+        applied = await asyncio.to_thread(fix_index.apply_edits, workspace_path, fix.edits)
+        if applied is None:
+            continue
+        if on_status:
+            await on_status(f"♻️ Known error — replaying a fix that worked {fix.successes}x before...")
+        results = await asyncio.gather(*(build_platform(p, workspace_path) for p in platforms))
+        ok = all(r.success for r in results)
+        index.record_outcome(fix.fix_id, ok)
+        if ok:
+            return True
+        await asyncio.to_thread(applied.revert)
+    return False
+
+
+async def _snapshot_before_fix(error_snippet: str, workspace_key: str, workspace_path: str) -> Optional[tuple]:
+    if not config.FIX_REPLAY_ENABLED:
+        return None
+    scope = _fix_scope(workspace_key)
+    if scope is None:
+        return None
+    snap = await asyncio.to_thread(fix_index.snapshot, workspace_path)
+    return (fix_index.fingerprint(error_snippet), scope, error_snippet, snap) if snap is not None else None
+
+
+def _remember_fix(pending: Optional[tuple], platform: str, workspace_path: str) -> None:
+    """The build passed right after a Claude fix — index that fix for replay."""
+    if pending is None:
+        return
+    fp, scope, error_snippet, snap = pending
+    try:
+        fix_index.get_index().record(fp, scope, platform, error_snippet, fix_index.diff_edits(snap, workspace_path))
+    except Exception as e:
+        print(f"[fix-index] Could not record fix: {e}")
+
+
 async def run_agent_loop(
     initial_prompt: str,
     workspace_key: str,
@@ -58,6 +195,10 @@ async def run_agent_loop(
     2. Build the specified platform
     3. If fail → send error to Claude → rebuild
     4. Repeat until success or max_attempts
+
+    `platform` may also be "all" or a list like "android,ios,web": the targets
+    are then built concurrently and their errors go to Claude in one prompt
+    per round (see _run_multi_platform_loop).
     """
     max_attempts = max_attempts or config.MAX_BUILD_ATTEMPTS
     loop_start = time.time()
@@ -75,11 +216,12 @@ async def run_agent_loop(
                 label = f"🔄 Retrying Claude (attempt {claude_try}/{max_claude_retries})..."
             await on_status(label)
 
-        initial_result = await claude.run(
-            initial_prompt, workspace_key, workspace_path,
-            context_prefix=context_prefix,
-            on_progress=on_status,
-        )
+        with eta_model.labels(kind="initial", platform=platform):
+            initial_result = await claude.run(
+                initial_prompt, workspace_key, workspace_path,
+                context_prefix=context_prefix,
+                on_progress=on_status,
+            )
         if budget:
             budget.record(initial_result.total_cost_usd)
 
@@ -113,8 +255,16 @@ async def run_agent_loop(
             final_message=budget.exceeded_message,
         )
 
+    platforms = split_platforms(platform)
+    if len(platforms) > 1:
+        return await _run_multi_platform_loop(
+            platforms, workspace_key, workspace_path, claude, max_attempts,
+            on_status, budget, context_prefix, loop_start,
+        )
+
     # Step 2-4: Build loop
     platform_label = platform.upper() if platform != "all" else "ALL"
+    pending_fix = None  # (fingerprint, error, snapshot) of the last Claude fix
 
     for attempt_num in range(1, max_attempts + 1):
         build_start = time.time()
@@ -126,6 +276,7 @@ async def run_agent_loop(
         build_duration = time.time() - build_start
 
         if result.success:
+            await asyncio.to_thread(_remember_fix, pending_fix, platform, workspace_path)
             attempts.append(BuildAttempt(attempt=attempt_num, success=True, duration_secs=build_duration))
             loop_result = AgentLoopResult(
                 success=True, total_attempts=attempt_num,
@@ -137,6 +288,7 @@ async def run_agent_loop(
             return loop_result
 
         error_snippet = result.error or extract_build_error(result.output)
+        pending_fix = None
 
         if last_error and _error_is_same(last_error, error_snippet):
             attempts.append(BuildAttempt(
@@ -157,18 +309,29 @@ async def run_agent_loop(
 
         last_error = error_snippet
 
+        if await _replay_known_fix(error_snippet, [platform], workspace_key, workspace_path, on_status):
+            attempts.append(BuildAttempt(
+                attempt=attempt_num, success=True,
+                duration_secs=time.time() - build_start,
+                error_snippet=error_snippet[:500],
+                claude_fix_summary="Replayed known fix",
+            ))
+            loop_result = AgentLoopResult(
+                success=True, total_attempts=attempt_num,
+                total_duration_secs=time.time() - loop_start,
+                attempts=attempts,
+                final_message=f"✅ {platform_label} build succeeded on attempt {attempt_num} (known fix replayed).",
+            )
+            _log_build_result(workspace_path, platform, loop_result, budget)
+            return loop_result
+
         if on_status:
             await on_status(
                 f"⚠️ Attempt {attempt_num} failed. Sending error to Claude...\n"
                 f"```\n{error_snippet[:300]}\n```"
             )
 
-        sim_hint = ""
-        if platform == "ios":
-            sim_hint = (
-                f"IMPORTANT: When running xcodebuild, always use: -destination 'name={config.IOS_SIMULATOR_NAME}'\n"
-                "NEVER use 'simctl launch --console' — it blocks forever. Use 'simctl launch' without --console.\n"
-            )
+        sim_hint = _ios_sim_hint() if platform == "ios" else ""
 
         fixes_context = get_recent_fixes(workspace_path)
         past_fixes = f"Previous fixes for this project:\n{fixes_context}\n\n" if fixes_context else ""
@@ -195,21 +358,11 @@ async def run_agent_loop(
             return loop_result
 
         # Try fix with retry on Claude failure
-        fix_result = None
-        for fix_try in range(1, 3):
-            fix_result = await claude.run(
-                fix_prompt, workspace_key, workspace_path,
-                context_prefix=context_prefix,
-                on_progress=on_status,
-            )
-            if budget:
-                budget.record(fix_result.total_cost_usd)
-            if fix_result.exit_code == 0:
-                break
-            claude.clear_session(workspace_key)
-            if fix_try < 2 and on_status:
-                await on_status("⚠️ Claude failed on fix, retrying...")
-            await asyncio.sleep(2)
+        snapshot = await _snapshot_before_fix(error_snippet, workspace_key, workspace_path)
+        fix_result = await _request_fix(claude, fix_prompt, workspace_key, workspace_path,
+                                        context_prefix, on_status, budget, platform=platform)
+        if fix_result.exit_code == 0:
+            pending_fix = snapshot
 
         attempts.append(BuildAttempt(
             attempt=attempt_num, success=False,
@@ -246,6 +399,210 @@ async def run_agent_loop(
     return loop_result
 
 
+async def _record_passed(workspace_path: str, platforms: list[str], passed_hashes: dict[str, str]) -> None:
+    for p in platforms:
+        source_hash = await asyncio.to_thread(build_cache.compute_source_hash, workspace_path, p)
+        if source_hash:
+            passed_hashes[p] = source_hash
+
+
+async def _drop_changed(workspace_path: str, passed_hashes: dict[str, str]) -> list[str]:
+    """Forget passed platforms whose inputs changed since they passed; returns them."""
+    changed = []
+    for p, source_hash in list(passed_hashes.items()):
+        if await asyncio.to_thread(build_cache.compute_source_hash, workspace_path, p) != source_hash:
+            del passed_hashes[p]
+            changed.append(p)
+    return changed
+
+
+async def _recheck_after_replay(replayed: list[str], workspace_path: str, passed_hashes: dict[str, str],
+                                on_status: Optional[Callable[[str], Awaitable[None]]]) -> dict[str, str]:
+    """A replayed fix only rebuilt the platforms it fixed. Rebuild any that had
+    already passed but whose inputs the edit touched; returns their errors."""
+    await _record_passed(workspace_path, replayed, passed_hashes)
+    changed = await _drop_changed(workspace_path, passed_hashes)
+    if not changed:
+        return {}
+    if on_status:
+        await on_status(f"🔨 [{'+'.join(p.upper() for p in changed)}] Rebuilding after replayed fix...")
+    results = await asyncio.gather(*(build_platform(p, workspace_path) for p in changed))
+    await _record_passed(workspace_path, [p for p, r in zip(changed, results) if r.success], passed_hashes)
+    return {p: r.error or extract_build_error(r.output) for p, r in zip(changed, results) if not r.success}
+
+
+async def _run_multi_platform_loop(
+    platforms: list[str],
+    workspace_key: str,
+    workspace_path: str,
+    claude: AgentRunner,
+    max_attempts: int,
+    on_status: Optional[Callable[[str], Awaitable[None]]],
+    budget: Optional[BudgetTracker],
+    context_prefix: str,
+    loop_start: float,
+) -> AgentLoopResult:
+    """Build every platform concurrently, send Claude one merged fix prompt per
+    round, and rebuild only what failed (plus any passed platform whose inputs
+    the fix touched). Concurrency is capped by the scheduler's build slots."""
+    log_platform = ",".join(platforms)
+    all_label = "+".join(p.upper() for p in platforms)
+    attempts: list[BuildAttempt] = []
+    last_error = ""
+    pending = list(platforms)
+    passed_hashes: dict[str, str] = {}
+    pending_fix = None  # (fingerprint, error, snapshot) of the last Claude fix
+
+    for attempt_num in range(1, max_attempts + 1):
+        # A fix aimed at one target can break another that already passed
+        pending += await _drop_changed(workspace_path, passed_hashes)
+        pending = [p for p in platforms if p in pending]
+
+        build_start = time.time()
+        if on_status:
+            label = "+".join(p.upper() for p in pending)
+            await on_status(f"🔨 [{label}] Build attempt {attempt_num}/{max_attempts}...")
+
+        # Gradle steps take turns per workspace (platforms._gradle); Xcode overlaps them
+        results = await asyncio.gather(*(build_platform(p, workspace_path) for p in pending))
+        build_duration = time.time() - build_start
+
+        await _record_passed(workspace_path, [p for p, r in zip(pending, results) if r.success], passed_hashes)
+        errors = {p: r.error or extract_build_error(r.output) for p, r in zip(pending, results) if not r.success}
+
+        if not errors:
+            await asyncio.to_thread(_remember_fix, pending_fix, log_platform, workspace_path)
+            attempts.append(BuildAttempt(attempt=attempt_num, success=True, duration_secs=build_duration))
+            loop_result = AgentLoopResult(
+                success=True, total_attempts=attempt_num,
+                total_duration_secs=time.time() - loop_start,
+                attempts=attempts,
+                final_message=f"✅ {all_label} builds succeeded on attempt {attempt_num}.",
+            )
+            _log_build_result(workspace_path, log_platform, loop_result, budget)
+            return loop_result
+
+        error_snippet = merge_build_errors(errors)
+        failed_label = "+".join(p.upper() for p in errors)
+        pending_fix = None
+
+        if last_error and _error_is_same(last_error, error_snippet):
+            attempts.append(BuildAttempt(
+                attempt=attempt_num, success=False,
+                duration_secs=build_duration, error_snippet=error_snippet[:500],
+            ))
+            loop_result = AgentLoopResult(
+                success=False, total_attempts=attempt_num,
+                total_duration_secs=time.time() - loop_start,
+                attempts=attempts,
+                final_message=(
+                    f"🛑 Stopping — same {failed_label} errors repeating on attempt {attempt_num}.\n\n"
+                    f"**Error:**\n```\n{error_snippet[:800]}\n```"
+                ),
+            )
+            _log_build_result(workspace_path, log_platform, loop_result, budget)
+            return loop_result
+
+        last_error = error_snippet
+
+        replayed = await _replay_known_fix(error_snippet, list(errors), workspace_key, workspace_path, on_status)
+        if replayed:
+            broken = await _recheck_after_replay(list(errors), workspace_path, passed_hashes, on_status)
+            if broken:
+                # The replayed edit stays; Claude fixes what it broke
+                errors = broken
+                error_snippet = merge_build_errors(errors)
+                failed_label = "+".join(p.upper() for p in errors)
+                last_error = error_snippet
+                replayed = False
+        if replayed:
+            attempts.append(BuildAttempt(
+                attempt=attempt_num, success=True,
+                duration_secs=time.time() - build_start,
+                error_snippet=error_snippet[:500],
+                claude_fix_summary="Replayed known fix",
+            ))
+            loop_result = AgentLoopResult(
+                success=True, total_attempts=attempt_num,
+                total_duration_secs=time.time() - loop_start,
+                attempts=attempts,
+                final_message=f"✅ {all_label} builds succeeded on attempt {attempt_num} (known fix replayed).",
+            )
+            _log_build_result(workspace_path, log_platform, loop_result, budget)
+            return loop_result
+
+        if on_status:
+            await on_status(
+                f"⚠️ Attempt {attempt_num} failed on {failed_label}. Sending errors to Claude...\n"
+                f"```\n{error_snippet[:300]}\n```"
+            )
+
+        if budget and budget.exceeded:
+            attempts.append(BuildAttempt(
+                attempt=attempt_num, success=False,
+                duration_secs=build_duration, error_snippet=error_snippet[:500],
+            ))
+            loop_result = AgentLoopResult(
+                success=False, total_attempts=attempt_num,
+                total_duration_secs=time.time() - loop_start,
+                attempts=attempts,
+                final_message=budget.exceeded_message,
+            )
+            _log_build_result(workspace_path, log_platform, loop_result, budget)
+            return loop_result
+
+        fixes_context = get_recent_fixes(workspace_path)
+        past_fixes = f"Previous fixes for this project:\n{fixes_context}\n\n" if fixes_context else ""
+        sim_hint = _ios_sim_hint() if "ios" in errors else ""
+        fix_prompt = (
+            f"{past_fixes}"
+            f"The {', '.join(errors)} builds failed. Fix the code so every target compiles.\n"
+            "Errors under a combined heading come from shared code — fix those first.\n"
+            f"Only modify what's necessary.\n{sim_hint}\n```\n{error_snippet}\n```"
+        )
+        snapshot = await _snapshot_before_fix(error_snippet, workspace_key, workspace_path)
+        fix_result = await _request_fix(claude, fix_prompt, workspace_key, workspace_path,
+                                        context_prefix, on_status, budget, platform=",".join(errors))
+        if fix_result.exit_code == 0:
+            pending_fix = snapshot
+
+        attempts.append(BuildAttempt(
+            attempt=attempt_num, success=False,
+            duration_secs=build_duration,
+            error_snippet=error_snippet[:500],
+            claude_fix_summary=(fix_result.stdout[:300] if fix_result.stdout else ""),
+        ))
+
+        if fix_result.exit_code != 0:
+            error_detail = fix_result.stderr.strip() or fix_result.stdout.strip() or "Unknown error"
+            loop_result = AgentLoopResult(
+                success=False, total_attempts=attempt_num,
+                total_duration_secs=time.time() - loop_start,
+                attempts=attempts,
+                final_message=f"🛑 Claude errored on fix:\n```\n{error_detail[:500]}\n```",
+            )
+            _log_build_result(workspace_path, log_platform, loop_result, budget)
+            return loop_result
+
+        for p, snippet in errors.items():
+            try:
+                log_fix(workspace_path, p, snippet[:300],
+                        fix_result.stdout[:300] if fix_result.stdout else "Applied fix")
+            except Exception:
+                pass  # don't break the build loop over logging
+
+        pending = list(errors)
+
+    loop_result = AgentLoopResult(
+        success=False, total_attempts=max_attempts,
+        total_duration_secs=time.time() - loop_start,
+        attempts=attempts,
+        final_message=f"🛑 Builds failed after {max_attempts} attempts.\n```\n{last_error[:800]}\n```",
+    )
+    _log_build_result(workspace_path, log_platform, loop_result, budget)
+    return loop_result
+
+
 def _log_build_result(
     workspace_path: str,
     platform: str,
@@ -259,6 +616,9 @@ def _log_build_result(
             if a.error_snippet:
                 error = a.error_snippet
                 break
+        telemetry.record("agent_loop", platform, result.total_duration_secs,
+                         cost_usd=budget.total_cost_usd if budget else 0.0, ok=result.success,
+                         workspace=workspace_path, attempts=result.total_attempts)
         log_build(
             ws_path=workspace_path,
             platform=platform,
@@ -1,31 +1,41 @@
 """
-allowlist.py — User allowlist backed by allowlist.json.
+allowlist.py — User allowlist, one document per user in the allowlist store
+(storage.py; allowlist.json is imported once).
 Controls who can use the bot, their roles, and per-user daily caps.
+
+Edits catch up with the store inside a write transaction before applying,
+so the bot and the API never write back each other's stale copies.
 """
 
 import json
 import os
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 import config
+import storage
 
 
 _DATA_FILE = Path(os.path.dirname(os.path.abspath(__file__))) / "allowlist.json"
 
 
+def _user_index(entry: dict):
+    yield "email", (entry.get("email") or "").lower()
+
+
 class Allowlist:
     def __init__(self):
         self._users: dict[int, dict] = {}
+        self._store = storage.open_store(_DATA_FILE, indexes={"users": _user_index})
+        self._store.import_json("users", _DATA_FILE)
+        self._seq = 0  # last store sequence applied to memory
         self._load()
 
     def _load(self):
-        if _DATA_FILE.exists():
-            try:
-                raw = json.loads(_DATA_FILE.read_text())
-                self._users = {int(k): v for k, v in raw.items()}
-            except (json.JSONDecodeError, OSError, ValueError):
-                self._users = {}
+        self._store.changed()  # start watching from here
+        self._seq = self._store.last_seq()
+        self._users = {int(k): v for k, v in self._store.items("users").items()}
 
         # Auto-seed bootstrap admin from config
         admin_id = config.DISCORD_ALLOWED_USER_ID
@@ -35,21 +45,46 @@ class Allowlist:
                 "display_name": "Owner",
                 "daily_cap_usd": config.DAILY_TOKEN_CAP_USD,
             }
-            self._save()
-
-    def _save(self):
-        _DATA_FILE.write_text(json.dumps(
-            {str(k): v for k, v in self._users.items()},
-            indent=2,
-        ) + "\n")
+            self._save(admin_id)
+
+    @contextmanager
+    def _edit(self, user_id: int) -> Iterator[dict]:
+        """Yield a copy of the stored entry ({} if unknown) to modify.
+
+        Runs inside a store transaction after catching up with other
+        processes; on exit the entry is written back if it changed (an
+        emptied entry is deleted).
+        """
+        with self._store.transaction():
+            self.reload()
+            before = json.dumps(self._users.get(user_id) or {}, sort_keys=True)
+            entry = json.loads(before)
+            yield entry
+            if json.dumps(entry, sort_keys=True) != before:
+                if entry:
+                    self._users[user_id] = entry
+                else:
+                    self._users.pop(user_id, None)
+                self._save(user_id)
+
+    def _save(self, user_id: int):
+        """Write one user's entry (or its removal) to the store."""
+        if user_id in self._users:
+            seq = self._store.put("users", user_id, self._users[user_id])
+        elif self._store.delete("users", user_id):
+            seq = self._store.last_seq()
+        else:
+            return
+        if seq == self._seq + 1:
+            self._seq = seq  # our own write; nothing else happened in between
 
     def is_allowed(self, user_id: int) -> bool:
         if user_id in self._users:
             return True
         # Check if user has a linked account
         try:
-            from accounts import AccountManager
-            mgr = AccountManager()
+            from accounts import get_manager
+            mgr = get_manager()
             return mgr.get_by_discord_id(user_id) is not None
         except Exception:
             return False
@@ -59,8 +94,8 @@ class Allowlist:
             return True
         # Check account role if linked
         try:
-            from accounts import AccountManager
-            mgr = AccountManager()
+            from accounts import get_manager
+            mgr = get_manager()
             acct_id = mgr.get_by_discord_id(user_id)
             if acct_id:
                 acct = mgr.get(acct_id)
@@ -70,26 +105,24 @@ class Allowlist:
         return False
 
     def add(self, user_id: int, display_name: str, daily_cap_usd: Optional[float] = None, email: Optional[str] = None):
-        if user_id in self._users:
-            # Link email if not set yet
-            if email and not self._users[user_id].get("email"):
-                self._users[user_id]["email"] = email
-                self._save()
-            return
-        entry = {
-            "role": "user",
-            "display_name": display_name,
-            "daily_cap_usd": daily_cap_usd or config.DEFAULT_USER_DAILY_CAP_USD,
-        }
-        if email:
-            entry["email"] = email
-        self._users[user_id] = entry
-        self._save()
+        with self._edit(user_id) as entry:
+            if entry:
+                # Link email if not set yet
+                if email and not entry.get("email"):
+                    entry["email"] = email
+                return
+            entry.update({
+                "role": "user",
+                "display_name": display_name,
+                "daily_cap_usd": daily_cap_usd or config.DEFAULT_USER_DAILY_CAP_USD,
+            })
+            if email:
+                entry["email"] = email
 
         # Auto-create an account when a Discord user is added
         try:
-            from accounts import AccountManager
-            mgr = AccountManager()
+            from accounts import get_manager
+            mgr = get_manager()
             if not mgr.get_by_discord_id(user_id):
                 acct, _ = mgr.register(display_name, email=email)
                 mgr.link_discord(acct.account_id, user_id)
@@ -97,10 +130,10 @@ class Allowlist:
             pass  # account creation is best-effort
 
     def set_email(self, user_id: int, email: str) -> bool:
-        if user_id not in self._users:
-            return False
-        self._users[user_id]["email"] = email
-        self._save()
+        with self._edit(user_id) as entry:
+            if not entry:
+                return False
+            entry["email"] = email
         return True
 
     def get_email(self, user_id: int) -> Optional[str]:
@@ -109,37 +142,28 @@ class Allowlist:
 
     def find_by_email(self, email: str) -> Optional[int]:
         """Find user ID by email. Returns None if not found."""
-        for uid, info in self._users.items():
-            if info.get("email", "").lower() == email.lower():
-                return uid
-        return None
+        matches = self._store.find("users", "email", email.lower())
+        return int(matches[0]) if matches else None
 
     def add_pending_invite(self, email: str):
         """Store an email for someone who hasn't joined Discord yet."""
         # Store in a special key
-        pending = self._users.get(0, {}).get("pending_invites", [])
-        if email.lower() not in [p.lower() for p in pending]:
-            pending.append(email)
-            if 0 not in self._users:
-                self._users[0] = {"pending_invites": pending}
-            else:
-                self._users[0]["pending_invites"] = pending
-            self._save()
+        with self._edit(0) as entry:
+            pending = entry.setdefault("pending_invites", [])
+            if email.lower() not in [p.lower() for p in pending]:
+                pending.append(email)
 
     def claim_pending_invite(self, email: str) -> bool:
         """Check if email was pre-invited. Returns True and removes from pending."""
-        pending = self._users.get(0, {}).get("pending_invites", [])
-        lower_pending = [p.lower() for p in pending]
-        if email.lower() in lower_pending:
-            idx = lower_pending.index(email.lower())
-            pending.pop(idx)
-            if pending:
-                self._users[0]["pending_invites"] = pending
-            else:
-                self._users.pop(0, None)
-            self._save()
-            return True
-        return False
+        with self._edit(0) as entry:
+            pending = entry.get("pending_invites", [])
+            lower_pending = [p.lower() for p in pending]
+            if email.lower() not in lower_pending:
+                return False
+            pending.pop(lower_pending.index(email.lower()))
+            if not pending:
+                entry.pop("pending_invites")
+        return True
 
     def get_pending_invites(self) -> list[str]:
         return self._users.get(0, {}).get("pending_invites", [])
@@ -148,11 +172,11 @@ class Allowlist:
         """Remove a user. Returns False if they are the bootstrap admin."""
         if user_id == config.DISCORD_ALLOWED_USER_ID:
             return False
-        if user_id in self._users:
-            del self._users[user_id]
-            self._save()
-            return True
-        return False
+        with self._edit(user_id) as entry:
+            if not entry:
+                return False
+            entry.clear()
+        return True
 
     def get_daily_cap(self, user_id: int) -> float:
         entry = self._users.get(user_id)
@@ -161,10 +185,10 @@ class Allowlist:
         return config.DEFAULT_USER_DAILY_CAP_USD
 
     def set_daily_cap(self, user_id: int, cap_usd: float) -> bool:
-        if user_id not in self._users:
-            return False
-        self._users[user_id]["daily_cap_usd"] = cap_usd
-        self._save()
+        with self._edit(user_id) as entry:
+            if not entry:
+                return False
+            entry["daily_cap_usd"] = cap_usd
         return True
 
     def get_display_name(self, user_id: int) -> Optional[str]:
@@ -179,4 +203,12 @@ class Allowlist:
         )
 
     def reload(self):
-        self._load()
+        """Apply entries another process changed since the last call; a no-op when nothing did."""
+        if not self._store.changed():
+            return
+        self._seq, changes = self._store.changes(self._seq, ["users"])
+        for _, key, entry in changes:
+            if entry is None:
+                self._users.pop(int(key), None)
+            else:
+                self._users[int(key)] = entry
@@ -13,13 +13,20 @@ from pathlib import Path
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException, Depends, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
 
+import build_events
+import claude_pool
+import gradle_pool
 import service
+import supabase_client
+import telemetry
+import webhook_dispatcher
 from agent_factory import get_provider_capabilities
-from accounts import AccountManager, Account
+from accounts import AccountManager, Account, get_manager
 
 # ── Logging ──────────────────────────────────────────────────────────────────
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
@@ -46,17 +53,19 @@ API_TOKEN = _get_api_token()
 
 # ── Account Manager (singleton) ─────────────────────────────────────────────
 
-_account_mgr: AccountManager | None = None
-
 def _get_account_mgr() -> AccountManager:
-    global _account_mgr
-    if _account_mgr is None:
-        _account_mgr = AccountManager()
-    return _account_mgr
+    return get_manager()
 
 
 # ── Multi-tenant Auth ───────────────────────────────────────────────────────
 
+_LEGACY_ADMIN = Account.view({
+    "account_id": "legacy_admin",
+    "display_name": "Admin (legacy)",
+    "role": "admin",
+})
+
+
 async def get_current_account(authorization: str = Header(...)) -> Account:
     """Authenticate via Bearer token. Supports legacy .api-token and new API keys."""
     if not authorization.startswith("Bearer "):
@@ -64,22 +73,14 @@ async def get_current_account(authorization: str = Header(...)) -> Account:
     token = authorization[7:]
 
     # 1. Check legacy .api-token (maps to admin account)
-    if token == API_TOKEN:
+    if secrets.compare_digest(token.encode(), API_TOKEN.encode()):
         mgr = _get_account_mgr()
         # Find admin account (or any account with this legacy key)
-        acct = mgr.authenticate(token)
+        acct = mgr.authenticate(token) or mgr.first_admin()
         if acct:
             return acct
-        # Fallback: find first admin account
-        for a in mgr.list_accounts():
-            if a.role == "admin":
-                return a
         # No accounts at all — create a synthetic admin for backward compat
-        return Account(
-            account_id="legacy_admin",
-            display_name="Admin (legacy)",
-            role="admin",
-        )
+        return _LEGACY_ADMIN
 
     # 2. Check new API keys
     mgr = _get_account_mgr()
@@ -108,6 +109,15 @@ async def startup():
     logger.info(f"Token: {API_TOKEN[:8]}...")
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    # Flush queued webhook events before the process exits
+    await webhook_dispatcher.get_dispatcher().aclose()
+    await supabase_client.get_client().aclose()
+    await gradle_pool.shutdown()
+    await claude_pool.shutdown()
+
+
 # ── Request/Response models ──────────────────────────────────────────────────
 
 class BuildAppRequest(BaseModel):
@@ -139,6 +149,9 @@ class BuildStatusResponse(BaseModel):
     logs: list[str] = []
     warnings: list[str] = []
     capabilities: dict | None = None
+    queued_for: str | None = None
+    queue_position: int | None = None
+    eta_seconds: int | None = None
 
 class WorkspaceResponse(BaseModel):
     slug: str
@@ -254,9 +267,12 @@ def _status_to_response(s: service.BuildStatus) -> BuildStatusResponse:
         message=s.message,
         platforms=s.platforms,
         elapsed_seconds=s.elapsed_seconds,
-        logs=s.logs,
+        logs=list(s.logs),
         warnings=getattr(s, 'warnings', []),
         capabilities=getattr(s, 'capabilities', None),
+        queued_for=s.queued_for,
+        queue_position=s.queue_position,
+        eta_seconds=s.eta_seconds,
     )
 
 
@@ -832,6 +848,22 @@ async def buildapp(req: BuildAppRequest, account: Account = Depends(get_current_
     return _status_to_response(status)
 
 
+@app.get("/api/v1/builds", response_model=list[BuildStatusResponse])
+async def list_builds(slug: str | None = None, status: str | None = None,
+                      since: float | None = None, until: float | None = None,
+                      limit: int = 50, account_id: str | None = None,
+                      account: Account = Depends(get_current_account)):
+    """List builds newest-first. `since`/`until` are unix timestamps on created_at.
+    Non-admins only see their own account's builds."""
+    if account.role != "admin":
+        account_id = account.account_id
+    builds = service.list_builds(
+        account_id=account_id, slug=slug, status=status,
+        since=since, until=until, limit=max(1, min(limit, 500)),
+    )
+    return [_status_to_response(b) for b in builds]
+
+
 @app.get("/api/v1/builds/{build_id}", response_model=BuildStatusResponse)
 async def get_build(build_id: str, account: Account = Depends(get_current_account)):
     """Poll build status."""
@@ -841,6 +873,29 @@ async def get_build(build_id: str, account: Account = Depends(get_current_accoun
     return _status_to_response(status)
 
 
+@app.get("/api/v1/builds/{build_id}/events")
+async def stream_build_events(build_id: str, last_event_id: int | None = None,
+                              last_event_id_header: str | None = Header(None, alias="Last-Event-ID"),
+                              account: Account = Depends(get_current_account)):
+    """Server-Sent Events stream of build progress (log lines, phase changes, completion).
+
+    Starts with a `snapshot` event carrying the full status. Reconnect with the
+    Last-Event-ID header (or ?last_event_id=) to resume without gaps."""
+    if not service.get_build(build_id):
+        raise HTTPException(404, f"Build '{build_id}' not found")
+    if last_event_id is None and last_event_id_header and last_event_id_header.isdigit():
+        last_event_id = int(last_event_id_header)
+
+    def snapshot() -> dict:
+        return _status_to_response(service.get_build(build_id)).model_dump()
+
+    return StreamingResponse(
+        build_events.sse(build_id, last_event_id, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/api/v1/workspaces", response_model=list[WorkspaceResponse])
 async def list_workspaces(account: Account = Depends(get_current_account)):
     workspaces = await service.list_workspaces(account_id=account.account_id)
@@ -877,7 +932,8 @@ async def send_prompt(slug: str, req: PromptRequestModel,
     _check_workspace_access(account, slug)
     try:
         status = await service.send_prompt(
-            service.PromptRequest(workspace=slug, prompt=req.prompt, webhook_url=req.webhook_url)
+            service.PromptRequest(workspace=slug, prompt=req.prompt, webhook_url=req.webhook_url,
+                                  account_id=account.account_id)
         )
         return _status_to_response(status)
     except ValueError as e:
@@ -890,7 +946,7 @@ async def demo(slug: str, req: DemoRequest = DemoRequest(),
     """Trigger a demo build for a workspace."""
     _check_workspace_access(account, slug)
     try:
-        status = await service.demo_workspace(slug, req.platform)
+        status = await service.demo_workspace(slug, req.platform, account_id=account.account_id)
         status.webhook_url = req.webhook_url
         return _status_to_response(status)
     except ValueError as e:
@@ -976,7 +1032,7 @@ async def build_workspace(slug: str, req: PlatformBuildRequest = PlatformBuildRe
     """Build workspace for a specific platform. Returns build_id for polling."""
     _check_workspace_access(account, slug)
     try:
-        status = await service.build_workspace_platform(slug, req.platform)
+        status = await service.build_workspace_platform(slug, req.platform, account_id=account.account_id)
         status.webhook_url = req.webhook_url
         return _status_to_response(status)
     except ValueError as e:
@@ -997,7 +1053,7 @@ async def appraise_workspace(slug: str, account: Account = Depends(get_current_a
     """Run quality appraisal on a workspace. Returns build_id for polling."""
     _check_workspace_access(account, slug)
     try:
-        status = await service.appraise_workspace(slug)
+        status = await service.appraise_workspace(slug, account_id=account.account_id)
         return _status_to_response(status)
     except ValueError as e:
         raise HTTPException(404, str(e))
@@ -1117,14 +1173,15 @@ async def run_smoketest_endpoint(req: SmokeTestRequest = SmokeTestRequest(),
     import time as _time
 
     build_id = str(uuid.uuid4())[:8]
-    status = BuildStatusResponse(
+    status = service.BuildStatus(
         build_id=build_id,
         slug="smoketest",
         status="running",
         phase="starting",
         message="Smoke test starting...",
+        account_id=account.account_id,
     )
-    _smoketest_results[build_id] = status
+    service.register_build(status, kind="smoketest")
 
     async def _run():
         from helpers.smoketest_runner import run_smoketest, SCENARIO_NAMES
@@ -1134,12 +1191,10 @@ async def run_smoketest_endpoint(req: SmokeTestRequest = SmokeTestRequest(),
         registry = WorkspaceRegistry()
         claude = ClaudeRunner()
         scenarios = [req.scenario] if req.scenario and req.scenario in SCENARIO_NAMES else None
-        logs = []
 
         async def on_status(msg, file_path=None):
             cleaned = msg.replace("**", "").replace("`", "")
-            logs.append(cleaned)
-            status.logs = logs[-20:]  # keep last 20
+            status.logs.append(cleaned)
             status.message = cleaned
 
         try:
@@ -1153,7 +1208,6 @@ async def run_smoketest_endpoint(req: SmokeTestRequest = SmokeTestRequest(),
             status.status = "success" if result.success else "failed"
             status.phase = "complete"
             status.message = result.summary()
-            status.logs = logs
 
             # Run API tests if requested
             if req.api_tests:
@@ -1171,27 +1225,47 @@ async def run_smoketest_endpoint(req: SmokeTestRequest = SmokeTestRequest(),
             status.status = "failed"
             status.phase = "complete"
             status.message = f"Error: {e}"
+        service.finish_build(status)
 
     import asyncio
     asyncio.create_task(_run())
-    return status
+    return _status_to_response(status)
 
-@app.get("/api/v1/smoketest/{build_id}")
+@app.get("/api/v1/smoketest/{build_id}", response_model=BuildStatusResponse)
 async def get_smoketest_status(build_id: str,
                                account: Account = Depends(get_current_account)):
-    if build_id not in _smoketest_results:
+    status = service.get_build(build_id, kind="smoketest")
+    if not status:
         raise HTTPException(404, f"Smoke test '{build_id}' not found")
-    return _smoketest_results[build_id]
-
-_smoketest_results: dict[str, BuildStatusResponse] = {}
+    return _status_to_response(status)
 
 
 # ── Analytics ────────────────────────────────────────────────────────────────
 
+# Sections only admins see: global and per-workspace spend, account auth counters
+_ADMIN_ANALYTICS = ("spend", "auth")
+
+
 @app.get("/api/v1/analytics")
 async def analytics(account: Account = Depends(get_current_account)):
-    """Build analytics: success rates, avg durations, per-workspace and per-operation breakdowns."""
-    return service.get_analytics()
+    """Build analytics: success rates, avg durations, per-workspace and per-operation breakdowns.
+    Spend and auth sections are included for admins only."""
+    data = service.get_analytics()
+    if account.role != "admin":
+        for key in _ADMIN_ANALYTICS:
+            data.pop(key, None)
+    return data
+
+
+@app.get("/api/v1/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(account: Account = Depends(get_current_account)):
+    """Cost/latency telemetry and component counters in Prometheus text format (admin only:
+    it carries global spend)."""
+    _require_admin(account)
+    analytics = service.get_analytics()
+    analytics.pop("telemetry", None)  # already rendered as histograms
+    return PlainTextResponse(telemetry.prometheus_text(analytics),
+                             media_type="text/plain; version=0.0.4")
 
 
 # ── Health ──────────────────────────────────────────────────────────────────
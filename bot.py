@@ -10,14 +10,17 @@ from pathlib import Path
 
 import discord
 
+import claude_pool
 import config
+import gradle_pool
+import scheduler
 from agent_factory import create_agent_runner
 import parser as msg_parser
 from parser import WorkspacePrompt, Command, FallbackPrompt
 from workspaces import WorkspaceRegistry
-from cost_tracker import CostTracker
+from cost_tracker import get_tracker
 from allowlist import Allowlist
-from accounts import AccountManager
+from accounts import get_manager
 from bot_context import BotContext
 from handlers import COMMAND_HANDLERS
 from handlers.prompt_handler import handle_prompt
@@ -41,14 +44,24 @@ config.print_config_summary()
 
 registry = WorkspaceRegistry()
 claude = create_agent_runner()
-cost_tracker = CostTracker()
+cost_tracker = get_tracker()
 allowlist = Allowlist()
-account_mgr = AccountManager()
+account_mgr = get_manager()
 
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True  # needed for auto-approve (guild.get_member)
-client = discord.Client(intents=intents)
+
+
+class BridgeClient(discord.Client):
+    async def close(self) -> None:
+        # Stop pooled Gradle daemons and warm Claude CLIs so they don't outlive the bot
+        await gradle_pool.shutdown()
+        await claude_pool.shutdown()
+        await super().close()
+
+
+client = BridgeClient(intents=intents)
 
 ctx = BotContext(
     client=client,
@@ -164,6 +177,9 @@ async def on_message(message: discord.Message):
     channel = message.channel
     is_dm = isinstance(channel, discord.DMChannel)
     user_id = message.author.id
+    # Pick up workspaces/users the API process changed (cheap when nothing did)
+    registry.reload()
+    allowlist.reload()
     is_admin = allowlist.is_admin(user_id)
     is_allowed = allowlist.is_allowed(user_id)
 
@@ -195,6 +211,11 @@ async def on_message(message: discord.Message):
 
     # Resolve account_id for this Discord user
     account_id = account_mgr.get_by_discord_id(user_id)
+    # Tag scheduler slots taken while handling this message (admins jump the queue)
+    scheduler.bind(
+        account=account_id or f"discord:{user_id}",
+        priority=scheduler.PRIORITY_HIGH if is_admin else scheduler.PRIORITY_NORMAL,
+    )
 
     # ── Claude prompts ───────────────────────────────────────────────────
     if isinstance(parsed, (WorkspacePrompt, FallbackPrompt)):
@@ -7,9 +7,10 @@ Endpoints:
   POST /api/v1/extract
   POST /api/v1/extract-doc-text
 
-Auth: Bearer token, validated against the shared accounts.json (encrypted
-credentials). Same scheme as the parent bridge so existing API keys and
-admin BYOK creds keep working.
+Auth: Bearer token, validated against accounts.json (encrypted
+credentials), exported from the parent bridge's account store with
+`python storage.py export accounts.json accounts` (see README). Same scheme
+as the parent bridge so existing API keys and admin BYOK creds keep working.
 
 This service intentionally does NOT include any of the bridge's
 shell-out / Claude CLI / build-runner code. It is safe to deploy to a
@@ -0,0 +1,332 @@
+"""
+build_cache.py — Content-addressed build cache for platform builds.
+
+Hashes the inputs that feed a platform's Gradle/Xcode target (source sets,
+Gradle files, resources, module config such as google-services.json and
+webpack.config.d/, iosApp/) and remembers the last BuildResult per
+(workspace, platform). When the hash matches and the dist artifacts are still
+on disk (or can be restored from the cache copy), build_platform() returns the
+cached result instead of shelling out to ./gradlew again. Failures are only
+cached when the compiler pointed at a source line; anything else (dependency
+resolution, network, Gradle lock timeouts, daemon crashes) may pass on retry
+with the same sources.
+
+Layout on disk (under BUILD_CACHE_DIR):
+    <workspace-id>/<platform>/entry.json      — hash + serialized BuildResult
+    <workspace-id>/<platform>/artifacts/      — copy of the dist outputs
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import config
+
+# Directories never hashed — build outputs, IDE state, VCS metadata
+_SKIP_DIRS = {
+    "build", ".gradle", ".kotlin", ".idea", ".git", "node_modules",
+    "DerivedData", "xcuserdata", ".swiftpm", "Pods",
+}
+
+# Root-level files that affect every target
+_ROOT_BUILD_FILES = (
+    "build.gradle.kts", "build.gradle", "settings.gradle.kts", "settings.gradle",
+    "gradle.properties", "gradle/libs.versions.toml",
+    "gradle/wrapper/gradle-wrapper.properties", "local.properties",
+)
+
+# Inputs outside src/ — in each module, and at the root — and the platform
+# they feed (None = every platform). Files or directories.
+_MODULE_INPUTS = (
+    ("google-services.json", "android"),
+    ("proguard-rules.pro", "android"),
+    ("consumer-rules.pro", "android"),
+    ("webpack.config.d", "web"),
+)
+_ROOT_INPUTS = (
+    ("kotlin-js-store", "web"),
+)
+
+# Source-set name prefixes → the platform they compile into.
+# Anything not listed (commonMain, nonWebMain, ...) feeds every platform.
+_SOURCE_SET_PLATFORMS = (
+    ("android", "android"),
+    ("ios", "ios"),
+    ("apple", "ios"),
+    ("native", "ios"),
+    ("wasmJs", "web"),
+    ("js", "web"),
+    ("web", "web"),
+    ("jvm", "desktop"),
+    ("desktop", "desktop"),
+)
+
+# Dist outputs to snapshot per platform (relative to the workspace root)
+_ARTIFACT_DIRS = {
+    "android": ["composeApp/build/outputs/apk/debug"],
+    "ios": ["build/ios-simulator/Build/Products/Debug-iphonesimulator"],
+    "web": [
+        "composeApp/build/dist/wasmJs/productionExecutable",
+        "composeApp/build/dist/js/productionExecutable",
+    ],
+}
+
+# Keep stored build output small — only the tail is useful for display
+_MAX_OUTPUT_CHARS = 100_000
+
+# A compiler error with a source location (Kotlin 2 and 1.x formats, Swift/ObjC)
+_COMPILER_ERROR_RE = re.compile(
+    r"^e: (?:file://)?\S+\.kts?(?::\d+:\d+|: \(\d+, \d+\))"
+    r"|^\S+\.(?:swift|mm?|h):\d+:\d+: (?:fatal )?error: ",
+    re.MULTILINE,
+)
+# Failures of the environment rather than the code
+_ENVIRONMENT_ERROR_RE = re.compile(
+    r"Timed out|Timeout waiting to lock|Could not resolve|Could not (?:GET|HEAD|download)"
+    r"|Connection (?:refused|reset|timed out)|UnknownHostException|daemon disappeared"
+    r"|OutOfMemoryError|Java heap space|Metaspace|Gradle build daemon has been stopped",
+    re.IGNORECASE,
+)
+
+# path -> (mtime_ns, size, digest), least recently used first; avoids
+# re-reading unchanged files
+_MAX_FILE_DIGESTS = 50_000
+_file_digests: OrderedDict[str, tuple[int, int, str]] = OrderedDict()
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "restores": 0}
+
+
+def _cache_root() -> Path:
+    return Path(config.BUILD_CACHE_DIR)
+
+
+def _entry_dir(workspace_path: str, platform: str) -> Path:
+    ws_id = hashlib.sha1(str(Path(workspace_path).resolve()).encode()).hexdigest()[:16]
+    return _cache_root() / ws_id / platform
+
+
+def _source_set_platform(name: str) -> Optional[str]:
+    """Return the platform a source set belongs to, or None if shared."""
+    for prefix, platform in _SOURCE_SET_PLATFORMS:
+        if name.startswith(prefix):
+            return platform
+    return None
+
+
+def _file_digest(path: Path) -> str:
+    st = path.stat()
+    key = str(path)
+    cached = _file_digests.get(key)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        _file_digests.move_to_end(key)
+        return cached[2]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _file_digests[key] = (st.st_mtime_ns, st.st_size, digest)
+    _file_digests.move_to_end(key)
+    while len(_file_digests) > _MAX_FILE_DIGESTS:
+        _file_digests.popitem(last=False)
+    return digest
+
+
+def _walk(root: Path):
+    """Yield files under root, skipping build/IDE directories."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in _SKIP_DIRS)
+        for name in sorted(filenames):
+            if name == ".DS_Store":
+                continue
+            yield Path(dirpath) / name
+
+
+def _extra_inputs(base: Path, inputs: tuple, platform: str) -> list[Path]:
+    files: list[Path] = []
+    for name, owner in inputs:
+        if owner is not None and owner != platform:
+            continue
+        p = base / name
+        if p.is_file():
+            files.append(p)
+        elif p.is_dir():
+            files.extend(_walk(p))
+    return files
+
+
+def _input_files(workspace_path: str, platform: str) -> list[Path]:
+    """Collect every file that feeds the given platform's build."""
+    ws = Path(workspace_path)
+    files: list[Path] = []
+
+    for name in _ROOT_BUILD_FILES:
+        p = ws / name
+        if p.is_file():
+            files.append(p)
+    files.extend(_extra_inputs(ws, _ROOT_INPUTS, platform))
+
+    # Gradle modules: any top-level dir with a src/ folder (composeApp, shared, ...)
+    for module in sorted(d for d in ws.iterdir() if d.is_dir() and d.name not in _SKIP_DIRS):
+        src = module / "src"
+        if not src.is_dir():
+            continue
+        for build_file in ("build.gradle.kts", "build.gradle"):
+            if (module / build_file).is_file():
+                files.append(module / build_file)
+        files.extend(_extra_inputs(module, _MODULE_INPUTS, platform))
+        for source_set in sorted(d for d in src.iterdir() if d.is_dir()):
+            if source_set.name.endswith("Test"):
+                continue
+            owner = _source_set_platform(source_set.name)
+            if owner is not None and owner != platform:
+                continue
+            files.extend(_walk(source_set))
+
+    if platform == "ios":
+        ios_dir = ws / "iosApp"
+        if ios_dir.is_dir():
+            files.extend(_walk(ios_dir))
+
+    return files
+
+
+def compute_source_hash(workspace_path: str, platform: str) -> Optional[str]:
+    """Hash all build inputs for a platform. Returns None if the tree is unreadable."""
+    ws = Path(workspace_path)
+    if not ws.is_dir():
+        return None
+    h = hashlib.sha256(platform.encode())
+    try:
+        for path in _input_files(workspace_path, platform):
+            rel = path.relative_to(ws).as_posix()
+            h.update(rel.encode())
+            h.update(b"\0")
+            h.update(_file_digest(path).encode())
+            h.update(b"\n")
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def _artifact_sources(workspace_path: str, platform: str) -> list[Path]:
+    ws = Path(workspace_path)
+    return [ws / rel for rel in _ARTIFACT_DIRS.get(platform, []) if (ws / rel).is_dir()]
+
+
+def _artifacts_present(workspace_path: str, platform: str) -> bool:
+    return any(any(d.iterdir()) for d in _artifact_sources(workspace_path, platform))
+
+
+def lookup(workspace_path: str, platform: str, source_hash: str) -> Optional[dict]:
+    """Return the cached result dict on a hash match, restoring artifacts if needed."""
+    entry_path = _entry_dir(workspace_path, platform) / "entry.json"
+    if not entry_path.exists():
+        _stats["misses"] += 1
+        return None
+    try:
+        entry = json.loads(entry_path.read_text())
+    except (json.JSONDecodeError, OSError):
+        _stats["misses"] += 1
+        return None
+    if entry.get("hash") != source_hash:
+        _stats["misses"] += 1
+        return None
+
+    result = entry.get("result", {})
+    if result.get("success") and not _artifacts_present(workspace_path, platform):
+        if not _restore_artifacts(workspace_path, platform, entry.get("artifacts", [])):
+            _stats["misses"] += 1
+            return None
+    _stats["hits"] += 1
+    return result
+
+
+def _restore_artifacts(workspace_path: str, platform: str, rel_dirs: list[str]) -> bool:
+    """Copy snapshotted dist outputs back into the workspace."""
+    stored = _entry_dir(workspace_path, platform) / "artifacts"
+    if not rel_dirs or not stored.is_dir():
+        return False
+    ws = Path(workspace_path)
+    try:
+        for rel in rel_dirs:
+            src = stored / rel
+            if not src.is_dir():
+                return False
+            dest = ws / rel
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copytree(src, dest, dirs_exist_ok=True)
+    except OSError as e:
+        print(f"[build-cache] Artifact restore failed: {e}")
+        return False
+    _stats["restores"] += 1
+    return True
+
+
+def _is_cacheable(result) -> bool:
+    """Successful builds and genuine compile failures are cacheable. Builds
+    stopped early (their error list may be partial), failures without a
+    located compiler error, and anything that looks environmental are not."""
+    if result.success:
+        return True
+    if getattr(result, "aborted_early", False):
+        return False
+    text = f"{result.error}\n{result.output}"
+    return bool(_COMPILER_ERROR_RE.search(text)) and not _ENVIRONMENT_ERROR_RE.search(text)
+
+
+def store(workspace_path: str, platform: str, source_hash: str, result) -> None:
+    """Persist a BuildResult (and, on success, a copy of the dist artifacts)."""
+    if not _is_cacheable(result):
+        # The build still touched the outputs — the old entry no longer matches them
+        invalidate(workspace_path, platform)
+        return
+    entry_dir = _entry_dir(workspace_path, platform)
+    artifacts_dir = entry_dir / "artifacts"
+    rel_dirs: list[str] = []
+    try:
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        if artifacts_dir.exists():
+            shutil.rmtree(artifacts_dir)
+        if result.success:
+            ws = Path(workspace_path)
+            for src in _artifact_sources(workspace_path, platform):
+                rel = src.relative_to(ws).as_posix()
+                shutil.copytree(src, artifacts_dir / rel)
+                rel_dirs.append(rel)
+        entry = {
+            "hash": source_hash,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "artifacts": rel_dirs,
+            "result": {
+                "success": result.success,
+                "output": result.output[-_MAX_OUTPUT_CHARS:],
+                "error": result.error,
+            },
+        }
+        tmp = entry_dir / "entry.json.tmp"
+        tmp.write_text(json.dumps(entry, indent=2))
+        os.replace(tmp, entry_dir / "entry.json")
+        _stats["stores"] += 1
+    except OSError as e:
+        print(f"[build-cache] Store failed for {platform}: {e}")
+
+
+def invalidate(workspace_path: str, platform: Optional[str] = None) -> None:
+    """Drop cached results for a workspace (one platform or all)."""
+    target = _entry_dir(workspace_path, platform) if platform else _entry_dir(workspace_path, "x").parent
+    shutil.rmtree(target, ignore_errors=True)
+
+
+def stats() -> dict:
+    """Return hit/miss counters since process start."""
+    total = _stats["hits"] + _stats["misses"]
+    return {**_stats, "hit_rate": round(_stats["hits"] / total, 3) if total else 0.0}
@@ -0,0 +1,159 @@
+"""
+build_errors.py — Recognise build errors line by line while the build runs.
+
+A Kotlin compile error is printed as soon as the compiler reaches the file,
+often minutes before Gradle finishes (or gives up) on the remaining tasks.
+proc_io feeds every output line of a platform build to an ErrorDetector,
+which matches it against that platform's pattern table and collects
+distinct errors as they appear.
+
+With BUILD_EARLY_ABORT_ERRORS > 0 the build is stopped once that many
+errors are known. The detector first waits BUILD_EARLY_ABORT_GRACE_SECS for
+the rest of the same compiler burst, so the fixer gets the whole batch from
+one module. The BuildResult is marked aborted_early, and build_cache won't
+store it because its error list may be partial.
+
+Pattern tables are regexes with optional named groups file / line / col /
+message. A JSON file named by BUILD_ERROR_PATTERNS_FILE adds patterns,
+checked before the built-in ones:
+
+    {"android": [{"pattern": "^ERROR: (?P<message>.+)$"}],
+     "ios":     [{"pattern": "^ld: (?P<message>.+)$"}]}
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import config
+
+_KOTLIN = [
+    r"^e: (?:file://)?(?P<file>[^:\s]+\.kts?):(?P<line>\d+):(?P<col>\d+) (?P<message>.+)$",
+    r"^e: (?P<message>.+)$",
+]
+_SWIFT = [
+    r"^(?P<file>/[^:]+\.(?:swift|m|mm|h)):(?P<line>\d+):(?P<col>\d+): (?:fatal )?error: (?P<message>.+)$",
+    r"^(?:xcodebuild: )?error: (?P<message>.+)$",
+]
+_GRADLE = [
+    r"^> Could not resolve (?P<message>.+)$",
+    r"^Could not resolve all (?P<message>.+)$",
+]
+
+_DEFAULT_PATTERNS: dict[str, list[str]] = {
+    "android": _KOTLIN + _GRADLE,
+    "web": _KOTLIN + _GRADLE,
+    "ios": _KOTLIN + _SWIFT + _GRADLE,
+}
+
+_metrics = {"builds_watched": 0, "errors_detected": 0, "early_aborts": 0, "lead_secs_total": 0.0}
+_tables: Optional[dict[str, list[re.Pattern]]] = None
+
+
+def _load_tables() -> dict[str, list[re.Pattern]]:
+    tables = {p: list(patterns) for p, patterns in _DEFAULT_PATTERNS.items()}
+    path = config.BUILD_ERROR_PATTERNS_FILE
+    if path:
+        try:
+            custom = json.loads(Path(path).read_text())
+            for platform, entries in custom.items():
+                extra = [e["pattern"] if isinstance(e, dict) else e for e in entries]
+                tables[platform] = extra + tables.get(platform, [])
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"[build-errors] Ignoring {path}: {e}")
+    compiled: dict[str, list[re.Pattern]] = {}
+    for platform, patterns in tables.items():
+        compiled[platform] = []
+        for pattern in patterns:
+            try:
+                compiled[platform].append(re.compile(pattern))
+            except re.error as e:
+                print(f"[build-errors] Bad pattern for {platform}: {pattern!r}: {e}")
+    return compiled
+
+
+def patterns_for(platform: str) -> list[re.Pattern]:
+    global _tables
+    if _tables is None:
+        _tables = _load_tables()
+    return _tables.get(platform, [])
+
+
+@dataclass(frozen=True)
+class BuildError:
+    message: str
+    file: str = ""
+    line: int = 0
+    col: int = 0
+    raw: str = ""
+
+
+class ErrorDetector:
+    """Collect distinct errors from one build's output as it streams."""
+
+    def __init__(self, platform: str, abort_after: Optional[int] = None,
+                 grace_secs: Optional[float] = None):
+        self.platform = platform
+        self.abort_after = config.BUILD_EARLY_ABORT_ERRORS if abort_after is None else abort_after
+        self.grace_secs = config.BUILD_EARLY_ABORT_GRACE_SECS if grace_secs is None else grace_secs
+        self.errors: list[BuildError] = []
+        self.aborted = False
+        self._patterns = patterns_for(platform)
+        self._seen: set[tuple] = set()
+        self._started = time.monotonic()
+        self._first_error_at: Optional[float] = None
+        _metrics["builds_watched"] += 1
+
+    def feed(self, line: str) -> Optional[BuildError]:
+        stripped = line.strip()
+        if not stripped:
+            return None
+        for pattern in self._patterns:
+            m = pattern.match(stripped)
+            if not m:
+                continue
+            groups = m.groupdict()
+            error = BuildError(
+                message=(groups.get("message") or stripped).strip(),
+                file=groups.get("file") or "",
+                line=int(groups.get("line") or 0),
+                col=int(groups.get("col") or 0),
+                raw=stripped,
+            )
+            key = (Path(error.file).name, error.line, error.message)
+            if key in self._seen:
+                return None  # Gradle and xcodebuild both repeat errors in their summaries
+            self._seen.add(key)
+            self.errors.append(error)
+            _metrics["errors_detected"] += 1
+            if self._first_error_at is None:
+                self._first_error_at = time.monotonic()
+            return error
+        return None
+
+    @property
+    def should_abort(self) -> bool:
+        return self.abort_after > 0 and len(self.errors) >= self.abort_after
+
+    def finish(self, aborted: bool = False) -> None:
+        """Call once the build has ended, to record how early the first error was known."""
+        self.aborted = aborted
+        if aborted:
+            _metrics["early_aborts"] += 1
+        if self._first_error_at is not None:
+            _metrics["lead_secs_total"] += time.monotonic() - self._first_error_at
+
+    def summary(self, max_lines: int = 60) -> str:
+        lines = [e.raw for e in self.errors[:max_lines]]
+        if self.aborted:
+            lines.append(f"(Build stopped early after {len(self.errors)} errors — fix these first.)")
+        return "\n".join(lines)
+
+
+def metrics() -> dict:
+    return dict(_metrics)
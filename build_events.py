@@ -0,0 +1,156 @@
+"""
+build_events.py — In-process progress event streams for running builds.
+
+service.py publishes a numbered event for every status line, phase change and
+completion; api.py turns a stream into Server-Sent Events. Each build keeps a
+bounded replay buffer, so a client reconnecting with Last-Event-ID picks up
+exactly where it left off. If the gap has already been trimmed, or the stream
+is gone (e.g. after a restart), the client gets a fresh snapshot instead.
+
+    build_events.publish(build_id, "log", {"message": msg})
+    build_events.close(build_id)          # after the "complete" event
+
+    async for chunk in build_events.sse(build_id, last_event_id, snapshot):
+        yield chunk
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Optional
+
+_REPLAY_EVENTS = 500
+_HEARTBEAT_SECS = 15
+_CLOSED_STREAM_TTL_SECS = 600
+
+
+@dataclass
+class BuildEvent:
+    id: int
+    event: str
+    data: dict
+
+    def to_sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.event}\ndata: {json.dumps(self.data, default=str)}\n\n"
+
+
+@dataclass
+class _Stream:
+    events: deque = field(default_factory=lambda: deque(maxlen=_REPLAY_EVENTS))
+    seq: int = 0
+    closed_at: Optional[float] = None
+    waiters: set = field(default_factory=set)
+
+    def publish(self, event: str, data: dict) -> BuildEvent:
+        self.seq += 1
+        ev = BuildEvent(self.seq, event, data)
+        self.events.append(ev)
+        self._wake()
+        return ev
+
+    def close(self) -> None:
+        self.closed_at = time.time()
+        self._wake()
+
+    def _wake(self) -> None:
+        for fut in self.waiters:
+            if not fut.done():
+                fut.set_result(None)
+        self.waiters.clear()
+
+    def after(self, last_id: int) -> Optional[list[BuildEvent]]:
+        """Events newer than last_id, or None if some were already trimmed."""
+        if self.events and last_id < self.events[0].id - 1:
+            return None
+        return [ev for ev in self.events if ev.id > last_id]
+
+    async def wait(self, timeout: float) -> None:
+        fut = asyncio.get_running_loop().create_future()
+        self.waiters.add(fut)
+        try:
+            await asyncio.wait_for(fut, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self.waiters.discard(fut)
+
+
+_streams: dict[str, _Stream] = {}
+
+
+def _sweep() -> None:
+    now = time.time()
+    for build_id in [b for b, s in _streams.items()
+                     if s.closed_at and now - s.closed_at > _CLOSED_STREAM_TTL_SECS]:
+        del _streams[build_id]
+
+
+def open_stream(build_id: str) -> None:
+    """Create a build's stream up front so early subscribers wait for events."""
+    if build_id not in _streams:
+        _sweep()
+        _streams[build_id] = _Stream()
+
+
+def publish(build_id: str, event: str, data: dict) -> None:
+    """Append an event to a build's stream (created on first use)."""
+    stream = _streams.get(build_id)
+    if stream is None:
+        _sweep()
+        stream = _streams[build_id] = _Stream()
+    stream.publish(event, data)
+
+
+def close(build_id: str) -> None:
+    """Mark a stream finished; subscribers drain it and disconnect."""
+    stream = _streams.get(build_id)
+    if stream:
+        stream.close()
+
+
+async def sse(build_id: str, last_event_id: Optional[int],
+              snapshot: Callable[[], dict]) -> AsyncIterator[str]:
+    """Yield SSE frames for a build until its stream closes.
+
+    `snapshot` returns the current BuildStatus as a dict; it is sent as a
+    "snapshot" event on first connect or when the replay gap is lost.
+    """
+    stream = _streams.get(build_id)
+    if stream is None:
+        # Nothing in memory (finished long ago or server restarted)
+        data = snapshot()
+        yield BuildEvent(0, "snapshot", data).to_sse()
+        if data.get("status") in ("success", "failed"):
+            yield BuildEvent(0, "complete", data).to_sse()
+        return
+
+    last = last_event_id
+    if last is not None and stream.after(last) is None:
+        last = None
+    if last is None:
+        last = stream.seq
+        yield BuildEvent(last, "snapshot", snapshot()).to_sse()
+        if stream.closed_at is not None and stream.events and stream.events[-1].event == "complete":
+            yield stream.events[-1].to_sse()
+            return
+
+    while True:
+        pending = stream.after(last)
+        if pending is None:
+            # Client fell behind the replay buffer — resync
+            last = stream.seq
+            yield BuildEvent(last, "snapshot", snapshot()).to_sse()
+            continue
+        for ev in pending:
+            yield ev.to_sse()
+            last = ev.id
+        if stream.closed_at is not None:
+            return
+        before = stream.seq
+        await stream.wait(_HEARTBEAT_SECS)
+        if stream.seq == before and stream.closed_at is None:
+            yield ": keepalive\n\n"
@@ -0,0 +1,238 @@
+"""
+build_store.py — Persistent build-status store (SQLite, WAL mode).
+
+Replaces the old in-memory `_builds` dict. Every status is written to
+BUILD_STORE_PATH so polling survives restarts. A bounded LRU of live status
+objects sits in front of the database; builds that are still running are
+pinned there because their background task keeps mutating the object.
+
+    store = BuildStore(config.BUILD_STORE_PATH, BuildStatus)
+    store.put(status)                      # on creation
+    store.save(status)                     # on completion
+    store.get(build_id)
+    store.query(account_id="acct_1", status="failed", since=time.time() - 86400)
+
+Rows older than BUILD_STORE_TTL_DAYS are purged. Builds left running by a
+process that has since died are marked failed on the next open. Rows carry
+the writing process's pid and a random per-process token: a restarted
+container usually gets the same pid back (often 1), so a live pid alone
+doesn't prove the row's owner is still running.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import fields
+from pathlib import Path
+from typing import Callable, Optional
+
+import config
+
+TERMINAL_STATUSES = ("success", "failed")
+
+_PURGE_INTERVAL_SECS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    build_id   TEXT PRIMARY KEY,
+    kind       TEXT NOT NULL DEFAULT 'build',
+    account_id TEXT,
+    slug       TEXT,
+    status     TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner_pid  INTEGER,
+    owner_token TEXT,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_builds_created ON builds(kind, created_at);
+CREATE INDEX IF NOT EXISTS idx_builds_account ON builds(kind, account_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_builds_slug ON builds(kind, slug, created_at);
+CREATE INDEX IF NOT EXISTS idx_builds_status ON builds(kind, status, created_at);
+"""
+
+# Identifies this process's rows; pids are reused across restarts
+_PROCESS_TOKEN = uuid.uuid4().hex
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class BuildStore:
+    def __init__(self, path: str, factory: Callable, cache_size: Optional[int] = None,
+                 ttl_days: Optional[float] = None):
+        self._factory = factory
+        self._cache_size = cache_size if cache_size is not None else config.BUILD_STORE_CACHE_SIZE
+        ttl = ttl_days if ttl_days is not None else config.BUILD_STORE_TTL_DAYS
+        self._ttl_secs = ttl * 86400
+        self._cache: OrderedDict[str, object] = OrderedDict()
+        self._kinds: dict[str, str] = {}
+        self._last_purge = 0.0
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        columns = {r["name"] for r in self._db.execute("PRAGMA table_info(builds)")}
+        if "owner_token" not in columns:
+            self._db.execute("ALTER TABLE builds ADD COLUMN owner_token TEXT")
+        self._mark_orphans_interrupted()
+        self._purge_expired()
+
+    # ── Serialization ────────────────────────────────────────────────────
+
+    @staticmethod
+    def _to_dict(status) -> dict:
+        data = {}
+        for f in fields(status):
+            value = getattr(status, f.name)
+            data[f.name] = list(value) if isinstance(value, deque) else value
+        return data
+
+    def _from_row(self, row: sqlite3.Row):
+        data = json.loads(row["data"])
+        known = {f.name for f in fields(self._factory)}
+        return self._factory(**{k: v for k, v in data.items() if k in known})
+
+    # ── Writes ───────────────────────────────────────────────────────────
+
+    def _write(self, status, kind: str) -> None:
+        data = self._to_dict(status)
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO builds (build_id, kind, account_id, slug, status, created_at, updated_at,"
+            " owner_pid, owner_token, data)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(build_id) DO UPDATE SET account_id=excluded.account_id, slug=excluded.slug,"
+            " status=excluded.status, updated_at=excluded.updated_at, data=excluded.data",
+            (status.build_id, kind, data.get("account_id"), data.get("slug"), status.status,
+             data.get("created_at") or now, now, os.getpid(), _PROCESS_TOKEN, json.dumps(data, default=str)),
+        )
+
+    def put(self, status, kind: str = "build") -> None:
+        """Register a new status object and persist its initial state."""
+        self._kinds[status.build_id] = kind
+        self._cache[status.build_id] = status
+        self._cache.move_to_end(status.build_id)
+        self._write(status, kind)
+        self._evict()
+
+    def save(self, status) -> None:
+        """Persist the current state of a status object (e.g. on completion)."""
+        kind = self._kinds.get(status.build_id, "build")
+        self._write(status, kind)
+        self._evict()
+        if time.time() - self._last_purge > _PURGE_INTERVAL_SECS:
+            self._purge_expired()
+
+    def flush_active(self) -> None:
+        """Write through every pinned (still running) status."""
+        for status in list(self._cache.values()):
+            if status.status not in TERMINAL_STATUSES:
+                self._write(status, self._kinds.get(status.build_id, "build"))
+
+    # ── Reads ────────────────────────────────────────────────────────────
+
+    def get(self, build_id: str, kind: str = "build"):
+        cached = self._cache.get(build_id)
+        if cached is not None:
+            if self._kinds.get(build_id, "build") != kind:
+                return None
+            self._cache.move_to_end(build_id)
+            return cached
+        row = self._db.execute(
+            "SELECT * FROM builds WHERE build_id = ? AND kind = ?", (build_id, kind)
+        ).fetchone()
+        if row is None:
+            return None
+        status = self._from_row(row)
+        self._kinds[build_id] = kind
+        self._cache[build_id] = status
+        self._evict()
+        return status
+
+    def query(self, *, kind: str = "build", account_id: Optional[str] = None,
+              slug: Optional[str] = None, status: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              limit: int = 100) -> list:
+        """Newest-first statuses matching every given filter."""
+        self.flush_active()
+        clauses, params = ["kind = ?"], [kind]
+        for column, value in (("account_id", account_id), ("slug", slug), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        params.append(limit)
+        rows = self._db.execute(
+            f"SELECT * FROM builds WHERE {' AND '.join(clauses)} ORDER BY created_at DESC LIMIT ?",
+            params,
+        ).fetchall()
+        # Prefer live objects so running builds reflect in-flight progress
+        return [self._cache.get(r["build_id"]) or self._from_row(r) for r in rows]
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM builds").fetchone()[0]
+
+    # ── Housekeeping ─────────────────────────────────────────────────────
+
+    def _evict(self) -> None:
+        if len(self._cache) <= self._cache_size:
+            return
+        for build_id in list(self._cache):
+            if len(self._cache) <= self._cache_size:
+                break
+            if self._cache[build_id].status in TERMINAL_STATUSES:
+                del self._cache[build_id]
+                self._kinds.pop(build_id, None)
+
+    def _purge_expired(self) -> None:
+        self._last_purge = time.time()
+        if self._ttl_secs <= 0:
+            return
+        cur = self._db.execute("DELETE FROM builds WHERE updated_at < ?", (time.time() - self._ttl_secs,))
+        if cur.rowcount:
+            print(f"[build-store] Purged {cur.rowcount} expired build(s)")
+
+    def _mark_orphans_interrupted(self) -> None:
+        placeholders = ",".join("?" * len(TERMINAL_STATUSES))
+        rows = self._db.execute(
+            f"SELECT build_id, owner_pid, owner_token, data FROM builds WHERE status NOT IN ({placeholders})",
+            TERMINAL_STATUSES,
+        ).fetchall()
+        interrupted = 0
+        for row in rows:
+            if row["owner_token"] == _PROCESS_TOKEN:
+                continue  # ours (another store on the same file in this process)
+            pid = row["owner_pid"]
+            # Our own pid on someone else's row means a previous process that had it
+            if pid and pid != os.getpid() and _pid_alive(pid):
+                continue
+            data = json.loads(row["data"])
+            data.update(status="failed", phase="complete", message="Interrupted by server restart")
+            self._db.execute(
+                "UPDATE builds SET status = 'failed', updated_at = ?, data = ? WHERE build_id = ?",
+                (time.time(), json.dumps(data, default=str), row["build_id"]),
+            )
+            interrupted += 1
+        if interrupted:
+            print(f"[build-store] Marked {interrupted} build(s) from a previous run as interrupted")
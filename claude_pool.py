@@ -0,0 +1,209 @@
+"""
+claude_pool.py — Pre-spawned Claude CLI processes, ready before the prompt is.
+
+The CLI is started with `--input-format stream-json`, so it can boot (Node
+startup, auth/config load, session file read for -r) while waiting for its
+first stdin message. ClaudeRunner pre-spawns the process it expects to need
+next, keyed by (cwd, argv, max output tokens). When the next prompt arrives it
+takes the matching warm process and writes the prompt to stdin. If nothing
+matches, it falls back to a normal cold spawn.
+
+    proc = pool.take(key)                 # None → spawn cold
+    pool.prewarm(key, spawn)              # after a run, for the next one
+
+Each process serves exactly one prompt: stdin is closed after the message so
+the CLI exits after its result, exactly like `-p "<prompt>"`.
+
+At most CLAUDE_WARM_POOL_SIZE idle processes are kept (0 disables the pool).
+Idle ones are killed after CLAUDE_WARM_IDLE_SECS. Processes for a workspace
+are discarded whenever its session changes. shutdown() (bot and API exit)
+waits for in-flight spawns and kills everything the pool holds.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import config
+
+_REAP_INTERVAL_SECS = 30
+_SHUTDOWN_SPAWN_WAIT_SECS = 10
+
+PoolKey = tuple  # (cwd, argv tuple, max_output_tokens)
+
+
+@dataclass
+class _WarmProcess:
+    key: PoolKey
+    proc: asyncio.subprocess.Process
+    spawned_at: float
+
+
+class ClaudeProcessPool:
+    def __init__(self, max_idle: int, idle_secs: int):
+        self._max_idle = max_idle
+        self._idle_secs = idle_secs
+        self._idle: list[_WarmProcess] = []
+        self._spawning: set[PoolKey] = set()
+        self._spawn_tasks: set[asyncio.Task] = set()
+        self._closing = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reaper: Optional[asyncio.Task] = None
+        self._metrics = {"warm_hits": 0, "cold_starts": 0, "prewarmed": 0, "reaped": 0, "discarded": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_idle > 0
+
+    def _bind_loop(self) -> None:
+        # Subprocess transports belong to the loop that created them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            for w in self._idle:
+                self._kill(w)
+            self._idle.clear()
+            self._spawning.clear()
+            self._spawn_tasks.clear()
+            self._loop = loop
+            self._reaper = None
+
+    @staticmethod
+    def _kill(w: _WarmProcess) -> None:
+        try:
+            if w.proc.returncode is None:
+                w.proc.kill()
+        except (ProcessLookupError, RuntimeError):
+            pass
+
+    # ── Take / prewarm ───────────────────────────────────────────────────
+
+    def take(self, key: PoolKey) -> Optional[asyncio.subprocess.Process]:
+        """Hand over a live warm process for `key`, or None (caller spawns cold)."""
+        if not self.enabled:
+            return None
+        self._bind_loop()
+        for w in list(self._idle):
+            if w.key != key:
+                continue
+            self._idle.remove(w)
+            if w.proc.returncode is not None:
+                continue  # died while idle
+            self._metrics["warm_hits"] += 1
+            return w.proc
+        self._metrics["cold_starts"] += 1
+        return None
+
+    def prewarm(self, key: PoolKey, spawn: Callable[[], Awaitable[asyncio.subprocess.Process]]) -> None:
+        """Start a process for `key` in the background if the pool has room."""
+        if not self.enabled or self._closing:
+            return
+        self._bind_loop()
+        self._ensure_reaper()
+        if key in self._spawning or any(w.key == key for w in self._idle):
+            return
+        if len(self._idle) + len(self._spawning) >= self._max_idle:
+            # Make room by dropping the oldest idle process
+            if not self._idle:
+                return
+            oldest = min(self._idle, key=lambda w: w.spawned_at)
+            self._idle.remove(oldest)
+            self._kill(oldest)
+            self._metrics["discarded"] += 1
+        self._spawning.add(key)
+        task = self._loop.create_task(self._spawn(key, spawn))
+        self._spawn_tasks.add(task)
+        task.add_done_callback(self._spawn_tasks.discard)
+
+    async def _spawn(self, key: PoolKey, spawn) -> None:
+        try:
+            proc = await spawn()
+        except Exception as e:
+            print(f"[claude-pool] Pre-spawn failed: {e}")
+            return
+        finally:
+            self._spawning.discard(key)
+        w = _WarmProcess(key, proc, time.time())
+        if self._closing:
+            self._kill(w)  # finished after shutdown started
+            return
+        self._idle.append(w)
+        self._metrics["prewarmed"] += 1
+
+    def discard(self, cwd: str, keep: Optional[set] = None) -> None:
+        """Kill idle processes for a workspace except those whose key is in `keep`."""
+        keep = keep or set()
+        for w in list(self._idle):
+            if w.key[0] == cwd and w.key not in keep:
+                self._idle.remove(w)
+                self._kill(w)
+                self._metrics["discarded"] += 1
+
+    # ── Reaping ──────────────────────────────────────────────────────────
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = self._loop.create_task(self._reap_loop())
+
+    async def _reap_loop(self) -> None:
+        while True:
+            await asyncio.sleep(_REAP_INTERVAL_SECS)
+            self.reap()
+
+    def reap(self) -> None:
+        now = time.time()
+        for w in list(self._idle):
+            if w.proc.returncode is not None or now - w.spawned_at > self._idle_secs:
+                self._idle.remove(w)
+                self._kill(w)
+                self._metrics["reaped"] += 1
+
+    async def shutdown(self) -> None:
+        """Kill every idle process, including ones still being spawned."""
+        self._closing = True
+        try:
+            if self._reaper:
+                self._reaper.cancel()
+                self._reaper = None
+            if self._spawn_tasks and self._loop is asyncio.get_running_loop():
+                tasks = list(self._spawn_tasks)
+                _, pending = await asyncio.wait(tasks, timeout=_SHUTDOWN_SPAWN_WAIT_SECS)
+                for task in pending:
+                    task.cancel()
+            for w in self._idle:
+                self._kill(w)
+            self._idle.clear()
+        finally:
+            self._closing = False
+
+    def metrics(self) -> dict:
+        hits, cold = self._metrics["warm_hits"], self._metrics["cold_starts"]
+        return {
+            **self._metrics,
+            "idle": len(self._idle),
+            "spawning": len(self._spawning),
+            "max_idle": self._max_idle,
+            "hit_rate": round(hits / (hits + cold), 3) if hits + cold else 0.0,
+        }
+
+
+_pool: Optional[ClaudeProcessPool] = None
+
+
+def get_pool() -> ClaudeProcessPool:
+    global _pool
+    if _pool is None:
+        _pool = ClaudeProcessPool(config.CLAUDE_WARM_POOL_SIZE, config.CLAUDE_WARM_IDLE_SECS)
+    return _pool
+
+
+async def shutdown() -> None:
+    """Kill the pool's processes, if a pool was ever created."""
+    if _pool is not None:
+        await _pool.shutdown()
+
+
+def metrics() -> dict:
+    return get_pool().metrics()
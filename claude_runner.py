@@ -2,6 +2,8 @@
 claude_runner.py — Invoke Claude Code CLI with session continuity.
 Uses -r <session_id> to resume sessions per workspace.
 Uses --output-format stream-json for real-time progress updates.
+Prompts go in over stdin (--input-format stream-json) so the next process can
+be pre-spawned by claude_pool while the user is still typing.
 """
 
 import asyncio
@@ -13,8 +15,20 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional, Callable, Awaitable
 
+import claude_pool
 import config
+import cost_tracker
+import eta_model
+import handoff_summaries
+import proc_io
+import rotation_policy
+import run_queue
+import scheduler
+import session_store
+import telemetry
+import workspaces
 from agent_protocol import AgentRunResult
+from stream_json import StreamJsonDecoder
 
 
 @dataclass
@@ -30,6 +44,11 @@ def _resolve_claude_bin() -> str:
     return found or config.CLAUDE_BIN
 
 
+_STDOUT_CHUNK_BYTES = 64 * 1024
+_RUN_MAX_OUTPUT_TOKENS = 128000
+_STDERR_PRINT_LINES = 50  # the rest only goes to the run's log file
+_RAW_MAX_OUTPUT_TOKENS = 4096
+
 _CODE_EXTENSIONS = {".kt", ".swift", ".kts", ".xml", ".gradle", ".java", ".py", ".js", ".ts"}
 
 # Bash commands that are just investigation — skip entirely
@@ -144,80 +163,40 @@ def _progress_from_event(event: dict, state: Optional[dict] = None) -> Optional[
 
 
 class ClaudeRunner:
-    _SESSIONS_FILE = Path(config.WORKSPACES_PATH).parent / "claude_sessions.json"
-    _SESSION_TOKENS_FILE = Path(config.WORKSPACES_PATH).parent / "claude_session_tokens.json"
-    _SESSION_RESUMES_FILE = Path(config.WORKSPACES_PATH).parent / "claude_session_resumes.json"
     _SUMMARIES_DIR = Path(config.SESSION_SUMMARIES_DIR)
 
     def __init__(self):
-        self._sessions: dict[str, str] = {}
-        self._session_tokens: dict[str, int] = {}  # workspace → last known cumulative tokens (informational)
-        self._session_resumes: dict[str, int] = {}  # workspace → number of prompts in current session
-        self._run_durations: dict[str, list[float]] = {}  # workspace → last N durations
+        self._state = session_store.get_store()  # session id, tokens, resume count per workspace
         self._active_procs: dict[str, asyncio.subprocess.Process] = {}
         self._claude_bin = _resolve_claude_bin()
-        self._load_sessions()
-        self._load_session_tokens()
-        self._load_session_resumes()
         self._SUMMARIES_DIR.mkdir(parents=True, exist_ok=True)
-        # Force rotation for existing sessions that don't have resume tracking yet
-        for ws in self._sessions:
-            if ws not in self._session_resumes:
-                self._session_resumes[ws] = config.SESSION_MAX_RESUMES
-        if self._session_resumes:
-            self._save_session_resumes()
+        self._runs = run_queue.WorkspaceRunQueue(self._run_in_slot)
+        self._summaries = handoff_summaries.HandoffSummaryWorker(
+            self._refresh_live_summary, lambda ws: ws in self._active_procs or self._runs.busy(ws),
+        )
+        self._summaries_resumed = False
         print(f"  Claude binary:   {self._claude_bin}")
-        print(f"  Persisted sessions: {len(self._sessions)}")
-        print(f"  Session rotation: every {config.SESSION_MAX_RESUMES} prompts, ${config.MAX_INVOCATION_BUDGET_USD} budget cap")
-
-    def _load_sessions(self):
-        if self._SESSIONS_FILE.exists():
-            try:
-                with open(self._SESSIONS_FILE) as f:
-                    self._sessions = json.load(f)
-            except (json.JSONDecodeError, ValueError):
-                self._sessions = {}
-
-    def _save_sessions(self):
-        with open(self._SESSIONS_FILE, "w") as f:
-            json.dump(self._sessions, f, indent=2)
-
-    def _load_session_tokens(self):
-        if self._SESSION_TOKENS_FILE.exists():
-            try:
-                with open(self._SESSION_TOKENS_FILE) as f:
-                    self._session_tokens = {k: int(v) for k, v in json.load(f).items()}
-            except (json.JSONDecodeError, ValueError):
-                self._session_tokens = {}
-
-    def _save_session_tokens(self):
-        with open(self._SESSION_TOKENS_FILE, "w") as f:
-            json.dump(self._session_tokens, f, indent=2)
-
-    def _load_session_resumes(self):
-        if self._SESSION_RESUMES_FILE.exists():
-            try:
-                with open(self._SESSION_RESUMES_FILE) as f:
-                    self._session_resumes = {k: int(v) for k, v in json.load(f).items()}
-            except (json.JSONDecodeError, ValueError):
-                self._session_resumes = {}
-
-    def _save_session_resumes(self):
-        with open(self._SESSION_RESUMES_FILE, "w") as f:
-            json.dump(self._session_resumes, f, indent=2)
+        print(f"  Persisted sessions: {len(self._state.workspaces_with_session())}")
+        rotation = (f"every {config.SESSION_MAX_RESUMES} prompts" if config.ROTATION_POLICY == "resumes"
+                    else f"cost-based, {config.ROTATION_HORIZON_PROMPTS}-prompt horizon")
+        print(f"  Session rotation: {rotation}, ${config.MAX_INVOCATION_BUDGET_USD} budget cap")
 
     def _record_context_tokens(self, workspace: str, tokens: int):
         """Update the last known cumulative token count for this workspace (informational)."""
-        self._session_tokens[workspace] = tokens
-        self._save_session_tokens()
+        self._state.update(workspace, context_tokens=tokens)
+
+    def _rotation_decision(self, workspace: str, record: bool = True) -> tuple[bool, str]:
+        """Ask the rotation policy whether resuming costs more than starting fresh."""
+        state = self._state.get(workspace)
+        summary_chars = len(self._load_handoff_summary(workspace))
+        return rotation_policy.should_rotate(state.usage, state.resumes, summary_chars, record=record)
 
     def _session_needs_rotation(self, workspace: str) -> bool:
-        """Check if session has exceeded the max number of resumed prompts."""
-        return self._session_resumes.get(workspace, 0) >= config.SESSION_MAX_RESUMES
+        return self._rotation_decision(workspace, record=False)[0]
 
     def get_resume_count(self, workspace: str) -> int:
         """Return the number of prompts sent in the current session."""
-        return self._session_resumes.get(workspace, 0)
+        return self._state.get(workspace).resumes
 
     def _get_summary_path(self, workspace: str) -> Path:
         return self._SUMMARIES_DIR / f"{workspace}.md"
@@ -237,9 +216,16 @@ class ClaudeRunner:
         path = self._get_summary_path(workspace)
         path.write_text(summary)
 
-    async def _generate_handoff_summary(self, workspace: str, workspace_path: str) -> Optional[str]:
-        """Ask Claude to summarize the current session before rotating."""
-        summary_prompt = (
+    def _get_live_summary_path(self, workspace: str) -> Path:
+        """Rolling summary of the *current* session, kept fresh in the background."""
+        return self._SUMMARIES_DIR / f"{workspace}.live.md"
+
+    def _discard_live_summary(self, workspace: str):
+        self._summaries.cancel(workspace)
+        self._get_live_summary_path(workspace).unlink(missing_ok=True)
+
+    def _summary_prompt(self, previous: str = "") -> str:
+        prompt = (
             "Summarize this session in 5-10 concise bullet points for a future AI assistant "
             "continuing work on this project. Include:\n"
             "- Key changes made (files, features, architecture decisions)\n"
@@ -248,19 +234,88 @@ class ClaudeRunner:
             "- Any open threads or incomplete work\n"
             "Keep it under 500 words. Be specific — mention file names, component names, decisions."
         )
+        if previous:
+            prompt += (
+                "\n\nAn earlier summary of this session is below. Update it with everything "
+                "that happened since, and reply with only the updated summary.\n\n"
+                f"{previous}"
+            )
+        return prompt
+
+    async def _generate_handoff_summary(self, workspace: str, workspace_path: str,
+                                        previous: str = "", fork: bool = False) -> Optional[str]:
+        """Ask Claude to summarize the current session."""
         try:
-            result = await self._run_raw(summary_prompt, workspace, workspace_path)
+            result = await self._run_raw(self._summary_prompt(previous), workspace, workspace_path, fork=fork)
+            self._charge_summary(workspace, result.total_cost_usd, background=fork)
             if result.exit_code == 0 and result.stdout.strip():
                 return result.stdout.strip()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             print(f"[claude] Handoff summary generation failed: {e}")
         return None
 
+    def _charge_summary(self, workspace: str, cost_usd: float, background: bool):
+        """Bill a summary run like a prompt: to the workspace owner's daily spend.
+        Background refresh costs also feed the rotation policy's projection."""
+        if cost_usd <= 0:
+            return
+        try:
+            owner_id = workspaces.get_registry().get_owner(workspace)
+        except Exception as e:
+            print(f"[claude] Could not resolve owner of {workspace}: {e}")
+            owner_id = None
+        cost_tracker.get_tracker().add(cost_usd, owner_id, workspace=workspace)
+        if background:
+            usage = rotation_policy.observe_summary(self._state.get(workspace).usage, cost_usd)
+            self._state.update(workspace, usage=usage)
+
+    async def _refresh_live_summary(self, workspace: str, workspace_path: str) -> bool:
+        """Background job: bring the live summary up to date on a fork of the session."""
+        state = self._state.get(workspace)
+        live_path = self._get_live_summary_path(workspace)
+        if not state.session_id:
+            return False
+        if state.summary_resumes == state.resumes and live_path.exists():
+            return True
+        previous = live_path.read_text().strip() if live_path.exists() else ""
+        summary = await self._generate_handoff_summary(workspace, workspace_path, previous, fork=True)
+        if not summary or self._state.get(workspace).session_id != state.session_id:
+            return False  # failed, or the session rotated meanwhile
+        tmp = live_path.with_suffix(".tmp")
+        tmp.write_text(summary)
+        tmp.replace(live_path)
+        self._state.update(workspace, summary_resumes=state.resumes)
+        print(f"[claude] Live summary refreshed for {workspace} ({len(summary)} chars, resume {state.resumes})")
+        return True
+
+    def _resume_summary_refreshes(self):
+        """After a restart, re-queue sessions whose live summary is behind."""
+        if self._summaries_resumed:
+            return
+        self._summaries_resumed = True
+        for ws in self._state.workspaces_with_session():
+            state = self._state.get(ws)
+            if state.workspace_path and state.summary_resumes != state.resumes:
+                self._summaries.schedule(ws, state.workspace_path)
+
+    def _fresh_live_summary(self, workspace: str) -> Optional[str]:
+        """The live summary, if it lags the session by at most SUMMARY_MAX_LAG prompts."""
+        state = self._state.get(workspace)
+        path = self._get_live_summary_path(workspace)
+        if not path.exists() or state.resumes - state.summary_resumes > config.SUMMARY_MAX_LAG:
+            return None
+        try:
+            return path.read_text().strip() or None
+        except OSError:
+            return None
+
     async def _rotate_session(self, workspace: str, workspace_path: str,
-                              on_progress: Optional[Callable[[str], Awaitable[None]]] = None):
+                              on_progress: Optional[Callable[[str], Awaitable[None]]] = None,
+                              reason: str = ""):
         """Generate handoff summary, clear session, reset resume counter."""
-        resumes = self._session_resumes.get(workspace, 0)
-        print(f"[claude] Rotating session for {workspace} (resumes: {resumes}/{config.SESSION_MAX_RESUMES})")
+        print(f"[claude] Rotating session for {workspace} ({reason or 'manual'})")
 
         if on_progress:
             try:
@@ -268,8 +323,13 @@ class ClaudeRunner:
             except Exception:
                 pass
 
-        # Generate summary from current session
-        summary = await self._generate_handoff_summary(workspace, workspace_path)
+        # Normally the background worker already has a current summary; only
+        # fall back to generating one inline if it is missing or too stale
+        summary = self._fresh_live_summary(workspace)
+        if summary:
+            print(f"[claude] Using live summary for {workspace}")
+        else:
+            summary = await self._generate_handoff_summary(workspace, workspace_path)
         if summary:
             # Append to any existing summary (rolling context)
             existing = self._load_handoff_summary(workspace)
@@ -287,11 +347,8 @@ class ClaudeRunner:
             print("[claude] No handoff summary generated — rotating anyway")
 
         # Clear session and reset counters
-        self.clear_session(workspace)
-        self._session_tokens.pop(workspace, None)
-        self._save_session_tokens()
-        self._session_resumes.pop(workspace, None)
-        self._save_session_resumes()
+        self._discard_live_summary(workspace)
+        self._state.clear(workspace)
 
         if on_progress:
             try:
@@ -300,78 +357,147 @@ class ClaudeRunner:
                 pass
 
     def cancel(self, workspace: str) -> bool:
-        """Kill the active Claude process for a workspace. Returns True if killed."""
+        """Cancel every queued run for a workspace and kill the active one.
+        Returns True if anything was cancelled."""
+        queued = self._runs.cancel(workspace)
+        if queued:
+            print(f"[claude] Cancelled {queued} queued run(s): workspace={workspace}")
         proc = self._active_procs.pop(workspace, None)
         if proc and proc.returncode is None:
             proc.kill()
             print(f"[claude] Cancelled: workspace={workspace} pid={proc.pid}")
             return True
-        return False
-
-    def _record_duration(self, workspace: str, duration: float):
-        """Record a run duration for ETA estimates."""
-        if workspace not in self._run_durations:
-            self._run_durations[workspace] = []
-        self._run_durations[workspace].append(duration)
-        # Keep last 10
-        self._run_durations[workspace] = self._run_durations[workspace][-10:]
-
-    def _estimated_duration(self, workspace: str) -> Optional[float]:
-        """Return average duration for this workspace, or None if no history."""
-        durations = self._run_durations.get(workspace, [])
-        if not durations:
-            return None
-        return sum(durations) / len(durations)
+        return queued > 0
 
     def get_session(self, workspace: str) -> Optional[str]:
-        return self._sessions.get(workspace)
+        return self._state.get(workspace).session_id
 
     def clear_session(self, workspace: str):
-        if self._sessions.pop(workspace, None) is not None:
-            self._save_sessions()
+        if self._state.get(workspace).session_id:
+            self._discard_live_summary(workspace)
+            self._state.update(workspace, session_id=None, usage={}, summary_resumes=-1)
 
-    async def _run_raw(
-        self,
-        prompt: str,
-        workspace_key: str,
-        workspace_path: str,
-    ) -> ClaudeResult:
-        """Run Claude without rotation checks or progress callbacks. Used for internal calls like summary generation."""
+    # ── CLI processes ────────────────────────────────────────────────────
+
+    def _cli_command(self, session_id: Optional[str], budget_usd: Optional[float] = None,
+                     fork: bool = False) -> list[str]:
+        """Claude CLI argv. The prompt is sent on stdin as a stream-json message,
+        which lets the process be started (and warmed) before the prompt exists.
+        Every run is capped: MAX_INVOCATION_BUDGET_USD unless `budget_usd` is given."""
         cmd = [
             self._claude_bin,
             "--dangerously-skip-permissions",
             "-p",
+            "--input-format", "stream-json",
             "--output-format", "stream-json",
             "--verbose",
         ]
-        session_id = self._sessions.get(workspace_key)
+        budget = budget_usd if budget_usd is not None else config.MAX_INVOCATION_BUDGET_USD
+        cmd += ["--max-budget-usd", str(budget)]
         if session_id:
             cmd += ["-r", session_id]
-        cmd.append(prompt)
+            if fork:
+                cmd.append("--fork-session")  # read the session, append to a copy
+        return cmd
 
-        env = {**os.environ, "CLAUDE_CODE_MAX_OUTPUT_TOKENS": "4096"}
+    async def _spawn_cli(self, cmd: list[str], workspace_path: str,
+                         max_output_tokens: int) -> asyncio.subprocess.Process:
+        env = {**os.environ, "CLAUDE_CODE_MAX_OUTPUT_TOKENS": str(max_output_tokens)}
         env.pop("CLAUDECODE", None)
-        proc = await asyncio.create_subprocess_exec(
+        return await asyncio.create_subprocess_exec(
             *cmd,
-            stdin=asyncio.subprocess.DEVNULL,
+            stdin=asyncio.subprocess.PIPE,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
             cwd=workspace_path,
             env=env,
         )
-        stdout_bytes, stderr_bytes = await asyncio.wait_for(proc.communicate(), timeout=60)
-        result_text = ""
-        for line in stdout_bytes.decode("utf-8", errors="replace").splitlines():
+
+    async def _start_cli(self, cmd: list[str], workspace_path: str,
+                         max_output_tokens: int, prompt: str) -> asyncio.subprocess.Process:
+        """Take a matching pre-spawned process (or spawn one cold) and send it the prompt."""
+        message = json.dumps({
+            "type": "user",
+            "message": {"role": "user", "content": [{"type": "text", "text": prompt}]},
+        }).encode() + b"\n"
+        proc = claude_pool.get_pool().take((workspace_path, tuple(cmd), max_output_tokens))
+        if proc is not None:
             try:
-                event = json.loads(line)
-                if event.get("type") == "result":
-                    result_text = event.get("result", "")
-            except json.JSONDecodeError:
-                continue
+                proc.stdin.write(message)
+                await proc.stdin.drain()
+                proc.stdin.close()
+                print(f"[claude] Using pre-spawned process pid={proc.pid}")
+                return proc
+            except (BrokenPipeError, ConnectionResetError):
+                print("[claude] Pre-spawned process died — starting cold")
+        proc = await self._spawn_cli(cmd, workspace_path, max_output_tokens)
+        proc.stdin.write(message)
+        await proc.stdin.drain()
+        proc.stdin.close()
+        return proc
+
+    def _prewarm(self, workspace: str, workspace_path: str):
+        """Pre-spawn the process(es) the next prompt for this workspace will need."""
+        pool = claude_pool.get_pool()
+        if not pool.enabled:
+            return
+        session_id = self.get_session(workspace)
+        if session_id and self._session_needs_rotation(workspace):
+            # Next prompt rotates into a fresh session; the old one only needs a
+            # summary run if the background worker has no usable live summary
+            wanted = [(self._cli_command(None), _RUN_MAX_OUTPUT_TOKENS)]
+            if self._fresh_live_summary(workspace) is None:
+                wanted.append((self._cli_command(session_id, budget_usd=config.SUMMARY_MAX_BUDGET_USD),
+                               _RAW_MAX_OUTPUT_TOKENS))
+        else:
+            wanted = [(self._cli_command(session_id), _RUN_MAX_OUTPUT_TOKENS)]
+        keys = {(workspace_path, tuple(cmd), tokens) for cmd, tokens in wanted}
+        pool.discard(workspace_path, keep=keys)  # anything else is for a stale session
+        for cmd, tokens in wanted:
+            pool.prewarm(
+                (workspace_path, tuple(cmd), tokens),
+                lambda cmd=cmd, tokens=tokens: self._spawn_cli(cmd, workspace_path, tokens),
+            )
+
+    async def _run_raw(
+        self,
+        prompt: str,
+        workspace_key: str,
+        workspace_path: str,
+        fork: bool = False,
+    ) -> ClaudeResult:
+        """Run Claude without rotation checks or progress callbacks. Used for internal calls like summary generation.
+
+        fork=True runs on a copy of the session (background summaries), so the
+        user's conversation is left untouched. Capped at SUMMARY_MAX_BUDGET_USD;
+        the caller bills the returned total_cost_usd.
+        """
+        started = time.time()
+        cmd = self._cli_command(self.get_session(workspace_key), budget_usd=config.SUMMARY_MAX_BUDGET_USD,
+                                fork=fork)
+        proc = await self._start_cli(cmd, workspace_path, _RAW_MAX_OUTPUT_TOKENS, prompt)
+        timeout = config.SUMMARY_TIMEOUT_SECS if fork else 60
+        try:
+            stdout_bytes, stderr_bytes = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except BaseException:
+            # Timed out, or a background summary was preempted
+            if proc.returncode is None:
+                proc.kill()
+            raise
+        result_text = ""
+        cost_usd = 0.0
+        decoder = StreamJsonDecoder({"result"})
+        for event in decoder.feed(stdout_bytes) + decoder.close():
+            result_text = event.get("result", "")
+            cost_usd = float(event.get("total_cost_usd") or 0)
+        exit_code = proc.returncode or 0
+        telemetry.record("claude", "summary", time.time() - started, cost_usd=cost_usd, ok=exit_code == 0,
+                         workspace=workspace_key, background=fork)
         return ClaudeResult(
             stdout=result_text,
             stderr=stderr_bytes.decode("utf-8", errors="replace"),
-            exit_code=proc.returncode or 0,
+            exit_code=exit_code,
+            total_cost_usd=cost_usd,
         )
 
     async def run(
@@ -382,12 +508,43 @@ class ClaudeRunner:
         context_prefix: str = "",
         on_progress: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> ClaudeResult:
+        # One run per workspace at a time; queued duplicates may share a run
+        try:
+            return await self._runs.run(workspace_key, workspace_path, prompt, context_prefix, on_progress)
+        except run_queue.RunCancelled:
+            return ClaudeResult(stdout="", stderr="Cancelled", exit_code=-1)
+
+    async def _run_in_slot(self, prompt: str, workspace_key: str, workspace_path: str,
+                           context_prefix: str,
+                           on_progress: Optional[Callable[[str], Awaitable[None]]]) -> ClaudeResult:
+        # The run holds the workspace's cross-process lock: catch up with any run the
+        # other process (bot/API) made, and persist ours before the lock is released
+        self._state.reload(workspace_key)
+        try:
+            # Wait for a free Claude CLI slot (global cap, fair across accounts)
+            async with scheduler.slot("claude"):
+                return await self._run_cli(prompt, workspace_key, workspace_path, context_prefix, on_progress)
+        finally:
+            self._state.flush()
+
+    async def _run_cli(
+        self,
+        prompt: str,
+        workspace_key: str,
+        workspace_path: str,
+        context_prefix: str = "",
+        on_progress: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> ClaudeResult:
+        self._resume_summary_refreshes()
+
         # Check if session needs rotation before this call
-        if self._session_needs_rotation(workspace_key) and self._sessions.get(workspace_key):
-            await self._rotate_session(workspace_key, workspace_path, on_progress)
+        if self.get_session(workspace_key):
+            rotate, reason = self._rotation_decision(workspace_key)
+            if rotate:
+                await self._rotate_session(workspace_key, workspace_path, on_progress, reason)
 
         # Inject handoff summary if starting a fresh session
-        if not self._sessions.get(workspace_key):
+        if not self.get_session(workspace_key):
             summary = self._load_handoff_summary(workspace_key)
             if summary:
                 summary_context = (
@@ -399,67 +556,51 @@ class ClaudeRunner:
 
         full_prompt = f"{context_prefix}\n\n{prompt}".strip() if context_prefix else prompt
 
-        # All flags MUST come before the positional prompt argument.
-        cmd = [
-            self._claude_bin,
-            "--dangerously-skip-permissions",
-            "-p",
-            "--output-format", "stream-json",
-            "--verbose",
-            "--max-budget-usd", str(config.MAX_INVOCATION_BUDGET_USD),
-        ]
-        session_id = self._sessions.get(workspace_key)
+        session_id = self.get_session(workspace_key)
         if session_id:
-            cmd += ["-r", session_id]
             # Track resume count for rotation
-            self._session_resumes[workspace_key] = self._session_resumes.get(workspace_key, 0) + 1
-            self._save_session_resumes()
-        cmd.append(full_prompt)  # positional prompt goes last
+            self._state.update(workspace_key, resumes=self.get_resume_count(workspace_key) + 1)
+        cmd = self._cli_command(session_id)
 
         print(f"[claude] Starting: workspace={workspace_key} prompt_len={len(full_prompt)}")
 
+        stderr_spool = None
+        started = time.time()
         try:
-            env = {**os.environ, "CLAUDE_CODE_MAX_OUTPUT_TOKENS": "128000"}
-            env.pop("CLAUDECODE", None)
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdin=asyncio.subprocess.DEVNULL,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=workspace_path,
-                env=env,
-                limit=10 * 1024 * 1024,  # 10MB — default 64KB is too small for large stream-json events
-            )
+            proc = await self._start_cli(cmd, workspace_path, _RUN_MAX_OUTPUT_TOKENS, full_prompt)
             self._active_procs[workspace_key] = proc
             print(f"[claude] Process started: pid={proc.pid}")
 
             result_text = ""
             result_session_id = None
+            result_event = None
             result_cost_usd = 0.0
             result_context_tokens = 0
-            stderr_chunks = []
             last_progress_time = time.time()
             process_done = False
             MIN_PROGRESS_INTERVAL = 3  # seconds between Discord updates
             HEARTBEAT_INTERVAL = 10    # seconds of silence before heartbeat
 
-            # Read stderr in background
-            async def read_stderr():
-                while True:
-                    chunk = await proc.stderr.read(1024)
-                    if not chunk:
-                        break
-                    decoded = chunk.decode("utf-8", errors="replace")
-                    stderr_chunks.append(decoded)
-                    for line in decoded.splitlines():
-                        if line.strip():
-                            print(f"[claude:stderr] {line.strip()}")
+            # Read stderr in background: spooled to a log file, head/tail kept in memory
+            printed_lines = 0
+
+            def print_stderr(line: str):
+                nonlocal printed_lines
+                if not line.strip():
+                    return
+                printed_lines += 1
+                if printed_lines <= _STDERR_PRINT_LINES:
+                    print(f"[claude:stderr] {line.strip()}")
+                elif printed_lines == _STDERR_PRINT_LINES + 1:
+                    print(f"[claude:stderr] … more in {stderr_spool.path}")
 
-            stderr_task = asyncio.create_task(read_stderr())
+            stderr_spool = proc_io.LogSpool(f"claude-{workspace_key}")
+            stderr_stream = proc_io.OutputStream(stderr_spool, on_line=print_stderr)
+            stderr_task = asyncio.create_task(stderr_stream.pump(proc.stderr))
 
             # Heartbeat: send "still working" with elapsed time + ETA
             run_start_time = time.time()
-            est = self._estimated_duration(workspace_key)
+            est = eta_model.get_model().estimate("claude", prompt_chars=len(full_prompt))
 
             async def heartbeat():
                 nonlocal last_progress_time
@@ -472,15 +613,8 @@ class ClaudeRunner:
                         elapsed = int(now - run_start_time)
                         mins, secs = divmod(elapsed, 60)
                         elapsed_str = f"{mins}m {secs}s" if mins > 0 else f"{secs}s"
-                        if est and est > 30:
-                            remaining = max(0, int(est - elapsed))
-                            r_mins, r_secs = divmod(remaining, 60)
-                            if remaining <= 0:
-                                eta_str = "almost done"
-                            elif r_mins > 0:
-                                eta_str = f"~{r_mins}m {r_secs}s left"
-                            else:
-                                eta_str = f"~{r_secs}s left"
+                        if est.p50 > 30:
+                            eta_str = eta_model.format_remaining(est.remaining(elapsed))
                             msg = f"⏳ Still working… ({elapsed_str} · {eta_str})"
                         else:
                             msg = f"⏳ Still working… ({elapsed_str})"
@@ -492,11 +626,14 @@ class ClaudeRunner:
 
             heartbeat_task = asyncio.create_task(heartbeat())
 
-            # Read stream-json events line by line
-            while True:
+            # Decode stream-json incrementally; only parse the event types we use
+            wanted = {"result", "assistant"} if on_progress else {"result"}
+            decoder = StreamJsonDecoder(wanted)
+            eof = False
+            while not eof:
                 try:
-                    line = await asyncio.wait_for(
-                        proc.stdout.readline(),
+                    chunk = await asyncio.wait_for(
+                        proc.stdout.read(_STDOUT_CHUNK_BYTES),
                         timeout=config.CLAUDE_TIMEOUT,
                     )
                 except asyncio.TimeoutError:
@@ -504,67 +641,70 @@ class ClaudeRunner:
                     print(f"[claude] Timed out after {config.CLAUDE_TIMEOUT}s")
                     process_done = True
                     heartbeat_task.cancel()
+                    decoder.close()
                     return ClaudeResult(
                         stdout=result_text,
                         stderr=f"Timed out after {config.CLAUDE_TIMEOUT}s",
                         exit_code=-1,
                     )
 
-                if not line:
-                    break
-
-                decoded = line.decode("utf-8", errors="replace").strip()
-                if not decoded:
-                    continue
-
-                try:
-                    event = json.loads(decoded)
-                except json.JSONDecodeError:
-                    continue
-
-                etype = event.get("type")
-
-                # Extract final result
-                if etype == "result":
-                    result_text = event.get("result", "")
-                    result_session_id = event.get("session_id")
-                    is_error = event.get("is_error", False)
-                    cost = event.get("total_cost_usd", 0) or 0
-                    result_cost_usd = float(cost)
-                    duration = event.get("duration_ms", 0) / 1000
-                    # Extract context token usage
-                    usage = event.get("usage", {})
-                    result_context_tokens = (
-                        usage.get("input_tokens", 0)
-                        + usage.get("cache_creation_input_tokens", 0)
-                        + usage.get("cache_read_input_tokens", 0)
-                    )
-                    print(f"[claude] Result: error={is_error} cost=${cost:.4f} duration={duration:.1f}s context={result_context_tokens:,} tokens")
-
-                # Send progress updates to Discord
-                elif on_progress:
-                    progress_msg = _progress_from_event(event)
-                    if progress_msg:
-                        now = time.time()
-                        if now - last_progress_time >= MIN_PROGRESS_INTERVAL:
-                            try:
-                                await on_progress(progress_msg)
-                            except Exception:
-                                pass
-                            last_progress_time = now
-                        print(f"[claude] {progress_msg}")
+                if chunk:
+                    events = decoder.feed(chunk)
+                else:
+                    eof = True
+                    events = decoder.close()
+
+                for event in events:
+                    etype = event.get("type")
+
+                    # Extract final result
+                    if etype == "result":
+                        result_text = event.get("result", "")
+                        result_session_id = event.get("session_id")
+                        result_event = event
+                        is_error = event.get("is_error", False)
+                        cost = event.get("total_cost_usd", 0) or 0
+                        result_cost_usd = float(cost)
+                        duration = event.get("duration_ms", 0) / 1000
+                        # Extract context token usage
+                        usage = event.get("usage", {})
+                        result_context_tokens = (
+                            usage.get("input_tokens", 0)
+                            + usage.get("cache_creation_input_tokens", 0)
+                            + usage.get("cache_read_input_tokens", 0)
+                        )
+                        print(f"[claude] Result: error={is_error} cost=${cost:.4f} duration={duration:.1f}s context={result_context_tokens:,} tokens")
+
+                    # Send progress updates to Discord
+                    elif on_progress:
+                        progress_msg = _progress_from_event(event)
+                        if progress_msg:
+                            now = time.time()
+                            if now - last_progress_time >= MIN_PROGRESS_INTERVAL:
+                                try:
+                                    await on_progress(progress_msg)
+                                except Exception:
+                                    pass
+                                last_progress_time = now
+                            print(f"[claude] {progress_msg}")
 
             process_done = True
             heartbeat_task.cancel()
             await stderr_task
             await proc.wait()
-            stderr = "".join(stderr_chunks)
+            stderr = stderr_stream.text()
+            st = decoder.stats
+            print(f"[claude] Stream: {st.bytes_in / 1024:.0f}KB, {st.events_seen} events "
+                  f"({st.events_parsed} parsed, {st.bytes_skipped / 1024:.0f}KB skipped unparsed)")
 
         except Exception as e:
             print(f"[claude] Exception: {e}")
+            telemetry.record("claude", "run", time.time() - started, ok=False, workspace=workspace_key)
             return ClaudeResult(stdout="", stderr=str(e), exit_code=-1)
         finally:
             self._active_procs.pop(workspace_key, None)
+            if stderr_spool is not None:
+                stderr_spool.close()
 
         exit_code = proc.returncode or 0
         run_duration = time.time() - run_start_time
@@ -572,17 +712,30 @@ class ClaudeRunner:
 
         # Record duration for future ETA estimates
         if exit_code == 0:
-            self._record_duration(workspace_key, run_duration)
+            eta_model.get_model().record("claude", run_duration, prompt_chars=len(full_prompt))
+        telemetry.record("claude", "run", run_duration, cost_usd=result_cost_usd, ok=exit_code == 0,
+                         workspace=workspace_key, resumed=bool(session_id))
 
         if result_session_id:
-            self._sessions[workspace_key] = result_session_id
-            self._save_sessions()
+            self._state.update(workspace_key, session_id=result_session_id)
 
         # Track cumulative tokens (informational) and resume count
         if result_context_tokens > 0:
             self._record_context_tokens(workspace_key, result_context_tokens)
-        resumes = self._session_resumes.get(workspace_key, 0)
-        print(f"[claude] Session {workspace_key}: {resumes}/{config.SESSION_MAX_RESUMES} resumes, cumulative_tokens={result_context_tokens:,}")
+        if result_event is not None:
+            usage = rotation_policy.observe(self._state.get(workspace_key).usage, result_event,
+                                            new_session=not session_id)
+            self._state.update(workspace_key, usage=usage)
+        resumes = self.get_resume_count(workspace_key)
+        usage = self._state.get(workspace_key).usage
+        print(f"[claude] Session {workspace_key}: {resumes} resumes, cumulative_tokens={result_context_tokens:,}, "
+              f"context~{usage.get('context_tokens', 0):,.0f} cache_hit={usage.get('cache_hit_ratio', 0):.0%}")
+
+        if exit_code == 0:
+            if self.get_session(workspace_key):
+                self._state.update(workspace_key, workspace_path=workspace_path)
+                self._summaries.schedule(workspace_key, workspace_path)
+            self._prewarm(workspace_key, workspace_path)
 
         return ClaudeResult(
             stdout=result_text,
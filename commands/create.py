@@ -55,8 +55,8 @@ def _project_base_dir(owner_id: int | None, account_id: str | None = None) -> Pa
     if account_id:
         # Check if this is an admin account
         try:
-            from accounts import AccountManager
-            mgr = AccountManager()
+            from accounts import get_manager
+            mgr = get_manager()
             acct = mgr.get(account_id)
             if acct and acct.role == "admin":
                 return base
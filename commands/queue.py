@@ -78,7 +78,7 @@ async def handle_queue(
             task, workspace_key, workspace_path, on_progress=progress,
         )
 
-        cost_tracker.add(result.total_cost_usd, user_id)
+        cost_tracker.add(result.total_cost_usd, user_id, workspace=workspace_key)
         total_cost += result.total_cost_usd
 
         if result.exit_code != 0:
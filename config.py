@@ -86,12 +86,25 @@ GOOGLE_SERVICE_ACCOUNT_PATH: str = os.getenv("GOOGLE_SERVICE_ACCOUNT_PATH", "")
 SUPABASE_PROJECT_REF: str = os.getenv("SUPABASE_PROJECT_REF", "")
 SUPABASE_MANAGEMENT_KEY: str = os.getenv("SUPABASE_MANAGEMENT_KEY", "")
 SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY", "")
+SUPABASE_MAX_CONNECTIONS: int = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "6"))  # keep-alive pool; also caps calls in flight
+SUPABASE_KEEPALIVE_SECS: float = float(os.getenv("SUPABASE_KEEPALIVE_SECS", "60"))
+SUPABASE_BATCH_MAX_STATEMENTS: int = int(os.getenv("SUPABASE_BATCH_MAX_STATEMENTS", "50"))  # per request; 1 = no batching
+SUPABASE_BATCH_MAX_BYTES: int = int(os.getenv("SUPABASE_BATCH_MAX_BYTES", "262144"))
 
 # ── Accounts / Multi-Tenant ────────────────────────────────────────────
 ACCOUNTS_PATH: str = os.getenv("ACCOUNTS_PATH", "./accounts.json")
 CREDENTIAL_ENCRYPTION_KEY: str = os.getenv("CREDENTIAL_ENCRYPTION_KEY", "")
+ACCOUNTS_RELOAD_CHECK_SECS: float = float(os.getenv("ACCOUNTS_RELOAD_CHECK_SECS", "1"))  # cross-process change check
+AUTH_NEGATIVE_CACHE_SECS: float = float(os.getenv("AUTH_NEGATIVE_CACHE_SECS", "60"))  # remember unknown keys
+AUTH_NEGATIVE_CACHE_MAX: int = int(os.getenv("AUTH_NEGATIVE_CACHE_MAX", "10000"))
+CREDENTIAL_CACHE_TTL_SECS: float = float(os.getenv("CREDENTIAL_CACHE_TTL_SECS", "300"))  # 0 = always decrypt
+CREDENTIAL_CACHE_MAX: int = int(os.getenv("CREDENTIAL_CACHE_MAX", "256"))
 RUN_MODE: str = os.getenv("RUN_MODE", "full")  # "full", "api_only", "bot_only"
 
+# ── Storage ─────────────────────────────────────────────────────────────
+# Accounts, allowlist and workspaces; each store sits next to the JSON file it replaced
+STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "sqlite")
+
 # ── Queue & Budget ──────────────────────────────────────────────────────
 DAILY_TOKEN_CAP_USD: float = float(os.getenv("DAILY_TOKEN_CAP_USD", "50"))
 DEFAULT_USER_DAILY_CAP_USD: float = float(os.getenv("DEFAULT_USER_DAILY_CAP_USD", "10"))
@@ -108,8 +121,129 @@ MAX_TOTAL_INVOCATIONS: int = int(os.getenv("MAX_TOTAL_INVOCATIONS", "20"))
 SESSION_MAX_RESUMES: int = int(os.getenv("SESSION_MAX_RESUMES", "8"))
 MAX_INVOCATION_BUDGET_USD: float = float(os.getenv("MAX_INVOCATION_BUDGET_USD", "5"))
 SESSION_SUMMARIES_DIR: str = os.getenv("SESSION_SUMMARIES_DIR", "./session_summaries")
+SESSION_STORE_PATH: str = os.getenv(
+    "SESSION_STORE_PATH", str(Path(WORKSPACES_PATH).parent / "claude_sessions.db"))
+SESSION_FLUSH_DELAY_SECS: float = float(os.getenv("SESSION_FLUSH_DELAY_SECS", "0.25"))  # write coalescing window
+# "cost" rotates when a fresh session + handoff is projected cheaper; "resumes" uses SESSION_MAX_RESUMES only
+ROTATION_POLICY: str = os.getenv("ROTATION_POLICY", "cost")
+ROTATION_HORIZON_PROMPTS: int = int(os.getenv("ROTATION_HORIZON_PROMPTS", "5"))
+ROTATION_MIN_PROMPTS: int = int(os.getenv("ROTATION_MIN_PROMPTS", "3"))
+ROTATION_MARGIN: float = float(os.getenv("ROTATION_MARGIN", "0.1"))  # rotate only if ≥10% cheaper
+ROTATION_MAX_CONTEXT_TOKENS: int = int(os.getenv("ROTATION_MAX_CONTEXT_TOKENS", "150000"))
+ROTATION_FRESH_BASE_TOKENS: int = int(os.getenv("ROTATION_FRESH_BASE_TOKENS", "20000"))  # until measured
+# Handoff summaries are refreshed in the background once a workspace is idle
+SUMMARY_IDLE_SECS: float = float(os.getenv("SUMMARY_IDLE_SECS", "20"))
+SUMMARY_QUEUE_SIZE: int = int(os.getenv("SUMMARY_QUEUE_SIZE", "64"))  # 0 = generate at rotation only
+SUMMARY_MAX_LAG: int = int(os.getenv("SUMMARY_MAX_LAG", "2"))  # prompts a live summary may trail by
+SUMMARY_TIMEOUT_SECS: float = float(os.getenv("SUMMARY_TIMEOUT_SECS", "180"))
+SUMMARY_MAX_BUDGET_USD: float = float(os.getenv("SUMMARY_MAX_BUDGET_USD", "0.5"))  # per summary run; charged to the owner
+# Runs in one workspace are serialized, across processes via a lock file per workspace.
+# Queued prompts may share a run: "off", "identical" (exact duplicates) or
+# "stacked" (everything queued behind the same run)
+CLAUDE_COALESCE_PROMPTS: str = os.getenv("CLAUDE_COALESCE_PROMPTS", "off")
+CLAUDE_RUN_LOCK_DIR: str = os.getenv("CLAUDE_RUN_LOCK_DIR", "./run_locks")
 AUTO_FIX_ON_FAILURE: bool = os.getenv("AUTO_FIX_ON_FAILURE", "1") == "1"
 
+# ── Build Cache ──────────────────────────────────────────────────────────────
+BUILD_CACHE_ENABLED: bool = os.getenv("BUILD_CACHE_ENABLED", "1") == "1"
+BUILD_CACHE_DIR: str = os.getenv("BUILD_CACHE_DIR", "./build_cache")
+
+# ── Gradle Daemon Pool ───────────────────────────────────────────────────────
+GRADLE_MAX_DAEMONS: int = int(os.getenv("GRADLE_MAX_DAEMONS", "2"))
+GRADLE_DAEMON_IDLE_SECS: int = int(os.getenv("GRADLE_DAEMON_IDLE_SECS", "1800"))
+GRADLE_MIN_FREE_MEM_MB: int = int(os.getenv("GRADLE_MIN_FREE_MEM_MB", "2048"))
+GRADLE_JVM_ARGS: str = os.getenv("GRADLE_JVM_ARGS", "")  # empty = use each project's gradle.properties
+GRADLE_PARALLEL: bool = os.getenv("GRADLE_PARALLEL", "0") == "1"
+GRADLE_DAEMON_DIR: str = os.getenv("GRADLE_DAEMON_DIR", "./gradle_daemons")
+
+# ── Build Scheduler ──────────────────────────────────────────────────────────
+# Max concurrent jobs per resource class; excess work queues fairly per account
+SCHED_CLAUDE_SLOTS: int = int(os.getenv("SCHED_CLAUDE_SLOTS", "2"))
+SCHED_GRADLE_SLOTS: int = int(os.getenv("SCHED_GRADLE_SLOTS", str(GRADLE_MAX_DAEMONS)))
+SCHED_XCODEBUILD_SLOTS: int = int(os.getenv("SCHED_XCODEBUILD_SLOTS", "1"))
+SCHED_EMULATOR_SLOTS: int = int(os.getenv("SCHED_EMULATOR_SLOTS", "1"))
+SCHED_PLAYWRIGHT_SLOTS: int = int(os.getenv("SCHED_PLAYWRIGHT_SLOTS", "2"))
+
+# ── Build Status Store ───────────────────────────────────────────────────────
+BUILD_STORE_PATH: str = os.getenv("BUILD_STORE_PATH", "./builds.db")
+BUILD_STORE_TTL_DAYS: float = float(os.getenv("BUILD_STORE_TTL_DAYS", "30"))
+BUILD_STORE_CACHE_SIZE: int = int(os.getenv("BUILD_STORE_CACHE_SIZE", "256"))
+BUILD_LOG_MAX_LINES: int = int(os.getenv("BUILD_LOG_MAX_LINES", "200"))  # per-build ring buffer
+
+# ── Webhook Delivery ─────────────────────────────────────────────────────────
+WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "4"))
+WEBHOOK_QUEUE_SIZE: int = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))  # per worker
+WEBHOOK_TIMEOUT_SECS: float = float(os.getenv("WEBHOOK_TIMEOUT_SECS", "5"))
+WEBHOOK_MAX_CONNECTIONS: int = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "20"))
+WEBHOOK_MAX_RETRIES: int = int(os.getenv("WEBHOOK_MAX_RETRIES", "4"))
+WEBHOOK_RETRY_BASE_SECS: float = float(os.getenv("WEBHOOK_RETRY_BASE_SECS", "1"))
+WEBHOOK_DEAD_LETTER_PATH: str = os.getenv("WEBHOOK_DEAD_LETTER_PATH", "./webhook_dead_letter.jsonl")
+WEBHOOK_MAX_HELD: int = int(os.getenv("WEBHOOK_MAX_HELD", "100"))  # per receiver, behind a retry
+WEBHOOK_CLOSE_TIMEOUT_SECS: float = float(os.getenv("WEBHOOK_CLOSE_TIMEOUT_SECS", "10"))
+
+# ── Claude CLI Warm Pool ─────────────────────────────────────────────────────
+# Idle pre-spawned CLI processes kept ready for the next prompt (0 = disabled)
+CLAUDE_WARM_POOL_SIZE: int = int(os.getenv("CLAUDE_WARM_POOL_SIZE", "2"))
+CLAUDE_WARM_IDLE_SECS: int = int(os.getenv("CLAUDE_WARM_IDLE_SECS", "600"))
+
+# ── Known-Fix Replay ─────────────────────────────────────────────────────────
+# Replay edits that fixed the same build error before, ahead of asking Claude
+FIX_REPLAY_ENABLED: bool = os.getenv("FIX_REPLAY_ENABLED", "1") == "1"
+FIX_INDEX_PATH: str = os.getenv("FIX_INDEX_PATH", "./fix_index.db")
+FIX_REPLAY_MAX_CANDIDATES: int = int(os.getenv("FIX_REPLAY_MAX_CANDIDATES", "2"))
+
+# ── ETA Model ────────────────────────────────────────────────────────────────
+# Persisted run durations behind progress ETAs (p50/p90 per op/platform/kind)
+ETA_MODEL_PATH: str = os.getenv("ETA_MODEL_PATH", "./eta_model.db")
+ETA_MODEL_WINDOW: int = int(os.getenv("ETA_MODEL_WINDOW", "50"))
+ETA_MODEL_MIN_SAMPLES: int = int(os.getenv("ETA_MODEL_MIN_SAMPLES", "3"))
+ETA_MODEL_RETENTION_DAYS: int = int(os.getenv("ETA_MODEL_RETENTION_DAYS", "90"))
+
+# ── Subprocess Output ────────────────────────────────────────────────────────
+# Build and Claude output is spooled to per-run log files; memory keeps head + tail only
+LOG_SPOOL_DIR: str = os.getenv("LOG_SPOOL_DIR", "./logs/runs")
+LOG_SPOOL_KEEP: int = int(os.getenv("LOG_SPOOL_KEEP", "200"))  # newest files kept; 0 = no spooling
+LOG_SPOOL_MAX_MB: int = int(os.getenv("LOG_SPOOL_MAX_MB", "50"))  # per file
+PROC_CAPTURE_HEAD_KB: int = int(os.getenv("PROC_CAPTURE_HEAD_KB", "64"))
+PROC_CAPTURE_TAIL_KB: int = int(os.getenv("PROC_CAPTURE_TAIL_KB", "256"))
+
+# ── Build Error Detection ────────────────────────────────────────────────────
+# Errors are recognised while a build streams; stop it once this many are known (0 = never)
+BUILD_EARLY_ABORT_ERRORS: int = int(os.getenv("BUILD_EARLY_ABORT_ERRORS", "10"))
+BUILD_EARLY_ABORT_GRACE_SECS: float = float(os.getenv("BUILD_EARLY_ABORT_GRACE_SECS", "3"))
+# Optional JSON file of extra per-platform error regexes (see build_errors.py)
+BUILD_ERROR_PATTERNS_FILE: str = os.getenv("BUILD_ERROR_PATTERNS_FILE", "")
+
+# ── Telemetry ────────────────────────────────────────────────────────────────
+# Cost/latency events for every Claude run, build, demo, SQL sync and external call
+TELEMETRY_ENABLED: bool = os.getenv("TELEMETRY_ENABLED", "1") == "1"
+TELEMETRY_PATH: str = os.getenv("TELEMETRY_PATH", "./telemetry.db")
+TELEMETRY_WINDOW: int = int(os.getenv("TELEMETRY_WINDOW", "1000"))  # events per series behind p50/p95/p99
+TELEMETRY_FLUSH_SECS: float = float(os.getenv("TELEMETRY_FLUSH_SECS", "5"))
+TELEMETRY_FLUSH_EVENTS: int = int(os.getenv("TELEMETRY_FLUSH_EVENTS", "200"))
+TELEMETRY_RAW_RETENTION_HOURS: int = int(os.getenv("TELEMETRY_RAW_RETENTION_HOURS", "48"))
+TELEMETRY_MINUTE_RETENTION_DAYS: int = int(os.getenv("TELEMETRY_MINUTE_RETENTION_DAYS", "7"))
+TELEMETRY_RETENTION_DAYS: int = int(os.getenv("TELEMETRY_RETENTION_DAYS", "90"))  # hourly rollups
+
+# ── Spend Ledger ─────────────────────────────────────────────────────────────
+# Append-only record of every charge; completed days are snapshotted per user/workspace
+COST_LEDGER_PATH: str = os.getenv("COST_LEDGER_PATH", "./cost_ledger.db")
+COST_LEDGER_RETENTION_DAYS: int = int(os.getenv("COST_LEDGER_RETENTION_DAYS", "90"))  # individual charges
+COST_HISTORY_DAYS: int = int(os.getenv("COST_HISTORY_DAYS", "730"))  # daily snapshots
+
+# ── LLM Router ───────────────────────────────────────────────────────────────
+# Short one-shot sub-tasks (save descriptions, PR titles, prompt suggestions) go to
+# the best available API provider instead of a Claude Code session.
+# Entries are "provider" or "provider:model"; each needs <PROVIDER>_API_KEY set.
+# Opt-in: routed calls are stateless and only see the diff stat and workspace key,
+# not the session that knows what the project is.
+LLM_ROUTER_ENABLED: bool = os.getenv("LLM_ROUTER_ENABLED", "0") == "1"
+LLM_ROUTER_PROVIDERS: str = os.getenv("LLM_ROUTER_PROVIDERS", "anthropic,openai,google,groq")
+LLM_ROUTER_MAX_CONCURRENCY: int = int(os.getenv("LLM_ROUTER_MAX_CONCURRENCY", "4"))  # per provider
+LLM_ROUTER_TIMEOUT_SECS: float = float(os.getenv("LLM_ROUTER_TIMEOUT_SECS", "20"))  # then fail over
+LLM_ROUTER_COOLDOWN_SECS: float = float(os.getenv("LLM_ROUTER_COOLDOWN_SECS", "60"))
+LLM_ROUTER_COST_WEIGHT: float = float(os.getenv("LLM_ROUTER_COST_WEIGHT", "2000"))  # seconds of latency $1 is worth
+
 
 def validate() -> list[str]:
     problems = []
@@ -118,7 +252,7 @@ def validate() -> list[str]:
             problems.append("DISCORD_BOT_TOKEN is not set")
         if DISCORD_ALLOWED_USER_ID == 0:
             problems.append("DISCORD_ALLOWED_USER_ID is not set")
-    if not Path(WORKSPACES_PATH).exists():
+    if not Path(WORKSPACES_PATH).exists() and not Path(WORKSPACES_PATH).with_suffix(".db").exists():
         problems.append(f"workspaces.json not found at {WORKSPACES_PATH}")
     return problems
 
@@ -0,0 +1,22 @@
+"""Shared pytest fixtures."""
+
+import sys
+
+import pytest
+
+
+def _reset(monkeypatch, module: str, attr: str) -> None:
+    """Drop a module's cached singleton (if the module is loaded) so it reopens at the patched path."""
+    if module in sys.modules:
+        monkeypatch.setattr(sys.modules[module], attr, None)
+
+
+@pytest.fixture(autouse=True)
+def _isolated_stores(tmp_path, monkeypatch):
+    """Point the SQLite stores at a temp dir instead of the production files in the repo root."""
+    monkeypatch.setattr("config.BUILD_STORE_PATH", str(tmp_path / "builds.db"))
+    _reset(monkeypatch, "service", "_build_store")
+    monkeypatch.setattr("config.ETA_MODEL_PATH", str(tmp_path / "eta_model.db"))
+    _reset(monkeypatch, "eta_model", "_model")
+    monkeypatch.setattr("config.TELEMETRY_PATH", str(tmp_path / "telemetry.db"))
+    _reset(monkeypatch, "telemetry", "_telemetry")
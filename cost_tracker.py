@@ -1,78 +1,168 @@
 """
 cost_tracker.py — Daily spend tracker for Claude API costs.
-Supports per-user tracking with auto-migration from legacy format.
-Persists to cost_tracker.json in the bot directory.
+
+Every charge is appended to a ledger in COST_LEDGER_PATH (SQLite, WAL mode):
+one INSERT per task, nothing rewritten, so concurrent tasks can't lose each
+other's updates. Today's per-user totals are kept in memory, so the
+can_afford() check before each task never touches disk.
+
+When the day rolls over, completed days are snapshotted into per-day rows
+(day, user, workspace) and ledger entries older than COST_LEDGER_RETENTION_DAYS
+are pruned. Daily rows are kept for COST_HISTORY_DAYS. spend() answers
+multi-day, per-user and per-workspace questions from both:
+
+    tracker.spend(days=7)                    # per day, everyone
+    tracker.spend(days=30, by="workspace")   # per workspace
+    tracker.spend(days=7, user_id=uid, by="user")
+
+The old cost_tracker.json (today's totals only) is imported once.
 """
 
 import json
 import os
-from datetime import date
+import sqlite3
+import time
+from datetime import date, timedelta
 from pathlib import Path
 from typing import Optional
 
+import config
 
 _DATA_FILE = Path(os.path.dirname(os.path.abspath(__file__))) / "cost_tracker.json"
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts         REAL NOT NULL,
+    day        TEXT NOT NULL,
+    user_id    INTEGER NOT NULL DEFAULT 0,
+    workspace  TEXT NOT NULL DEFAULT '',
+    cost_usd   REAL NOT NULL,
+    tasks      INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS ledger_day ON ledger (day);
+CREATE TABLE IF NOT EXISTS daily (
+    day        TEXT NOT NULL,
+    user_id    INTEGER NOT NULL,
+    workspace  TEXT NOT NULL,
+    spent_usd  REAL NOT NULL,
+    tasks      INTEGER NOT NULL,
+    PRIMARY KEY (day, user_id, workspace)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# spend(by=...) → column; user_id 0 / workspace "" mean "not attributed"
+_GROUP_COLUMNS = {"day": "day", "user": "user_id", "workspace": "workspace"}
+
 
 class CostTracker:
-    def __init__(self):
+    def __init__(self, path: Optional[str] = None, legacy_file: Optional[Path] = _DATA_FILE):
+        path = path or config.COST_LEDGER_PATH
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
         self._date: str = ""
         self._global: dict = {"spent_usd": 0.0, "tasks": 0}
-        self._users: dict[int, dict] = {}  # user_id -> {"spent_usd", "tasks"}
-        self._load()
-
-    def _load(self):
-        if _DATA_FILE.exists():
-            try:
-                data = json.loads(_DATA_FILE.read_text())
-                self._date = data.get("date", "")
-                self._migrate(data)
-            except (json.JSONDecodeError, OSError):
-                pass
+        self._users: dict[int, dict] = {}  # user_id -> {"spent_usd", "tasks"}, today only
+        self._metrics = {"charges": 0, "write_errors": 0, "snapshots": 0, "ledger_rows_pruned": 0}
+        if legacy_file is not None:
+            self._import_legacy(Path(legacy_file))
         self._reset_if_new_day()
 
-    def _migrate(self, data: dict):
-        """Auto-migrate from legacy flat format to per-user format."""
-        if "global" in data:
-            # New format
-            self._global = data["global"]
-            self._users = {int(k): v for k, v in data.get("users", {}).items()}
-        else:
-            # Legacy format: flat {date, spent_usd, tasks}
-            self._global = {
-                "spent_usd": data.get("spent_usd", 0.0),
-                "tasks": data.get("tasks", 0),
-            }
-            self._users = {}
-            self._save()
-
-    def _save(self):
-        _DATA_FILE.write_text(json.dumps({
-            "date": self._date,
-            "global": {
-                "spent_usd": round(self._global["spent_usd"], 6),
-                "tasks": self._global["tasks"],
-            },
-            "users": {
-                str(k): {
-                    "spent_usd": round(v["spent_usd"], 6),
-                    "tasks": v["tasks"],
-                }
-                for k, v in self._users.items()
-            },
-        }, indent=2) + "\n")
+    def _import_legacy(self, legacy_file: Path):
+        """Carry today's totals over from cost_tracker.json (flat or per-user format)."""
+        if self._db.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        rows = []
+        try:
+            data = json.loads(legacy_file.read_text()) if legacy_file.exists() else {}
+        except (json.JSONDecodeError, OSError):
+            data = {}
+        day = data.get("date", "")
+        if day:
+            if "global" in data:
+                glob = data["global"]
+                users = {int(k): v for k, v in data.get("users", {}).items()}
+            else:
+                glob = {"spent_usd": data.get("spent_usd", 0.0), "tasks": data.get("tasks", 0)}
+                users = {}
+            for uid, v in users.items():
+                rows.append((day, uid, v.get("spent_usd", 0.0), v.get("tasks", 0)))
+            # Spend that was never attributed to a user (the global total includes it)
+            rest_usd = glob.get("spent_usd", 0.0) - sum(v.get("spent_usd", 0.0) for v in users.values())
+            rest_tasks = glob.get("tasks", 0) - sum(v.get("tasks", 0) for v in users.values())
+            if rest_tasks > 0 or rest_usd > 1e-9:
+                rows.append((day, 0, max(0.0, rest_usd), max(0, rest_tasks)))
+        now = time.time()
+        self._db.execute("BEGIN")
+        self._db.executemany(
+            "INSERT INTO ledger (ts, day, user_id, cost_usd, tasks) VALUES (?, ?, ?, ?, ?)",
+            [(now, *r) for r in rows],
+        )
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)", (str(now),))
+        self._db.execute("COMMIT")
 
     def _reset_if_new_day(self):
         today = date.today().isoformat()
-        if self._date != today:
-            self._date = today
-            self._global = {"spent_usd": 0.0, "tasks": 0}
-            self._users = {}
-            self._save()
+        if self._date == today:
+            return
+        self._date = today
+        self._global = {"spent_usd": 0.0, "tasks": 0}
+        self._users = {}
+        for uid, spent, tasks in self._db.execute(
+            "SELECT user_id, SUM(cost_usd), SUM(tasks) FROM ledger WHERE day = ? GROUP BY user_id", (today,)
+        ):
+            self._global["spent_usd"] += spent
+            self._global["tasks"] += tasks
+            if uid:
+                self._users[uid] = {"spent_usd": spent, "tasks": tasks}
+        self.snapshot()
+
+    def snapshot(self):
+        """Fold completed days into daily rows, then apply retention."""
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'snapshot_day'").fetchone()
+        last = row[0] if row else ""
+        today = date.fromisoformat(self._date)
+        raw_cutoff = (today - timedelta(days=config.COST_LEDGER_RETENTION_DAYS)).isoformat()
+        history_cutoff = (today - timedelta(days=config.COST_HISTORY_DAYS)).isoformat()
+        try:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT OR REPLACE INTO daily (day, user_id, workspace, spent_usd, tasks)"
+                " SELECT day, user_id, workspace, SUM(cost_usd), SUM(tasks) FROM ledger"
+                " WHERE day > ? AND day < ? GROUP BY day, user_id, workspace",
+                (last, self._date),
+            )
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('snapshot_day', ?)",
+                             ((today - timedelta(days=1)).isoformat(),))
+            pruned = self._db.execute("DELETE FROM ledger WHERE day < ?", (raw_cutoff,)).rowcount
+            self._db.execute("DELETE FROM daily WHERE day < ?", (history_cutoff,))
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            print(f"[cost] Snapshot failed: {e}")
+            return
+        self._metrics["snapshots"] += 1
+        self._metrics["ledger_rows_pruned"] += max(0, pruned)
 
-    def add(self, cost_usd: float, user_id: Optional[int] = None):
+    def add(self, cost_usd: float, user_id: Optional[int] = None, workspace: Optional[str] = None):
         """Record a cost and increment the task counter."""
         self._reset_if_new_day()
+        try:
+            self._db.execute(
+                "INSERT INTO ledger (ts, day, user_id, workspace, cost_usd) VALUES (?, ?, ?, ?, ?)",
+                (time.time(), self._date, user_id or 0, workspace or "", cost_usd),
+            )
+        except sqlite3.Error as e:
+            # Still count it in memory so today's cap holds
+            self._metrics["write_errors"] += 1
+            print(f"[cost] Ledger write failed: {e}")
+        self._metrics["charges"] += 1
         self._global["spent_usd"] += cost_usd
         self._global["tasks"] += 1
         if user_id is not None:
@@ -80,7 +170,6 @@ class CostTracker:
                 self._users[user_id] = {"spent_usd": 0.0, "tasks": 0}
             self._users[user_id]["spent_usd"] += cost_usd
             self._users[user_id]["tasks"] += 1
-        self._save()
 
     def today_spent(self, user_id: Optional[int] = None) -> float:
         """Return total USD spent today, globally or for a specific user."""
@@ -109,3 +198,59 @@ class CostTracker:
             (uid, data["spent_usd"], data["tasks"])
             for uid, data in sorted(self._users.items())
         ]
+
+    def spend(self, days: int = 7, user_id: Optional[int] = None,
+              workspace: Optional[str] = None, by: str = "day") -> list[dict]:
+        """Spend over the last `days` days (today included), grouped by day, user or workspace.
+
+        Reads the database rather than memory, so other processes (the API)
+        see the bot's charges.
+        """
+        column = _GROUP_COLUMNS[by]
+        self._reset_if_new_day()
+        since = (date.fromisoformat(self._date) - timedelta(days=max(1, days) - 1)).isoformat()
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'snapshot_day'").fetchone()
+        snapshot_day = row[0] if row else ""
+        where, params = "", []
+        if user_id is not None:
+            where += " AND user_id = ?"
+            params.append(user_id)
+        if workspace is not None:
+            where += " AND workspace = ?"
+            params.append(workspace)
+        rows = self._db.execute(
+            f"SELECT {column}, SUM(spent), SUM(tasks) FROM ("
+            "  SELECT day, user_id, workspace, spent_usd AS spent, tasks FROM daily WHERE day >= ? AND day <= ?"
+            "  UNION ALL"
+            "  SELECT day, user_id, workspace, cost_usd, tasks FROM ledger WHERE day >= ? AND day > ?"
+            f") WHERE 1 = 1{where} GROUP BY {column} ORDER BY {column}",
+            [since, snapshot_day, since, snapshot_day, *params],
+        )
+        return [{by: key, "spent_usd": round(spent, 6), "tasks": tasks} for key, spent, tasks in rows]
+
+    def period_spent(self, days: int, user_id: Optional[int] = None) -> tuple[float, int]:
+        """(spent_usd, tasks) over the last `days` days, today included."""
+        rows = self.spend(days, user_id=user_id, by="user")
+        return (sum(r["spent_usd"] for r in rows), sum(r["tasks"] for r in rows))
+
+    def metrics(self) -> dict:
+        top = sorted(self.spend(30, by="workspace"), key=lambda r: -r["spent_usd"])[:10]
+        return {
+            **self._metrics,
+            "last_7_days": self.spend(7),
+            "top_workspaces_30d": top,
+        }
+
+
+_tracker: Optional[CostTracker] = None
+
+
+def get_tracker() -> CostTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = CostTracker()
+    return _tracker
+
+
+def metrics() -> dict:
+    return get_tracker().metrics()
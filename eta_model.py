@@ -0,0 +1,287 @@
+"""
+eta_model.py — Persisted duration model behind every "~Xm left" the bot shows.
+
+ClaudeRunner used to average the last 10 run durations per workspace in
+memory. Every restart lost them, a new workspace had no ETA at all, and a
+one-line fix prompt was averaged together with a from-scratch app prompt.
+Durations are now stored in ETA_MODEL_PATH (SQLite, WAL mode) and keyed by:
+
+    op        claude, build, job:<operation> (API jobs), ...
+    platform  android / ios / web, or "" when it doesn't apply
+    kind      initial / fix for Claude runs (see labels())
+    size      prompt-length bucket
+
+estimate() returns p50/p90 over the most specific key with enough samples.
+It falls back to coarser keys (dropping size, then kind, then platform), then
+to built-in priors:
+
+    est = get_model().estimate("claude", prompt_chars=len(prompt))
+    est.remaining(elapsed)                       # None once past p90
+    get_model().record("claude", duration, prompt_chars=len(prompt))
+
+record() first asks the model what it would have predicted for the same key,
+so metrics() reports how accurate the ETAs actually are.
+
+platform and kind default to the labels bound by the caller. agent_loop tags
+its fix prompts this way, without threading extra arguments through
+AgentRunner:
+
+    with labels(kind="fix", platform="android"):
+        await claude.run(...)
+"""
+
+from __future__ import annotations
+
+import bisect
+import sqlite3
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import config
+
+# Prompt-length bucket edges in characters; size 0 means "no prompt"
+_SIZE_EDGES = (1_000, 4_000, 16_000)
+_LOAD_ROWS = 5_000
+_ACCURACY_ROWS = 1_000
+_PRUNE_EVERY = 500
+
+# (op, platform, kind) → p50 seconds used until real samples arrive; p90 = 2× p50
+_PRIORS = {
+    ("claude", "", ""): 120.0,
+    ("claude", "", "initial"): 240.0,
+    ("claude", "", "fix"): 90.0,
+    ("build", "", ""): 180.0,
+    ("build", "android", ""): 180.0,
+    ("build", "ios", ""): 240.0,
+    ("build", "web", ""): 90.0,
+    ("job:buildapp", "", ""): 900.0,
+    ("job:prompt", "", ""): 180.0,
+    ("job:demo", "", ""): 150.0,
+    ("job:build", "", ""): 180.0,
+    ("job:appraise", "", ""): 120.0,
+}
+_DEFAULT_PRIOR = 120.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    op           TEXT NOT NULL,
+    platform     TEXT NOT NULL DEFAULT '',
+    kind         TEXT NOT NULL DEFAULT '',
+    size         INTEGER NOT NULL DEFAULT 0,
+    duration     REAL NOT NULL,
+    predicted    REAL,
+    predicted_p90 REAL,
+    basis        TEXT,
+    created_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_samples_created ON samples(created_at);
+"""
+
+
+@dataclass(frozen=True)
+class Labels:
+    platform: str = ""
+    kind: str = ""
+
+
+_labels: ContextVar[Labels] = ContextVar("eta_labels", default=Labels())
+
+
+@contextmanager
+def labels(platform: Optional[str] = None, kind: Optional[str] = None):
+    """Default platform/kind for estimates and samples made inside the block."""
+    current = _labels.get()
+    token = _labels.set(Labels(
+        platform=current.platform if platform is None else platform,
+        kind=current.kind if kind is None else kind,
+    ))
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def size_bucket(prompt_chars: int) -> int:
+    return 0 if prompt_chars <= 0 else 1 + bisect.bisect_right(_SIZE_EDGES, prompt_chars)
+
+
+@dataclass(frozen=True)
+class Estimate:
+    p50: float
+    p90: float
+    samples: int
+    basis: str  # which key answered: "exact", "kind", "platform", "op" or "prior"
+
+    def remaining(self, elapsed: float) -> Optional[float]:
+        """Seconds left: to p50 while under it, then to p90; None once past p90."""
+        if elapsed < self.p50:
+            return self.p50 - elapsed
+        if elapsed < self.p90:
+            return self.p90 - elapsed
+        return None
+
+
+def format_remaining(seconds: Optional[float]) -> str:
+    """'~2m 10s left', '~40s left', or 'taking longer than usual'."""
+    if seconds is None:
+        return "taking longer than usual"
+    mins, secs = divmod(int(seconds), 60)
+    return f"~{mins}m {secs}s left" if mins else f"~{secs}s left"
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * pct
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def _prior(op: str, platform: str, kind: str) -> float:
+    for key in ((op, platform, kind), (op, platform, ""), (op, "", kind), (op, "", "")):
+        if key in _PRIORS:
+            return _PRIORS[key]
+    return _DEFAULT_PRIOR
+
+
+# Fallback levels, most specific first: (basis, key builder)
+_LEVELS = (
+    ("exact", lambda op, platform, kind, size: (op, platform, kind, size)),
+    ("kind", lambda op, platform, kind, size: (op, platform, kind)),
+    ("platform", lambda op, platform, kind, size: (op, platform)),
+    ("op", lambda op, platform, kind, size: (op,)),
+)
+
+
+class EtaModel:
+    def __init__(self, path: str, window: Optional[int] = None, min_samples: Optional[int] = None):
+        self._window = window or config.ETA_MODEL_WINDOW
+        self._min_samples = min_samples or config.ETA_MODEL_MIN_SAMPLES
+        # Recent durations for every fallback level of every key seen
+        self._samples: dict[tuple, deque[float]] = {}
+        self._since_prune = 0
+        self._metrics = {"estimates": 0, "recorded": 0}
+        self._basis_counts: dict[str, int] = {}
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._prune()
+        rows = self._db.execute(
+            "SELECT op, platform, kind, size, duration FROM"
+            " (SELECT * FROM samples ORDER BY id DESC LIMIT ?) ORDER BY id",
+            (_LOAD_ROWS,),
+        ).fetchall()
+        for r in rows:
+            self._add(r["op"], r["platform"], r["kind"], r["size"], r["duration"])
+
+    def _add(self, op: str, platform: str, kind: str, size: int, duration: float) -> None:
+        for _, key_of in _LEVELS:
+            key = key_of(op, platform, kind, size)
+            bucket = self._samples.get(key)
+            if bucket is None:
+                bucket = self._samples[key] = deque(maxlen=self._window)
+            bucket.append(duration)
+
+    def _resolve(self, platform: Optional[str], kind: Optional[str]) -> tuple[str, str]:
+        bound = _labels.get()
+        return (bound.platform if platform is None else platform,
+                bound.kind if kind is None else kind)
+
+    def _estimate(self, op: str, platform: str, kind: str, size: int) -> Estimate:
+        for basis, key_of in _LEVELS:
+            values = self._samples.get(key_of(op, platform, kind, size))
+            if values and len(values) >= self._min_samples:
+                ordered = sorted(values)
+                return Estimate(_percentile(ordered, 0.5), _percentile(ordered, 0.9), len(ordered), basis)
+        prior = _prior(op, platform, kind)
+        return Estimate(prior, prior * 2, 0, "prior")
+
+    def estimate(self, op: str, platform: Optional[str] = None, kind: Optional[str] = None,
+                 prompt_chars: int = 0) -> Estimate:
+        """p50/p90 duration for an operation; platform/kind default to the bound labels."""
+        platform, kind = self._resolve(platform, kind)
+        est = self._estimate(op, platform, kind, size_bucket(prompt_chars))
+        self._metrics["estimates"] += 1
+        self._basis_counts[est.basis] = self._basis_counts.get(est.basis, 0) + 1
+        return est
+
+    def record(self, op: str, duration: float, platform: Optional[str] = None,
+               kind: Optional[str] = None, prompt_chars: int = 0) -> None:
+        """Store a completed run, together with what the model predicted for it."""
+        if duration <= 0:
+            return
+        platform, kind = self._resolve(platform, kind)
+        size = size_bucket(prompt_chars)
+        predicted = self._estimate(op, platform, kind, size)
+        try:
+            self._db.execute(
+                "INSERT INTO samples (op, platform, kind, size, duration, predicted, predicted_p90, basis, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (op, platform, kind, size, duration, predicted.p50, predicted.p90, predicted.basis, time.time()),
+            )
+        except sqlite3.Error as e:
+            print(f"[eta] Failed to record sample: {e}")
+        self._add(op, platform, kind, size, duration)
+        self._metrics["recorded"] += 1
+        self._since_prune += 1
+        if self._since_prune >= _PRUNE_EVERY:
+            self._prune()
+
+    def _prune(self) -> None:
+        self._since_prune = 0
+        cutoff = time.time() - config.ETA_MODEL_RETENTION_DAYS * 86400
+        self._db.execute("DELETE FROM samples WHERE created_at < ?", (cutoff,))
+
+    def accuracy(self) -> dict:
+        """Per-op accuracy of recent predictions: mean absolute % error of p50,
+        and how often the run finished within p90."""
+        rows = self._db.execute(
+            "SELECT op, duration, predicted, predicted_p90, basis FROM samples"
+            " WHERE predicted IS NOT NULL ORDER BY id DESC LIMIT ?",
+            (_ACCURACY_ROWS,),
+        ).fetchall()
+        by_op: dict[str, dict] = {}
+        for r in rows:
+            acc = by_op.setdefault(r["op"], {"samples": 0, "abs_pct_error": 0.0, "within_p90": 0, "from_prior": 0})
+            acc["samples"] += 1
+            acc["abs_pct_error"] += abs(r["predicted"] - r["duration"]) / r["duration"]
+            acc["within_p90"] += r["duration"] <= r["predicted_p90"]
+            acc["from_prior"] += r["basis"] == "prior"
+        return {
+            op: {
+                "samples": acc["samples"],
+                "mape": round(acc["abs_pct_error"] / acc["samples"], 3),
+                "p90_coverage": round(acc["within_p90"] / acc["samples"], 3),
+                "from_prior": acc["from_prior"],
+            }
+            for op, acc in by_op.items()
+        }
+
+    def metrics(self) -> dict:
+        return {**self._metrics, "basis": dict(self._basis_counts), "accuracy": self.accuracy()}
+
+
+_model: Optional[EtaModel] = None
+
+
+def get_model() -> EtaModel:
+    global _model
+    if _model is None:
+        _model = EtaModel(config.ETA_MODEL_PATH)
+    return _model
+
+
+def metrics() -> dict:
+    return get_model().metrics()
@@ -0,0 +1,296 @@
+"""
+fix_index.py — Index of compile errors and the edits that fixed them, shared
+across one tenant's workspaces.
+
+The same KMP failures recur across apps: a missing import, an API that doesn't
+exist on wasmJs, or an expect/actual mismatch. When a Claude fix turns a failing build
+green, agent_loop records the edit under a fingerprint of the error and the
+tenant (account, or Discord owner) that owns the workspace. The next time any
+workspace of that tenant hits an error with the same fingerprint, the stored
+edit is replayed and rebuilt before Claude is asked. If the replayed edit doesn't
+apply cleanly or doesn't make the build pass, it is reverted and the loop falls
+back to Claude.
+
+    fp = fingerprint(error_snippet)
+    snap = snapshot(ws_path)              # before Claude's fix
+    ...                                   # Claude fixes, rebuild passes
+    get_index().record(fp, scope, "android", error_snippet, diff_edits(snap, ws_path))
+
+    for fix in get_index().candidates(fp, scope):
+        applied = apply_edits(ws_path, fix.edits)   # None → not applicable here
+        ...                                          # rebuild; applied.revert() on failure
+        get_index().record_outcome(fix.fix_id, ok)
+
+Fingerprints drop what differs between workspaces: absolute paths and package
+directories (only the file name is kept), line/column numbers, and numeric
+literals. An edit is stored as one or more (file, before, after) text blocks
+with two lines of context. It applies only where `before` occurs exactly once
+in the target file, so a fix never lands anywhere except the code it was
+written for. Fixes that create files are not recorded: a replay only ever
+rewrites code the target workspace already has, never copies a file into it.
+
+Stored in FIX_INDEX_PATH (SQLite, WAL mode).
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import config
+
+# Only source/build-script text is snapshotted and patched. .json and .properties
+# are left out: that is where keys live (google-services.json, local.properties)
+_TEXT_SUFFIXES = {".kt", ".kts", ".swift", ".toml", ".xml", ".gradle", ".pro"}
+_SKIP_DIRS = {
+    "build", ".gradle", ".kotlin", ".idea", ".git", "node_modules",
+    "DerivedData", "xcuserdata", ".swiftpm", "Pods",
+}
+_MAX_FILE_BYTES = 256 * 1024
+_MAX_SNAPSHOT_BYTES = 20 * 1024 * 1024
+_CONTEXT_LINES = 2
+_MAX_EDIT_CHARS = 20_000  # larger fixes are too app-specific to replay
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fixes (
+    fix_id       TEXT PRIMARY KEY,
+    fingerprint  TEXT NOT NULL,
+    scope        TEXT,
+    platform     TEXT,
+    sample_error TEXT,
+    edits        TEXT NOT NULL,
+    successes    INTEGER NOT NULL DEFAULT 0,
+    failures     INTEGER NOT NULL DEFAULT 0,
+    created_at   REAL NOT NULL,
+    last_used_at REAL
+);
+"""
+# After the scope column exists (rows from before it have scope NULL and are never offered)
+_SCOPE_INDEX = "CREATE INDEX IF NOT EXISTS idx_fixes_scope ON fixes(scope, fingerprint)"
+
+_ERROR_LINE_RE = re.compile(r"^(e:|error:)|\berror\b", re.IGNORECASE)
+_PATH_RE = re.compile(r"(?:file://)?(?:[A-Za-z]:)?(?:[\w.@+-]*/)+([\w.@+-]+\.\w+)")
+_LOCATION_RE = re.compile(r"(\.\w+)(?::\d+)+|\(\d+(?:,\s*\d+)?\)")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+
+
+def fingerprint(error: str) -> str:
+    """Stable signature of a build error, independent of workspace and line numbers."""
+    lines = [ln.strip() for ln in error.splitlines() if ln.strip()]
+    error_lines = [ln for ln in lines if _ERROR_LINE_RE.search(ln)] or lines
+    normalized = set()
+    for line in error_lines:
+        line = _PATH_RE.sub(r"\1", line)
+        line = _LOCATION_RE.sub(r"\1", line)
+        line = _NUMBER_RE.sub("N", line)
+        normalized.add(" ".join(line.split()))
+    return hashlib.sha256("\n".join(sorted(normalized)).encode()).hexdigest()[:24]
+
+
+# ── Snapshots and edits ──────────────────────────────────────────────────────
+
+
+def snapshot(workspace_path: str) -> Optional[dict[str, str]]:
+    """Read every source text file in the workspace: {relative path: content}.
+
+    Returns None if the tree is too large to diff cheaply or unreadable.
+    """
+    ws = Path(workspace_path)
+    files: dict[str, str] = {}
+    total = 0
+    try:
+        for dirpath, dirnames, filenames in os.walk(ws):
+            dirnames[:] = [d for d in dirnames if d not in _SKIP_DIRS]
+            for name in filenames:
+                path = Path(dirpath) / name
+                if path.suffix not in _TEXT_SUFFIXES:
+                    continue
+                size = path.stat().st_size
+                if size > _MAX_FILE_BYTES:
+                    continue
+                total += size
+                if total > _MAX_SNAPSHOT_BYTES:
+                    return None
+                try:
+                    files[path.relative_to(ws).as_posix()] = path.read_text()
+                except UnicodeDecodeError:
+                    continue
+    except OSError:
+        return None
+    return files
+
+
+def diff_edits(before: dict[str, str], workspace_path: str) -> list[dict]:
+    """Describe how the workspace changed since `before` as replayable edits.
+
+    Returns [] when nothing changed or the change can't be replayed safely
+    (files created or deleted, or the edit is too large to be a reusable fix).
+    """
+    after = snapshot(workspace_path)
+    if after is None or set(before) != set(after):
+        return []
+    edits: list[dict] = []
+    for rel, new_text in sorted(after.items()):
+        old_text = before.get(rel)
+        if old_text == new_text:
+            continue
+        a = old_text.splitlines(keepends=True)
+        b = new_text.splitlines(keepends=True)
+        for group in difflib.SequenceMatcher(None, a, b, autojunk=False).get_grouped_opcodes(_CONTEXT_LINES):
+            i1, i2 = group[0][1], group[-1][2]
+            j1, j2 = group[0][3], group[-1][4]
+            old_block = "".join(a[i1:i2])
+            if not old_block.strip():
+                return []  # pure insertion with no anchor
+            edits.append({"file": rel, "before": old_block, "after": "".join(b[j1:j2])})
+    if sum(len(e["after"]) + len(e["before"]) for e in edits) > _MAX_EDIT_CHARS:
+        return []
+    return edits
+
+
+@dataclass
+class AppliedEdits:
+    """Original contents of the files an edit touched, for revert()."""
+    workspace_path: str
+    originals: dict[str, str]
+
+    def revert(self) -> None:
+        ws = Path(self.workspace_path)
+        for rel, text in self.originals.items():
+            (ws / rel).write_text(text)
+
+
+def _resolve(rel: str, files: dict[str, str]) -> Optional[str]:
+    """Find the edit's file in this workspace: same path, else unique same name."""
+    if rel in files:
+        return rel
+    name = rel.rsplit("/", 1)[-1]
+    matches = [r for r in files if r.rsplit("/", 1)[-1] == name]
+    return matches[0] if len(matches) == 1 else None
+
+
+def apply_edits(workspace_path: str, edits: list[dict]) -> Optional[AppliedEdits]:
+    """Apply edits all-or-nothing. Returns None (workspace untouched) if any doesn't fit.
+
+    Only replacements of existing text are applied; an edit without a `before`
+    block (a whole new file, recorded by older versions) never is.
+    """
+    ws = Path(workspace_path)
+    files = snapshot(workspace_path)
+    if files is None or not edits:
+        return None
+    new_contents: dict[str, str] = {}
+    originals: dict[str, str] = {}
+    for edit in edits:
+        if not edit.get("before"):
+            return None
+        rel = _resolve(edit["file"], files)
+        if rel is None:
+            return None
+        text = new_contents.get(rel, files[rel])
+        if text.count(edit["before"]) != 1:
+            return None
+        originals.setdefault(rel, files[rel])
+        new_contents[rel] = text.replace(edit["before"], edit["after"], 1)
+    for rel, text in new_contents.items():
+        (ws / rel).write_text(text)
+    return AppliedEdits(workspace_path, originals)
+
+
+# ── Index ────────────────────────────────────────────────────────────────────
+
+
+@dataclass
+class KnownFix:
+    fix_id: str
+    fingerprint: str
+    platform: str
+    edits: list[dict]
+    successes: int
+    failures: int
+
+
+class FixIndex:
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        columns = {r["name"] for r in self._db.execute("PRAGMA table_info(fixes)")}
+        if "scope" not in columns:
+            self._db.execute("ALTER TABLE fixes ADD COLUMN scope TEXT")
+        self._db.execute(_SCOPE_INDEX)
+        self._metrics = {"lookups": 0, "hits": 0, "replay_successes": 0, "replay_failures": 0, "recorded": 0}
+
+    def candidates(self, fp: str, scope: str, limit: Optional[int] = None) -> list[KnownFix]:
+        """Known fixes for a fingerprint recorded in the same scope, best track
+        record first. Fixes that have failed more often than they worked are no
+        longer offered."""
+        limit = limit if limit is not None else config.FIX_REPLAY_MAX_CANDIDATES
+        self._metrics["lookups"] += 1
+        rows = self._db.execute(
+            "SELECT * FROM fixes WHERE scope = ? AND fingerprint = ? AND failures <= successes"
+            " ORDER BY successes - failures DESC, last_used_at DESC LIMIT ?",
+            (scope, fp, limit),
+        ).fetchall()
+        if rows:
+            self._metrics["hits"] += 1
+        return [
+            KnownFix(r["fix_id"], r["fingerprint"], r["platform"], json.loads(r["edits"]),
+                     r["successes"], r["failures"])
+            for r in rows
+        ]
+
+    def record(self, fp: str, scope: str, platform: str, error: str, edits: list[dict]) -> Optional[str]:
+        """Store an edit that fixed `fp` within `scope` (or credit it again if already known)."""
+        if not edits or not scope:
+            return None
+        payload = json.dumps(edits, sort_keys=True)
+        fix_id = hashlib.sha256(f"{scope}\n{fp}\n{payload}".encode()).hexdigest()[:24]
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO fixes (fix_id, fingerprint, scope, platform, sample_error, edits, successes,"
+            " created_at, last_used_at) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?)"
+            " ON CONFLICT(fix_id) DO UPDATE SET successes = successes + 1, last_used_at = excluded.last_used_at",
+            (fix_id, fp, scope, platform, error[:2000], payload, now, now),
+        )
+        self._metrics["recorded"] += 1
+        return fix_id
+
+    def record_outcome(self, fix_id: str, success: bool) -> None:
+        column = "successes" if success else "failures"
+        self._db.execute(
+            f"UPDATE fixes SET {column} = {column} + 1, last_used_at = ? WHERE fix_id = ?",
+            (time.time(), fix_id),
+        )
+        self._metrics["replay_successes" if success else "replay_failures"] += 1
+
+    def metrics(self) -> dict:
+        row = self._db.execute(
+            "SELECT COUNT(*) AS n, COUNT(DISTINCT fingerprint) AS fps FROM fixes"
+        ).fetchone()
+        return {**self._metrics, "known_fixes": row["n"], "fingerprints": row["fps"]}
+
+
+_index: Optional[FixIndex] = None
+
+
+def get_index() -> FixIndex:
+    global _index
+    if _index is None:
+        _index = FixIndex(config.FIX_INDEX_PATH)
+    return _index
+
+
+def metrics() -> dict:
+    return get_index().metrics()
@@ -0,0 +1,319 @@
+"""
+gradle_pool.py — Managed pool of warm Gradle daemons shared across workspaces.
+
+Each pool slot owns a private daemon registry (org.gradle.daemon.registry.base),
+so a build leasing an idle slot lands on that slot's daemon instead of
+spawning a fresh JVM. Slots remember the workspace they last built, so repeat
+builds of the same app prefer the daemon that already has its project loaded.
+
+Gradle only reuses a daemon with the same Gradle version, JVM args and Java
+home; otherwise it starts a second one in the same registry. Each slot
+remembers that signature, leases prefer slots whose daemon matches, and a
+slot whose daemon doesn't is stopped before the build, so at most one daemon
+lives per slot.
+
+    async with gradle_pool.lease(workspace_path) as slot:
+        cmd = slot.command("composeApp:assembleDebug")
+        rc, out, err = await _run(cmd, cwd=workspace_path, timeout=300)
+        slot.observe(out + err)
+
+The number of slots caps concurrent Gradle builds (and live daemons). Idle
+daemons exit on their own after GRADLE_DAEMON_IDLE_SECS; when free memory drops
+below GRADLE_MIN_FREE_MEM_MB the least recently used idle daemon is stopped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import config
+
+# Printed by Gradle whenever no compatible idle daemon was found
+_COLD_START_MARKER = "Starting a Gradle Daemon"
+
+_REAP_INTERVAL_SECS = 60
+
+
+@dataclass
+class GradleSlot:
+    index: int
+    registry_dir: Path
+    busy: bool = False
+    warm: bool = False            # a daemon is believed to be alive in this slot
+    last_workspace: str = ""
+    last_used: float = 0.0
+    builds: int = 0
+    signature: str = ""           # daemon_signature() of the daemon's builds
+
+    def command(self, *tasks: str) -> list[str]:
+        """Build the ./gradlew argv pinned to this slot's daemon registry."""
+        cmd = [
+            "./gradlew", *tasks,
+            "--daemon",
+            f"-Dorg.gradle.daemon.registry.base={self.registry_dir}",
+            f"-Dorg.gradle.daemon.idletimeout={config.GRADLE_DAEMON_IDLE_SECS * 1000}",
+        ]
+        if config.GRADLE_JVM_ARGS:
+            cmd.append(f"-Dorg.gradle.jvmargs={config.GRADLE_JVM_ARGS}")
+        if config.GRADLE_PARALLEL:
+            cmd.append("--parallel")
+        return cmd
+
+    def observe(self, output: str) -> None:
+        """Record whether the build reused this slot's daemon or cold-started one."""
+        _pool_metrics["cold_starts" if _COLD_START_MARKER in output else "daemon_hits"] += 1
+        self.warm = True
+
+
+_pool_metrics = {
+    "daemon_hits": 0,
+    "cold_starts": 0,
+    "affinity_hits": 0,
+    "idle_evictions": 0,
+    "memory_evictions": 0,
+    "incompatible_stops": 0,
+    "wait_secs_total": 0.0,
+}
+
+
+def _read_property(path: Path, name: str) -> str:
+    try:
+        for line in path.read_text().splitlines():
+            key, sep, value = line.partition("=")
+            if sep and key.strip() == name:
+                return value.strip()
+    except OSError:
+        pass
+    return ""
+
+
+def daemon_signature(workspace_path: str) -> str:
+    """What decides whether Gradle can reuse a daemon for this workspace:
+    the wrapper's Gradle distribution, the daemon JVM args and Java home."""
+    ws = Path(workspace_path)
+    props = ws / "gradle.properties"
+    return "|".join((
+        _read_property(ws / "gradle" / "wrapper" / "gradle-wrapper.properties", "distributionUrl"),
+        config.GRADLE_JVM_ARGS or _read_property(props, "org.gradle.jvmargs"),
+        _read_property(props, "org.gradle.java.home"),
+    ))
+
+
+def _available_memory_mb() -> Optional[int]:
+    """Best-effort free memory probe (Linux /proc/meminfo, macOS vm_stat)."""
+    meminfo = Path("/proc/meminfo")
+    if meminfo.exists():
+        try:
+            for line in meminfo.read_text().splitlines():
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+        except (OSError, ValueError):
+            return None
+    if sys.platform == "darwin":
+        try:
+            out = subprocess.run(["vm_stat"], capture_output=True, text=True, timeout=5).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        m = re.search(r"page size of (\d+) bytes", out)
+        page_size = int(m.group(1)) if m else 4096
+        pages = 0
+        for label in ("Pages free", "Pages inactive", "Pages speculative"):
+            m = re.search(rf"{label}:\s+(\d+)", out)
+            if m:
+                pages += int(m.group(1))
+        return pages * page_size // (1024 * 1024)
+    return None
+
+
+class GradleDaemonPool:
+    def __init__(self, max_daemons: int, base_dir: str):
+        base = Path(base_dir).expanduser().resolve()
+        self._slots = [
+            GradleSlot(index=i, registry_dir=base / f"slot-{i}")
+            for i in range(max(1, max_daemons))
+        ]
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiting = 0
+        self._reaper: Optional[asyncio.Task] = None
+
+    def _condition(self) -> asyncio.Condition:
+        # Rebind if the pool outlives an event loop (tests, api/bot restarts)
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+            self._reaper = None
+        return self._cond
+
+    def _pick(self, workspace_path: str, signature: str) -> Optional[GradleSlot]:
+        free = [s for s in self._slots if not s.busy]
+        if not free:
+            return None
+        compatible = [s for s in free if s.warm and s.signature == signature]
+        for s in compatible:
+            if s.last_workspace == workspace_path:
+                _pool_metrics["affinity_hits"] += 1
+                return s
+        if compatible:
+            return max(compatible, key=lambda s: s.last_used)
+        cold = [s for s in free if not s.warm]
+        if cold:
+            return cold[0]
+        # Only incompatible daemons are free: the LRU one is stopped in acquire()
+        return min(free, key=lambda s: s.last_used)
+
+    async def acquire(self, workspace_path: str) -> GradleSlot:
+        cond = self._condition()
+        self._ensure_reaper()
+        start = time.time()
+        signature = await asyncio.to_thread(daemon_signature, workspace_path)
+        async with cond:
+            self._waiting += 1
+            try:
+                while (slot := self._pick(workspace_path, signature)) is None:
+                    await cond.wait()
+            finally:
+                self._waiting -= 1
+            slot.busy = True
+        _pool_metrics["wait_secs_total"] += time.time() - start
+        if slot.warm and slot.signature != signature:
+            # Gradle would start a second daemon beside this one
+            await self._stop(slot)
+            _pool_metrics["incompatible_stops"] += 1
+        slot.signature = signature
+        slot.registry_dir.mkdir(parents=True, exist_ok=True)
+        return slot
+
+    async def release(self, slot: GradleSlot, workspace_path: str) -> None:
+        cond = self._condition()
+        async with cond:
+            slot.busy = False
+            slot.last_workspace = workspace_path
+            slot.last_used = time.time()
+            slot.builds += 1
+            cond.notify()
+
+    # ── Eviction ────────────────────────────────────────────────────────
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.get_running_loop().create_task(self._reap_loop())
+
+    async def _reap_loop(self):
+        while True:
+            await asyncio.sleep(_REAP_INTERVAL_SECS)
+            try:
+                await self.evict()
+            except Exception as e:
+                print(f"[gradle-pool] Eviction pass failed: {e}")
+
+    async def evict(self) -> None:
+        """Forget daemons past their idle timeout; stop LRU daemons under memory pressure."""
+        now = time.time()
+        for s in self._slots:
+            if s.warm and not s.busy and now - s.last_used > config.GRADLE_DAEMON_IDLE_SECS:
+                s.warm = False  # daemon has exited via org.gradle.daemon.idletimeout
+                _pool_metrics["idle_evictions"] += 1
+
+        free_mb = await asyncio.to_thread(_available_memory_mb)
+        if free_mb is None or free_mb >= config.GRADLE_MIN_FREE_MEM_MB:
+            return
+        idle = sorted((s for s in self._slots if s.warm and not s.busy), key=lambda s: s.last_used)
+        if idle:
+            victim = idle[0]
+            print(f"[gradle-pool] Low memory ({free_mb}MB free) — stopping daemon in slot {victim.index}")
+            await self._stop_daemon(victim)
+            _pool_metrics["memory_evictions"] += 1
+
+    @staticmethod
+    async def _stop(slot: GradleSlot) -> None:
+        """Stop the slot's daemon with the Gradle version that started it."""
+        gradlew = Path(slot.last_workspace) / "gradlew"
+        if slot.last_workspace and gradlew.exists():
+            proc = await asyncio.create_subprocess_exec(
+                "./gradlew", "--stop",
+                f"-Dorg.gradle.daemon.registry.base={slot.registry_dir}",
+                cwd=slot.last_workspace,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            try:
+                await asyncio.wait_for(proc.wait(), timeout=60)
+            except asyncio.TimeoutError:
+                proc.kill()
+        slot.warm = False
+
+    async def _stop_daemon(self, slot: GradleSlot) -> None:
+        slot.busy = True
+        try:
+            await self._stop(slot)
+        finally:
+            cond = self._condition()
+            async with cond:
+                slot.busy = False
+                cond.notify()
+
+    async def shutdown(self) -> None:
+        """Stop every pooled daemon and remove its registry (e.g. on process exit).
+        Slots still running a build are left alone."""
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        for s in self._slots:
+            if s.busy:
+                continue
+            if s.warm:
+                await self._stop_daemon(s)
+            shutil.rmtree(s.registry_dir, ignore_errors=True)
+
+    def metrics(self) -> dict:
+        total = _pool_metrics["daemon_hits"] + _pool_metrics["cold_starts"]
+        return {
+            **_pool_metrics,
+            "hit_rate": round(_pool_metrics["daemon_hits"] / total, 3) if total else 0.0,
+            "max_daemons": len(self._slots),
+            "busy": sum(1 for s in self._slots if s.busy),
+            "warm": sum(1 for s in self._slots if s.warm),
+            "waiting": self._waiting,
+        }
+
+
+_pool: Optional[GradleDaemonPool] = None
+
+
+def get_pool() -> GradleDaemonPool:
+    global _pool
+    if _pool is None:
+        _pool = GradleDaemonPool(config.GRADLE_MAX_DAEMONS, config.GRADLE_DAEMON_DIR)
+    return _pool
+
+
+@asynccontextmanager
+async def lease(workspace_path: str):
+    """Hold a daemon slot for the duration of one ./gradlew invocation."""
+    pool = get_pool()
+    slot = await pool.acquire(workspace_path)
+    try:
+        yield slot
+    finally:
+        await pool.release(slot, workspace_path)
+
+
+async def shutdown() -> None:
+    """Stop the pool's daemons, if a pool was ever created."""
+    if _pool is not None:
+        await _pool.shutdown()
+
+
+def metrics() -> dict:
+    return get_pool().metrics()
@@ -132,11 +132,12 @@ async def handle_users_admin(ctx: BotContext, cmd: Command, channel, user_id: in
             cap = info.get("daily_cap_usd", config.DEFAULT_USER_DAILY_CAP_USD)
             spent = ctx.cost_tracker.today_spent(uid)
             tasks = ctx.cost_tracker.today_tasks(uid)
+            week_spent, _ = ctx.cost_tracker.period_spent(7, uid)
             badge = "\U0001f451" if role == "admin" else "\U0001f464"
             email_str = f" \u00b7 {email}" if email else ""
             lines.append(
                 f"{badge} **{name}**{email_str}\n"
-                f"\u2003\u2003${spent:.2f}/${cap:.2f} today, {tasks} tasks"
+                f"\u2003\u2003${spent:.2f}/${cap:.2f} today, {tasks} tasks \u00b7 ${week_spent:.2f} last 7 days"
             )
         if pending:
             lines.append("\n**Pending invites** (not yet joined)")
@@ -165,7 +165,7 @@ async def handle_prompt(
     if cancel_view.cancelled:
         return await ctx.send(channel, "🛑 Request was cancelled.")
 
-    ctx.cost_tracker.add(result.total_cost_usd, user_id)
+    ctx.cost_tracker.add(result.total_cost_usd, user_id, workspace=ws_key)
     if result.exit_code != 0:
         error_detail = result.stderr.strip() or result.stdout.strip() or ""
         # Auto-reset session on context compaction crash so next message works
@@ -187,7 +187,7 @@ async def handle_prompt(
                 context_prefix=context_prefix,
                 on_progress=claude_progress,
             )
-            ctx.cost_tracker.add(result.total_cost_usd, user_id)
+            ctx.cost_tracker.add(result.total_cost_usd, user_id, workspace=ws_key)
             if result.exit_code != 0:
                 error_detail = result.stderr.strip() or result.stdout.strip() or "Unknown error"
                 return await ctx.send(
@@ -202,7 +202,11 @@ async def handle_prompt(
     # Show session usage (resume count + cost)
     resumes = ctx.claude.get_resume_count(ws_key)
     max_resumes = config.SESSION_MAX_RESUMES
-    if resumes > 0:
+    if resumes > 0 and config.ROTATION_POLICY != "resumes":
+        # Cost-based rotation has no fixed prompt limit to show progress against
+        cost_str = f" · ${result.total_cost_usd:.2f}" if result.total_cost_usd > 0 else ""
+        await ctx.send(channel, f"-# 🧠 Session: {resumes} prompts{cost_str}")
+    elif resumes > 0:
         pct = int(resumes / max_resumes * 100)
         bar_filled = min(pct // 10, 10)
         bar = "█" * bar_filled + "░" * (10 - bar_filled)
@@ -10,6 +10,7 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 import config
+from agent_factory import get_light_runner
 from commands import git_cmd
 from views.save_views import SaveConfirmView, SaveListView
 
@@ -44,13 +45,13 @@ async def handle_save(ctx: BotContext, cmd: Command, channel, user_id: int, is_a
                     # Custom message: save directly, no preview
                     loading = await channel.send("💾 Saving…")
                     save_result = await git_cmd.handle_save(
-                        ws_path, ws_key, claude=ctx.claude, custom_msg=cmd.raw_cmd)
+                        ws_path, ws_key, claude=get_light_runner(ctx.claude), custom_msg=cmd.raw_cmd)
                     await loading.delete()
                     await ctx.send(channel, save_result)
                 else:
                     # No message: preview with confirm/edit buttons
                     loading = await channel.send("💾 Saving…")
-                    result = await git_cmd.prepare_save(ws_path, ws_key, claude=ctx.claude)
+                    result = await git_cmd.prepare_save(ws_path, ws_key, claude=get_light_runner(ctx.claude))
                     await loading.delete()
                     if isinstance(result, str):
                         await ctx.send(channel, result)
@@ -93,7 +94,7 @@ async def handle_commit(ctx: BotContext, cmd: Command, channel, user_id: int, is
     ws_key, ws_path = await _admin_git(ctx, cmd, channel, user_id, is_admin)
     if ws_path:
         result = await git_cmd.handle_commit(
-            ws_path, ws_key, message=cmd.raw_cmd, claude=ctx.claude, auto_push=True)
+            ws_path, ws_key, message=cmd.raw_cmd, claude=get_light_runner(ctx.claude), auto_push=True)
         await ctx.send(channel, result)
 
 
@@ -126,7 +127,7 @@ async def handle_pr(ctx: BotContext, cmd: Command, channel, user_id: int, is_adm
     ws_key, ws_path = await _admin_git(ctx, cmd, channel, user_id, is_admin)
     if ws_path:
         await ctx.send(channel, await git_cmd.handle_pr(
-            ws_path, ws_key, title=cmd.raw_cmd, claude=ctx.claude))
+            ws_path, ws_key, title=cmd.raw_cmd, claude=get_light_runner(ctx.claude)))
 
 
 async def handle_repo(ctx: BotContext, cmd: Command, channel, user_id: int, is_admin: bool) -> None:
@@ -40,6 +40,16 @@ async def handle_spend(ctx: BotContext, cmd: Command, channel, user_id: int, is_
         for uid, spent, tasks in ctx.cost_tracker.user_summaries():
             name = ctx.allowlist.get_display_name(uid) or str(uid)
             lines.append(f"  {name}: ${spent:.4f} ({tasks} tasks)")
+        days = ctx.cost_tracker.spend(7)
+        if days:
+            lines.append("\n📅 **Last 7 days**")
+            for row in days:
+                lines.append(f"  {row['day']}: ${row['spent_usd']:.2f} ({row['tasks']} tasks)")
+        top = sorted(ctx.cost_tracker.spend(30, by="workspace"), key=lambda r: -r["spent_usd"])[:5]
+        if top:
+            lines.append("\n🏗️ **Top workspaces (30 days)**")
+            for row in top:
+                lines.append(f"  {row['workspace'] or '(none)'}: ${row['spent_usd']:.2f} ({row['tasks']} tasks)")
     await ctx.send(channel, "\n".join(lines))
 
 
@@ -28,9 +28,10 @@ async def handle_help(ctx: BotContext, cmd: Command, channel, user_id: int, is_a
 
 async def handle_ls(ctx: BotContext, cmd: Command, channel, user_id: int, is_admin: bool) -> None:
     user_email = ctx.allowlist.get_email(user_id) if not is_admin else None
-    keys = ctx.registry.list_keys(owner_id=None if is_admin else user_id, user_email=user_email)
-    # Filter out smoketests and inactive workspaces
-    keys = [k for k in keys if ctx.registry.is_active(k) and ctx.registry.get_category(k) != "smoketest"]
+    keys = ctx.registry.list_keys(owner_id=None if is_admin else user_id, user_email=user_email,
+                                  active_only=True)
+    # Filter out smoketests
+    keys = [k for k in keys if ctx.registry.get_category(k) != "smoketest"]
     if not keys:
         await ctx.send(channel, "No workspaces.")
         return
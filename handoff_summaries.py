@@ -0,0 +1,147 @@
+"""
+handoff_summaries.py — Keep handoff summaries current in the background.
+
+Session rotation needs a summary of the old session for the new one. It used
+to be generated inline: a full CLI run (up to 60s) in front of the user's
+prompt. Now ClaudeRunner calls schedule() after every successful run. Once the
+workspace has been idle for SUMMARY_IDLE_SECS, the worker refreshes that
+session's live summary from a *fork* of the session, so the user's
+conversation never sees the summary prompt. Rotation then only has to promote
+the live summary, which is instant.
+
+Summaries must never compete with user prompts:
+  * one worker, one summary at a time;
+  * a summary only starts when a Claude scheduler slot is free and nobody is
+    queued for one, and while its workspace has no active run;
+  * if a user prompt queues for a slot while a summary runs, the summary is
+    killed and retried later.
+
+The queue holds at most SUMMARY_QUEUE_SIZE workspaces (one entry each; the
+oldest is dropped when full). Live summaries and the resume count they cover
+persist in session_summaries/ and the session store. After a restart,
+ClaudeRunner re-schedules every session whose summary is behind.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import config
+import scheduler
+
+_PREEMPT_POLL_SECS = 0.5
+_BUSY_RETRY_SECS = 30
+
+# generate(workspace, workspace_path) -> True when the live summary was refreshed
+Generate = Callable[[str, str], Awaitable[bool]]
+
+
+class HandoffSummaryWorker:
+    def __init__(self, generate: Generate, is_busy: Callable[[str], bool],
+                 max_queue: Optional[int] = None, idle_secs: Optional[float] = None):
+        self._generate = generate
+        self._is_busy = is_busy
+        self._max_queue = max_queue if max_queue is not None else config.SUMMARY_QUEUE_SIZE
+        self._idle_secs = idle_secs if idle_secs is not None else config.SUMMARY_IDLE_SECS
+        # workspace → (workspace_path, not-before timestamp), oldest first
+        self._queue: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running: Optional[str] = None
+        self._metrics = {"scheduled": 0, "generated": 0, "failed": 0, "preempted": 0, "dropped": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_queue > 0
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    def schedule(self, workspace: str, workspace_path: str) -> None:
+        """Refresh this workspace's summary once it has been idle a while."""
+        if not self.enabled:
+            return
+        self._ensure_started()
+        self._queue.pop(workspace, None)
+        self._queue[workspace] = (workspace_path, time.time() + self._idle_secs)
+        self._metrics["scheduled"] += 1
+        while len(self._queue) > self._max_queue:
+            dropped, _ = self._queue.popitem(last=False)
+            self._metrics["dropped"] += 1
+            print(f"[handoff] Queue full — dropped summary refresh for {dropped}")
+        self._wakeup.set()
+
+    def cancel(self, workspace: str) -> None:
+        self._queue.pop(workspace, None)
+
+    # ── Worker ───────────────────────────────────────────────────────────
+
+    def _next_due(self) -> tuple[Optional[str], float]:
+        """Earliest-due workspace and how long until it is due."""
+        if not self._queue:
+            return None, 3600.0
+        ws, (_, due) = min(self._queue.items(), key=lambda kv: kv[1][1])
+        return ws, max(0.0, due - time.time())
+
+    def _defer(self, workspace: str, secs: float) -> None:
+        entry = self._queue.get(workspace)
+        if entry:
+            self._queue[workspace] = (entry[0], time.time() + secs)
+
+    async def _run(self) -> None:
+        sched = scheduler.get_scheduler()
+        while True:
+            ws, wait = self._next_due()
+            if wait > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            if self._is_busy(ws) or not sched.has_capacity("claude"):
+                self._defer(ws, _BUSY_RETRY_SECS)
+                continue
+            path, _ = self._queue.pop(ws)
+            await self._generate_preemptible(sched, ws, path)
+
+    async def _generate_preemptible(self, sched: scheduler.Scheduler, ws: str, path: str) -> None:
+        self._running = ws
+        scheduler.bind(account="system:handoff", job_id=f"handoff:{ws}", priority=scheduler.PRIORITY_LOW)
+        task = asyncio.ensure_future(self._generate_in_slot(sched, ws, path))
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=_PREEMPT_POLL_SECS)
+                if task.done() or task.cancelling():
+                    continue
+                if sched.has_waiters("claude") or self._is_busy(ws):
+                    task.cancel()
+                    self._metrics["preempted"] += 1
+                    print(f"[handoff] Yielding to a user prompt — summary for {ws} retried later")
+                    if ws not in self._queue:
+                        self._queue[ws] = (path, time.time() + self._idle_secs)
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                print(f"[handoff] Summary for {ws} failed: {task.exception()}")
+            ok = task.exception() is None and task.result()
+            self._metrics["generated" if ok else "failed"] += 1
+        finally:
+            self._running = None
+
+    async def _generate_in_slot(self, sched: scheduler.Scheduler, ws: str, path: str) -> bool:
+        async with sched.slot("claude"):
+            return await self._generate(ws, path)
+
+    def metrics(self) -> dict:
+        return {**self._metrics, "queued": len(self._queue), "running": self._running}
@@ -6,9 +6,11 @@ through ctx.send() instead of a module-level send().
 """
 
 import asyncio
+import shutil
 
 import config
-from agent_loop import run_agent_loop, format_loop_summary
+import eta_model
+from agent_loop import run_agent_loop, format_loop_summary, merge_build_errors
 from bot_context import STILL_LISTENING
 from commands import fixes_cmd
 from helpers.budget import BudgetTracker
@@ -17,6 +19,7 @@ from platforms import (
     AndroidPlatform,
     iOSPlatform,
     WebPlatform,
+    build_platform,
     demo_platform,
 )
 from helpers.web_screenshot import take_web_screenshot
@@ -25,7 +28,8 @@ from helpers.error_reporter import report_error_and_fix
 
 async def run_demo_all(ctx, channel, ws_key: str, ws_path: str,
                        budget: BudgetTracker = None):
-    """Run web first (deliver link immediately), then iOS + Android in parallel."""
+    """Build every platform in parallel and fix shared failures in one loop,
+    then run web first (deliver link immediately), then iOS + Android in parallel."""
     if budget is None:
         budget = BudgetTracker(
             max_cost_usd=config.MAX_FIX_BUDGET_USD,
@@ -35,6 +39,39 @@ async def run_demo_all(ctx, channel, ws_key: str, ws_path: str,
     await ctx.send(channel, f"📱 Demoing **{ws_key}** [all platforms]...")
     await ctx.send(channel, STILL_LISTENING)
 
+    # --- Phase 0: Build all targets at once; one combined fix loop for failures ---
+    # The per-platform demos below then hit the build cache instead of each
+    # running its own fix loop against the same shared-code errors.
+    platforms = ["web", "android"]
+    if shutil.which(config.XCODEBUILD):
+        platforms.append("ios")
+    results = await asyncio.gather(*(build_platform(p, ws_path) for p in platforms))
+    errors = {
+        p: r.error or r.output[-800:]
+        for p, r in zip(platforms, results) if not r.success
+    }
+    if errors:
+        failed = ", ".join(p.upper() for p in errors)
+        progress = ProgressMessage(ctx, channel, title=f"Cross-platform Fix — {ws_key}")
+        await progress.update(f"⚠️ {failed} build failed — auto-fixing together...")
+        fix_result = await run_agent_loop(
+            initial_prompt=(
+                f"The {', '.join(errors)} builds failed. Fix the code so every target compiles.\n"
+                "Errors under a combined heading come from shared code — fix those first.\n"
+                "Only modify what's necessary.\n\n"
+                f"```\n{merge_build_errors(errors)[:1500]}\n```"
+            ),
+            workspace_key=ws_key,
+            workspace_path=ws_path,
+            claude=ctx.claude,
+            platform=",".join(errors),
+            max_attempts=config.MAX_BUILD_ATTEMPTS,
+            on_status=progress.status_callback,
+            budget=budget,
+        )
+        await progress.close()
+        await ctx.send(channel, format_loop_summary(fix_result))
+
     # --- Phase 1: Web builds first, deliver link immediately ---
     await run_demo(ctx, channel, ws_key, ws_path, "web", budget=budget)
 
@@ -79,8 +116,10 @@ async def run_demo(ctx, channel, ws_key: str, ws_path: str, platform: str,
         if not ok:
             await ctx.send(channel, f"❌ {sim_msg}")
         else:
+            progress.expect(eta_model.get_model().estimate("build", platform="ios", kind=""))
             await progress.update(f"{sim_msg} Building KMP framework + Xcode project...")
-            build_result = await iOSPlatform.build(ws_path)
+            build_result = await build_platform("ios", ws_path)
+            progress.expect(None)
 
             # Auto-fix: if build fails, use agent loop (same as /buildapp iOS)
             if not build_result.success:
@@ -204,8 +243,10 @@ async def run_demo(ctx, channel, ws_key: str, ws_path: str, platform: str,
         if not ok:
             await ctx.send(channel, f"❌ {dev_msg}")
         else:
+            progress.expect(eta_model.get_model().estimate("build", platform="android", kind=""))
             await progress.update(f"{dev_msg} Building Android APK...")
-            build_result = await AndroidPlatform.build(ws_path)
+            build_result = await build_platform("android", ws_path)
+            progress.expect(None)
 
             # Auto-fix: if build fails, use agent loop
             if not build_result.success:
@@ -331,8 +372,10 @@ async def run_demo(ctx, channel, ws_key: str, ws_path: str, platform: str,
 
     elif platform == "web":
         progress = ProgressMessage(ctx, channel, title=f"Web Demo — {ws_key}")
+        progress.expect(eta_model.get_model().estimate("build", platform="web", kind=""))
         await progress.update("Building web app...")
-        build_result = await WebPlatform.build(ws_path)
+        build_result = await build_platform("web", ws_path)
+        progress.expect(None)
 
         # Auto-fix: if build fails, use agent loop
         if not build_result.success:
@@ -409,7 +452,7 @@ async def run_demo(ctx, channel, ws_key: str, ws_path: str, platform: str,
                             break
 
                         # Rebuild + re-serve + re-check
-                        rebuild = await WebPlatform.build(ws_path)
+                        rebuild = await build_platform("web", ws_path)
                         if not rebuild.success:
                             await ctx.send(channel, f"❌ Rebuild failed:\n```\n{rebuild.error[:800]}\n```")
                             break
@@ -16,7 +16,7 @@ from typing import Optional
 import aiohttp
 
 import config
-from supabase_client import query_sql, run_sql
+from supabase_client import query_many, run_sql_many
 from handlers.data_commands import parse_tables_from_schema
 
 
@@ -190,11 +190,10 @@ def _extract_text(document: dict) -> str:
 
 async def fetch_current_state(schema: str, tables: dict) -> dict[str, list[dict]]:
     """Query all syncable tables from Supabase. Returns {table_name: [rows]}."""
+    names = list(tables)
+    results = await query_many([f'SELECT * FROM "{t}";' for t in names], schema=schema)
     current: dict[str, list[dict]] = {}
-    for table_name in tables:
-        ok, result = await query_sql(
-            f'SELECT * FROM "{table_name}";', schema=schema
-        )
+    for table_name, (ok, result) in zip(names, results):
         if ok and isinstance(result, list):
             current[table_name] = result
         else:
@@ -381,24 +380,17 @@ async def execute_sync(
     table_order = _parse_fk_order(schema_sql, tables)
     results: list[str] = []
     all_ok = True
+    ops: list[tuple[str, str]] = []  # (label for errors, statement), in execution order
 
     # Inserts and updates in FK dependency order (parents first)
     for table_name in table_order:
         diff = next((d for d in plan.diffs if d.table == table_name), None)
         if not diff:
             continue
-
         for row in diff.inserts:
-            ok, err = await _upsert_row(table_name, row, schema)
-            if not ok:
-                results.append(f"Insert {table_name}: {err}")
-                all_ok = False
-
+            ops.append((f"Insert {table_name}", _upsert_sql(table_name, row)))
         for change in diff.updates:
-            ok, err = await _upsert_row(table_name, change["new"], schema)
-            if not ok:
-                results.append(f"Update {table_name}: {err}")
-                all_ok = False
+            ops.append((f"Update {table_name}", _upsert_sql(table_name, change["new"])))
 
     # Deletes in reverse FK order (children first)
     for table_name in reversed(table_order):
@@ -410,13 +402,15 @@ async def execute_sync(
             if row_id is None:
                 continue
             escaped_id = str(row_id).replace("'", "''")
-            ok, err = await run_sql(
-                f"""DELETE FROM "{table_name}" WHERE id = '{escaped_id}';""",
-                schema=schema,
-            )
-            if not ok:
-                results.append(f"Delete {table_name} id={row_id}: {err}")
-                all_ok = False
+            ops.append((f"Delete {table_name} id={row_id}",
+                        f"""DELETE FROM "{table_name}" WHERE id = '{escaped_id}';"""))
+
+    # Upserts and keyed deletes are safe to re-run, so they can share requests
+    outcomes = await run_sql_many([sql for _, sql in ops], schema=schema)
+    for (label, _), (ok, err) in zip(ops, outcomes):
+        if not ok:
+            results.append(f"{label}: {err}")
+            all_ok = False
 
     if not results:
         return True, "All changes applied successfully."
@@ -427,7 +421,7 @@ async def execute_sync(
     return False, "Some operations failed:\n" + "\n".join(results)
 
 
-async def _upsert_row(table: str, row: dict, schema: str) -> tuple[bool, str]:
+def _upsert_sql(table: str, row: dict) -> str:
     """INSERT ... ON CONFLICT (id) DO UPDATE for a single row."""
     cols: list[str] = []
     vals: list[str] = []
@@ -456,17 +450,14 @@ async def _upsert_row(table: str, row: dict, schema: str) -> tuple[bool, str]:
     update_set = ", ".join(update_parts)
 
     if update_set:
-        sql = (
+        return (
             f'INSERT INTO "{table}" ({col_list}) VALUES ({val_list}) '
             f"ON CONFLICT (id) DO UPDATE SET {update_set};"
         )
-    else:
-        sql = (
-            f'INSERT INTO "{table}" ({col_list}) VALUES ({val_list}) '
-            f"ON CONFLICT (id) DO NOTHING;"
-        )
-
-    return await run_sql(sql, schema=schema)
+    return (
+        f'INSERT INTO "{table}" ({col_list}) VALUES ({val_list}) '
+        f"ON CONFLICT (id) DO NOTHING;"
+    )
 
 
 # ── Top-level orchestrator ────────────────────────────────────────────────────
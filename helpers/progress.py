@@ -9,6 +9,9 @@ from __future__ import annotations
 
 import logging
 import time
+from typing import Optional
+
+from eta_model import Estimate, format_remaining
 
 log = logging.getLogger(__name__)
 
@@ -32,7 +35,9 @@ class ProgressMessage:
 
         progress = ProgressMessage(ctx, channel, title="Building iOS")
         await progress.update("Booting simulator...")
-        await progress.update("Compiling...")
+        progress.expect(eta_model.get_model().estimate("build", platform="ios"))
+        await progress.update("Compiling...")   # title shows "~3m 10s left"
+        progress.expect(None)
         await progress.close()  # optional: remove spinner feel
     """
 
@@ -44,12 +49,22 @@ class ProgressMessage:
         self._history: list[str] = []
         self._closed = False
         self._start_time = time.monotonic()
+        self._eta: Optional[Estimate] = None
+        self._eta_start = 0.0
+
+    def expect(self, estimate: Optional[Estimate]) -> None:
+        """Show time left for the step that starts now (None clears it)."""
+        self._eta = estimate
+        self._eta_start = time.monotonic()
 
     def _render(self) -> str:
         """Build the message content from title + rolling history."""
         lines: list[str] = []
         if self._title:
-            lines.append(f"**{self._title}**")
+            title = f"**{self._title}**"
+            if self._eta is not None:
+                title += f" · {format_remaining(self._eta.remaining(time.monotonic() - self._eta_start))}"
+            lines.append(title)
         for entry in self._history:
             lines.append(entry)
         return "\n".join(lines) or "⏳ Starting..."
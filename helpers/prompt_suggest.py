@@ -1,8 +1,9 @@
 """
 helpers/prompt_suggest.py — Suggest an improved prompt before sending to Claude.
 
-Uses a fast/cheap Claude Haiku call to rewrite vague user prompts into
-specific, actionable instructions for the app-building agent.
+Uses a fast/cheap model call to rewrite vague user prompts into specific,
+actionable instructions for the app-building agent. Goes through llm_router
+when any provider is configured, otherwise straight to Claude Haiku.
 """
 
 from __future__ import annotations
@@ -12,6 +13,7 @@ import os
 import httpx
 
 import config
+import llm_router
 
 ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
 
@@ -36,6 +38,12 @@ async def suggest(raw_prompt: str) -> str | None:
     (missing API key, network error, etc.) so the caller can fall back
     to the original.
     """
+    if llm_router.available():
+        res = await llm_router.complete(raw_prompt, system=_SYSTEM_PROMPT, max_tokens=300, timeout=15)
+        if res.error:
+            print(f"[prompt_suggest] Failed: {res.error}")
+        return res.text or None
+
     if not ANTHROPIC_API_KEY:
         return None
 
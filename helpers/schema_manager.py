@@ -4,12 +4,11 @@ helpers/schema_manager.py — Per-app Postgres schema isolation within a single
 Each app gets its own schema so tables, functions, and policies don't collide.
 """
 
+import json
 import re
 
-import aiohttp
-
 import config
-from supabase_client import run_sql, query_sql
+from supabase_client import get_client, query_many, query_sql, run_sql
 
 
 def schema_name_for_workspace(ws_key: str) -> str:
@@ -59,47 +58,43 @@ async def _expose_schema(schema_name: str) -> tuple[bool, str]:
     if not config.SUPABASE_PROJECT_REF or not config.SUPABASE_MANAGEMENT_KEY:
         return False, "SUPABASE_PROJECT_REF or SUPABASE_MANAGEMENT_KEY not set"
 
-    base = f"https://api.supabase.com/v1/projects/{config.SUPABASE_PROJECT_REF}"
-    headers = {
-        "Authorization": f"Bearer {config.SUPABASE_MANAGEMENT_KEY}",
-        "Content-Type": "application/json",
-    }
+    path = f"/projects/{config.SUPABASE_PROJECT_REF}/postgrest"
+    client = get_client()
 
     try:
-        async with aiohttp.ClientSession() as session:
-            # GET current PostgREST config
-            async with session.get(f"{base}/postgrest", headers=headers) as resp:
-                if resp.status != 200:
-                    return False, f"GET config failed: HTTP {resp.status}"
-                cfg = await resp.json()
-
-            # Check both db_schema (exposed) and db_extra_search_path
-            db_schema = cfg.get("db_schema", "public")
-            extra_path = cfg.get("db_extra_search_path", "public")
-            db_schemas = [s.strip() for s in db_schema.split(",") if s.strip()]
-            extra_schemas = [s.strip() for s in extra_path.split(",") if s.strip()]
-
-            if schema_name in db_schemas and schema_name in extra_schemas:
-                return True, ""  # Already exposed
-
-            if schema_name not in db_schemas:
-                db_schemas.append(schema_name)
-            if schema_name not in extra_schemas:
-                extra_schemas.append(schema_name)
-
-            # PATCH to expose the schema
-            async with session.patch(
-                f"{base}/postgrest",
-                headers=headers,
-                json={
-                    "db_schema": ", ".join(db_schemas),
-                    "db_extra_search_path": ", ".join(extra_schemas),
-                },
-            ) as resp:
-                if resp.status in (200, 201, 204):
-                    return True, ""
-                text = await resp.text()
-                return False, f"PATCH config failed: HTTP {resp.status} {text[:200]}"
+        # GET current PostgREST config
+        status, text = await client.request("GET", path, name="supabase.postgrest")
+        if status != 200:
+            return False, f"GET config failed: HTTP {status}"
+        cfg = json.loads(text)
+
+        # Check both db_schema (exposed) and db_extra_search_path
+        db_schema = cfg.get("db_schema", "public")
+        extra_path = cfg.get("db_extra_search_path", "public")
+        db_schemas = [s.strip() for s in db_schema.split(",") if s.strip()]
+        extra_schemas = [s.strip() for s in extra_path.split(",") if s.strip()]
+
+        if schema_name in db_schemas and schema_name in extra_schemas:
+            return True, ""  # Already exposed
+
+        if schema_name not in db_schemas:
+            db_schemas.append(schema_name)
+        if schema_name not in extra_schemas:
+            extra_schemas.append(schema_name)
+
+        # PATCH to expose the schema
+        status, text = await client.request(
+            "PATCH",
+            path,
+            {
+                "db_schema": ", ".join(db_schemas),
+                "db_extra_search_path": ", ".join(extra_schemas),
+            },
+            name="supabase.postgrest",
+        )
+        if status in (200, 201, 204):
+            return True, ""
+        return False, f"PATCH config failed: HTTP {status} {text[:200]}"
     except Exception as e:
         return False, str(e)
 
@@ -128,9 +123,8 @@ async def get_all_app_meta() -> list[dict]:
     """
     schemas = await list_schemas()
     results = []
-    for s in schemas:
-        sql = f"SELECT * FROM {s}.app_meta LIMIT 1;"
-        ok, data = await query_sql(sql)
+    replies = await query_many([f"SELECT * FROM {s}.app_meta LIMIT 1;" for s in schemas])
+    for s, (ok, data) in zip(schemas, replies):
         if not ok or not data:
             continue
         rows = data[0] if isinstance(data[0], list) else data
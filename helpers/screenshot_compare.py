@@ -13,6 +13,7 @@ import tempfile
 from pathlib import Path
 
 import config
+import scheduler
 
 
 async def take_app_screenshot(
@@ -39,7 +40,7 @@ async def take_app_screenshot(
     screenshot_path = Path(tempfile.gettempdir()) / "app_screenshot.png"
 
     try:
-        async with async_playwright() as p:
+        async with scheduler.slot("playwright"), async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
             page = await browser.new_page(viewport={"width": 390, "height": 844})
             await page.goto(url, wait_until="networkidle", timeout=30_000)
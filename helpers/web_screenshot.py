@@ -8,6 +8,8 @@ import asyncio
 import tempfile
 from pathlib import Path
 
+import scheduler
+
 
 async def take_web_screenshot(url: str, wait_ms: int = 3000) -> str | None:
     """Take a screenshot of *url* and return the file path, or None on failure.
@@ -23,7 +25,7 @@ async def take_web_screenshot(url: str, wait_ms: int = 3000) -> str | None:
     screenshot_path = Path(tempfile.gettempdir()) / "web_preview.png"
 
     try:
-        async with async_playwright() as p:
+        async with scheduler.slot("playwright"), async_playwright() as p:
             browser = await p.chromium.launch(headless=True)
             page = await browser.new_page(viewport={"width": 390, "height": 844})
             await page.goto(url, wait_until="networkidle", timeout=30000)
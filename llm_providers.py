@@ -24,6 +24,8 @@ from typing import Any
 
 import httpx
 
+import telemetry
+
 
 # ── Base ─────────────────────────────────────────────────────────────────────
 
@@ -262,12 +264,14 @@ async def extract_json(
         f"Document:\n\n{text}\n\n"
         "Respond with a single JSON object. No prose. No markdown fences."
     )
-    res = await prov.query(
-        model=model or prov.default_model,
-        messages=[{"role": "system", "content": sys}, {"role": "user", "content": user}],
-        temperature=temperature,
-        timeout=timeout,
-    )
+    with telemetry.span("external_api", f"llm.{prov.name}", model=model or prov.default_model) as span:
+        res = await prov.query(
+            model=model or prov.default_model,
+            messages=[{"role": "system", "content": sys}, {"role": "user", "content": user}],
+            temperature=temperature,
+            timeout=timeout,
+        )
+        span.ok = not res.get("error")
     if res.get("error"):
         return {"error": True, "error_message": res["error_message"], "provider": prov.name}
     raw = res["content"].strip()
@@ -0,0 +1,285 @@
+"""
+llm_router.py — Spread short one-shot LLM sub-tasks across API providers.
+
+Save descriptions, PR titles and prompt suggestions don't need a Claude Code
+session, workspace tools or the workspace's conversation. Sending them
+through ClaudeRunner spends a CLI slot and a session turn on a 60-character
+answer. The router sends them to whichever configured API provider
+(llm_providers.py) is currently the best choice:
+
+    score = expected latency × (1 + in-flight / limit) + expected cost × LLM_ROUTER_COST_WEIGHT
+
+Expected latency is an EWMA of that provider's recent calls. Expected cost
+comes from a per-provider price table and the prompt size. Each provider has
+its own concurrency limit (LLM_ROUTER_MAX_CONCURRENCY). A call that errors or
+runs past LLM_ROUTER_TIMEOUT_SECS fails over to the next provider. After
+_TRIP_AFTER failures in a row a provider sits out LLM_ROUTER_COOLDOWN_SECS.
+
+Providers come from LLM_ROUTER_PROVIDERS ("provider" or "provider:model",
+in tie-break order). Each needs its key in <PROVIDER>_API_KEY (e.g.
+OPENAI_API_KEY); providers without a key are skipped.
+
+RoutingRunner implements AgentRunner, so callers that take a runner can be
+handed one. The router is opt-in (LLM_ROUTER_ENABLED=1): a routed call has
+none of the workspace session's context, so it can only describe what the
+prompt itself shows. agent_factory.get_light_runner() picks it when the
+router is enabled and any provider is configured:
+
+    runner = get_light_runner(ctx.claude)
+    result = await runner.run(prompt, ws_key, ws_path)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import config
+import llm_providers
+import telemetry
+from agent_protocol import AgentRunResult, ProgressCallback
+
+# USD per 1M (input, output) tokens for each provider's default model
+_PRICES = {
+    "anthropic": (1.00, 5.00),
+    "openai": (0.15, 0.60),
+    "google": (0.30, 2.50),
+    "groq": (0.59, 0.79),
+    "deepseek": (0.27, 1.10),
+    "mistral": (0.10, 0.30),
+    "openrouter": (0.80, 4.00),
+}
+_CHARS_PER_TOKEN = 4
+_PRIOR_LATENCY = 2.0  # seconds, until a provider has answered once
+_EWMA_ALPHA = 0.3
+_TRIP_AFTER = 2       # consecutive failures before a cooldown
+
+
+@dataclass
+class Target:
+    provider: str
+    model: str
+    client: llm_providers.LLMProvider
+    price_in: float = 0.0   # USD per 1M input tokens
+    price_out: float = 0.0  # USD per 1M output tokens
+    limit: int = 4
+    latency: float = _PRIOR_LATENCY
+    inflight: int = 0
+    failures: int = 0
+    open_until: float = 0.0
+    calls: int = 0
+    errors: int = 0
+    cost_usd: float = 0.0
+    _sem: Optional[asyncio.Semaphore] = field(default=None, repr=False)
+
+    @property
+    def sem(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+        return self._sem
+
+    def cost(self, chars_in: int, chars_out: int) -> float:
+        return (chars_in * self.price_in + chars_out * self.price_out) / _CHARS_PER_TOKEN / 1e6
+
+    def score(self, chars_in: int, max_tokens: int) -> float:
+        queueing = 1 + self.inflight / max(1, self.limit)
+        # Assume a quarter of max_tokens comes back; only the ordering matters
+        expected_cost = self.cost(chars_in, max_tokens * _CHARS_PER_TOKEN // 4)
+        return self.latency * queueing + expected_cost * config.LLM_ROUTER_COST_WEIGHT
+
+
+@dataclass
+class RouteResult:
+    text: str = ""
+    provider: str = ""
+    model: str = ""
+    cost_usd: float = 0.0
+    latency: float = 0.0
+    attempts: int = 0
+    error: str = ""
+
+
+class LLMRouter:
+    def __init__(self, targets: list[Target]):
+        self.targets = targets
+        self._metrics = {"requests": 0, "failovers": 0, "exhausted": 0, "cooldowns": 0}
+
+    def _pick(self, chars_in: int, max_tokens: int, tried: set[int]) -> Optional[Target]:
+        now = time.time()
+        untried = [t for i, t in enumerate(self.targets) if i not in tried]
+        candidates = [t for t in untried if now >= t.open_until]
+        if not candidates and not tried and untried:
+            # Everything is cooling down: probe the one that has rested longest
+            candidates = [min(untried, key=lambda t: t.open_until)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda t: t.score(chars_in, max_tokens))
+
+    def _observe(self, target: Target, latency: float, ok: bool) -> None:
+        target.calls += 1
+        target.latency += _EWMA_ALPHA * (latency - target.latency)
+        if ok:
+            target.failures = 0
+            return
+        target.errors += 1
+        target.failures += 1
+        if target.failures >= _TRIP_AFTER:
+            target.open_until = time.time() + config.LLM_ROUTER_COOLDOWN_SECS
+            self._metrics["cooldowns"] += 1
+            print(f"[llm-router] {target.provider} failed {target.failures}x, "
+                  f"cooling down {config.LLM_ROUTER_COOLDOWN_SECS:.0f}s")
+
+    async def complete(self, prompt: str, system: str = "", max_tokens: int = 1024,
+                       temperature: float = 0.2, timeout: Optional[float] = None) -> RouteResult:
+        """Answer one prompt, failing over across providers; error is set if all fail."""
+        self._metrics["requests"] += 1
+        timeout = min(timeout or config.LLM_ROUTER_TIMEOUT_SECS, config.LLM_ROUTER_TIMEOUT_SECS)
+        messages = ([{"role": "system", "content": system}] if system else []) + \
+            [{"role": "user", "content": prompt}]
+        chars_in = len(system) + len(prompt)
+        tried: set[int] = set()
+        errors: list[str] = []
+        while True:
+            target = self._pick(chars_in, max_tokens, tried)
+            if target is None:
+                break
+            if tried:
+                self._metrics["failovers"] += 1
+            tried.add(self.targets.index(target))
+            target.inflight += 1
+            start = time.monotonic()
+            try:
+                async with target.sem:
+                    start = time.monotonic()
+                    res = await asyncio.wait_for(
+                        target.client.query(target.model, messages, temperature=temperature,
+                                            timeout=timeout, max_tokens=max_tokens),
+                        timeout=timeout,
+                    )
+            except asyncio.TimeoutError:
+                res = {"error": True, "error_message": f"no answer within {timeout:.0f}s"}
+            finally:
+                target.inflight -= 1
+            latency = time.monotonic() - start
+            text = (res.get("content") or "").strip() if not res.get("error") else ""
+            ok = bool(text)
+            cost = target.cost(chars_in, len(text)) if ok else 0.0
+            self._observe(target, latency, ok)
+            telemetry.record("external_api", f"llm.{target.provider}", latency, cost_usd=cost, ok=ok,
+                             model=target.model, routed=True)
+            if ok:
+                target.cost_usd += cost
+                return RouteResult(text, target.provider, target.model, cost, latency, len(tried))
+            errors.append(f"{target.provider}: {(res.get('error_message') or 'empty reply')[:200]}")
+        self._metrics["exhausted"] += 1
+        return RouteResult(attempts=len(tried), error="; ".join(errors) or "No LLM provider configured")
+
+    def metrics(self) -> dict:
+        now = time.time()
+        return {
+            **self._metrics,
+            "providers": {
+                t.provider: {
+                    "model": t.model,
+                    "calls": t.calls,
+                    "errors": t.errors,
+                    "inflight": t.inflight,
+                    "latency_ewma_secs": round(t.latency, 2),
+                    "cost_usd": round(t.cost_usd, 6),
+                    "cooling_down": now < t.open_until,
+                }
+                for t in self.targets
+            },
+        }
+
+
+class RoutingRunner:
+    """AgentRunner over LLMRouter: stateless, no workspace tools, context_prefix becomes the system prompt."""
+
+    def __init__(self, router: LLMRouter):
+        self._router = router
+        self._active: dict[str, set[asyncio.Task]] = {}
+
+    async def run(
+        self,
+        prompt: str,
+        workspace_key: str,
+        workspace_path: str,
+        context_prefix: str = "",
+        on_progress: ProgressCallback = None,
+    ) -> AgentRunResult:
+        task = asyncio.ensure_future(self._router.complete(prompt, system=context_prefix))
+        self._active.setdefault(workspace_key, set()).add(task)
+        try:
+            res = await task
+        except asyncio.CancelledError:
+            if asyncio.current_task().cancelling():
+                raise
+            return AgentRunResult(stdout="", stderr="Cancelled", exit_code=-1)
+        finally:
+            self._active.get(workspace_key, set()).discard(task)
+        if res.error:
+            return AgentRunResult(stdout="", stderr=res.error, exit_code=1)
+        return AgentRunResult(stdout=res.text, stderr="", exit_code=0, total_cost_usd=res.cost_usd)
+
+    def cancel(self, workspace: str) -> bool:
+        tasks = [t for t in self._active.pop(workspace, set()) if not t.done()]
+        for t in tasks:
+            t.cancel()
+        return bool(tasks)
+
+    def clear_session(self, workspace: str) -> None:
+        pass
+
+    def get_resume_count(self, workspace: str) -> int:
+        return 0
+
+    def get_session(self, workspace: str) -> Optional[str]:
+        return None
+
+
+def _targets_from_config() -> list[Target]:
+    targets = []
+    for entry in config.LLM_ROUTER_PROVIDERS.split(","):
+        provider, _, model = entry.strip().partition(":")
+        provider = provider.strip().lower()
+        if not provider:
+            continue
+        api_key = os.getenv(f"{provider.upper()}_API_KEY", "")
+        if not api_key:
+            continue
+        try:
+            client = llm_providers.get_provider(api_key, provider)
+        except ValueError as e:
+            print(f"[llm-router] Skipping {provider}: {e}")
+            continue
+        price_in, price_out = _PRICES.get(provider, (0.0, 0.0))
+        targets.append(Target(provider, model.strip() or client.default_model, client,
+                              price_in, price_out, config.LLM_ROUTER_MAX_CONCURRENCY))
+    return targets
+
+
+_router: Optional[LLMRouter] = None
+
+
+def get_router() -> LLMRouter:
+    global _router
+    if _router is None:
+        _router = LLMRouter(_targets_from_config() if config.LLM_ROUTER_ENABLED else [])
+    return _router
+
+
+def available() -> bool:
+    return bool(get_router().targets)
+
+
+async def complete(prompt: str, system: str = "", max_tokens: int = 1024,
+                   timeout: Optional[float] = None) -> RouteResult:
+    return await get_router().complete(prompt, system=system, max_tokens=max_tokens, timeout=timeout)
+
+
+def metrics() -> dict:
+    return get_router().metrics()
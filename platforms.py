@@ -16,11 +16,17 @@ import os
 import re
 import signal
 import tempfile
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
+import build_errors
 import config
+import eta_model
+import proc_io
+import scheduler
+import telemetry
 
 
 @dataclass
@@ -28,6 +34,7 @@ class BuildResult:
     success: bool
     output: str
     error: str = ""
+    aborted_early: bool = False  # stopped once enough errors were known (see build_errors)
 
 
 @dataclass
@@ -39,38 +46,68 @@ class DemoResult:
     demo_url: Optional[str] = None
 
 
+# Optional async progress callback for long multi-step operations (demos)
+StatusCallback = Optional[Callable[[str], Awaitable[None]]]
+
+
+async def _notify(on_status: StatusCallback, msg: str) -> None:
+    if on_status:
+        await on_status(msg)
+
+
 # ── Shared helpers ───────────────────────────────────────────────────────────
 
 async def _run(cmd: list[str], cwd: str = None, timeout: int = 60) -> tuple[int, str, str]:
-    proc = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        cwd=cwd,
-    )
-    try:
-        out, err = await asyncio.wait_for(proc.communicate(), timeout=timeout)
-    except asyncio.TimeoutError:
-        proc.kill()
-        return -1, "", "Timed out"
-    return proc.returncode, out.decode(errors="replace"), err.decode(errors="replace")
+    # Short adb/simctl/devicectl commands whose output is parsed whole
+    res = await proc_io.run(cmd, cwd=cwd, timeout=timeout, bounded=False)
+    return res.returncode, res.stdout, res.stderr
+
+
+# workspace → (loop, lock): one ./gradlew per project at a time in this process
+_gradle_locks: dict[str, tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = {}
+
+
+def _gradle_lock(workspace_path: str) -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    key = str(Path(workspace_path).resolve())
+    entry = _gradle_locks.get(key)
+    if entry is None or entry[0] is not loop:
+        entry = _gradle_locks[key] = (loop, asyncio.Lock())
+    return entry[1]
+
+
+async def _gradle(workspace_path: str, *tasks: str, timeout: int = 300,
+                  platform: str = None) -> proc_io.ProcResult:
+    """Run ./gradlew through the scheduler and the shared daemon pool (bounded, warm, workspace-affine).
+    Output is spooled to a log file; the result keeps its head/tail and error excerpt.
+    With a platform, errors are detected as they stream and may stop the build early.
+
+    Gradle invocations in one workspace are serialized before they take a
+    scheduler slot or a daemon: two builds of the same project would only
+    wait on each other's project locks (and could time out on them) while
+    holding both. xcodebuild runs outside this lock, so platforms built
+    together still overlap iOS's Xcode phase with the next Gradle build."""
+    import gradle_pool
+    detector = build_errors.ErrorDetector(platform) if platform else None
+    async with _gradle_lock(workspace_path), scheduler.slot("gradle"), \
+            gradle_pool.lease(workspace_path) as slot:
+        res = await proc_io.run(slot.command(*tasks), cwd=workspace_path, timeout=timeout,
+                                label=f"gradle-{Path(workspace_path).name}", detector=detector)
+        slot.observe(res.output)
+    return res
+
+
+async def _xcodebuild(args: list[str], cwd: str = None, timeout: int = 300,
+                      platform: str = None) -> proc_io.ProcResult:
+    """Run xcodebuild once a scheduler slot is free."""
+    detector = build_errors.ErrorDetector(platform) if platform else None
+    async with scheduler.slot("xcodebuild"):
+        return await proc_io.run([config.XCODEBUILD, *args], cwd=cwd, timeout=timeout,
+                                 label=f"xcodebuild-{Path(cwd or '.').resolve().name}", detector=detector)
 
 
 def extract_build_error(raw_output: str, max_lines: int = 60) -> str:
-    lines = raw_output.splitlines()
-    # Gradle errors
-    for i, line in enumerate(lines):
-        if "FAILURE:" in line or "BUILD FAILED" in line:
-            return "\n".join(lines[i:i + max_lines])
-    # Xcode errors
-    for i, line in enumerate(lines):
-        if "error:" in line.lower() or "** BUILD FAILED **" in line:
-            return "\n".join(lines[max(0, i - 5):i + max_lines])
-    # Compiler errors
-    error_lines = [l for l in lines if l.strip().startswith("e:") or "error:" in l.lower()]
-    if error_lines:
-        return "\n".join(error_lines[:max_lines])
-    return "\n".join(lines[-max_lines:])
+    return proc_io.scan_lines(raw_output.splitlines(), max_lines)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -104,26 +141,18 @@ class AndroidPlatform:
     @staticmethod
     async def build(workspace_path: str) -> BuildResult:
         """Compile only — no device needed."""
-        rc, out, err = await _run(
-            ["./gradlew", "composeApp:assembleDebug"],
-            cwd=workspace_path, timeout=300,
-        )
-        raw = out + err
-        if rc == 0:
-            return BuildResult(success=True, output=raw)
-        return BuildResult(success=False, output=raw, error=extract_build_error(raw))
+        res = await _gradle(workspace_path, "composeApp:assembleDebug", timeout=300, platform="android")
+        if res.returncode == 0:
+            return BuildResult(success=True, output=res.output)
+        return BuildResult(success=False, output=res.output, error=res.error, aborted_early=res.aborted_early)
 
     @staticmethod
     async def install(workspace_path: str) -> BuildResult:
         """Install to connected device/emulator."""
-        rc, out, err = await _run(
-            ["./gradlew", "composeApp:installDebug"],
-            cwd=workspace_path, timeout=120,
-        )
-        raw = out + err
-        if rc == 0:
-            return BuildResult(success=True, output=raw)
-        return BuildResult(success=False, output=raw, error=extract_build_error(raw))
+        res = await _gradle(workspace_path, "composeApp:installDebug", timeout=120)
+        if res.returncode == 0:
+            return BuildResult(success=True, output=res.output)
+        return BuildResult(success=False, output=res.output, error=res.error)
 
     @staticmethod
     def parse_app_id(workspace_path: str) -> Optional[str]:
@@ -198,14 +227,17 @@ class AndroidPlatform:
         return None
 
     @staticmethod
-    async def full_demo(workspace_path: str) -> DemoResult:
+    async def full_demo(workspace_path: str, on_status: StatusCallback = None) -> DemoResult:
+        await _notify(on_status, "📱 Starting Android emulator...")
         ok, msg = await AndroidPlatform.ensure_device()
         if not ok:
             return DemoResult(success=False, message=f"❌ {msg}")
         # install() compiles + pushes to device in one step
+        await _notify(on_status, "🔨 Building and installing Android app...")
         result = await AndroidPlatform.install(workspace_path)
         if not result.success:
             return DemoResult(success=False, message=f"❌ Android build failed:\n```\n{result.error[:800]}\n```")
+        await _notify(on_status, "🚀 Launching Android app...")
         app_id = await AndroidPlatform.launch(workspace_path)
         screenshot = await AndroidPlatform.screenshot()
         return DemoResult(
@@ -329,13 +361,9 @@ class AndroidPlatform:
     @staticmethod
     async def bundle_release(workspace_path: str) -> BuildResult:
         """Run bundleRelease and return the AAB path."""
-        rc, out, err = await _run(
-            ["./gradlew", "composeApp:bundleRelease"],
-            cwd=workspace_path, timeout=600,
-        )
-        raw = out + err
-        if rc != 0:
-            return BuildResult(success=False, output=raw, error=extract_build_error(raw))
+        res = await _gradle(workspace_path, "composeApp:bundleRelease", timeout=600)
+        if res.returncode != 0:
+            return BuildResult(success=False, output=res.output, error=res.error)
 
         # Find the .aab file
         aab_dir = Path(workspace_path) / "composeApp" / "build" / "outputs" / "bundle" / "release"
@@ -348,7 +376,7 @@ class AndroidPlatform:
                     break
         if aabs:
             return BuildResult(success=True, output=str(aabs[0]))
-        return BuildResult(success=False, output=raw, error="Build succeeded but no .aab found")
+        return BuildResult(success=False, output=res.output, error="Build succeeded but no .aab found")
 
     @staticmethod
     async def generate_keystore(workspace_path: str, alias: str, password: str) -> tuple[bool, str]:
@@ -432,13 +460,11 @@ class iOSPlatform:
         """Build the iOS target via Gradle's KMP iOS tasks."""
         # KMP projects use gradle to build the shared framework,
         # then xcodebuild for the final iOS app
-        rc, out, err = await _run(
-            ["./gradlew", "composeApp:linkDebugFrameworkIosSimulatorArm64"],
-            cwd=workspace_path, timeout=300,
-        )
-        if rc != 0:
-            raw = out + err
-            return BuildResult(success=False, output=raw, error=extract_build_error(raw))
+        res = await _gradle(workspace_path, "composeApp:linkDebugFrameworkIosSimulatorArm64", timeout=300,
+                            platform="ios")
+        if res.returncode != 0:
+            return BuildResult(success=False, output=res.output, error=res.error,
+                               aborted_early=res.aborted_early)
 
         # Now build the Xcode project
         ios_dir = Path(workspace_path) / "iosApp"
@@ -446,8 +472,7 @@ class iOSPlatform:
             return BuildResult(success=False, output="", error="No iosApp/ directory found.")
 
         derived_data = Path(workspace_path) / "build" / "ios-simulator"
-        rc, out, err = await _run([
-            config.XCODEBUILD,
+        res = await _xcodebuild([
             "-project", str(ios_dir / "iosApp.xcodeproj"),
             "-scheme", "iosApp",
             "-sdk", "iphonesimulator",
@@ -455,11 +480,10 @@ class iOSPlatform:
             "-configuration", "Debug",
             "-derivedDataPath", str(derived_data),
             "build",
-        ], cwd=workspace_path, timeout=300)
-        raw = out + err
-        if rc == 0:
-            return BuildResult(success=True, output=raw)
-        return BuildResult(success=False, output=raw, error=extract_build_error(raw))
+        ], cwd=workspace_path, timeout=300, platform="ios")
+        if res.returncode == 0:
+            return BuildResult(success=True, output=res.output)
+        return BuildResult(success=False, output=res.output, error=res.error, aborted_early=res.aborted_early)
 
     @staticmethod
     async def install_and_launch(workspace_path: str) -> str:
@@ -565,13 +589,16 @@ class iOSPlatform:
         return tmp.name
 
     @staticmethod
-    async def full_demo(workspace_path: str) -> DemoResult:
+    async def full_demo(workspace_path: str, on_status: StatusCallback = None) -> DemoResult:
+        await _notify(on_status, "📱 Booting iOS simulator...")
         ok, msg = await iOSPlatform.ensure_simulator()
         if not ok:
             return DemoResult(success=False, message=f"❌ {msg}")
+        await _notify(on_status, "🔨 Building iOS app...")
         result = await iOSPlatform.build(workspace_path)
         if not result.success:
             return DemoResult(success=False, message=f"❌ iOS build failed:\n```\n{result.error[:800]}\n```")
+        await _notify(on_status, "🚀 Installing and launching iOS app...")
         bundle_id = await iOSPlatform.install_and_launch(workspace_path)
         screenshot = await iOSPlatform.screenshot()
         return DemoResult(
@@ -687,13 +714,9 @@ class iOSPlatform:
     async def archive(workspace_path: str, team_id: str) -> BuildResult:
         """Build KMP release framework + create Xcode archive for distribution."""
         # Stage 1: Gradle release framework for arm64
-        rc, out, err = await _run(
-            ["./gradlew", "composeApp:linkReleaseFrameworkIosArm64"],
-            cwd=workspace_path, timeout=600,
-        )
-        if rc != 0:
-            raw = out + err
-            return BuildResult(success=False, output=raw, error=extract_build_error(raw))
+        res = await _gradle(workspace_path, "composeApp:linkReleaseFrameworkIosArm64", timeout=600)
+        if res.returncode != 0:
+            return BuildResult(success=False, output=res.output, error=res.error)
 
         # Stage 2: xcodebuild archive
         ios_dir = Path(workspace_path) / "iosApp"
@@ -706,8 +729,7 @@ class iOSPlatform:
             import shutil
             shutil.rmtree(archive_path)
 
-        rc, out, err = await _run([
-            config.XCODEBUILD,
+        res = await _xcodebuild([
             "-project", str(ios_dir / "iosApp.xcodeproj"),
             "-scheme", "iosApp",
             "-sdk", "iphoneos",
@@ -719,10 +741,9 @@ class iOSPlatform:
             "archive",
         ], cwd=workspace_path, timeout=600)
 
-        raw = out + err
-        if rc == 0 and archive_path.exists():
+        if res.returncode == 0 and archive_path.exists():
             return BuildResult(success=True, output=str(archive_path))
-        return BuildResult(success=False, output=raw, error=extract_build_error(raw))
+        return BuildResult(success=False, output=res.output, error=res.error)
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -739,30 +760,24 @@ class WebPlatform:
     async def build(workspace_path: str) -> BuildResult:
         """Build the WASM/JS web target."""
         # Try wasmJsBrowserDistribution first (Compose Multiplatform WASM)
-        rc, out, err = await _run(
-            ["./gradlew", "composeApp:wasmJsBrowserDistribution"],
-            cwd=workspace_path, timeout=300,
-        )
-        raw = out + err
-        if rc == 0:
+        res = await _gradle(workspace_path, "composeApp:wasmJsBrowserDistribution", timeout=300, platform="web")
+        raw = res.output
+        if res.returncode == 0:
             return BuildResult(success=True, output=raw)
 
         # Only try JS fallback if the WASM task itself doesn't exist
         if "not found in project" in raw and "wasmJsBrowserDistribution" in raw:
-            rc2, out2, err2 = await _run(
-                ["./gradlew", "composeApp:jsBrowserDistribution"],
-                cwd=workspace_path, timeout=300,
-            )
-            raw2 = out2 + err2
-            if rc2 == 0:
+            res2 = await _gradle(workspace_path, "composeApp:jsBrowserDistribution", timeout=300, platform="web")
+            raw2 = res2.output
+            if res2.returncode == 0:
                 return BuildResult(success=True, output=raw2)
             # JS fallback also missing — return original WASM error
             if "not found in project" in raw2:
-                return BuildResult(success=False, output=raw, error=extract_build_error(raw))
-            return BuildResult(success=False, output=raw2, error=extract_build_error(raw2))
+                return BuildResult(success=False, output=raw, error=res.error, aborted_early=res.aborted_early)
+            return BuildResult(success=False, output=raw2, error=res2.error, aborted_early=res2.aborted_early)
 
         # WASM task exists but build failed — return the real error
-        return BuildResult(success=False, output=raw, error=extract_build_error(raw))
+        return BuildResult(success=False, output=raw, error=res.error, aborted_early=res.aborted_early)
 
     @staticmethod
     def _find_dist_dir(workspace_path: str) -> Optional[Path]:
@@ -1035,10 +1050,13 @@ class WebPlatform:
             return str(e)
 
     @staticmethod
-    async def full_demo(workspace_path: str, workspace_key: str = "") -> DemoResult:
+    async def full_demo(workspace_path: str, workspace_key: str = "",
+                        on_status: StatusCallback = None) -> DemoResult:
+        await _notify(on_status, "🔨 Building web app...")
         result = await WebPlatform.build(workspace_path)
         if not result.success:
             return DemoResult(success=False, message=f"❌ Web build failed:\n```\n{result.error[:800]}\n```")
+        await _notify(on_status, "🌐 Serving web demo...")
         url = await WebPlatform.serve(workspace_path, workspace_key)
         if not url:
             return DemoResult(success=False, message="❌ Built but could not find distribution directory.")
@@ -1090,13 +1108,9 @@ async def deploy_ios(workspace_path: str) -> DeployResult:
         return DeployResult(False, f"❌ Failed to parse device list: {e}")
 
     # 2. Build KMP framework for physical device (arm64, not simulator)
-    rc, out, err = await _run(
-        ["./gradlew", "composeApp:linkDebugFrameworkIosArm64"],
-        cwd=workspace_path, timeout=300,
-    )
-    if rc != 0:
-        raw = out + err
-        return DeployResult(False, f"❌ KMP framework build failed:\n```\n{extract_build_error(raw)[:800]}\n```")
+    res = await _gradle(workspace_path, "composeApp:linkDebugFrameworkIosArm64", timeout=300)
+    if res.returncode != 0:
+        return DeployResult(False, f"❌ KMP framework build failed:\n```\n{res.error[:800]}\n```")
 
     # 3. Build Xcode project for physical device
     ios_dir = Path(workspace_path) / "iosApp"
@@ -1104,8 +1118,7 @@ async def deploy_ios(workspace_path: str) -> DeployResult:
         return DeployResult(False, "❌ No `iosApp/` directory found.")
 
     derived_data = Path(workspace_path) / "build" / "ios-device"
-    rc, out, err = await _run([
-        config.XCODEBUILD,
+    res = await _xcodebuild([
         "-project", str(ios_dir / "iosApp.xcodeproj"),
         "-scheme", "iosApp",
         "-sdk", "iphoneos",
@@ -1114,9 +1127,8 @@ async def deploy_ios(workspace_path: str) -> DeployResult:
         "-allowProvisioningUpdates",
         "build",
     ], cwd=workspace_path, timeout=300)
-    raw = out + err
-    if rc != 0:
-        return DeployResult(False, f"❌ Xcode build failed:\n```\n{extract_build_error(raw)[:800]}\n```")
+    if res.returncode != 0:
+        return DeployResult(False, f"❌ Xcode build failed:\n```\n{res.error[:800]}\n```")
 
     # 4. Find the .app bundle
     app_path = None
@@ -1152,13 +1164,9 @@ async def deploy_android(workspace_path: str) -> DeployResult:
         return DeployResult(False, "❌ No Android device connected. Plug in via USB or use `adb connect`.")
 
     # installDebug will build + install
-    rc, out, err = await _run(
-        ["./gradlew", "composeApp:installDebug"],
-        cwd=workspace_path, timeout=300,
-    )
-    raw = out + err
-    if rc != 0:
-        return DeployResult(False, f"❌ Build/install failed:\n```\n{extract_build_error(raw)[:800]}\n```")
+    res = await _gradle(workspace_path, "composeApp:installDebug", timeout=300)
+    if res.returncode != 0:
+        return DeployResult(False, f"❌ Build/install failed:\n```\n{res.error[:800]}\n```")
 
     app_id = AndroidPlatform.parse_app_id(workspace_path) or "the app"
     return DeployResult(True, f"✅ **{app_id}** installed on your Android device.\nOpen it on your phone!")
@@ -1397,8 +1405,7 @@ async def export_ipa(archive_path: str, workspace_path: str, team_id: str) -> tu
         '</dict>\n</plist>\n'
     )
 
-    rc, out, err = await _run([
-        config.XCODEBUILD,
+    res = await _xcodebuild([
         "-exportArchive",
         "-archivePath", archive_path,
         "-exportOptionsPlist", str(plist_path),
@@ -1406,9 +1413,9 @@ async def export_ipa(archive_path: str, workspace_path: str, team_id: str) -> tu
         "-allowProvisioningUpdates",
     ], timeout=900)
 
-    raw = out + err
-    if rc != 0:
-        return False, extract_build_error(raw), raw
+    raw = res.output
+    if res.returncode != 0:
+        return False, res.error, raw
 
     # Find the .ipa file
     ipas = list(export_dir.glob("*.ipa"))
@@ -1453,17 +1460,59 @@ PLATFORMS = {
 }
 
 
-async def build_platform(platform: str, workspace_path: str) -> BuildResult:
+async def _timed_build(cls, platform: str, workspace_path: str) -> BuildResult:
+    """Run a real (uncached) build and feed its duration to the ETA model."""
+    start = time.time()
+    result = await cls.build(workspace_path)
+    duration = time.time() - start
+    if result.success:
+        eta_model.get_model().record("build", duration, platform=platform, kind="")
+    telemetry.record("build", platform, duration, ok=result.success, workspace=workspace_path,
+                     aborted_early=result.aborted_early or None)
+    return result
+
+
+async def build_platform(platform: str, workspace_path: str, use_cache: bool = True) -> BuildResult:
+    """Build a platform, short-circuiting via build_cache when the inputs are unchanged."""
     cls = PLATFORMS.get(platform)
     if not cls:
         return BuildResult(success=False, output="", error=f"Unknown platform: {platform}")
-    return await cls.build(workspace_path)
+    if not (use_cache and config.BUILD_CACHE_ENABLED):
+        return await _timed_build(cls, platform, workspace_path)
+
+    import build_cache
+    source_hash = await asyncio.to_thread(build_cache.compute_source_hash, workspace_path, platform)
+    if source_hash:
+        cached = await asyncio.to_thread(build_cache.lookup, workspace_path, platform, source_hash)
+        if cached is not None:
+            print(f"[build-cache] Hit: {platform} {workspace_path} ({source_hash[:12]})")
+            telemetry.record("build", platform, 0.0, ok=cached.get("success", False),
+                             workspace=workspace_path, cache="hit")
+            return BuildResult(
+                success=cached.get("success", False),
+                output=cached.get("output", ""),
+                error=cached.get("error", ""),
+            )
+
+    result = await _timed_build(cls, platform, workspace_path)
+    if source_hash:
+        await asyncio.to_thread(build_cache.store, workspace_path, platform, source_hash, result)
+    return result
 
 
-async def demo_platform(platform: str, workspace_path: str, workspace_key: str = "") -> DemoResult:
+async def demo_platform(platform: str, workspace_path: str, workspace_key: str = "",
+                        on_status: StatusCallback = None) -> DemoResult:
     cls = PLATFORMS.get(platform)
     if not cls:
         return DemoResult(success=False, message=f"Unknown platform: {platform}")
     if platform == "web":
-        return await cls.full_demo(workspace_path, workspace_key=workspace_key)
-    return await cls.full_demo(workspace_path)
+        with telemetry.span("demo", platform, workspace=workspace_key) as span:
+            result = await cls.full_demo(workspace_path, workspace_key=workspace_key, on_status=on_status)
+            span.ok = result.success
+        return result
+    # One emulator/simulator session at a time — installs and launches would collide
+    async with scheduler.slot("emulator"):
+        with telemetry.span("demo", platform, workspace=workspace_key or workspace_path) as span:
+            result = await cls.full_demo(workspace_path, on_status=on_status)
+            span.ok = result.success
+        return result
@@ -0,0 +1,364 @@
+"""
+proc_io.py — Bounded subprocess output: spool to disk, keep head + tail in memory.
+
+platforms._run used proc.communicate(), which held a build's entire output
+(often tens of MB for verbose Gradle/xcodebuild runs) in memory and then
+copied it again for `out + err`. ClaudeRunner likewise kept every stderr
+chunk. Output is now streamed:
+
+  * every byte goes to a per-run log file in LOG_SPOOL_DIR, opened on the
+    first write, capped at LOG_SPOOL_MAX_MB; only the newest LOG_SPOOL_KEEP
+    files are kept;
+  * memory holds only the first PROC_CAPTURE_HEAD_KB and last
+    PROC_CAPTURE_TAIL_KB of each stream, joined by a marker that points at
+    the log file;
+  * an ErrorScanner sees every line as it passes, so the error excerpt is
+    the same one extract_build_error would have found in the full output.
+
+Peak memory per process is bounded by the capture sizes, however verbose
+the build.
+
+    res = await run(["./gradlew", "assembleDebug"], cwd=ws, timeout=300, label="gradle")
+    res.returncode, res.output, res.error, res.log_path
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, Optional
+
+import config
+
+if TYPE_CHECKING:
+    import build_errors
+
+_READ_CHUNK = 64 * 1024
+_MAX_LINE_BYTES = 64 * 1024  # longer lines are scanned truncated
+_ABORT_DRAIN_SECS = 5
+_LABEL_RE = re.compile(r"[^\w.-]+")
+
+_metrics = {"runs": 0, "timeouts": 0, "bytes_read": 0, "bytes_not_kept": 0, "log_files": 0}
+
+
+# ── Error scanning ───────────────────────────────────────────────────────────
+
+
+class ErrorScanner:
+    """Streaming equivalent of platforms.extract_build_error.
+
+    Feed lines in order. result() returns, by priority: the Gradle FAILURE
+    block, the first Xcode error with 5 lines of lead-in, the first compiler
+    error lines, or the last lines of output.
+    """
+
+    def __init__(self, max_lines: int = 60):
+        self.max_lines = max_lines
+        self.gradle: Optional[list[str]] = None
+        self.xcode: Optional[list[str]] = None
+        self.compiler: list[str] = []
+        self.tail: deque[str] = deque(maxlen=max_lines)
+        self._before: deque[str] = deque(maxlen=5)
+
+    def feed(self, line: str) -> None:
+        if self.gradle is None:
+            if "FAILURE:" in line or "BUILD FAILED" in line:
+                self.gradle = [line]
+        elif len(self.gradle) < self.max_lines:
+            self.gradle.append(line)
+
+        lower = line.lower()
+        if self.xcode is None:
+            if "error:" in lower or "** BUILD FAILED **" in line:
+                self.xcode = [*self._before, line]
+                self._xcode_limit = len(self.xcode) + self.max_lines - 1
+        elif len(self.xcode) < self._xcode_limit:
+            self.xcode.append(line)
+        self._before.append(line)
+
+        if len(self.compiler) < self.max_lines and (line.strip().startswith("e:") or "error:" in lower):
+            self.compiler.append(line)
+        self.tail.append(line)
+
+    def result(self) -> str:
+        return self.combine([self])
+
+    @staticmethod
+    def combine(scanners: list["ErrorScanner"]) -> str:
+        """Excerpt for several streams read side by side (stdout, stderr), in that order."""
+        for attr in ("gradle", "xcode"):
+            for s in scanners:
+                block = getattr(s, attr)
+                if block is not None:
+                    return "\n".join(block)
+        max_lines = scanners[0].max_lines
+        compiler = [line for s in scanners for line in s.compiler][:max_lines]
+        if compiler:
+            return "\n".join(compiler)
+        return "\n".join([line for s in scanners for line in s.tail][-max_lines:])
+
+
+def scan_lines(lines: Iterable[str], max_lines: int = 60) -> str:
+    scanner = ErrorScanner(max_lines)
+    for line in lines:
+        scanner.feed(line)
+    return scanner.result()
+
+
+# ── Spooling and bounded capture ─────────────────────────────────────────────
+
+
+class LogSpool:
+    """Per-run log file, created on the first write and capped in size."""
+
+    def __init__(self, label: str):
+        self.label = _LABEL_RE.sub("_", label)[:60] or "run"
+        self.path: Optional[Path] = None
+        self._file = None
+        self._written = 0
+        self._max_bytes = config.LOG_SPOOL_MAX_MB * 1024 * 1024
+        self._truncated = False
+        self._closed = False
+
+    def write(self, data: bytes) -> None:
+        if self._truncated or self._closed or config.LOG_SPOOL_KEEP <= 0:
+            return
+        if self._file is None:
+            self._open()
+            if self._file is None:
+                return
+        room = self._max_bytes - self._written
+        if len(data) > room:
+            data = data[:max(0, room)]
+            self._truncated = True
+        try:
+            self._file.write(data)
+            if self._truncated:
+                self._file.write(b"\n[log truncated at LOG_SPOOL_MAX_MB]\n")
+        except OSError:
+            self._truncated = True
+        self._written += len(data)
+
+    def _open(self) -> None:
+        spool_dir = Path(config.LOG_SPOOL_DIR)
+        try:
+            spool_dir.mkdir(parents=True, exist_ok=True)
+            _prune(spool_dir, config.LOG_SPOOL_KEEP - 1)
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            self.path = spool_dir / f"{stamp}-{self.label}-{os.getpid()}-{id(self) & 0xffff:04x}.log"
+            self._file = open(self.path, "ab", buffering=_READ_CHUNK)
+            _metrics["log_files"] += 1
+        except OSError as e:
+            print(f"[proc-io] Can't open log spool in {spool_dir}: {e}")
+            self._truncated = True
+
+    def close(self) -> None:
+        self._closed = True
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+
+def _prune(spool_dir: Path, keep: int) -> None:
+    """Delete all but the newest `keep` log files."""
+    try:
+        logs = sorted(spool_dir.glob("*.log"), key=lambda p: p.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for old in logs[max(0, keep):]:
+        old.unlink(missing_ok=True)
+
+
+class BoundedCapture:
+    """First `head` and last `tail` bytes of a stream."""
+
+    def __init__(self, head: Optional[int] = None, tail: Optional[int] = None):
+        self._head_max = head if head is not None else config.PROC_CAPTURE_HEAD_KB * 1024
+        self._tail_max = tail if tail is not None else config.PROC_CAPTURE_TAIL_KB * 1024
+        self._head = bytearray()
+        self._tail = bytearray()
+        self.total = 0
+
+    def feed(self, data: bytes) -> None:
+        self.total += len(data)
+        room = self._head_max - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if data:
+            self._tail += data
+            if len(self._tail) > 2 * self._tail_max:
+                del self._tail[:len(self._tail) - self._tail_max]
+
+    @property
+    def omitted(self) -> int:
+        return max(0, self.total - len(self._head) - min(len(self._tail), self._tail_max))
+
+    def text(self, log_path: Optional[Path] = None) -> str:
+        tail = bytes(self._tail[-self._tail_max:]) if self._tail_max else b""
+        if not self.omitted:
+            return (bytes(self._head) + tail).decode(errors="replace")
+        # Cut on line boundaries around the gap
+        head = bytes(self._head)
+        head = head[:head.rfind(b"\n") + 1] or head
+        nl = tail.find(b"\n")
+        tail = tail[nl + 1:] if nl >= 0 else tail
+        where = f" — full log: {log_path}" if log_path else ""
+        marker = f"\n[… {self.omitted:,} bytes omitted{where} …]\n"
+        return head.decode(errors="replace") + marker + tail.decode(errors="replace")
+
+
+class OutputStream:
+    """Pump one pipe into a spool, a bounded capture and an error scanner."""
+
+    def __init__(self, spool: Optional[LogSpool] = None, max_error_lines: int = 60,
+                 on_line: Optional[Callable[[str], None]] = None, bounded: bool = True):
+        self.spool = spool
+        self.capture = BoundedCapture() if bounded else BoundedCapture(head=1 << 62, tail=0)
+        self.scanner = ErrorScanner(max_error_lines)
+        self._on_line = on_line
+        self._partial = bytearray()
+
+    def feed(self, data: bytes) -> None:
+        _metrics["bytes_read"] += len(data)
+        if self.spool is not None:
+            self.spool.write(data)
+        self.capture.feed(data)
+        self._partial += data
+        start = 0
+        while True:
+            nl = self._partial.find(b"\n", start)
+            if nl < 0:
+                break
+            self._line(self._partial[start:nl])
+            start = nl + 1
+        del self._partial[:start]
+        if len(self._partial) > _MAX_LINE_BYTES:
+            self._line(self._partial[:_MAX_LINE_BYTES])
+            self._partial.clear()
+
+    def _line(self, raw: bytes) -> None:
+        line = raw.decode(errors="replace").rstrip("\r")
+        self.scanner.feed(line)
+        if self._on_line is not None:
+            self._on_line(line)
+
+    def finish(self) -> None:
+        if self._partial:
+            self._line(self._partial)
+            self._partial.clear()
+        _metrics["bytes_not_kept"] += self.capture.omitted
+
+    async def pump(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            chunk = await reader.read(_READ_CHUNK)
+            if not chunk:
+                break
+            self.feed(chunk)
+        self.finish()
+
+    def text(self) -> str:
+        return self.capture.text(self.spool.path if self.spool else None)
+
+
+# ── Running processes ────────────────────────────────────────────────────────
+
+
+@dataclass
+class ProcResult:
+    returncode: int
+    stdout: str
+    stderr: str
+    error: str            # build-error excerpt over the full output (see ErrorScanner)
+    log_path: Optional[Path] = None
+    aborted_early: bool = False  # stopped by an ErrorDetector once enough errors were known
+
+    @property
+    def output(self) -> str:
+        return self.stdout + self.stderr
+
+
+async def run(cmd: list[str], cwd: Optional[str] = None, timeout: int = 60,
+              label: Optional[str] = None, bounded: bool = True,
+              detector: Optional["build_errors.ErrorDetector"] = None) -> ProcResult:
+    """Run a command with bounded output capture. With a label, output is also
+    spooled to a log file. bounded=False keeps everything (small utility
+    commands whose output is parsed whole). A detector sees every line and
+    may stop the process early (see build_errors). On timeout the process is
+    killed and the result is (-1, "", "Timed out"), as before."""
+    _metrics["runs"] += 1
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd,
+    )
+    spool = LogSpool(label) if label else None
+    abort = asyncio.Event() if detector is not None else None
+
+    def watch(line: str) -> None:
+        detector.feed(line)
+        if detector.should_abort:
+            abort.set()
+
+    on_line = watch if detector is not None else None
+    out = OutputStream(spool, bounded=bounded, on_line=on_line)
+    err = OutputStream(spool, bounded=bounded, on_line=on_line)
+    aborted = False
+    try:
+        aborted = await asyncio.wait_for(_communicate(proc, out, err, abort, detector), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        _metrics["timeouts"] += 1
+        if detector is not None:
+            detector.finish()
+        return ProcResult(-1, "", "Timed out", "Timed out", spool.path if spool else None)
+    finally:
+        if spool is not None:
+            spool.close()
+    error = ErrorScanner.combine([out.scanner, err.scanner])
+    if detector is not None:
+        detector.finish(aborted)
+        if aborted:
+            error = detector.summary()
+    return ProcResult(proc.returncode if not aborted else -1, out.text(), err.text(), error,
+                      spool.path if spool else None, aborted_early=aborted)
+
+
+async def _communicate(proc, out: OutputStream, err: OutputStream,
+                       abort: Optional[asyncio.Event], detector) -> bool:
+    """Pump both pipes until the process exits. Returns True if it was stopped
+    early because the detector had collected enough errors."""
+    io = asyncio.ensure_future(asyncio.gather(out.pump(proc.stdout), err.pump(proc.stderr), proc.wait()))
+    abort_wait = asyncio.ensure_future(abort.wait()) if abort is not None else None
+    try:
+        await asyncio.wait({io, abort_wait} - {None}, return_when=asyncio.FIRST_COMPLETED)
+        if io.done():
+            io.result()
+            return False
+        # Let the current burst of compiler errors finish, then stop the build
+        done, _ = await asyncio.wait({io}, timeout=detector.grace_secs)
+        if done:
+            io.result()
+            return False
+        print(f"[build-errors] Stopping {detector.platform} build early: {len(detector.errors)} errors found")
+        proc.kill()
+        # Tool subprocesses may still hold the pipes open; don't wait on them for long
+        await asyncio.wait({io}, timeout=_ABORT_DRAIN_SECS)
+        return True
+    finally:
+        for task in (io, abort_wait):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+def metrics() -> dict:
+    return dict(_metrics)
@@ -0,0 +1,188 @@
+"""
+rotation_policy.py — Decide when a Claude session should be rotated, from what it costs.
+
+Rotation used to trigger purely on resume count (SESSION_MAX_RESUMES). Every
+resumed prompt re-reads the whole conversation, so a session gets more
+expensive as it grows. Prompt caching makes that re-read cheap while it keeps
+hitting the cache, though. This module tracks, per session, the context size,
+how fast it grows, the cache-hit ratio, turns per prompt and measured USD per
+prompt. It rotates only when the projected cost of the next
+ROTATION_HORIZON_PROMPTS prompts on the current session exceeds the cost of:
+a handoff summary, a fresh session seeded with it, and the same prompts on that
+smaller context.
+
+Token costs are modelled in "input-token units": cache reads ≈ 0.1×, cache
+writes ≈ 1.25× a plain input token. Units are converted to USD with the
+session's own measured $/unit, so the model needs no price table.
+
+    usage = observe(state.usage, result_event, new_session)   # after each run
+    rotate, reason = should_rotate(usage, resumes, summary_chars)
+
+While background live summaries are on (SUMMARY_QUEUE_SIZE > 0), every
+prompt is followed by a summary run on a fork of the session. Its measured
+cost per context token is part of the projection: a big session pays for a
+big summary after each prompt, a fresh one for a small summary.
+
+ROTATION_POLICY=resumes restores the old fixed-count behaviour. Sessions with
+no usage data yet (e.g. imported from the old JSON files) also fall back to it.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, asdict, fields
+from typing import Optional
+
+import config
+
+_CACHE_READ_MULT = 0.1
+_CACHE_WRITE_MULT = 1.25
+_EWMA_ALPHA = 0.4
+_SUMMARY_OUTPUT_UNITS = 1000 * 5  # ~1k output tokens at ~5× input price
+_CHARS_PER_TOKEN = 4
+
+_metrics = {"evaluations": 0, "rotations": 0, "by_context_cap": 0, "by_cost": 0, "by_resume_count": 0, "kept": 0}
+
+# Measured context of a fresh session's first prompt (system prompt, tools,
+# CLAUDE.md). Shared by all workspaces; refined as fresh sessions run.
+_fresh_base_tokens: Optional[float] = None
+
+
+@dataclass
+class SessionUsage:
+    prompts: int = 0
+    context_tokens: float = 0.0     # context re-read per turn, latest prompt
+    growth_per_prompt: float = 0.0  # EWMA of context delta between prompts
+    cache_hit_ratio: float = 0.0    # EWMA of cache_read / all input tokens
+    turns_per_prompt: float = 1.0   # EWMA of API turns per CLI run
+    usd_per_prompt: float = 0.0     # EWMA of measured cost
+    usd_per_unit: float = 0.0       # EWMA of measured cost / modelled units
+    summary_usd_per_token: float = 0.0  # EWMA of background summary cost / context tokens
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "SessionUsage":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in (data or {}).items() if k in known})
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _ewma(prev: float, value: float, first: bool) -> float:
+    return value if first else prev + _EWMA_ALPHA * (value - prev)
+
+
+def _units(context: float, hit_ratio: float) -> float:
+    """Input-token units to process `context` tokens once at a given cache-hit ratio."""
+    return context * (hit_ratio * _CACHE_READ_MULT + (1 - hit_ratio) * _CACHE_WRITE_MULT)
+
+
+def observe(data: Optional[dict], result_event: dict, new_session: bool = False) -> dict:
+    """Fold one CLI `result` event into a session's usage. Returns the new dict.
+
+    `new_session` marks a run that started without -r; its context is what a
+    rotation would cost up front.
+    """
+    global _fresh_base_tokens
+    usage = SessionUsage.from_dict(data)
+    u = result_event.get("usage") or {}
+    fresh_input = u.get("input_tokens", 0) + u.get("cache_creation_input_tokens", 0)
+    cached = u.get("cache_read_input_tokens", 0)
+    total_input = fresh_input + cached
+    if total_input <= 0:
+        return usage.to_dict()
+    turns = max(1, int(result_event.get("num_turns") or 1))
+    cost = float(result_event.get("total_cost_usd") or 0)
+
+    # The aggregate spans every turn of the run; per-turn average ≈ context size
+    context = total_input / turns
+    hit_ratio = cached / total_input
+    first = usage.prompts == 0
+    if new_session:
+        _fresh_base_tokens = _ewma(_fresh_base_tokens or context, context, _fresh_base_tokens is None)
+    if not first:
+        usage.growth_per_prompt = _ewma(usage.growth_per_prompt, max(0.0, context - usage.context_tokens),
+                                        usage.prompts == 1)
+    usage.context_tokens = context
+    usage.cache_hit_ratio = _ewma(usage.cache_hit_ratio, hit_ratio, first)
+    usage.turns_per_prompt = _ewma(usage.turns_per_prompt, turns, first)
+    usage.usd_per_prompt = _ewma(usage.usd_per_prompt, cost, first)
+    units = turns * _units(context, hit_ratio)
+    if cost > 0 and units > 0:
+        usage.usd_per_unit = _ewma(usage.usd_per_unit, cost / units, usage.usd_per_unit == 0)
+    usage.prompts += 1
+    return usage.to_dict()
+
+
+def observe_summary(data: Optional[dict], cost_usd: float) -> dict:
+    """Fold the measured cost of one background summary run into a session's usage."""
+    usage = SessionUsage.from_dict(data)
+    if cost_usd > 0 and usage.context_tokens > 0:
+        per_token = cost_usd / usage.context_tokens
+        usage.summary_usd_per_token = _ewma(usage.summary_usd_per_token, per_token,
+                                            usage.summary_usd_per_token == 0)
+    return usage.to_dict()
+
+
+def project(usage: SessionUsage, summary_chars: int = 0,
+            horizon: Optional[int] = None) -> tuple[float, float]:
+    """Projected USD for the next `horizon` prompts: (resume current, rotate now)."""
+    horizon = horizon or config.ROTATION_HORIZON_PROMPTS
+    g, h, t = usage.growth_per_prompt, usage.cache_hit_ratio, usage.turns_per_prompt
+    c = usage.context_tokens
+    base = (_fresh_base_tokens or config.ROTATION_FRESH_BASE_TOKENS) + summary_chars / _CHARS_PER_TOKEN
+
+    resume = sum(t * _units(c + k * g, h) for k in range(1, horizon + 1))
+    # Rotating: one summary turn on the current context, then a fresh session
+    # whose first turn writes the whole (small) context to the cache
+    rotate = _units(c, h) + _SUMMARY_OUTPUT_UNITS
+    rotate += _units(base, 0.0) + (t - 1) * _units(base, h)
+    rotate += sum(t * _units(base + k * g, h) for k in range(1, horizon))
+    resume_usd, rotate_usd = resume * usage.usd_per_unit, rotate * usage.usd_per_unit
+
+    # One background summary after each prompt, priced by the context it forks
+    s = usage.summary_usd_per_token
+    if s > 0 and config.SUMMARY_QUEUE_SIZE > 0:
+        resume_usd += s * sum(c + k * g for k in range(1, horizon + 1))
+        rotate_usd += s * sum(base + k * g for k in range(horizon))
+    return resume_usd, rotate_usd
+
+
+def should_rotate(data: Optional[dict], resumes: int, summary_chars: int = 0,
+                  record: bool = True) -> tuple[bool, str]:
+    """Return (rotate?, reason) for a session about to be resumed.
+
+    Pass record=False for look-ahead checks (pre-warming) so metrics only
+    count real decisions.
+    """
+    trigger, reason = _decide(SessionUsage.from_dict(data), resumes, summary_chars)
+    if record:
+        _metrics["evaluations"] += 1
+        if trigger:
+            _metrics["rotations"] += 1
+            _metrics[f"by_{trigger}"] += 1
+        else:
+            _metrics["kept"] += 1
+    return trigger is not None, reason
+
+
+def _decide(usage: SessionUsage, resumes: int, summary_chars: int) -> tuple[Optional[str], str]:
+    """Return (trigger or None, reason)."""
+    if config.ROTATION_POLICY == "resumes" or usage.prompts == 0 or usage.usd_per_unit <= 0:
+        reason = f"{resumes}/{config.SESSION_MAX_RESUMES} resumes"
+        return ("resume_count" if resumes >= config.SESSION_MAX_RESUMES else None), reason
+
+    next_context = usage.context_tokens + usage.growth_per_prompt
+    if next_context >= config.ROTATION_MAX_CONTEXT_TOKENS:
+        # Latency and auto-compaction dominate near the window limit
+        return "context_cap", f"context ~{next_context:,.0f} tokens ≥ {config.ROTATION_MAX_CONTEXT_TOKENS:,}"
+    if usage.prompts < config.ROTATION_MIN_PROMPTS:
+        return None, f"only {usage.prompts} prompt(s) measured"
+
+    resume_usd, rotate_usd = project(usage, summary_chars)
+    reason = (f"next {config.ROTATION_HORIZON_PROMPTS} prompts: resume ${resume_usd:.3f} "
+              f"vs rotate ${rotate_usd:.3f}, cache hit {usage.cache_hit_ratio:.0%}")
+    return ("cost" if rotate_usd < resume_usd * (1 - config.ROTATION_MARGIN) else None), reason
+
+
+def metrics() -> dict:
+    return {**_metrics, "fresh_base_tokens": round(_fresh_base_tokens or 0)}
@@ -0,0 +1,227 @@
+"""
+run_queue.py — One Claude run per workspace at a time, in arrival order.
+
+Nothing used to stop two prompts (Discord and the HTTP API, or /queue and a
+fix loop) from running `claude -r <same session>` in one workspace at once:
+the session files raced and ClaudeRunner lost track of the first process.
+ClaudeRunner.run() now goes through a WorkspaceRunQueue. Runs in different
+workspaces still proceed in parallel (bounded by the scheduler's Claude
+slots). Within a workspace they are serialized, and a waiting caller is told
+how many runs are ahead of it.
+
+The queue only orders runs within one process. The bot and the API are
+separate processes, and both build their own ClaudeRunners, so the run at
+the head of a queue also takes an exclusive flock on
+CLAUDE_RUN_LOCK_DIR/<workspace>.lock before it starts. The lock is per open
+file, so it also separates runners inside one process, and the OS drops it
+if a process dies mid-run.
+
+Queued runs can be coalesced (CLAUDE_COALESCE_PROMPTS):
+  * "off" (default);
+  * "identical" — a prompt equal to one already waiting shares its run;
+  * "stacked"   — every prompt queued behind the same run is sent as one
+                  numbered request, and each caller gets the combined result.
+Only runs that haven't started are merged, and only with the same context
+prefix.
+
+cancel(workspace) cancels everything queued for the workspace; killing the
+active process stays with the runner. Cancelled callers get RunCancelled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import os
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import config
+
+ProgressCallback = Optional[Callable[[str], Awaitable[None]]]
+# execute(prompt, workspace_key, workspace_path, context_prefix, on_progress) -> result
+Execute = Callable[[str, str, str, str, ProgressCallback], Awaitable[object]]
+
+_LOCK_POLL_SECS = 0.25
+_UNSAFE_NAME = re.compile(r"[^\w.-]")
+
+_metrics = {"runs": 0, "executed": 0, "waited": 0, "waited_other_process": 0,
+            "coalesced_identical": 0, "coalesced_stacked": 0, "cancelled": 0}
+
+
+class RunCancelled(Exception):
+    """The run was cancelled before it started."""
+
+
+@dataclass(eq=False)
+class _Batch:
+    context_prefix: str
+    prompts: list[str]
+    callbacks: list[Callable[[str], Awaitable[None]]] = field(default_factory=list)
+    turn: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+    waiters: int = 0
+    started: bool = False
+    cancelled: bool = False
+
+    def prompt(self) -> str:
+        if len(self.prompts) == 1:
+            return self.prompts[0]
+        numbered = "\n\n".join(f"{i}. {p}" for i, p in enumerate(self.prompts, 1))
+        return ("Several requests arrived while you were busy. "
+                f"Handle all of them, in order:\n\n{numbered}")
+
+    async def progress(self, text: str) -> None:
+        for cb in list(self.callbacks):
+            try:
+                await cb(text)
+            except Exception:
+                pass
+
+
+def _lock_path(workspace: str) -> Path:
+    return Path(config.CLAUDE_RUN_LOCK_DIR) / (_UNSAFE_NAME.sub("_", workspace) + ".lock")
+
+
+async def _lock_workspace(workspace: str, batch: _Batch) -> Optional[int]:
+    """Wait for the workspace's cross-process lock. Returns the locked fd
+    (closing it releases the lock), or None if the batch was cancelled first."""
+    path = _lock_path(workspace)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    told = False
+    try:
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                pass
+            if batch.cancelled:
+                os.close(fd)
+                return None
+            if not told:
+                told = True
+                _metrics["waited_other_process"] += 1
+                print(f"[claude] Waiting for a run in {workspace} held by another process")
+                await batch.progress(f"⏳ Waiting for another run in **{workspace}** to finish…")
+            await asyncio.sleep(_LOCK_POLL_SECS)
+    except BaseException:
+        os.close(fd)
+        raise
+
+
+class WorkspaceRunQueue:
+    def __init__(self, execute: Execute, coalesce: Optional[str] = None):
+        self._execute = execute
+        self._coalesce = coalesce or config.CLAUDE_COALESCE_PROMPTS
+        # workspace → batches in order; the head is the one running
+        self._queues: dict[str, deque[_Batch]] = {}
+
+    def busy(self, workspace: str) -> bool:
+        return bool(self._queues.get(workspace))
+
+    def waiting(self, workspace: str) -> int:
+        """Runs queued behind the active one."""
+        return max(0, len(self._queues.get(workspace, ())) - 1)
+
+    def _join(self, queue: deque[_Batch], prompt: str, context_prefix: str) -> Optional[_Batch]:
+        if self._coalesce not in ("identical", "stacked"):
+            return None
+        for batch in reversed(queue):
+            if batch.started or batch.cancelled or batch.context_prefix != context_prefix:
+                continue
+            if prompt in batch.prompts:
+                _metrics["coalesced_identical"] += 1
+                return batch
+            if self._coalesce == "stacked":
+                batch.prompts.append(prompt)
+                _metrics["coalesced_stacked"] += 1
+                return batch
+        return None
+
+    async def run(self, workspace: str, workspace_path: str, prompt: str,
+                  context_prefix: str = "", on_progress: ProgressCallback = None):
+        _metrics["runs"] += 1
+        queue = self._queues.setdefault(workspace, deque())
+        batch = self._join(queue, prompt, context_prefix)
+        if batch is not None:
+            note = "🔗 Merged with a queued request"
+        else:
+            batch = _Batch(context_prefix, [prompt])
+            queue.append(batch)
+            if len(queue) == 1:
+                batch.turn.set()
+            batch.task = asyncio.ensure_future(self._drive(workspace, workspace_path, batch))
+            note = None
+            if len(queue) > 1:
+                note = f"⏳ Waiting for {len(queue) - 1} earlier run(s)"
+                _metrics["waited"] += 1
+        if on_progress:
+            batch.callbacks.append(on_progress)
+        if note:
+            print(f"[claude] {note} in {workspace}")
+            if on_progress:
+                try:
+                    await on_progress(f"{note} in **{workspace}**…")
+                except Exception:
+                    pass
+
+        batch.waiters += 1
+        try:
+            return await asyncio.shield(batch.task)
+        except asyncio.CancelledError:
+            # Last interested caller gone: stop the run (or its wait)
+            if batch.waiters == 1 and not batch.task.done():
+                batch.task.cancel()
+            raise
+        finally:
+            batch.waiters -= 1
+
+    async def _drive(self, workspace: str, workspace_path: str, batch: _Batch):
+        try:
+            await batch.turn.wait()
+            fd = None if batch.cancelled else await _lock_workspace(workspace, batch)
+            if fd is None:
+                raise RunCancelled(f"Cancelled while queued in {workspace}")
+            try:
+                batch.started = True
+                _metrics["executed"] += 1
+                return await self._execute(batch.prompt(), workspace, workspace_path,
+                                           batch.context_prefix, batch.progress if batch.callbacks else None)
+            finally:
+                os.close(fd)
+        finally:
+            self._advance(workspace, batch)
+
+    def _advance(self, workspace: str, batch: _Batch) -> None:
+        queue = self._queues.get(workspace)
+        if not queue or batch not in queue:
+            return
+        was_head = queue[0] is batch
+        queue.remove(batch)
+        if not queue:
+            del self._queues[workspace]
+        elif was_head:
+            queue[0].turn.set()
+
+    def cancel(self, workspace: str) -> int:
+        """Cancel every run queued (not yet started) in a workspace. Returns the count."""
+        count = 0
+        for batch in self._queues.get(workspace, ()):
+            if not batch.started and not batch.cancelled:
+                batch.cancelled = True
+                batch.turn.set()
+                count += 1
+        _metrics["cancelled"] += count
+        return count
+
+    def snapshot(self) -> dict:
+        return {ws: {"running": q[0].started, "waiting": len(q) - 1} for ws, q in self._queues.items()}
+
+
+def metrics() -> dict:
+    return dict(_metrics)
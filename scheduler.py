@@ -0,0 +1,248 @@
+"""
+scheduler.py — Central admission control for heavy subprocess work.
+
+Every Claude CLI run, Gradle build, xcodebuild, emulator/simulator session and
+Playwright screenshot acquires a slot from a bounded per-resource pool before it
+starts. Waiters are ordered by priority, then by how many slots their account
+already holds (fair share), then FIFO.
+
+    async with scheduler.slot("gradle"):
+        ...
+
+Callers tag work with an account, a job id (build_id) and a priority via
+bind(); the tags live in a ContextVar, so they follow the coroutine into
+ClaudeRunner, platforms and helpers without threading extra arguments.
+get_queue_info(job_id) reports queue position and ETA for BuildStatus.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+import config
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+RESOURCE_CLASSES = ("claude", "gradle", "xcodebuild", "emulator", "playwright")
+
+# Seed durations (seconds) used for ETAs until real samples arrive
+_PRIOR_DURATIONS = {
+    "claude": 120.0,
+    "gradle": 180.0,
+    "xcodebuild": 240.0,
+    "emulator": 60.0,
+    "playwright": 15.0,
+}
+
+_DURATION_SAMPLES = 20
+
+
+@dataclass
+class JobContext:
+    account: Optional[str] = None
+    job_id: Optional[str] = None
+    priority: int = PRIORITY_NORMAL
+
+
+_job_context: ContextVar[JobContext] = ContextVar("scheduler_job", default=JobContext())
+
+
+def bind(account: Optional[str] = None, job_id: Optional[str] = None,
+         priority: int = PRIORITY_NORMAL) -> None:
+    """Tag all scheduler requests made from the current task (and its children)."""
+    _job_context.set(JobContext(account=account, job_id=job_id, priority=priority))
+
+
+def current_job() -> JobContext:
+    return _job_context.get()
+
+
+@dataclass
+class _Ticket:
+    seq: int
+    resource: str
+    account: str
+    job_id: Optional[str]
+    priority: int
+    enqueued_at: float
+    granted: bool = False
+    future: Optional[asyncio.Future] = None
+
+
+@dataclass
+class _ResourcePool:
+    name: str
+    limit: int
+    waiting: list[_Ticket] = field(default_factory=list)
+    running: list[_Ticket] = field(default_factory=list)
+    durations: deque = field(default_factory=lambda: deque(maxlen=_DURATION_SAMPLES))
+    granted_total: int = 0
+    wait_secs_total: float = 0.0
+
+    def avg_duration(self) -> float:
+        if not self.durations:
+            return _PRIOR_DURATIONS.get(self.name, 60.0)
+        return sum(self.durations) / len(self.durations)
+
+    def _held_by(self, account: str) -> int:
+        return sum(1 for t in self.running if t.account == account)
+
+    def ordered_waiters(self) -> list[_Ticket]:
+        """Waiters in dispatch order: priority, fair share per account, then FIFO."""
+        return sorted(self.waiting, key=lambda t: (t.priority, self._held_by(t.account), t.seq))
+
+
+class Scheduler:
+    def __init__(self, limits: dict[str, int]):
+        self._pools = {name: _ResourcePool(name, max(1, n)) for name, n in limits.items()}
+        self._seq = itertools.count()
+
+    def _pool(self, resource: str) -> _ResourcePool:
+        pool = self._pools.get(resource)
+        if pool is None:
+            raise ValueError(f"Unknown resource class: {resource}")
+        return pool
+
+    def _dispatch(self, pool: _ResourcePool) -> None:
+        while pool.waiting and len(pool.running) < pool.limit:
+            ticket = pool.ordered_waiters()[0]
+            pool.waiting.remove(ticket)
+            ticket.granted = True
+            pool.running.append(ticket)
+            if ticket.future and not ticket.future.done():
+                ticket.future.set_result(None)
+
+    async def acquire(self, resource: str) -> _Ticket:
+        pool = self._pool(resource)
+        job = current_job()
+        ticket = _Ticket(
+            seq=next(self._seq),
+            resource=resource,
+            account=job.account or "anonymous",
+            job_id=job.job_id,
+            priority=job.priority,
+            enqueued_at=time.time(),
+            future=asyncio.get_running_loop().create_future(),
+        )
+        pool.waiting.append(ticket)
+        self._dispatch(pool)
+        if not ticket.granted:
+            print(f"[scheduler] Queued {resource} for {ticket.account} "
+                  f"(position {self.position(ticket)}, {len(pool.running)}/{pool.limit} busy)")
+        try:
+            await ticket.future
+        except BaseException:
+            # Cancelled while waiting (or right after being granted)
+            if ticket in pool.waiting:
+                pool.waiting.remove(ticket)
+            elif ticket.granted:
+                self.release(ticket, record=False)
+            raise
+        pool.granted_total += 1
+        pool.wait_secs_total += time.time() - ticket.enqueued_at
+        ticket.enqueued_at = time.time()  # reused as start time for duration tracking
+        return ticket
+
+    def release(self, ticket: _Ticket, record: bool = True) -> None:
+        pool = self._pool(ticket.resource)
+        if ticket in pool.running:
+            pool.running.remove(ticket)
+            if record:
+                pool.durations.append(time.time() - ticket.enqueued_at)
+        self._dispatch(pool)
+
+    @asynccontextmanager
+    async def slot(self, resource: str):
+        ticket = await self.acquire(resource)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    # ── Introspection ───────────────────────────────────────────────────
+
+    def has_capacity(self, resource: str) -> bool:
+        """True when a slot is free and nobody is queued — safe for background work."""
+        pool = self._pool(resource)
+        return not pool.waiting and len(pool.running) < pool.limit
+
+    def has_waiters(self, resource: str) -> bool:
+        return bool(self._pool(resource).waiting)
+
+    def position(self, ticket: _Ticket) -> Optional[int]:
+        """1-based queue position of a waiting ticket, or None once running."""
+        pool = self._pool(ticket.resource)
+        for i, t in enumerate(pool.ordered_waiters(), 1):
+            if t is ticket:
+                return i
+        return None
+
+    def _eta_for(self, pool: _ResourcePool, position: int) -> int:
+        """Seconds until a ticket at `position` is likely to start."""
+        avg = pool.avg_duration()
+        now = time.time()
+        # Remaining time of the slot that frees up first
+        remaining = [max(0.0, avg - (now - t.enqueued_at)) for t in pool.running]
+        first_free = min(remaining) if len(remaining) >= pool.limit else 0.0
+        rounds = math.ceil(position / pool.limit) - 1
+        return int(first_free + rounds * avg)
+
+    def get_queue_info(self, job_id: str) -> Optional[dict]:
+        """Return {resource, position, eta_seconds} for the job's first waiting ticket."""
+        for pool in self._pools.values():
+            for i, t in enumerate(pool.ordered_waiters(), 1):
+                if t.job_id == job_id:
+                    return {
+                        "resource": pool.name,
+                        "position": i,
+                        "eta_seconds": self._eta_for(pool, i),
+                    }
+        return None
+
+    def snapshot(self) -> dict:
+        return {
+            name: {
+                "limit": p.limit,
+                "running": len(p.running),
+                "waiting": len(p.waiting),
+                "granted_total": p.granted_total,
+                "avg_wait_secs": round(p.wait_secs_total / p.granted_total, 1) if p.granted_total else 0.0,
+                "avg_duration_secs": round(p.avg_duration(), 1),
+            }
+            for name, p in self._pools.items()
+        }
+
+
+_scheduler: Optional[Scheduler] = None
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = Scheduler({
+            "claude": config.SCHED_CLAUDE_SLOTS,
+            "gradle": config.SCHED_GRADLE_SLOTS,
+            "xcodebuild": config.SCHED_XCODEBUILD_SLOTS,
+            "emulator": config.SCHED_EMULATOR_SLOTS,
+            "playwright": config.SCHED_PLAYWRIGHT_SLOTS,
+        })
+    return _scheduler
+
+
+def slot(resource: str):
+    """Shorthand for ``get_scheduler().slot(resource)``."""
+    return get_scheduler().slot(resource)
+
+
+def get_queue_info(job_id: str) -> Optional[dict]:
+    return get_scheduler().get_queue_info(job_id)
@@ -2,13 +2,12 @@
 """
 Generate APP_REGISTRY.md — the local source of truth for all apps.
 
-Pulls from workspaces.json + filesystem (git log for last edit) + Supabase schema info.
+Pulls from the workspace store (workspaces.json / workspaces.db) + filesystem (git log for last edit) + Supabase schema info.
 
 Usage:
     python scripts/generate_app_registry.py
 """
 
-import json
 import os
 import subprocess
 import sys
@@ -17,6 +16,8 @@ from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import storage
+
 REPO_ROOT = Path(__file__).resolve().parent.parent
 WORKSPACES_PATH = REPO_ROOT / "workspaces.json"
 OUTPUT_PATH = REPO_ROOT / "APP_REGISTRY.md"
@@ -63,8 +64,9 @@ def has_supabase_schema(entry: dict) -> bool:
 
 
 def main():
-    with open(WORKSPACES_PATH) as f:
-        workspaces = json.load(f)
+    store = storage.open_store(WORKSPACES_PATH)
+    store.import_json("workspaces", WORKSPACES_PATH)  # no-op once the bot has run
+    workspaces = store.items("workspaces")
 
     # Separate into categories
     my_apps = []
@@ -2,17 +2,20 @@
 """
 migrate_to_accounts.py — One-time migration from single-user to multi-tenant.
 
-1. Reads allowlist.json → creates an account per user in accounts.json
+1. Reads the allowlist store → creates an account per user in accounts.json
 2. Maps existing .api-token as a legacy key on the admin account
 3. Copies admin's Supabase/Apple/Google creds from env vars into the account
-4. Updates workspaces.json with account_id fields
-5. Updates user_defaults.json and user_platforms.json to include account_id keys
-6. Backs up all files as *.pre-migration.bak before modifying
+4. Sets account_id on workspaces in the workspace registry
+5. Adds account_id keys to the user defaults and platforms
+6. Backs up the allowlist and workspace collections as *.pre-migration.bak
+   (JSON exports) before modifying
+
+The allowlist and workspace data live in their stores (storage.py); the
+legacy JSON files are only imported the first time a store is opened, so
+all reads and writes go through the stores, never the JSON files.
 """
 
-import json
 import os
-import shutil
 import sys
 from pathlib import Path
 
@@ -21,14 +24,16 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
 import config
+import storage
 from accounts import AccountManager
+from allowlist import Allowlist
+from workspaces import WorkspaceRegistry
 
 
-def backup(path: Path):
-    if path.exists():
-        bak = path.with_suffix(path.suffix + ".pre-migration.bak")
-        shutil.copy2(path, bak)
-        print(f"  Backed up {path.name} → {bak.name}")
+def backup(store, collection: str, json_path: Path):
+    bak = json_path.with_suffix(json_path.suffix + ".pre-migration.bak")
+    store.export_json(collection, bak)
+    print(f"  Backed up {collection} → {bak.name}")
 
 
 def main():
@@ -40,25 +45,30 @@ def main():
     defaults_path = workspaces_path.parent / "user_defaults.json"
     platforms_path = workspaces_path.parent / "user_platforms.json"
 
-    if accounts_path.exists():
+    if accounts_path.exists() or Path(storage.store_path(accounts_path)).exists():
         print(f"⚠️  {accounts_path} already exists. Aborting to avoid overwrite.")
         print("   Delete it first if you want to re-run the migration.")
         sys.exit(1)
 
-    # Backup all files
+    # Opening the registry and allowlist imports any legacy JSON into their stores
+    registry = WorkspaceRegistry()
+    allowlist = Allowlist()
+    ws_store, allowlist_store = registry._store, allowlist._store
+
+    # Backup all collections
     print("1. Backing up files...")
-    for p in [allowlist_path, workspaces_path, defaults_path, platforms_path]:
-        backup(p)
+    backup(allowlist_store, "users", allowlist_path)
+    backup(ws_store, "workspaces", workspaces_path)
+    backup(ws_store, "user_defaults", defaults_path)
+    backup(ws_store, "user_platforms", platforms_path)
 
     # Read allowlist
     print("\n2. Reading allowlist...")
-    allowlist_data = {}
-    if allowlist_path.exists():
-        allowlist_data = json.loads(allowlist_path.read_text())
-    else:
-        print("   No allowlist.json found, creating admin-only account.")
+    allowlist_data = dict(allowlist.list_users())
+    if not allowlist_data:
+        print("   Allowlist is empty, creating admin-only account.")
 
-    # Initialize AccountManager (creates empty accounts.json)
+    # Initialize AccountManager (creates an empty accounts store)
     mgr = AccountManager(str(accounts_path))
 
     # Track discord_user_id -> account_id mapping
@@ -68,8 +78,7 @@ def main():
     admin_account_id = None
 
     print("\n3. Creating accounts from allowlist...")
-    for uid_str, info in allowlist_data.items():
-        uid = int(uid_str)
+    for uid, info in allowlist_data.items():
         if uid == 0:
             continue  # skip pending_invites entry
 
@@ -81,8 +90,8 @@ def main():
         mgr.link_discord(acct.account_id, uid)
         acct.daily_cap_usd = info.get("daily_cap_usd", config.DEFAULT_USER_DAILY_CAP_USD)
         # Update daily_cap in stored data
-        mgr._accounts[acct.account_id]["daily_cap_usd"] = acct.daily_cap_usd
-        mgr._save()
+        with mgr._edit(acct.account_id) as stored:
+            stored["daily_cap_usd"] = acct.daily_cap_usd
 
         discord_to_account[uid] = acct.account_id
         generated_keys.append((display_name, acct.account_id, raw_key))
@@ -141,46 +150,28 @@ def main():
             })
             print("   Stored Google Play credentials")
 
-    # Update workspaces.json with account_id
-    print("\n6. Updating workspaces.json with account_id...")
-    if workspaces_path.exists():
-        workspaces = json.loads(workspaces_path.read_text())
-        updated = 0
-        for slug, entry in workspaces.items():
-            if not isinstance(entry, dict):
-                continue
-            owner_id = entry.get("owner_id")
-            if owner_id and int(owner_id) in discord_to_account:
-                entry["account_id"] = discord_to_account[int(owner_id)]
-                updated += 1
-        workspaces_path.write_text(json.dumps(workspaces, indent=2) + "\n")
-        print(f"   Updated {updated} workspaces")
-
-    # Update user_defaults.json
-    print("\n7. Updating user_defaults.json...")
-    if defaults_path.exists():
-        defaults = json.loads(defaults_path.read_text())
-        new_defaults = {}
-        for uid_str, ws_slug in defaults.items():
-            uid = int(uid_str)
-            new_defaults[uid_str] = ws_slug
-            if uid in discord_to_account:
-                new_defaults[discord_to_account[uid]] = ws_slug
-        defaults_path.write_text(json.dumps(new_defaults, indent=2) + "\n")
-        print(f"   Added account_id keys to defaults")
-
-    # Update user_platforms.json
-    print("\n8. Updating user_platforms.json...")
-    if platforms_path.exists():
-        platforms = json.loads(platforms_path.read_text())
-        new_platforms = {}
-        for uid_str, platform in platforms.items():
-            uid = int(uid_str)
-            new_platforms[uid_str] = platform
-            if uid in discord_to_account:
-                new_platforms[discord_to_account[uid]] = platform
-        platforms_path.write_text(json.dumps(new_platforms, indent=2) + "\n")
-        print(f"   Added account_id keys to platforms")
+    # Attach workspaces to their owners' accounts
+    print("\n6. Updating workspaces with account_id...")
+    updated = 0
+    for slug in registry.list_keys():
+        owner_id = registry.get_owner(slug)
+        if owner_id and int(owner_id) in discord_to_account:
+            registry.set_account_id(slug, discord_to_account[int(owner_id)])
+            updated += 1
+    print(f"   Updated {updated} workspaces")
+
+    # Stored keys are strings; Discord user ids are numeric
+    print("\n7. Updating user defaults...")
+    for uid_str, ws_slug in ws_store.items("user_defaults").items():
+        if uid_str.isdigit() and int(uid_str) in discord_to_account:
+            registry.set_default(discord_to_account[int(uid_str)], ws_slug)
+    print(f"   Added account_id keys to defaults")
+
+    print("\n8. Updating user platforms...")
+    for uid_str, platform in ws_store.items("user_platforms").items():
+        if uid_str.isdigit() and int(uid_str) in discord_to_account:
+            registry.set_platform(discord_to_account[int(uid_str)], platform)
+    print(f"   Added account_id keys to platforms")
 
     # Print generated keys
     print("\n" + "=" * 60)
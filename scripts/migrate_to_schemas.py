@@ -7,14 +7,13 @@ For each app:
   2. GRANT permissions to anon/authenticated
   3. ALTER TABLE public.<table> SET SCHEMA app_<name>  (moves data + indexes + RLS)
   4. CREATE app_meta in the new schema with display metadata
-  5. Update workspaces.json with supabase_schema
+  5. Record supabase_schema in the workspace registry
 
 Usage:
     python3 scripts/migrate_to_schemas.py
 """
 
 import asyncio
-import json
 import sys
 import os
 
@@ -22,11 +21,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from supabase_client import run_sql, query_sql
 from helpers.schema_manager import ensure_schema, ensure_dashboard_function
-
-WORKSPACES_PATH = os.path.join(
-    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-    "workspaces.json",
-)
+from workspaces import WorkspaceRegistry
 
 # ── App → table mapping ──────────────────────────────────────────────────────
 
@@ -223,19 +218,14 @@ async def main():
         print("\nSome migrations failed. Fix errors and re-run (script is idempotent).")
         return
 
-    # Update workspaces.json
-    print(f"\nUpdating workspaces.json...")
-    with open(WORKSPACES_PATH) as f:
-        workspaces = json.load(f)
-
+    # Record schemas in the workspace registry
+    print(f"\nUpdating workspace registry...")
+    registry = WorkspaceRegistry()
     for slug, app_config in APPS.items():
-        if slug in workspaces:
-            workspaces[slug]["supabase_schema"] = app_config["schema"]
+        if registry.exists(slug):
+            registry.set_schema(slug, app_config["schema"])
             print(f"  {slug} → {app_config['schema']}")
-
-    with open(WORKSPACES_PATH, "w") as f:
-        json.dump(workspaces, f, indent=2)
-    print("  workspaces.json updated ✓")
+    print("  workspace registry updated ✓")
 
     # Re-deploy get_all_apps() RPC
     print(f"\nUpdating get_all_apps() RPC...")
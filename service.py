@@ -9,10 +9,31 @@ import shutil
 import time
 import uuid
 import logging
+from collections import deque
 from datetime import datetime, timezone
 from dataclasses import dataclass, field
 from typing import Callable, Awaitable, Optional
 
+import accounts
+import build_cache
+import build_errors
+import build_events
+import build_store
+import claude_pool
+import config
+import cost_tracker
+import eta_model
+import fix_index
+import gradle_pool
+import llm_router
+import proc_io
+import rotation_policy
+import run_queue
+import scheduler
+import stream_json
+import supabase_client
+import telemetry
+import webhook_dispatcher
 from agent_factory import create_agent_runner
 from agent_protocol import AgentRunner
 from workspaces import WorkspaceRegistry
@@ -31,6 +52,11 @@ def _utc_timestamp() -> str:
 
 # ── Data classes ─────────────────────────────────────────────────────────────
 
+def _log_buffer(lines=()) -> deque:
+    """Ring buffer for per-build log lines (oldest lines drop off)."""
+    return deque(lines, maxlen=config.BUILD_LOG_MAX_LINES)
+
+
 @dataclass
 class BuildRequest:
     description: str
@@ -49,14 +75,26 @@ class BuildStatus:
     message: str
     platforms: dict = field(default_factory=dict)
     elapsed_seconds: int = 0
-    logs: list[str] = field(default_factory=list)
+    logs: deque[str] = field(default_factory=lambda: _log_buffer())
     webhook_url: str | None = None  # fires on completion
+    queued_for: str | None = None  # resource class the build is waiting on
+    queue_position: int | None = None
+    eta_seconds: int | None = None
+    account_id: str | None = None
+    created_at: float = field(default_factory=time.time)
+    operation: str | None = None  # buildapp, prompt, demo, build, appraise — keys the ETA model
+    platform: str | None = None
+
+    def __post_init__(self):
+        if not isinstance(self.logs, deque):
+            self.logs = _log_buffer(self.logs)
 
 @dataclass
 class PromptRequest:
     workspace: str
     prompt: str
     webhook_url: str | None = None
+    account_id: str | None = None
 
 @dataclass
 class WorkspaceInfo:
@@ -71,7 +109,7 @@ class WorkspaceInfo:
 
 _registry: WorkspaceRegistry | None = None
 _agent_runner: AgentRunner | None = None
-_builds: dict[str, BuildStatus] = {}
+_build_store: build_store.BuildStore | None = None
 
 # ── Analytics tracking ───────────────────────────────────────────────────────
 
@@ -117,19 +155,64 @@ def get_analytics() -> dict:
         **_analytics,
         "success_rate": round(_analytics["successes"] / total * 100, 1) if total else 0,
         "avg_duration_secs": round(_analytics["total_duration_secs"] / total) if total else 0,
+        "build_cache": build_cache.stats(),
+        "gradle_pool": gradle_pool.metrics(),
+        "scheduler": scheduler.get_scheduler().snapshot(),
+        "webhooks": webhook_dispatcher.metrics(),
+        "claude_stream": stream_json.stats(),
+        "claude_pool": claude_pool.metrics(),
+        "fix_index": fix_index.metrics(),
+        "session_rotation": rotation_policy.metrics(),
+        "claude_runs": run_queue.metrics(),
+        "subprocess_io": proc_io.metrics(),
+        "build_errors": build_errors.metrics(),
+        "eta_model": eta_model.metrics(),
+        "telemetry": telemetry.metrics(),
+        "spend": cost_tracker.metrics(),
+        "llm_router": llm_router.metrics(),
+        "auth": accounts.metrics(),
+        "supabase": supabase_client.metrics(),
     }
 
 
 async def _send_webhook_event(webhook_url: str | None, event: dict):
-    """Fire-and-forget webhook POST. Never blocks the build."""
+    """Queue a webhook POST for background delivery. Never blocks the build."""
     if not webhook_url:
         return
     try:
-        import httpx
-        async with httpx.AsyncClient(timeout=5) as client:
-            await client.post(webhook_url, json=event)
+        webhook_dispatcher.enqueue(webhook_url, event)
     except Exception as e:
-        logger.warning(f"Webhook delivery failed: {e}")
+        logger.warning(f"Webhook enqueue failed: {e}")
+
+
+def _publish_progress(status: BuildStatus, msg: str, prev_phase: str):
+    """Push a status line (and any phase transition) to live SSE subscribers."""
+    build_events.publish(status.build_id, "log", {
+        "message": msg,
+        "elapsed_seconds": status.elapsed_seconds,
+    })
+    if status.phase != prev_phase:
+        build_events.publish(status.build_id, "phase", {
+            "phase": status.phase,
+            "previous": prev_phase,
+        })
+
+
+def finish_build(status: BuildStatus):
+    """Persist the final status and end its event stream."""
+    _get_build_store().save(status)
+    if status.operation and status.status == "success":
+        eta_model.get_model().record(f"job:{status.operation}", status.elapsed_seconds,
+                                     platform=status.platform or "", kind="")
+    build_events.publish(status.build_id, "complete", {
+        "status": status.status,
+        "phase": status.phase,
+        "message": status.message,
+        "elapsed_seconds": status.elapsed_seconds,
+        "slug": status.slug,
+        "platforms": status.platforms,
+    })
+    build_events.close(status.build_id)
 
 
 async def _emit_completion_event(status: BuildStatus):
@@ -215,9 +298,18 @@ def _get_registry() -> WorkspaceRegistry:
     global _registry
     if _registry is None:
         _registry = WorkspaceRegistry()
+    else:
+        _registry.reload()  # apply the bot's changes; a no-op when there are none
     return _registry
 
 
+def _get_build_store() -> build_store.BuildStore:
+    global _build_store
+    if _build_store is None:
+        _build_store = build_store.BuildStore(config.BUILD_STORE_PATH, BuildStatus)
+    return _build_store
+
+
 def _get_agent_runner() -> AgentRunner:
     global _agent_runner
     if _agent_runner is None:
@@ -232,8 +324,8 @@ def _resolve_credentials(account_id: str | None) -> dict | None:
         return None  # use global config (backward compat)
 
     try:
-        from accounts import AccountManager
-        mgr = AccountManager()
+        from accounts import get_manager
+        mgr = get_manager()
         acct = mgr.get(account_id)
         if not acct:
             return None
@@ -254,12 +346,41 @@ def _resolve_credentials(account_id: str | None) -> dict | None:
 
 # ── Build tracking ───────────────────────────────────────────────────────────
 
-def get_build(build_id: str) -> BuildStatus | None:
-    return _builds.get(build_id)
+def _refresh_queue_info(status: BuildStatus) -> BuildStatus:
+    """Fill in queue position/ETA while the build waits on a scheduler slot,
+    and the expected time left (from the ETA model) once it is running."""
+    info = scheduler.get_queue_info(status.build_id)
+    status.queued_for = info["resource"] if info else None
+    status.queue_position = info["position"] if info else None
+    status.eta_seconds = info["eta_seconds"] if info else None
+    if info is None and status.operation and status.status in ("queued", "building"):
+        est = eta_model.get_model().estimate(f"job:{status.operation}", platform=status.platform or "", kind="")
+        remaining = est.remaining(time.time() - status.created_at)
+        status.eta_seconds = int(remaining) if remaining is not None else None
+    return status
+
+
+def get_build(build_id: str, kind: str = "build") -> BuildStatus | None:
+    status = _get_build_store().get(build_id, kind=kind)
+    return _refresh_queue_info(status) if status else None
+
+
+def list_builds(account_id: str | None = None, slug: str | None = None,
+                status: str | None = None, since: float | None = None,
+                until: float | None = None, limit: int = 100,
+                kind: str = "build") -> list[BuildStatus]:
+    """Newest-first builds, filtered by account, workspace, status and created_at range."""
+    builds = _get_build_store().query(
+        kind=kind, account_id=account_id, slug=slug, status=status,
+        since=since, until=until, limit=limit,
+    )
+    return [_refresh_queue_info(b) for b in builds]
 
 
-def list_builds() -> list[BuildStatus]:
-    return list(_builds.values())
+def register_build(status: BuildStatus, kind: str = "build") -> None:
+    """Persist a new status and open its progress event stream."""
+    _get_build_store().put(status, kind=kind)
+    build_events.open_stream(status.build_id)
 
 
 # ── Service functions ────────────────────────────────────────────────────────
@@ -273,10 +394,14 @@ async def build_app(request: BuildRequest) -> BuildStatus:
         status="queued",
         phase="scaffolding",
         message="Build queued",
+        account_id=request.account_id,
+        operation="buildapp",
+        platform=request.platform,
     )
-    _builds[build_id] = status
+    register_build(status)
 
     async def _run_build():
+        scheduler.bind(account=request.account_id, job_id=build_id)
         registry = _get_registry()
         claude = _get_agent_runner()
         start = time.time()
@@ -297,10 +422,12 @@ async def build_app(request: BuildRequest) -> BuildStatus:
         })
 
         async def on_status(msg: str, _attachment: str | None = None):
+            prev_phase = status.phase
             status.message = msg
             status.elapsed_seconds = int(time.time() - start)
             status.logs.append(msg)
             status.phase = _infer_phase(msg, status.phase)
+            _publish_progress(status, msg, prev_phase)
             logger.info(f"[build:{build_id}] {msg[:120]}")
 
             # Dispatch real-time webhook event
@@ -373,6 +500,7 @@ async def build_app(request: BuildRequest) -> BuildStatus:
                 "detail": {"error": str(e), "recoverable": False},
             })
 
+        finish_build(status)
         _track_build("buildapp", status.slug or "unknown", status.status == "success", status.elapsed_seconds)
 
     asyncio.create_task(_run_build())
@@ -396,16 +524,20 @@ async def send_prompt(request: PromptRequest) -> BuildStatus:
         phase="building",
         message="Sending prompt to Claude...",
         webhook_url=request.webhook_url,
+        account_id=request.account_id,
+        operation="prompt",
     )
-    _builds[build_id] = status
+    register_build(status)
 
     async def _run():
+        scheduler.bind(account=request.account_id, job_id=build_id)
         start = time.time()
         try:
             async def on_status(msg: str):
                 status.message = msg
                 status.elapsed_seconds = int(time.time() - start)
                 status.logs.append(msg)
+                _publish_progress(status, msg, status.phase)
 
             loop_result = await run_agent_loop(
                 initial_prompt=request.prompt,
@@ -425,6 +557,7 @@ async def send_prompt(request: PromptRequest) -> BuildStatus:
             status.phase = "complete"
             status.message = f"Error: {e}"
 
+        finish_build(status)
         _track_build("prompt", status.slug, status.status == "success", status.elapsed_seconds)
         await _emit_completion_event(status)
 
@@ -465,7 +598,7 @@ async def get_workspace(slug: str) -> WorkspaceInfo | None:
     )
 
 
-async def demo_workspace(slug: str, platform: str = "web") -> BuildStatus:
+async def demo_workspace(slug: str, platform: str = "web", account_id: str | None = None) -> BuildStatus:
     """Trigger a demo build for a workspace. Returns build status."""
     registry = _get_registry()
     ws_path = registry.get_path(slug)
@@ -479,13 +612,23 @@ async def demo_workspace(slug: str, platform: str = "web") -> BuildStatus:
         status="building",
         phase="demoing",
         message=f"Starting {platform} demo...",
+        account_id=account_id,
+        operation="demo",
+        platform=platform,
     )
-    _builds[build_id] = status
+    register_build(status)
 
     async def _run():
+        scheduler.bind(account=account_id, job_id=build_id)
         start = time.time()
         try:
-            result = await demo_platform(platform, ws_path, workspace_key=slug)
+            async def on_status(msg: str):
+                status.message = msg
+                status.elapsed_seconds = int(time.time() - start)
+                status.logs.append(msg)
+                _publish_progress(status, msg, status.phase)
+
+            result = await demo_platform(platform, ws_path, workspace_key=slug, on_status=on_status)
             status.status = "success" if result.success else "failed"
             status.message = result.message
             status.phase = "complete"
@@ -498,6 +641,7 @@ async def demo_workspace(slug: str, platform: str = "web") -> BuildStatus:
             status.phase = "complete"
             status.message = f"Error: {e}"
 
+        finish_build(status)
         _track_build("demo", slug, status.status == "success", status.elapsed_seconds)
         await _emit_completion_event(status)
 
@@ -540,7 +684,8 @@ async def clear_session(slug: str) -> None:
     claude.clear_session(slug)
 
 
-async def build_workspace_platform(slug: str, platform: str = "web") -> BuildStatus:
+async def build_workspace_platform(slug: str, platform: str = "web",
+                                   account_id: str | None = None) -> BuildStatus:
     """Build a workspace for a specific platform. Returns build status for polling."""
     registry = _get_registry()
     ws_path = registry.get_path(slug)
@@ -554,10 +699,14 @@ async def build_workspace_platform(slug: str, platform: str = "web") -> BuildSta
         status="building",
         phase="building",
         message=f"Building {platform}...",
+        account_id=account_id,
+        operation="build",
+        platform=platform,
     )
-    _builds[build_id] = status
+    register_build(status)
 
     async def _run():
+        scheduler.bind(account=account_id, job_id=build_id)
         start = time.time()
         try:
             result = await build_platform(platform, ws_path)
@@ -573,6 +722,7 @@ async def build_workspace_platform(slug: str, platform: str = "web") -> BuildSta
             status.phase = "complete"
             status.message = f"Error: {e}"
 
+        finish_build(status)
         _track_build("build", slug, status.status == "success", status.elapsed_seconds)
         await _emit_completion_event(status)
 
@@ -586,7 +736,7 @@ async def plan_app(description: str) -> dict | None:
     return await generate_plan(description, claude)
 
 
-async def appraise_workspace(slug: str) -> BuildStatus:
+async def appraise_workspace(slug: str, account_id: str | None = None) -> BuildStatus:
     """Run appraisal on a workspace. Background task with polling."""
     registry = _get_registry()
     ws_path = registry.get_path(slug)
@@ -601,10 +751,13 @@ async def appraise_workspace(slug: str) -> BuildStatus:
         status="building",
         phase="building",
         message="Running appraisal...",
+        account_id=account_id,
+        operation="appraise",
     )
-    _builds[build_id] = status
+    register_build(status)
 
     async def _run():
+        scheduler.bind(account=account_id, job_id=build_id)
         start = time.time()
         try:
             result = await run_appraisal(claude, slug, ws_path)
@@ -622,6 +775,7 @@ async def appraise_workspace(slug: str) -> BuildStatus:
             status.phase = "complete"
             status.message = f"Error: {e}"
 
+        finish_build(status)
         _track_build("appraise", slug, status.status == "success", status.elapsed_seconds)
         await _emit_completion_event(status)
 
@@ -0,0 +1,261 @@
+"""
+session_store.py — Per-workspace Claude session state in one SQLite file.
+
+Replaces claude_sessions.json, claude_session_tokens.json and
+claude_session_resumes.json. Each of those was rewritten in full
+(non-atomically) several times per prompt. State is kept in memory and
+writes are coalesced: a change marks the workspace dirty and schedules one
+flush a moment later. The flush writes every dirty workspace in a single
+transaction, so a burst of updates from concurrent runs costs one commit, and
+a crash can never leave a half-written file. Only the columns a workspace's
+updates actually changed are written.
+
+The bot and the API each hold a store on the same file. A Claude run holds
+the workspace's cross-process lock (run_queue.py), so ClaudeRunner reloads
+the workspace's row when its run starts and flushes before the lock is
+released; the other process's session is picked up instead of clobbered.
+
+    store = get_store()
+    store.get("my-app").session_id
+    store.update("my-app", session_id="abc", resumes=0)
+    store.clear("my-app")
+
+The legacy JSON files are imported once, the first time the database is
+created.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import json
+import sqlite3
+import time
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+from typing import Optional
+
+import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    workspace      TEXT PRIMARY KEY,
+    session_id     TEXT,
+    context_tokens INTEGER NOT NULL DEFAULT 0,
+    resumes        INTEGER NOT NULL DEFAULT 0,
+    usage          TEXT,
+    workspace_path TEXT,
+    summary_resumes INTEGER NOT NULL DEFAULT -1,
+    updated_at     REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_LEGACY_FILES = {
+    "session_id": "claude_sessions.json",
+    "context_tokens": "claude_session_tokens.json",
+    "resumes": "claude_session_resumes.json",
+}
+
+
+@dataclass(frozen=True)
+class SessionState:
+    session_id: Optional[str] = None
+    context_tokens: int = 0  # last known cumulative tokens (informational)
+    resumes: int = 0         # prompts sent in the current session
+    usage: dict = field(default_factory=dict, hash=False)  # rotation_policy.SessionUsage
+    workspace_path: Optional[str] = None
+    summary_resumes: int = -1  # resume count the live handoff summary covers (-1 = none)
+
+
+# Columns added after the first release: name → ALTER TABLE definition
+_ADDED_COLUMNS = {
+    "usage": "TEXT",
+    "workspace_path": "TEXT",
+    "summary_resumes": "INTEGER NOT NULL DEFAULT -1",
+}
+
+_EMPTY = SessionState()
+_FIELDS = tuple(f.name for f in fields(SessionState))
+
+
+def _from_row(row: sqlite3.Row) -> SessionState:
+    return SessionState(
+        session_id=row["session_id"],
+        context_tokens=row["context_tokens"],
+        resumes=row["resumes"],
+        usage=json.loads(row["usage"]) if row["usage"] else {},
+        workspace_path=row["workspace_path"],
+        summary_resumes=row["summary_resumes"],
+    )
+
+
+def _column(state: SessionState, name: str):
+    value = getattr(state, name)
+    if name == "usage":
+        return json.dumps(value) if value else None
+    return value
+
+
+class SessionStore:
+    def __init__(self, path: str, legacy_dir: Optional[str] = None,
+                 flush_delay: Optional[float] = None):
+        self._flush_delay = flush_delay if flush_delay is not None else config.SESSION_FLUSH_DELAY_SECS
+        self._states: dict[str, SessionState] = {}
+        self._dirty: dict[str, set[str]] = {}  # workspace → changed fields
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._metrics = {"updates": 0, "flushes": 0, "rows_written": 0}
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        columns = {r["name"] for r in self._db.execute("PRAGMA table_info(sessions)")}
+        for name, definition in _ADDED_COLUMNS.items():
+            if name not in columns:
+                self._db.execute(f"ALTER TABLE sessions ADD COLUMN {name} {definition}")
+
+        for row in self._db.execute("SELECT * FROM sessions"):
+            self._states[row["workspace"]] = _from_row(row)
+        if legacy_dir is not None:
+            self._import_legacy(Path(legacy_dir))
+
+    # ── Migration ────────────────────────────────────────────────────────
+
+    def _import_legacy(self, legacy_dir: Path) -> None:
+        if self._db.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+            return
+        legacy: dict[str, dict[str, dict]] = {}
+        for field_name, filename in _LEGACY_FILES.items():
+            path = legacy_dir / filename
+            try:
+                legacy[field_name] = json.loads(path.read_text()) if path.exists() else {}
+            except (json.JSONDecodeError, ValueError, OSError):
+                legacy[field_name] = {}
+        for ws in set().union(*(d.keys() for d in legacy.values())):
+            session_id = legacy["session_id"].get(ws)
+            resumes = legacy["resumes"].get(ws)
+            if resumes is None and session_id:
+                # No resume tracking for this session yet: rotate it on next use
+                resumes = config.SESSION_MAX_RESUMES
+            self._states[ws] = SessionState(
+                session_id=session_id,
+                context_tokens=int(legacy["context_tokens"].get(ws, 0)),
+                resumes=int(resumes or 0),
+            )
+            self._dirty[ws] = set(_FIELDS)
+        self.flush()
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_imported', ?)",
+                         (str(time.time()),))
+
+    # ── Reads ────────────────────────────────────────────────────────────
+
+    def get(self, workspace: str) -> SessionState:
+        return self._states.get(workspace, _EMPTY)
+
+    def workspaces_with_session(self) -> list[str]:
+        return [ws for ws, s in self._states.items() if s.session_id]
+
+    def reload(self, workspace: str) -> SessionState:
+        """Re-read a workspace's row, picking up writes from other processes.
+        Pending changes to it are flushed first."""
+        if workspace in self._dirty:
+            self.flush()
+        row = self._db.execute("SELECT * FROM sessions WHERE workspace = ?", (workspace,)).fetchone()
+        if row is None:
+            self._states.pop(workspace, None)
+            return _EMPTY
+        self._states[workspace] = state = _from_row(row)
+        return state
+
+    # ── Writes ───────────────────────────────────────────────────────────
+
+    def update(self, workspace: str, **changes) -> SessionState:
+        """Change some fields of a workspace's state; persisted on the next flush."""
+        unknown = set(changes) - set(_FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown session fields: {', '.join(sorted(unknown))}")
+        current = self.get(workspace)
+        new = replace(current, **changes)
+        changed = {name for name in changes if getattr(new, name) != getattr(current, name)}
+        if changed:
+            self._states[workspace] = new
+            self._mark_dirty(workspace, changed)
+        return new
+
+    def clear(self, workspace: str) -> None:
+        """Forget the session, its token count and its resume count."""
+        if self._states.pop(workspace, None) is not None:
+            # Any later update rewrites the whole row
+            self._mark_dirty(workspace, set(_FIELDS))
+
+    def _mark_dirty(self, workspace: str, changed: set[str]) -> None:
+        self._metrics["updates"] += 1
+        self._dirty.setdefault(workspace, set()).update(changed)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # no loop to coalesce on (startup, scripts)
+            return
+        if self._flush_handle is not None and self._flush_loop is not loop:
+            self.flush()  # the loop that scheduled the pending flush is gone
+            return
+        if self._flush_handle is None:
+            self._flush_loop = loop
+            self._flush_handle = loop.call_later(self._flush_delay, self.flush)
+
+    def flush(self) -> None:
+        """Write every dirty workspace in one transaction."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        now = time.time()
+        try:
+            self._db.execute("BEGIN")
+            for ws, changed in dirty.items():
+                state = self._states.get(ws)
+                if state is None:
+                    self._db.execute("DELETE FROM sessions WHERE workspace = ?", (ws,))
+                    continue
+                # Insert the full row if it's new, otherwise touch only what changed
+                assignments = "".join(f"{name}=excluded.{name}, " for name in _FIELDS if name in changed)
+                self._db.execute(
+                    f"INSERT INTO sessions (workspace, {', '.join(_FIELDS)}, updated_at)"
+                    f" VALUES (?, {', '.join('?' for _ in _FIELDS)}, ?)"
+                    f" ON CONFLICT(workspace) DO UPDATE SET {assignments}updated_at=excluded.updated_at",
+                    (ws, *(_column(state, name) for name in _FIELDS), now),
+                )
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            for ws, changed in dirty.items():  # retry on the next flush
+                self._dirty.setdefault(ws, set()).update(changed)
+            print(f"[sessions] Flush failed: {e}")
+            return
+        self._metrics["flushes"] += 1
+        self._metrics["rows_written"] += len(dirty)
+
+    def metrics(self) -> dict:
+        return {**self._metrics, "workspaces": len(self._states), "dirty": len(self._dirty)}
+
+
+_store: Optional[SessionStore] = None
+
+
+def get_store() -> SessionStore:
+    global _store
+    if _store is None:
+        _store = SessionStore(config.SESSION_STORE_PATH,
+                              legacy_dir=str(Path(config.WORKSPACES_PATH).parent))
+        atexit.register(_store.flush)
+    return _store
@@ -0,0 +1,295 @@
+"""
+storage.py — Transactional document store behind accounts, the allowlist
+and the workspace registry.
+
+accounts.json, allowlist.json, workspaces.json and the user_*.json preference
+files used to be rewritten in full on every mutation, with no lock, by both
+the bot and the API process: O(n) per write, and whichever process wrote
+last silently dropped the other's change. A Store keeps the same records as
+one row per document:
+
+    store = open_store("workspaces.json", indexes={"workspaces": _ws_index})
+    with store.transaction():
+        entry = store.get("workspaces", "my-app")
+        entry["active"] = False
+        store.put("workspaces", "my-app", entry)
+    store.find("workspaces", "owner_id", 42)   # indexed lookup → keys
+
+A write touches only its own document. transaction() takes the write lock up
+front (BEGIN IMMEDIATE), so a read-modify-write can't interleave with another
+process's; nested transaction() calls join the outer one.
+
+Indexes are per collection: a function from a document to (field, value)
+pairs, kept in a lookup table that is updated with each write.
+
+Change notification: every write stamps its document with the next value of
+a store-wide sequence, and a delete leaves a tombstone. A reader remembers the
+last sequence it applied and asks changes(since) for just what moved.
+changed() is the cheap check in front of that. SQLite bumps PRAGMA
+data_version whenever another connection commits, so polling it does no I/O.
+
+Each collection's legacy JSON file is imported once, the first time the store
+is opened. export_json() writes a collection back out in the same shape, for
+scripts and backups:
+
+    python storage.py export workspaces.json workspaces > backup.json
+
+STORAGE_BACKEND selects the implementation. Only "sqlite" ships today; the
+database lives next to the JSON file it replaces (workspaces.json →
+workspaces.db).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    collection TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    doc        TEXT,              -- JSON; NULL marks a deleted document
+    seq        INTEGER NOT NULL,
+    PRIMARY KEY (collection, key)
+);
+CREATE INDEX IF NOT EXISTS docs_seq ON docs (seq);
+CREATE TABLE IF NOT EXISTS lookup (
+    collection TEXT NOT NULL,
+    field      TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    PRIMARY KEY (collection, field, value, key)
+);
+CREATE INDEX IF NOT EXISTS lookup_key ON lookup (collection, key);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value);
+"""
+
+# collection → function(doc) yielding (field, value) pairs to index
+Indexer = Callable[[Any], Iterable[tuple[str, Any]]]
+
+
+class SQLiteStore:
+    def __init__(self, path: str, indexes: Optional[dict[str, Indexer]] = None):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript(_SCHEMA)
+        self._indexes = indexes or {}
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._data_version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        self._metrics = {"writes": 0, "transactions": 0, "rollbacks": 0}
+        for collection in self._indexes:
+            if self._meta(f"indexed:{collection}") is None:
+                self.reindex(collection)
+
+    # ── Transactions ─────────────────────────────────────────────────────
+
+    @contextmanager
+    def transaction(self) -> Iterator["SQLiteStore"]:
+        """Run the block atomically under the database write lock."""
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self
+                finally:
+                    self._depth -= 1
+                return
+            self._db.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield self
+                self._db.execute("COMMIT")
+                self._metrics["transactions"] += 1
+            except BaseException:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                self._metrics["rollbacks"] += 1
+                raise
+            finally:
+                self._depth = 0
+
+    def _meta(self, key: str) -> Any:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _next_seq(self) -> int:
+        seq = (self._meta("seq") or 0) + 1
+        self._set_meta("seq", seq)
+        return seq
+
+    # ── Documents ────────────────────────────────────────────────────────
+
+    def get(self, collection: str, key: str) -> Any:
+        row = self._db.execute(
+            "SELECT doc FROM docs WHERE collection = ? AND key = ? AND doc IS NOT NULL",
+            (collection, str(key)),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def items(self, collection: str) -> dict[str, Any]:
+        """Every live document in a collection, in insertion order."""
+        rows = self._db.execute(
+            "SELECT key, doc FROM docs WHERE collection = ? AND doc IS NOT NULL ORDER BY rowid",
+            (collection,),
+        )
+        return {key: json.loads(doc) for key, doc in rows}
+
+    def find(self, collection: str, field: str, value: Any) -> list[str]:
+        """Keys whose indexer emitted (field, value)."""
+        rows = self._db.execute(
+            "SELECT key FROM lookup WHERE collection = ? AND field = ? AND value = ? ORDER BY key",
+            (collection, field, str(value)),
+        )
+        return [key for (key,) in rows]
+
+    def put(self, collection: str, key: str, doc: Any) -> int:
+        """Insert or replace one document. Returns its sequence number."""
+        key = str(key)
+        with self.transaction():
+            seq = self._next_seq()
+            self._db.execute(
+                "INSERT INTO docs (collection, key, doc, seq) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (collection, key) DO UPDATE SET doc = excluded.doc, seq = excluded.seq",
+                (collection, key, json.dumps(doc), seq),
+            )
+            self._index(collection, key, doc)
+        self._metrics["writes"] += 1
+        return seq
+
+    def delete(self, collection: str, key: str) -> bool:
+        key = str(key)
+        with self.transaction():
+            if self._db.execute(
+                "SELECT 1 FROM docs WHERE collection = ? AND key = ? AND doc IS NOT NULL", (collection, key)
+            ).fetchone() is None:
+                return False
+            self._db.execute("UPDATE docs SET doc = NULL, seq = ? WHERE collection = ? AND key = ?",
+                             (self._next_seq(), collection, key))
+            self._index(collection, key, None)
+        self._metrics["writes"] += 1
+        return True
+
+    def _index(self, collection: str, key: str, doc: Any) -> None:
+        indexer = self._indexes.get(collection)
+        if indexer is None:
+            return
+        self._db.execute("DELETE FROM lookup WHERE collection = ? AND key = ?", (collection, key))
+        if doc is None:
+            return
+        self._db.executemany(
+            "INSERT OR IGNORE INTO lookup (collection, field, value, key) VALUES (?, ?, ?, ?)",
+            [(collection, field, str(value), key) for field, value in indexer(doc)
+             if value is not None and value != ""],
+        )
+
+    def reindex(self, collection: str) -> None:
+        """Rebuild a collection's lookup rows (after its indexer changes)."""
+        with self.transaction():
+            self._db.execute("DELETE FROM lookup WHERE collection = ?", (collection,))
+            for key, doc in self.items(collection).items():
+                self._index(collection, key, doc)
+            self._set_meta(f"indexed:{collection}", 1)
+
+    # ── Change notification ──────────────────────────────────────────────
+
+    def changed(self) -> bool:
+        """True if another connection (process) committed since the last call."""
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return False
+        self._data_version = version
+        return True
+
+    def last_seq(self) -> int:
+        return self._meta("seq") or 0
+
+    def changes(self, since: int, collections: Optional[Iterable[str]] = None) -> tuple[int, list[tuple]]:
+        """(new high-water seq, [(collection, key, doc or None if deleted), ...]) after `since`."""
+        where, params = "", [since]
+        if collections is not None:
+            names = list(collections)
+            where = f" AND collection IN ({', '.join('?' * len(names))})"
+            params += names
+        rows = self._db.execute(
+            f"SELECT collection, key, doc, seq FROM docs WHERE seq > ?{where} ORDER BY seq", params
+        ).fetchall()
+        high = max([since] + [seq for *_, seq in rows])
+        return high, [(c, k, json.loads(d) if d is not None else None) for c, k, d, _ in rows]
+
+    # ── JSON import / export ─────────────────────────────────────────────
+
+    def import_json(self, collection: str, path: str | Path,
+                    convert: Optional[Callable[[Any], dict[str, Any]]] = None) -> int:
+        """Load a legacy JSON file into an empty collection, once. Returns documents imported."""
+        path = Path(path)
+        with self.transaction():
+            if self._meta(f"imported:{collection}") is not None:
+                return 0
+            try:
+                raw = json.loads(path.read_text()) if path.exists() else {}
+            except (json.JSONDecodeError, OSError, ValueError) as e:
+                print(f"[storage] Could not import {path}: {e}")
+                raw = {}
+            docs = convert(raw) if convert else raw
+            for key, doc in docs.items():
+                self.put(collection, key, doc)
+            self._set_meta(f"imported:{collection}", str(path))
+        if docs:
+            print(f"[storage] Imported {len(docs)} {collection} from {path.name}")
+        return len(docs)
+
+    def export_json(self, collection: str, path: Optional[str | Path] = None) -> dict[str, Any]:
+        """Snapshot a collection as {key: doc}; also written atomically to `path` if given."""
+        docs = self.items(collection)
+        if path is not None:
+            path = Path(path)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(json.dumps(docs, indent=2) + "\n")
+            os.replace(tmp, path)
+        return docs
+
+    def metrics(self) -> dict:
+        return {**self._metrics, "seq": self.last_seq()}
+
+    def close(self) -> None:
+        self._db.close()
+
+
+_BACKENDS = {"sqlite": SQLiteStore}
+
+
+def store_path(json_path: str | Path) -> str:
+    """Where the store replacing `json_path` lives (workspaces.json → workspaces.db)."""
+    return str(Path(json_path).with_suffix(".db"))
+
+
+def open_store(json_path: str | Path, indexes: Optional[dict[str, Indexer]] = None) -> SQLiteStore:
+    """Open (creating if needed) the store that replaces a legacy JSON file."""
+    try:
+        backend = _BACKENDS[config.STORAGE_BACKEND]
+    except KeyError:
+        raise ValueError(f"Unknown STORAGE_BACKEND {config.STORAGE_BACKEND!r} "
+                         f"(choose from {', '.join(_BACKENDS)})") from None
+    return backend(store_path(json_path), indexes)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "export":
+        sys.exit("usage: python storage.py export <legacy.json> <collection>")
+    print(json.dumps(open_store(sys.argv[2]).export_json(sys.argv[3]), indent=2))
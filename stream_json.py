@@ -0,0 +1,148 @@
+"""
+stream_json.py — Incremental decoder for Claude CLI `--output-format stream-json`.
+
+Each stdout line is one JSON event whose first key is "type". The decoder
+reads the type from the first few bytes and only runs json.loads on events the
+caller asked for. Everything else is skipped without decoding, including
+multi-megabyte `user` tool_result payloads. A line that is being skipped is
+dropped chunk by chunk rather than buffered, so memory per session is bounded
+by the largest *wanted* event (capped at max_line_bytes). `result` and `system`
+events are exempt from the cap: a run without them looks like it never
+finished, so they are kept whole and the overrun is logged.
+
+    decoder = StreamJsonDecoder(wanted={"assistant", "result"})
+    while chunk := await proc.stdout.read(64 * 1024):
+        for event in decoder.feed(chunk):
+            ...
+    for event in decoder.close():
+        ...
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass, asdict
+
+_HEAD_BYTES = 128
+_TYPE_RE = re.compile(rb'"type"\s*:\s*"([A-Za-z_]+)"')
+
+DEFAULT_MAX_LINE_BYTES = 10 * 1024 * 1024
+
+# Never dropped for size, however large
+_ALWAYS_KEEP = frozenset({"result", "system"})
+
+
+@dataclass
+class StreamStats:
+    bytes_in: int = 0
+    bytes_skipped: int = 0
+    events_seen: int = 0
+    events_parsed: int = 0
+    events_skipped: int = 0
+    oversize_dropped: int = 0
+    oversize_kept: int = 0
+    parse_errors: int = 0
+
+    def add(self, other: "StreamStats") -> None:
+        for k, v in asdict(other).items():
+            setattr(self, k, getattr(self, k) + v)
+
+
+# Process-wide totals across all sessions
+_totals = StreamStats()
+
+
+def _peek_type(head: bytes | bytearray) -> str | None:
+    m = _TYPE_RE.search(head)
+    return m.group(1).decode() if m else None
+
+
+class StreamJsonDecoder:
+    def __init__(self, wanted: set[str], max_line_bytes: int = DEFAULT_MAX_LINE_BYTES):
+        self._wanted = wanted
+        self._max_line_bytes = max_line_bytes
+        self._buf = bytearray()
+        self._skipping = False  # discarding the rest of the current line
+        self._keeping = False   # buffering an oversize _ALWAYS_KEEP line regardless
+        self.stats = StreamStats()
+
+    def _handle_line(self, line: bytearray, out: list[dict]) -> None:
+        line_bytes = line.strip()
+        if not line_bytes:
+            return
+        self.stats.events_seen += 1
+        etype = _peek_type(line_bytes[:_HEAD_BYTES])
+        if etype is not None and etype not in self._wanted:
+            self.stats.events_skipped += 1
+            self.stats.bytes_skipped += len(line_bytes)
+            return
+        try:
+            event = json.loads(line_bytes)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self.stats.parse_errors += 1
+            return
+        if not isinstance(event, dict) or event.get("type") not in self._wanted:
+            self.stats.events_skipped += 1
+            return
+        self.stats.events_parsed += 1
+        out.append(event)
+
+    def feed(self, chunk: bytes) -> list[dict]:
+        """Consume a stdout chunk and return the wanted events it completed."""
+        self.stats.bytes_in += len(chunk)
+        data = memoryview(chunk)
+        if self._skipping:
+            nl = chunk.find(b"\n")
+            if nl == -1:
+                self.stats.bytes_skipped += len(chunk)
+                return []
+            self.stats.bytes_skipped += nl + 1
+            self._skipping = False
+            data = data[nl + 1:]
+
+        out: list[dict] = []
+        self._buf += data
+        start = 0
+        while True:
+            nl = self._buf.find(b"\n", start)
+            if nl == -1:
+                break
+            self._handle_line(self._buf[start:nl], out)
+            self._keeping = False
+            start = nl + 1
+        del self._buf[:start]
+
+        # Decide on the unfinished line early so unwanted payloads are never buffered
+        if self._buf and len(self._buf) >= _HEAD_BYTES and not self._keeping:
+            etype = _peek_type(self._buf[:_HEAD_BYTES])
+            oversize = len(self._buf) > self._max_line_bytes
+            if oversize and etype in self._wanted and etype in _ALWAYS_KEEP:
+                self.stats.oversize_kept += 1
+                self._keeping = True
+                print(f"[stream-json] Keeping {etype} event over {self._max_line_bytes} bytes")
+            elif (etype is not None and etype not in self._wanted) or oversize:
+                self.stats.events_seen += 1
+                if oversize:
+                    self.stats.oversize_dropped += 1
+                    print(f"[stream-json] Dropping {etype or 'unknown'} event over {self._max_line_bytes} bytes")
+                else:
+                    self.stats.events_skipped += 1
+                self.stats.bytes_skipped += len(self._buf)
+                self._buf.clear()
+                self._skipping = True
+        return out
+
+    def close(self) -> list[dict]:
+        """Flush a trailing line without a newline and fold stats into the totals."""
+        out: list[dict] = []
+        if self._buf and not self._skipping:
+            self._handle_line(self._buf, out)
+        self._buf.clear()
+        self._keeping = False
+        _totals.add(self.stats)
+        return out
+
+
+def stats() -> dict:
+    return asdict(_totals)
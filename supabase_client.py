@@ -1,19 +1,136 @@
 """
 supabase_client.py — Async helpers for the Supabase Management API.
 
-Used by /buildapp to auto-provision tables for new apps.
+Used by /buildapp to auto-provision tables for new apps, by SQL file sync,
+Google Doc sync and schema management.
+
+Every call goes through one keep-alive aiohttp session (get_client()), so a
+doc sync or schema setup pays for the TLS handshake to api.supabase.com once
+instead of once per statement. At most SUPABASE_MAX_CONNECTIONS calls are in
+flight; each call's latency goes to telemetry ("external_api" /
+"supabase.query") and to metrics().
+
+    await run_sql(sql, schema)               # one statement or script
+    await run_sql_many(statements, schema)   # writes, packed into few requests
+    await query_many(queries, schema)        # independent reads, fanned out
 """
 
+import asyncio
 import glob
+import json
 import os
 import re
+import time
+from collections import deque
 from typing import Optional
 
 import aiohttp
 
 import config
+import telemetry
 
 _TIMEOUT = aiohttp.ClientTimeout(total=30)
+_API_BASE = "https://api.supabase.com/v1"
+_LATENCY_SAMPLES = 500
+
+# Statements that can't share a request: they manage transactions themselves or
+# refuse to run inside one (a multi-statement body is one implicit transaction)
+_BATCH_UNSAFE = re.compile(
+    r"^\s*(BEGIN|START|COMMIT|END|ROLLBACK|ABORT|VACUUM)\b"
+    r"|\bCONCURRENTLY\b|\b(CREATE|DROP)\s+DATABASE\b|\bALTER\s+SYSTEM\b",
+    re.IGNORECASE,
+)
+
+
+class SupabaseClient:
+    """Pooled keep-alive session to the Management API, rebound if the event loop changes."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._latencies: deque = deque(maxlen=_LATENCY_SAMPLES)
+        self._metrics = {
+            "requests": 0,
+            "errors": 0,
+            "sessions": 0,
+            "batches": 0,
+            "batched_statements": 0,
+            "batch_fallbacks": 0,
+            "fanout_reads": 0,
+        }
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._session is not None and not self._session.closed:
+            return
+        self._loop = loop
+        self._session = aiohttp.ClientSession(
+            timeout=_TIMEOUT,
+            connector=aiohttp.TCPConnector(
+                limit=config.SUPABASE_MAX_CONNECTIONS,
+                keepalive_timeout=config.SUPABASE_KEEPALIVE_SECS,
+            ),
+        )
+        self._sem = asyncio.Semaphore(config.SUPABASE_MAX_CONNECTIONS)
+        self._metrics["sessions"] += 1
+
+    async def _send(self, method: str, url: str, body: Optional[dict]) -> tuple[int, str]:
+        headers = {
+            "Authorization": f"Bearer {config.SUPABASE_MANAGEMENT_KEY}",
+            "Content-Type": "application/json",
+        }
+        async with self._session.request(method, url, headers=headers, json=body) as resp:
+            return resp.status, await resp.text()
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None,
+                      name: str = "supabase.api") -> tuple[int, str]:
+        """One API call → (HTTP status, response text). Network errors propagate."""
+        self._ensure_started()
+        async with self._sem:
+            start = time.monotonic()
+            status = 0
+            try:
+                status, text = await self._send(method, f"{_API_BASE}{path}", body)
+                return status, text
+            finally:
+                latency = time.monotonic() - start
+                ok = 200 <= status < 300
+                self._latencies.append(latency)
+                self._metrics["requests"] += 1
+                self._metrics["errors"] += 0 if ok else 1
+                telemetry.record("external_api", name, latency, ok=ok, status=status)
+
+    async def query(self, sql: str) -> tuple[int, str]:
+        return await self.request("POST", f"/projects/{config.SUPABASE_PROJECT_REF}/database/query",
+                                  {"query": sql}, name="supabase.query")
+
+    async def aclose(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._loop = None
+
+    def metrics(self) -> dict:
+        ordered = sorted(self._latencies)
+        return {
+            **self._metrics,
+            "latency_p50_secs": round(telemetry.quantile(ordered, 0.5), 3),
+            "latency_p95_secs": round(telemetry.quantile(ordered, 0.95), 3),
+        }
+
+
+_client: Optional[SupabaseClient] = None
+
+
+def get_client() -> SupabaseClient:
+    global _client
+    if _client is None:
+        _client = SupabaseClient()
+    return _client
+
+
+def metrics() -> dict:
+    return get_client().metrics()
 
 
 def _qualify_functions(sql: str, schema: str) -> str:
@@ -39,24 +156,15 @@ async def run_sql(sql: str, schema: Optional[str] = None) -> tuple[bool, str]:
     if schema:
         sql = _qualify_functions(sql, schema)
         sql = f"SET search_path TO {schema}, public;\n{sql}"
-    url = f"https://api.supabase.com/v1/projects/{config.SUPABASE_PROJECT_REF}/database/query"
-    headers = {
-        "Authorization": f"Bearer {config.SUPABASE_MANAGEMENT_KEY}",
-        "Content-Type": "application/json",
-    }
-    body = {"query": sql}
-
     try:
-        async with aiohttp.ClientSession(timeout=_TIMEOUT) as session:
-            async with session.post(url, headers=headers, json=body) as resp:
-                text = await resp.text()
-                if resp.status == 200 or resp.status == 201:
-                    return (True, "")
-                return (False, f"HTTP {resp.status}: {text[:300]}")
+        status, text = await get_client().query(sql)
     except aiohttp.ClientError as e:
         return (False, f"Request failed: {e}")
     except Exception as e:
         return (False, f"Unexpected error: {e}")
+    if status == 200 or status == 201:
+        return (True, "")
+    return (False, f"HTTP {status}: {text[:300]}")
 
 
 async def query_sql(sql: str, schema: Optional[str] = None):
@@ -66,31 +174,75 @@ async def query_sql(sql: str, schema: Optional[str] = None):
     """
     if schema:
         sql = f"SET search_path TO {schema}, public;\n{sql}"
-    url = f"https://api.supabase.com/v1/projects/{config.SUPABASE_PROJECT_REF}/database/query"
-    headers = {
-        "Authorization": f"Bearer {config.SUPABASE_MANAGEMENT_KEY}",
-        "Content-Type": "application/json",
-    }
-    body = {"query": sql}
-
     try:
-        async with aiohttp.ClientSession(timeout=_TIMEOUT) as session:
-            async with session.post(url, headers=headers, json=body) as resp:
-                text = await resp.text()
-                if resp.status in (200, 201):
-                    import json
-                    data = json.loads(text)
-                    # API returns a list of result sets; take the first one
-                    if isinstance(data, list) and data:
-                        return (True, data)
-                    return (True, data if isinstance(data, list) else [])
-                return (False, f"HTTP {resp.status}: {text[:300]}")
+        status, text = await get_client().query(sql)
+        if status in (200, 201):
+            data = json.loads(text)
+            # API returns a list of result sets; take the first one
+            if isinstance(data, list) and data:
+                return (True, data)
+            return (True, data if isinstance(data, list) else [])
+        return (False, f"HTTP {status}: {text[:300]}")
     except aiohttp.ClientError as e:
         return (False, f"Request failed: {e}")
     except Exception as e:
         return (False, f"Unexpected error: {e}")
 
 
+async def run_sql_many(statements: list[str], schema: Optional[str] = None) -> list[tuple[bool, str]]:
+    """Run statements in order, several per request. Returns one (ok, error) per statement.
+
+    Up to SUPABASE_BATCH_MAX_STATEMENTS (and SUPABASE_BATCH_MAX_BYTES) go in one
+    query body, which Postgres runs as a single implicit transaction. If a
+    batch fails it is rolled back as a whole and its statements are re-run
+    one at a time, so every statement still gets its own result and the good
+    ones still apply. Statements that can't run inside a transaction are sent
+    alone.
+    """
+    client = get_client()
+    results: list[tuple[bool, str]] = []
+    batch: list[str] = []
+    size = 0
+
+    async def flush():
+        nonlocal size
+        if len(batch) == 1:
+            results.append(await run_sql(batch[0], schema=schema))
+        elif batch:
+            client._metrics["batches"] += 1
+            client._metrics["batched_statements"] += len(batch)
+            body = "\n".join(stmt.rstrip().rstrip(";") + ";" for stmt in batch)
+            ok, _ = await run_sql(body, schema=schema)
+            if ok:
+                results.extend([(True, "")] * len(batch))
+            else:
+                client._metrics["batch_fallbacks"] += 1
+                for stmt in batch:
+                    results.append(await run_sql(stmt, schema=schema))
+        batch.clear()
+        size = 0
+
+    for stmt in statements:
+        if _BATCH_UNSAFE.search(stmt):
+            await flush()
+            batch.append(stmt)
+            await flush()
+            continue
+        if batch and (len(batch) >= config.SUPABASE_BATCH_MAX_STATEMENTS
+                      or size + len(stmt) > config.SUPABASE_BATCH_MAX_BYTES):
+            await flush()
+        batch.append(stmt)
+        size += len(stmt)
+    await flush()
+    return results
+
+
+async def query_many(queries: list[str], schema: Optional[str] = None) -> list[tuple]:
+    """Run independent reads concurrently (bounded by the pool); results in input order."""
+    get_client()._metrics["fanout_reads"] += len(queries)
+    return list(await asyncio.gather(*(query_sql(q, schema=schema) for q in queries)))
+
+
 def extract_sql(text: str) -> Optional[str]:
     """Extract SQL from Claude's response (code fences, or bare CREATE statements)."""
     # Try ```sql ... ``` first
@@ -251,6 +403,7 @@ async def sync_sql_files(changed_files: list[str], schema: Optional[str] = None)
     """
     results = []
     all_ok = True
+    start = time.monotonic()
 
     for path in changed_files:
         name = os.path.basename(path)
@@ -298,4 +451,6 @@ async def sync_sql_files(changed_files: list[str], schema: Optional[str] = None)
             all_ok = False
 
     summary = "Database sync: " + ", ".join(results)
+    telemetry.record("sql_sync", "supabase", time.monotonic() - start, ok=all_ok,
+                     files=len(changed_files), schema=schema)
     return (all_ok, summary)
@@ -0,0 +1,408 @@
+"""
+telemetry.py — One event stream for the cost and latency of everything the bridge runs.
+
+Cost used to live in three places: CostTracker (daily totals per user),
+BudgetTracker (one agent loop) and build_log (per-workspace .builds.json).
+Latency was only printed. Every Claude run, build, demo, SQL sync and
+external API call now also records one event:
+
+    kind        claude / build / demo / agent_loop / sql_sync / external_api
+    name        what ran: "run", a platform, "supabase.query", "webhook", ...
+    duration    seconds
+    cost_usd    0 when the operation is free
+    ok          outcome
+    labels      free-form context (workspace, cache hit, ...) kept in the store only
+
+Use record() once the outcome is known, or span() around a block:
+
+    with telemetry.span("demo", platform) as s:
+        result = await cls.full_demo(workspace_path)
+        s.ok = result.success
+
+Events feed an in-process aggregator (counters, fixed-bucket histograms and
+p50/p95/p99 over the last TELEMETRY_WINDOW events per series) and are
+appended to TELEMETRY_PATH (SQLite, WAL mode) in coalesced batches. Raw
+events are rolled up into per-minute and per-hour rows with percentiles,
+and each resolution has its own retention. prometheus_text() renders the
+aggregator for GET /api/v1/metrics.
+
+The existing trackers keep doing their jobs (the daily cap, the loop budget,
+the workspace history). This is the one place to ask "what did it cost and
+how long did it take" across all of them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import json
+import math
+import sqlite3
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+import config
+
+# Histogram bucket upper bounds in seconds: API calls up to long builds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+QUANTILES = (0.5, 0.95, 0.99)
+MINUTE, HOUR = 60, 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts        REAL NOT NULL,
+    kind      TEXT NOT NULL,
+    name      TEXT NOT NULL,
+    duration  REAL NOT NULL,
+    cost_usd  REAL NOT NULL DEFAULT 0,
+    ok        INTEGER NOT NULL,
+    labels    TEXT
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution  INTEGER NOT NULL,
+    bucket      INTEGER NOT NULL,
+    kind        TEXT NOT NULL,
+    name        TEXT NOT NULL,
+    count       INTEGER NOT NULL,
+    errors      INTEGER NOT NULL,
+    cost_usd    REAL NOT NULL,
+    duration_sum REAL NOT NULL,
+    duration_max REAL NOT NULL,
+    p50 REAL, p95 REAL, p99 REAL,
+    PRIMARY KEY (resolution, bucket, kind, name)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+@dataclass
+class Event:
+    kind: str
+    name: str
+    duration: float
+    cost_usd: float = 0.0
+    ok: bool = True
+    labels: dict = field(default_factory=dict)
+    ts: float = 0.0
+
+
+def quantile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank quantile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class _Series:
+    """Running totals for one (kind, name)."""
+
+    def __init__(self, window: int):
+        self.ok = 0
+        self.errors = 0
+        self.cost_usd = 0.0
+        self.duration_sum = 0.0
+        self.buckets = [0] * len(BUCKETS)  # non-cumulative; +Inf is the total count
+        self.recent: deque[float] = deque(maxlen=window)
+
+    @property
+    def count(self) -> int:
+        return self.ok + self.errors
+
+    def add(self, event: Event) -> None:
+        if event.ok:
+            self.ok += 1
+        else:
+            self.errors += 1
+        self.cost_usd += event.cost_usd
+        self.duration_sum += event.duration
+        for i, bound in enumerate(BUCKETS):
+            if event.duration <= bound:
+                self.buckets[i] += 1
+                break
+        self.recent.append(event.duration)
+
+    def quantiles(self) -> dict[float, float]:
+        ordered = sorted(self.recent)
+        return {q: quantile(ordered, q) for q in QUANTILES}
+
+
+class Span:
+    """Mutable handle yielded by span(); set ok / cost_usd / labels before the block ends."""
+
+    def __init__(self, labels: dict):
+        self.ok = True
+        self.cost_usd = 0.0
+        self.labels = labels
+
+
+class Telemetry:
+    def __init__(self, path: str, window: Optional[int] = None,
+                 flush_delay: Optional[float] = None):
+        self._window = window or config.TELEMETRY_WINDOW
+        self._flush_delay = flush_delay if flush_delay is not None else config.TELEMETRY_FLUSH_SECS
+        self._series: dict[tuple[str, str], _Series] = {}
+        self._pending: list[Event] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_rollup = 0.0
+        self._metrics = {"events": 0, "flushes": 0, "rows_written": 0, "rollups": 0, "write_errors": 0}
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    # ── Recording ────────────────────────────────────────────────────────
+
+    def record(self, kind: str, name: str, duration: float, cost_usd: float = 0.0,
+               ok: bool = True, **labels) -> Event:
+        event = Event(kind, name, max(0.0, float(duration)), float(cost_usd or 0.0), bool(ok),
+                      {k: v for k, v in labels.items() if v not in (None, "")}, time.time())
+        key = (kind, name)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(self._window)
+        series.add(event)
+        self._metrics["events"] += 1
+        self._pending.append(event)
+        self._schedule_flush()
+        return event
+
+    def _schedule_flush(self) -> None:
+        if len(self._pending) >= config.TELEMETRY_FLUSH_EVENTS:
+            self.flush()
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()  # no loop to coalesce on (scripts, tests)
+            return
+        if self._flush_handle is not None and self._flush_loop is not loop:
+            self.flush()  # the loop that scheduled the pending flush is gone
+            return
+        if self._flush_handle is None:
+            self._flush_loop = loop
+            self._flush_handle = loop.call_later(self._flush_delay, self.flush)
+
+    def flush(self) -> None:
+        """Append pending events in one transaction, then roll up if a minute has passed."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._pending:
+            pending, self._pending = self._pending, []
+            rows = [(e.ts, e.kind, e.name, e.duration, e.cost_usd, int(e.ok),
+                     json.dumps(e.labels, default=str) if e.labels else None) for e in pending]
+            try:
+                self._db.execute("BEGIN")
+                self._db.executemany(
+                    "INSERT INTO events (ts, kind, name, duration, cost_usd, ok, labels)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+                self._metrics["flushes"] += 1
+                self._metrics["rows_written"] += len(rows)
+            except sqlite3.Error as e:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                self._metrics["write_errors"] += 1
+                print(f"[telemetry] Flush failed, dropped {len(rows)} events: {e}")
+        if time.time() - self._last_rollup >= MINUTE:
+            self.rollup()
+
+    # ── Rollups ──────────────────────────────────────────────────────────
+
+    def rollup(self, now: Optional[float] = None) -> None:
+        """Summarise completed minutes and hours from raw events, then apply retention."""
+        now = time.time() if now is None else now
+        self._last_rollup = now
+        try:
+            for resolution in (MINUTE, HOUR):
+                self._rollup(resolution, now)
+            self._db.execute("DELETE FROM events WHERE ts < ?",
+                             (now - config.TELEMETRY_RAW_RETENTION_HOURS * HOUR,))
+            self._db.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+                             (MINUTE, now - config.TELEMETRY_MINUTE_RETENTION_DAYS * 86400))
+            self._db.execute("DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+                             (HOUR, now - config.TELEMETRY_RETENTION_DAYS * 86400))
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            self._metrics["write_errors"] += 1
+            print(f"[telemetry] Rollup failed: {e}")
+
+    def _rollup(self, resolution: int, now: float) -> None:
+        meta_key = f"rolled_{resolution}"
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (meta_key,)).fetchone()
+        end = int(now // resolution) * resolution  # only buckets that can't change any more
+        start = int(float(row["value"])) if row else 0
+        if start >= end:
+            return
+        groups: dict[tuple[int, str, str], list] = {}
+        for r in self._db.execute(
+            "SELECT ts, kind, name, duration, cost_usd, ok FROM events WHERE ts >= ? AND ts < ?",
+            (start, end),
+        ):
+            key = (int(r["ts"] // resolution) * resolution, r["kind"], r["name"])
+            groups.setdefault(key, []).append((r["duration"], r["cost_usd"], r["ok"]))
+        rows = []
+        for (bucket, kind, name), items in groups.items():
+            durations = sorted(d for d, _, _ in items)
+            rows.append((resolution, bucket, kind, name, len(items),
+                         sum(1 for _, _, ok in items if not ok),
+                         sum(c for _, c, _ in items), sum(durations), durations[-1],
+                         *(quantile(durations, q) for q in QUANTILES)))
+        self._db.execute("BEGIN")
+        self._db.executemany(
+            "INSERT OR REPLACE INTO rollups (resolution, bucket, kind, name, count, errors, cost_usd,"
+            " duration_sum, duration_max, p50, p95, p99) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows)
+        self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (meta_key, str(end)))
+        self._db.execute("COMMIT")
+        self._metrics["rollups"] += len(rows)
+
+    # ── Reads ────────────────────────────────────────────────────────────
+
+    def series(self, kind: str, name: Optional[str] = None, since: float = 0.0,
+               resolution: int = HOUR) -> list[dict]:
+        """Rolled-up rows for one kind (optionally one name), oldest first."""
+        sql = ("SELECT bucket, kind, name, count, errors, cost_usd, duration_sum, duration_max,"
+               " p50, p95, p99 FROM rollups WHERE resolution = ? AND kind = ? AND bucket >= ?")
+        params: list = [resolution, kind, since]
+        if name is not None:
+            sql += " AND name = ?"
+            params.append(name)
+        return [dict(r) for r in self._db.execute(sql + " ORDER BY bucket, name", params)]
+
+    def summary(self) -> dict:
+        """Per-series totals and recent percentiles, keyed "kind/name"."""
+        out = {}
+        for (kind, name), s in sorted(self._series.items()):
+            q = s.quantiles()
+            out[f"{kind}/{name}"] = {
+                "count": s.count,
+                "errors": s.errors,
+                "cost_usd": round(s.cost_usd, 4),
+                "p50_secs": round(q[0.5], 2),
+                "p95_secs": round(q[0.95], 2),
+                "p99_secs": round(q[0.99], 2),
+            }
+        return out
+
+    def prometheus_text(self, components: Optional[dict] = None) -> str:
+        """Render the aggregator (plus numeric component metrics) in Prometheus text format 0.0.4."""
+        lines: list[str] = []
+
+        def family(metric: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+
+        items = sorted(self._series.items())
+        family("bridge_events_total", "counter", "Completed operations by kind, name and outcome.")
+        for (kind, name), s in items:
+            for status, n in (("ok", s.ok), ("error", s.errors)):
+                lines.append(f"bridge_events_total{_labels(kind=kind, name=name, status=status)} {n}")
+        family("bridge_cost_usd_total", "counter", "Reported spend in USD.")
+        for (kind, name), s in items:
+            lines.append(f"bridge_cost_usd_total{_labels(kind=kind, name=name)} {_num(s.cost_usd)}")
+        family("bridge_duration_seconds", "histogram", "Operation duration.")
+        for (kind, name), s in items:
+            cumulative = 0
+            for bound, n in zip(BUCKETS, s.buckets):
+                cumulative += n
+                lines.append(f"bridge_duration_seconds_bucket"
+                             f"{_labels(kind=kind, name=name, le=_num(bound))} {cumulative}")
+            lines.append(f"bridge_duration_seconds_bucket{_labels(kind=kind, name=name, le='+Inf')} {s.count}")
+            lines.append(f"bridge_duration_seconds_sum{_labels(kind=kind, name=name)} {_num(s.duration_sum)}")
+            lines.append(f"bridge_duration_seconds_count{_labels(kind=kind, name=name)} {s.count}")
+        family("bridge_duration_recent_seconds", "gauge",
+               f"Duration quantiles over the last {self._window} operations.")
+        for (kind, name), s in items:
+            for q, v in s.quantiles().items():
+                lines.append(f"bridge_duration_recent_seconds"
+                             f"{_labels(kind=kind, name=name, quantile=_num(q))} {_num(v)}")
+        if components:
+            family("bridge_component", "gauge", "Numeric counters reported by bridge components.")
+            for component, values in sorted(components.items()):
+                for key, value in _flatten(values):
+                    lines.append(f"bridge_component{_labels(component=component, metric=key or component)}"
+                                 f" {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+    def metrics(self) -> dict:
+        return {**self._metrics, "series": len(self._series), "pending": len(self._pending),
+                "summary": self.summary()}
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _num(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _flatten(value, prefix: str = "") -> Iterator[tuple[str, float]]:
+    """Numeric leaves of a nested analytics dict as ("a.b", n); other values are skipped."""
+    if isinstance(value, bool):
+        yield prefix, int(value)
+    elif isinstance(value, (int, float)):
+        yield prefix, value
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            yield from _flatten(v, f"{prefix}.{k}" if prefix else str(k))
+
+
+_telemetry: Optional[Telemetry] = None
+
+
+def get_telemetry() -> Telemetry:
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = Telemetry(config.TELEMETRY_PATH)
+        atexit.register(_telemetry.flush)
+    return _telemetry
+
+
+def record(kind: str, name: str, duration: float, cost_usd: float = 0.0,
+           ok: bool = True, **labels) -> None:
+    """Record one event; telemetry must never break the operation it measures."""
+    if not config.TELEMETRY_ENABLED:
+        return
+    try:
+        get_telemetry().record(kind, name, duration, cost_usd, ok, **labels)
+    except Exception as e:
+        print(f"[telemetry] Dropped {kind}/{name} event: {e}")
+
+
+@contextmanager
+def span(kind: str, name: str, **labels) -> Iterator[Span]:
+    """Time a block and record it; an exception marks it failed and propagates."""
+    handle = Span(labels)
+    start = time.monotonic()
+    try:
+        yield handle
+    except BaseException:
+        handle.ok = False
+        raise
+    finally:
+        record(kind, name, time.monotonic() - start, handle.cost_usd, handle.ok, **handle.labels)
+
+
+def prometheus_text(components: Optional[dict] = None) -> str:
+    return get_telemetry().prometheus_text(components)
+
+
+def metrics() -> dict:
+    return get_telemetry().metrics()
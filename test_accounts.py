@@ -7,8 +7,10 @@ Discord linking, shared store access, and workspace scoping.
 
 import json
 import os
+import sqlite3
 import tempfile
 
+import storage
 from accounts import AccountManager, Account, _hash_key, _gen_api_key
 
 
@@ -23,7 +25,8 @@ def _fresh_mgr() -> tuple[AccountManager, str]:
 
 
 def _cleanup(path: str):
-    for p in (path,):
+    db = storage.store_path(path)
+    for p in (path, db, db + "-wal", db + "-shm"):
         if os.path.exists(p):
             os.unlink(p)
 
@@ -104,6 +107,74 @@ def test_authenticate_empty_string():
         _cleanup(path)
 
 
+# ── Auth Cache ──────────────────────────────────────────────────────────────
+
+def test_authenticate_returns_shared_read_only_view():
+    mgr, path = _fresh_mgr()
+    try:
+        acct, key = mgr.register("Vera")
+        first = mgr.authenticate(key)
+        assert mgr.authenticate(key) is first
+        assert mgr.get(acct.account_id) is first
+        try:
+            first.role = "admin"
+            assert False, "cached view should be read-only"
+        except AttributeError:
+            pass
+        # A change to the account replaces the view
+        mgr.set_shared_store_access(acct.account_id, True)
+        assert mgr.authenticate(key).shared_store_access is True
+        assert first.shared_store_access is False
+    finally:
+        _cleanup(path)
+
+
+def test_unknown_keys_are_negatively_cached_until_keys_change():
+    import accounts
+    mgr, path = _fresh_mgr()
+    try:
+        acct, _ = mgr.register("Nina")
+        before = accounts.metrics()["negative_hits"]
+        assert mgr.authenticate("sk_live_guess") is None
+        assert mgr.authenticate("sk_live_guess") is None
+        assert accounts.metrics()["negative_hits"] == before + 1
+
+        mgr.register_legacy_key(acct.account_id, "sk_live_guess")
+        assert mgr.authenticate("sk_live_guess").account_id == acct.account_id
+    finally:
+        _cleanup(path)
+
+
+def test_changes_from_another_process_are_picked_up():
+    import config
+    mgr, path = _fresh_mgr()
+    old_interval = config.ACCOUNTS_RELOAD_CHECK_SECS
+    try:
+        config.ACCOUNTS_RELOAD_CHECK_SECS = 0
+        mgr.register("Owner", role="admin")
+        other = AccountManager(path)  # e.g. the bot process
+        acct, key = other.register("Late")
+        assert mgr.authenticate(key).account_id == acct.account_id
+        assert mgr.first_admin().display_name == "Owner"
+    finally:
+        config.ACCOUNTS_RELOAD_CHECK_SECS = old_interval
+        _cleanup(path)
+
+
+def test_edits_from_two_processes_both_survive():
+    mgr, path = _fresh_mgr()
+    try:
+        acct, _ = mgr.register("Shared")
+        other = AccountManager(path)  # loaded before either edit below
+        mgr.set_shared_store_access(acct.account_id, True)
+        other.link_discord(acct.account_id, 4242)  # must not write back a stale copy
+        stored = AccountManager(path).get(acct.account_id)
+        assert stored.shared_store_access is True
+        assert stored.discord_user_id == 4242
+    finally:
+        _cleanup(path)
+
+
 # ── API Key Management ──────────────────────────────────────────────────────
 
 def test_create_second_api_key():
@@ -188,9 +259,11 @@ def test_credential_encrypted_at_rest():
     try:
         acct, _ = mgr.register("Liam")
         mgr.set_credential(acct.account_id, "supabase", {"project_ref": "xyzabc"})
-        # Read raw JSON from disk
-        raw = json.loads(open(path).read())
-        encrypted_value = raw[acct.account_id]["credentials"]["supabase"]
+        # Read the stored document straight from disk
+        db = sqlite3.connect(storage.store_path(path))
+        (doc,) = db.execute("SELECT doc FROM docs WHERE key = ?", (acct.account_id,)).fetchone()
+        db.close()
+        encrypted_value = json.loads(doc)["credentials"]["supabase"]
         # Should NOT contain the plaintext
         assert "xyzabc" not in encrypted_value
         # But decrypted should match
@@ -261,6 +334,46 @@ def test_list_credentials():
         _cleanup(path)
 
 
+def test_decrypted_credentials_are_cached_until_changed():
+    import accounts
+    from unittest.mock import patch
+    mgr, path = _fresh_mgr()
+    try:
+        acct, _ = mgr.register("Cora")
+        mgr.set_credential(acct.account_id, "llm", {"api_key": "sk-one"})
+        fernet = accounts._get_fernet()
+        with patch.object(fernet, "decrypt", wraps=fernet.decrypt) as decrypt:
+            first = mgr.get_credential(acct.account_id, "llm")
+            first["api_key"] = "mutated by caller"
+            assert mgr.get_credential(acct.account_id, "llm") == {"api_key": "sk-one"}
+            assert decrypt.call_count == 1
+
+            mgr.set_credential(acct.account_id, "llm", {"api_key": "sk-two"})
+            assert mgr.get_credential(acct.account_id, "llm") == {"api_key": "sk-two"}
+            mgr.delete_credential(acct.account_id, "llm")
+            assert mgr.get_credential(acct.account_id, "llm") is None
+            assert decrypt.call_count == 2
+        assert accounts.metrics()["credential_cache"]["hits"] >= 1
+    finally:
+        _cleanup(path)
+
+
+def test_credential_cache_is_bounded_and_wipes_evicted_plaintext():
+    import accounts
+    import config
+    old_max = config.CREDENTIAL_CACHE_MAX
+    try:
+        config.CREDENTIAL_CACHE_MAX = 1
+        cache = accounts._CredentialCache()
+        first = cache.put(("a", "llm"), "ct-a", b'{"k": 1}')
+        cache.put(("b", "llm"), "ct-b", b'{"k": 2}')
+        assert cache.get(("a", "llm"), "ct-a") is None
+        assert set(first) == {0}
+        assert cache.get(("b", "llm"), "ct-other") is None  # ciphertext changed underneath
+    finally:
+        config.CREDENTIAL_CACHE_MAX = old_max
+
+
 # ── Capabilities ────────────────────────────────────────────────────────────
 
 def test_capabilities_empty_account():
@@ -606,7 +719,7 @@ def test_workspace_registry_account_id():
         assert reg.is_owner("app1", account_id="acc_bbb") is False
     finally:
         config.WORKSPACES_PATH = old_path
-        os.unlink(ws_path)
+        _cleanup(ws_path)
 
 
 # ── Config Changes ──────────────────────────────────────────────────────────
@@ -0,0 +1,201 @@
+"""Tests for the multi-platform build loop in agent_loop.py."""
+
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import agent_loop
+import fix_index
+import platforms
+
+
+def test_merge_build_errors_groups_shared_lines_first():
+    merged = agent_loop.merge_build_errors({
+        "android": "e: Foo.kt:3 Unresolved reference: bar\ne: Android.kt:9 Type mismatch",
+        "web": "e: Foo.kt:3 Unresolved reference: bar",
+    })
+    assert merged.splitlines()[0] == "[ANDROID + WEB]"
+    assert merged.count("Unresolved reference: bar") == 1
+    assert "[ANDROID]\ne: Android.kt:9 Type mismatch" in merged
+
+
+def test_multi_platform_loop_rebuilds_only_failed_platforms():
+    built = []
+    outcomes = {"android": [False, True], "web": [True]}
+
+    async def fake_build(platform, path):
+        built.append(platform)
+        ok = outcomes[platform].pop(0)
+        return SimpleNamespace(success=ok, error="" if ok else "e: Main.kt:1 boom", output="")
+
+    ok_run = SimpleNamespace(exit_code=0, stdout="fixed", stderr="", total_cost_usd=0.0)
+    claude = SimpleNamespace(run=AsyncMock(return_value=ok_run), clear_session=lambda key: None)
+
+    with patch("agent_loop.config.FIX_REPLAY_ENABLED", False), \
+         patch("agent_loop.build_platform", side_effect=fake_build), \
+         patch("agent_loop.build_cache.compute_source_hash", return_value="h1"), \
+         patch("agent_loop.get_recent_fixes", return_value=""), \
+         patch("agent_loop.log_fix"), \
+         patch("agent_loop._log_build_result"):
+        result = asyncio.run(agent_loop.run_agent_loop(
+            "make it", "demo", "/tmp/demo", claude, platform="android,web", max_attempts=3,
+        ))
+
+    assert result.success and result.total_attempts == 2
+    assert built == ["android", "web", "android"]
+    # Initial prompt + one combined fix prompt
+    assert claude.run.await_count == 2
+    assert "android builds failed" in claude.run.await_args_list[1].args[0]
+
+
+def _claude(on_fix=None):
+    """Fake runner: the initial prompt changes nothing, fix prompts call on_fix."""
+    async def run(prompt, key, path, **kwargs):
+        if on_fix and "build failed" in prompt:
+            on_fix()
+        return SimpleNamespace(exit_code=0, stdout="done", stderr="", total_cost_usd=0.0)
+    return SimpleNamespace(run=AsyncMock(side_effect=run), clear_session=lambda key: None)
+
+
+def _replay_scenario(scopes: dict[str, str]):
+    """Workspace "one" hits an error and Claude fixes it; then "two" hits the
+    same error. Returns (result two, runner two, whether two got the fix, index metrics)."""
+    error = "e: file:///Users/a/%s/composeApp/src/commonMain/kotlin/App.kt:12:5 Unresolved reference 'Clock'."
+    source = "package app\n\nfun now() = Clock.System.now()\n"
+    fixed = "package app\n\nimport kotlinx.datetime.Clock\n\nfun now() = Clock.System.now()\n"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workspaces = []
+        for name in ("one", "two"):
+            src = Path(tmp, name, "composeApp/src/commonMain/kotlin/com", name)
+            src.mkdir(parents=True)
+            (src / "App.kt").write_text(source)
+            workspaces.append((name, src / "App.kt"))
+
+        async def build(platform, path):
+            app = next(f for n, f in workspaces if path.endswith(n))
+            ok = "import kotlinx" in app.read_text()
+            return SimpleNamespace(success=ok, error="" if ok else error % Path(path).name, output="")
+
+        with patch("agent_loop.fix_index._index", fix_index.FixIndex(str(Path(tmp, "fixes.db")))), \
+             patch("agent_loop._fix_scope", side_effect=scopes.get), \
+             patch("agent_loop.build_platform", side_effect=build), \
+             patch("agent_loop.get_recent_fixes", return_value=""), \
+             patch("agent_loop.log_fix"), \
+             patch("agent_loop._log_build_result"):
+            first = _claude(on_fix=lambda: workspaces[0][1].write_text(fixed))
+            r1 = asyncio.run(agent_loop.run_agent_loop(
+                "go", "one", str(Path(tmp, "one")), first, platform="android"))
+            assert r1.success and first.run.await_count == 2
+
+            second = _claude(on_fix=lambda: workspaces[1][1].write_text(fixed))
+            r2 = asyncio.run(agent_loop.run_agent_loop(
+                "go", "two", str(Path(tmp, "two")), second, platform="android"))
+            return r2, second, workspaces[1][1].read_text() == fixed, fix_index.get_index().metrics()
+
+
+def test_fix_recorded_in_one_workspace_is_replayed_in_another():
+    r2, second, fixed, m = _replay_scenario({"one": "account:acc_a", "two": "account:acc_a"})
+    # Workspace two is fixed without a Claude fix prompt
+    assert r2.success and "known fix" in r2.final_message
+    assert second.run.await_count == 1 and fixed
+    assert m["replay_successes"] == 1
+
+
+def test_fix_is_never_replayed_for_another_account():
+    r2, second, fixed, m = _replay_scenario({"one": "account:acc_a", "two": "account:acc_b"})
+    # Claude fixes workspace two itself; account A's edit is not offered
+    assert r2.success and "known fix" not in r2.final_message
+    assert second.run.await_count == 2
+    assert m["hits"] == 0 and m["replay_successes"] == 0
+
+
+def test_replayed_fix_rebuilds_platforms_it_touched():
+    # v0: web broken; v1: replayed edit to shared code fixes web, breaks android; v2: Claude's fix
+    state = {"v": 0}
+    built = []
+
+    async def fake_build(platform, path):
+        built.append(platform)
+        ok = state["v"] != 1 if platform == "android" else state["v"] >= 1
+        return SimpleNamespace(success=ok, error="" if ok else f"e: {platform}.kt:1 boom", output="")
+
+    async def fake_replay(*args):
+        state["v"] = 1
+        return True
+
+    async def run(prompt, key, path, **kwargs):
+        if "Fix the code" in prompt:
+            state["v"] = 2
+        return SimpleNamespace(exit_code=0, stdout="done", stderr="", total_cost_usd=0.0)
+
+    claude = SimpleNamespace(run=AsyncMock(side_effect=run), clear_session=lambda key: None)
+    with patch("agent_loop._replay_known_fix", side_effect=fake_replay), \
+         patch("agent_loop.build_platform", side_effect=fake_build), \
+         patch("agent_loop.build_cache.compute_source_hash", side_effect=lambda path, p: str(state["v"])), \
+         patch("agent_loop.get_recent_fixes", return_value=""), \
+         patch("agent_loop.log_fix"), \
+         patch("agent_loop._log_build_result"):
+        result = asyncio.run(agent_loop.run_agent_loop(
+            "make it", "demo", "/tmp/demo", claude, platform="android,web", max_attempts=3,
+        ))
+
+    assert result.success and "known fix" not in result.final_message
+    assert built == ["android", "web", "android", "android", "web"]
+    assert "android builds failed" in claude.run.await_args_list[1].args[0]
+
+
+def test_new_files_are_not_recorded_as_replayable():
+    with tempfile.TemporaryDirectory() as tmp:
+        Path(tmp, "App.kt").write_text("val a = 1\n")
+        snap = fix_index.snapshot(tmp)
+        Path(tmp, "App.kt").write_text("val a = 2\n")
+        Path(tmp, "Secrets.kt").write_text("const val KEY = \"sk-live\"\n")
+        assert fix_index.diff_edits(snap, tmp) == []
+        assert fix_index.apply_edits(tmp, [{"file": "Other.kt", "before": None, "after": "x"}]) is None
+        assert not Path(tmp, "Other.kt").exists()
+
+
+def test_inapplicable_fix_leaves_workspace_untouched():
+    with tempfile.TemporaryDirectory() as tmp:
+        Path(tmp, "App.kt").write_text("val a = 1\nval b = 2\n")
+        edits = [
+            {"file": "App.kt", "before": "val a = 1\n", "after": "val a = 10\n"},
+            {"file": "App.kt", "before": "val missing = 3\n", "after": ""},
+        ]
+        assert fix_index.apply_edits(tmp, edits) is None
+        assert Path(tmp, "App.kt").read_text() == "val a = 1\nval b = 2\n"
+
+
+def test_gradle_builds_in_one_workspace_take_turns():
+    active: dict[str, int] = {}
+    peak: dict[str, int] = {}
+
+    async def fake_run(cmd, cwd=None, **kwargs):
+        active[cwd] = active.get(cwd, 0) + 1
+        peak[cwd] = max(peak.get(cwd, 0), active[cwd])
+        await asyncio.sleep(0.02)
+        active[cwd] -= 1
+        return SimpleNamespace(returncode=0, output="BUILD SUCCESSFUL", error="", aborted_early=False)
+
+    @asynccontextmanager
+    async def fake_lease(workspace_path):
+        yield SimpleNamespace(command=lambda *tasks: list(tasks), observe=lambda output: None)
+
+    async def scenario():
+        return await asyncio.gather(
+            platforms.build_platform("android", "/ws/a", use_cache=False),
+            platforms.build_platform("web", "/ws/a", use_cache=False),
+            platforms.build_platform("web", "/ws/b", use_cache=False),
+        )
+
+    with patch("platforms.proc_io.run", side_effect=fake_run), \
+         patch("gradle_pool.lease", fake_lease), \
+         patch("platforms.eta_model.get_model"), \
+         patch("platforms.telemetry.record"):
+        results = asyncio.run(scenario())
+    assert all(r.success for r in results)
+    assert peak == {"/ws/a": 1, "/ws/b": 1}
@@ -0,0 +1,120 @@
+"""Tests for the content-addressed build cache (build_cache.py + platforms.build_platform)."""
+
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import build_cache
+import platforms
+from platforms import BuildResult
+
+
+def _make_workspace(root: Path) -> Path:
+    ws = root / "ws"
+    (ws / "composeApp" / "src" / "commonMain" / "kotlin").mkdir(parents=True)
+    (ws / "composeApp" / "src" / "androidMain" / "kotlin").mkdir(parents=True)
+    (ws / "composeApp" / "src" / "wasmJsMain" / "kotlin").mkdir(parents=True)
+    (ws / "composeApp" / "build.gradle.kts").write_text("plugins {}\n")
+    (ws / "settings.gradle.kts").write_text("include(\":composeApp\")\n")
+    (ws / "composeApp" / "src" / "commonMain" / "kotlin" / "App.kt").write_text("fun app() {}\n")
+    (ws / "composeApp" / "src" / "androidMain" / "kotlin" / "Main.kt").write_text("fun main() {}\n")
+    (ws / "composeApp" / "src" / "wasmJsMain" / "kotlin" / "Main.kt").write_text("fun main() {}\n")
+    return ws
+
+
+def test_hash_ignores_other_platform_source_sets():
+    with tempfile.TemporaryDirectory() as tmp:
+        ws = _make_workspace(Path(tmp))
+        before = build_cache.compute_source_hash(str(ws), "web")
+        (ws / "composeApp" / "src" / "androidMain" / "kotlin" / "Main.kt").write_text("fun main() { 1 }\n")
+        assert build_cache.compute_source_hash(str(ws), "web") == before
+
+
+def test_hash_changes_on_shared_source_edit():
+    with tempfile.TemporaryDirectory() as tmp:
+        ws = _make_workspace(Path(tmp))
+        before = build_cache.compute_source_hash(str(ws), "android")
+        (ws / "composeApp" / "src" / "commonMain" / "kotlin" / "App.kt").write_text("fun app() { 2 }\n")
+        assert build_cache.compute_source_hash(str(ws), "android") != before
+
+
+def test_hash_ignores_build_outputs():
+    with tempfile.TemporaryDirectory() as tmp:
+        ws = _make_workspace(Path(tmp))
+        before = build_cache.compute_source_hash(str(ws), "web")
+        out = ws / "composeApp" / "src" / "commonMain" / "build"
+        out.mkdir()
+        (out / "generated.kt").write_text("x")
+        assert build_cache.compute_source_hash(str(ws), "web") == before
+
+
+def test_store_and_restore_artifacts():
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch("config.BUILD_CACHE_DIR", str(Path(tmp) / "cache")):
+        ws = _make_workspace(Path(tmp))
+        dist = ws / "composeApp" / "build" / "dist" / "wasmJs" / "productionExecutable"
+        dist.mkdir(parents=True)
+        (dist / "index.html").write_text("<html></html>")
+
+        h = build_cache.compute_source_hash(str(ws), "web")
+        build_cache.store(str(ws), "web", h, BuildResult(success=True, output="BUILD SUCCESSFUL"))
+
+        # Simulate `gradle clean` wiping the outputs
+        (dist / "index.html").unlink()
+        cached = build_cache.lookup(str(ws), "web", h)
+        assert cached is not None
+        assert cached["success"] is True
+        assert (dist / "index.html").read_text() == "<html></html>"
+
+
+def test_timeout_results_are_not_cached():
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch("config.BUILD_CACHE_DIR", str(Path(tmp) / "cache")):
+        ws = _make_workspace(Path(tmp))
+        h = build_cache.compute_source_hash(str(ws), "android")
+        build_cache.store(str(ws), "android", h, BuildResult(success=False, output="", error="Timed out"))
+        assert build_cache.lookup(str(ws), "android", h) is None
+
+
+def test_only_located_compiler_failures_are_cached():
+    compile_error = "e: file:///ws/composeApp/src/commonMain/kotlin/App.kt:3:7 Unresolved reference 'x'."
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch("config.BUILD_CACHE_DIR", str(Path(tmp) / "cache")):
+        ws = _make_workspace(Path(tmp))
+        h = build_cache.compute_source_hash(str(ws), "android")
+        for error in ("> Could not resolve io.ktor:ktor-client-core:3.0.0.",
+                      "Timeout waiting to lock build logic queue.",
+                      f"{compile_error}\nException: java.lang.OutOfMemoryError: Java heap space",
+                      "FAILURE: Build failed with an exception."):
+            build_cache.store(str(ws), "android", h, BuildResult(success=False, output="", error=error))
+            assert build_cache.lookup(str(ws), "android", h) is None
+        build_cache.store(str(ws), "android", h, BuildResult(success=False, output="", error=compile_error))
+        assert build_cache.lookup(str(ws), "android", h)["error"] == compile_error
+
+
+def test_hash_covers_module_config_outside_src():
+    with tempfile.TemporaryDirectory() as tmp:
+        ws = _make_workspace(Path(tmp))
+        android = build_cache.compute_source_hash(str(ws), "android")
+        web = build_cache.compute_source_hash(str(ws), "web")
+        (ws / "composeApp" / "google-services.json").write_text("{}")
+        (ws / "composeApp" / "webpack.config.d").mkdir()
+        (ws / "composeApp" / "webpack.config.d" / "devServer.js").write_text("config.devServer = {}")
+        assert build_cache.compute_source_hash(str(ws), "android") != android
+        assert build_cache.compute_source_hash(str(ws), "web") != web
+
+
+def test_build_platform_skips_gradle_on_hash_match():
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch("config.BUILD_CACHE_DIR", str(Path(tmp) / "cache")), \
+         patch("config.BUILD_CACHE_ENABLED", True):
+        ws = _make_workspace(Path(tmp))
+        error = "e: file:///ws/composeApp/src/commonMain/kotlin/App.kt:1:5 boom"
+        failing = BuildResult(success=False, output=error, error=error)
+        with patch.object(platforms.AndroidPlatform, "build", new_callable=AsyncMock,
+                          return_value=failing) as mock_build:
+            first = asyncio.run(platforms.build_platform("android", str(ws)))
+            second = asyncio.run(platforms.build_platform("android", str(ws)))
+        assert mock_build.await_count == 1
+        assert second.error == first.error
@@ -0,0 +1,58 @@
+"""Tests for streaming build-error detection and early abort (build_errors.py)."""
+
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import build_errors
+import proc_io
+
+
+def test_detector_collects_distinct_errors_per_platform():
+    detector = build_errors.ErrorDetector("ios", abort_after=0)
+    lines = [
+        "> Task :composeApp:compileKotlinIosSimulatorArm64",
+        "e: file:///ws/composeApp/src/commonMain/kotlin/App.kt:12:5 Unresolved reference: foo",
+        "/ws/iosApp/iosApp/ContentView.swift:7:9: error: cannot find 'bar' in scope",
+        "w: App.kt:3:1 Parameter 'x' is never used",
+        # Gradle repeats compiler errors in its failure summary
+        "e: file:///ws/composeApp/src/commonMain/kotlin/App.kt:12:5 Unresolved reference: foo",
+    ]
+    for line in lines:
+        detector.feed(line)
+    assert [(e.file.rsplit("/", 1)[-1], e.line, e.message) for e in detector.errors] == [
+        ("App.kt", 12, "Unresolved reference: foo"),
+        ("ContentView.swift", 7, "cannot find 'bar' in scope"),
+    ]
+
+
+def test_custom_patterns_are_checked_first():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp, "patterns.json")
+        path.write_text(json.dumps({"android": [{"pattern": r"^AAPT: error: (?P<message>.+)$"}]}))
+        with patch("config.BUILD_ERROR_PATTERNS_FILE", str(path)), patch("build_errors._tables", None):
+            detector = build_errors.ErrorDetector("android", abort_after=0)
+            detector.feed("AAPT: error: resource string/app_name not found")
+        assert detector.errors[0].message == "resource string/app_name not found"
+
+
+def test_build_is_stopped_once_enough_errors_are_known():
+    script = (
+        "import sys, time\n"
+        "for i in range(3): print(f'e: App.kt:{i}:1 Unresolved reference: x{i}', flush=True)\n"
+        "time.sleep(30)\n"
+        "print('BUILD SUCCESSFUL')\n"
+    )
+    detector = build_errors.ErrorDetector("android", abort_after=3, grace_secs=0.2)
+    with tempfile.TemporaryDirectory() as tmp, patch("config.LOG_SPOOL_DIR", tmp):
+        start = time.monotonic()
+        res = asyncio.run(proc_io.run([sys.executable, "-c", script], timeout=60,
+                                      label="gradle-abort", detector=detector))
+    assert time.monotonic() - start < 10
+    assert res.aborted_early and res.returncode != 0
+    assert res.error.splitlines()[:3] == [f"e: App.kt:{i}:1 Unresolved reference: x{i}" for i in range(3)]
+    assert "stopped early" in res.error
@@ -0,0 +1,44 @@
+"""Tests for build progress event streams (build_events.py)."""
+
+import asyncio
+
+import build_events
+
+
+async def _collect(build_id, last_event_id, snapshot):
+    return [chunk async for chunk in build_events.sse(build_id, last_event_id, snapshot)]
+
+
+def _events(chunks):
+    return [line.split(": ", 1)[1] for c in chunks for line in c.splitlines() if line.startswith("event:")]
+
+
+def test_live_subscriber_gets_snapshot_then_deltas_until_complete():
+    async def main():
+        build_events.open_stream("live1")
+        consumer = asyncio.create_task(_collect("live1", None, lambda: {"status": "building"}))
+        await asyncio.sleep(0)
+        build_events.publish("live1", "log", {"message": "Scaffolding"})
+        build_events.publish("live1", "phase", {"phase": "building_web"})
+        build_events.publish("live1", "complete", {"status": "success"})
+        build_events.close("live1")
+        return await asyncio.wait_for(consumer, 1)
+
+    assert _events(asyncio.run(main())) == ["snapshot", "log", "phase", "complete"]
+
+
+def test_resume_from_last_event_id_replays_only_newer_events():
+    build_events.open_stream("resume1")
+    for i in range(3):
+        build_events.publish("resume1", "log", {"message": f"line {i}"})
+    build_events.publish("resume1", "complete", {"status": "failed"})
+    build_events.close("resume1")
+
+    chunks = asyncio.run(_collect("resume1", 2, lambda: {}))
+    assert chunks[0].startswith("id: 3\n")
+    assert _events(chunks) == ["log", "complete"]
+
+
+def test_unknown_stream_falls_back_to_snapshot():
+    chunks = asyncio.run(_collect("gone1", 7, lambda: {"status": "success"}))
+    assert _events(chunks) == ["snapshot", "complete"]
@@ -0,0 +1,78 @@
+"""Tests for the SQLite-backed build-status store (build_store.py)."""
+
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import build_store
+import service
+
+
+def _status(build_id: str, **kwargs) -> service.BuildStatus:
+    defaults = dict(slug="demo-app", status="building", phase="building", message="...")
+    defaults.update(kwargs)
+    return service.BuildStatus(build_id=build_id, **defaults)
+
+
+def test_status_survives_reopen_and_filters_by_index_columns():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "builds.db")
+        store = build_store.BuildStore(path, service.BuildStatus)
+        done = _status("b1", account_id="acct_a", status="success", phase="complete")
+        done.logs.append("compiled")
+        store.put(done)
+        store.put(_status("b2", account_id="acct_b", slug="other", status="failed"))
+
+        reopened = build_store.BuildStore(path, service.BuildStatus)
+        loaded = reopened.get("b1")
+        assert loaded.status == "success"
+        assert list(loaded.logs) == ["compiled"]
+        assert [b.build_id for b in reopened.query(account_id="acct_a")] == ["b1"]
+        assert [b.build_id for b in reopened.query(slug="other", status="failed")] == ["b2"]
+        assert reopened.query(since=time.time() + 60) == []
+
+
+def test_orphaned_running_builds_are_marked_interrupted():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "builds.db")
+        store = build_store.BuildStore(path, service.BuildStatus)
+        store.put(_status("b1"))
+        # Pretend the owning process died
+        with sqlite3.connect(path) as db:
+            db.execute("UPDATE builds SET owner_pid = 999999999, owner_token = 'dead-process'")
+
+        loaded = build_store.BuildStore(path, service.BuildStatus).get("b1")
+        assert loaded.status == "failed"
+        assert "Interrupted" in loaded.message
+
+
+def test_builds_from_a_previous_process_with_our_pid_are_interrupted():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "builds.db")
+        store = build_store.BuildStore(path, service.BuildStatus)
+        store.put(_status("mine"))
+        store.put(_status("old"))
+        # e.g. a container restart: the previous entrypoint had the same pid
+        with sqlite3.connect(path) as db:
+            db.execute("UPDATE builds SET owner_token = 'previous-boot' WHERE build_id = 'old'")
+
+        reopened = build_store.BuildStore(path, service.BuildStatus)
+        assert reopened.get("old").status == "failed"
+        assert reopened.get("mine").status == "building"
+
+
+def test_expired_rows_are_purged_and_logs_are_bounded():
+    with tempfile.TemporaryDirectory() as tmp, patch("config.BUILD_LOG_MAX_LINES", 3):
+        path = str(Path(tmp) / "builds.db")
+        store = build_store.BuildStore(path, service.BuildStatus, ttl_days=1)
+        old = _status("old", status="success")
+        for i in range(10):
+            old.logs.append(f"line {i}")
+        store.put(old)
+        assert list(old.logs) == ["line 7", "line 8", "line 9"]
+        with sqlite3.connect(path) as db:
+            db.execute("UPDATE builds SET updated_at = ?", (time.time() - 2 * 86400,))
+
+        assert build_store.BuildStore(path, service.BuildStatus, ttl_days=1).get("old") is None
@@ -0,0 +1,109 @@
+"""Tests for the pre-spawned Claude CLI pool (claude_pool.py)."""
+
+import asyncio
+
+import claude_pool
+
+
+class _Proc:
+    def __init__(self):
+        self.returncode = None
+        self.killed = False
+
+    def kill(self):
+        self.killed = True
+        self.returncode = -9
+
+
+def _spawner(spawned: list, delay: float = 0.0):
+    async def spawn():
+        await asyncio.sleep(delay)
+        proc = _Proc()
+        spawned.append(proc)
+        return proc
+    return spawn
+
+
+def test_take_hands_over_only_a_matching_warm_process():
+    pool = claude_pool.ClaudeProcessPool(max_idle=2, idle_secs=60)
+    spawned = []
+
+    async def main():
+        pool.prewarm(("/ws", ("claude",), 100), _spawner(spawned))
+        await asyncio.sleep(0.01)
+        assert pool.take(("/ws", ("claude", "-r", "s1"), 100)) is None
+        assert pool.take(("/ws", ("claude",), 100)) is spawned[0]
+        assert pool.take(("/ws", ("claude",), 100)) is None  # each process serves one prompt
+        await pool.shutdown()
+
+    asyncio.run(main())
+    m = pool.metrics()
+    assert (m["warm_hits"], m["cold_starts"], m["idle"]) == (1, 2, 0)
+
+
+def test_prewarm_respects_the_idle_limit():
+    pool = claude_pool.ClaudeProcessPool(max_idle=2, idle_secs=60)
+    spawned = []
+
+    async def main():
+        for key in ("a", "b", "a"):
+            pool.prewarm((key, (), 0), _spawner(spawned))
+        assert pool.metrics()["spawning"] == 2  # the repeated key isn't spawned twice
+        await asyncio.sleep(0.01)
+        pool.prewarm(("c", (), 0), _spawner(spawned))  # drops the oldest idle process
+        await asyncio.sleep(0.01)
+        idle = pool.metrics()["idle"]
+        await pool.shutdown()
+        return idle
+
+    assert asyncio.run(main()) == 2
+    assert len(spawned) == 3 and spawned[0].killed
+    assert pool.metrics()["discarded"] == 1
+
+
+def test_reap_kills_expired_and_dead_processes():
+    pool = claude_pool.ClaudeProcessPool(max_idle=3, idle_secs=60)
+    spawned = []
+
+    async def main():
+        for key in ("old", "dead", "fresh"):
+            pool.prewarm((key, (), 0), _spawner(spawned))
+        await asyncio.sleep(0.01)
+        pool._idle[0].spawned_at -= 120
+        pool._idle[1].proc.returncode = 1
+        pool.reap()
+        assert [w.key[0] for w in pool._idle] == ["fresh"]
+        await pool.shutdown()
+
+    asyncio.run(main())
+    assert spawned[0].killed and pool.metrics()["reaped"] == 2
+
+
+def test_processes_from_a_previous_loop_are_killed():
+    pool = claude_pool.ClaudeProcessPool(max_idle=2, idle_secs=60)
+    spawned = []
+
+    async def first():
+        pool.prewarm(("/ws", (), 0), _spawner(spawned))
+        await asyncio.sleep(0.01)
+
+    async def second():
+        return pool.take(("/ws", (), 0))
+
+    asyncio.run(first())
+    # Its transport belongs to the closed loop, so it can't be handed over
+    assert asyncio.run(second()) is None
+    assert spawned[0].killed
+
+
+def test_shutdown_kills_processes_still_being_spawned():
+    pool = claude_pool.ClaudeProcessPool(max_idle=2, idle_secs=60)
+    spawned = []
+
+    async def main():
+        pool.prewarm(("/ws", (), 0), _spawner(spawned, delay=0.05))
+        await pool.shutdown()
+
+    asyncio.run(main())
+    assert len(spawned) == 1 and spawned[0].killed
+    assert pool.metrics()["idle"] == 0
@@ -0,0 +1,76 @@
+"""Tests for the append-only spend ledger (cost_tracker.py)."""
+
+import json
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+import cost_tracker
+
+
+class _Day(date):
+    """date.today() that a test can move forward."""
+    current = date(2026, 3, 1)
+
+    @classmethod
+    def today(cls):
+        return cls.current
+
+
+def _tracker(tmp: str, legacy: Path = None) -> cost_tracker.CostTracker:
+    return cost_tracker.CostTracker(str(Path(tmp, "ledger.db")), legacy_file=legacy or Path(tmp, "none.json"))
+
+
+def test_charges_survive_restart_and_roll_over_daily():
+    with tempfile.TemporaryDirectory() as tmp, patch("cost_tracker.date", _Day):
+        _Day.current = date(2026, 3, 1)
+        t = _tracker(tmp)
+        t.add(0.50, 1, workspace="app")
+        t.add(0.25, 2, workspace="game")
+        t.add(0.10)  # unattributed
+        assert not t.can_afford(0.5, 1) and t.can_afford(0.5, 2)
+
+        reopened = _tracker(tmp)
+        assert reopened.today_spent() == 0.85 and reopened.today_tasks() == 3
+        assert reopened.user_summaries() == [(1, 0.5, 1), (2, 0.25, 1)]
+
+        _Day.current = date(2026, 3, 2)
+        reopened.add(1.0, 1, workspace="app")
+        assert reopened.today_spent(1) == 1.0 and reopened.today_tasks() == 1
+
+        days = reopened.spend(7)
+        assert [(r["day"], r["spent_usd"], r["tasks"]) for r in days] == [
+            ("2026-03-01", 0.85, 3), ("2026-03-02", 1.0, 1),
+        ]
+        by_ws = {r["workspace"]: r["spent_usd"] for r in reopened.spend(7, by="workspace")}
+        assert by_ws == {"": 0.1, "app": 1.5, "game": 0.25}
+        assert reopened.period_spent(7, user_id=1) == (1.5, 2)
+
+
+def test_retention_prunes_raw_charges_but_keeps_daily_snapshots():
+    with tempfile.TemporaryDirectory() as tmp, patch("cost_tracker.date", _Day), \
+         patch("config.COST_LEDGER_RETENTION_DAYS", 3):
+        _Day.current = date(2026, 3, 1)
+        t = _tracker(tmp)
+        t.add(2.0, 7, workspace="app")
+        _Day.current = date(2026, 3, 1) + timedelta(days=5)
+        t.add(1.0, 7, workspace="app")
+
+        assert t._db.execute("SELECT COUNT(*) FROM ledger").fetchone()[0] == 1
+        assert t.period_spent(10, user_id=7) == (3.0, 2)
+
+
+def test_legacy_json_is_imported_once():
+    with tempfile.TemporaryDirectory() as tmp, patch("cost_tracker.date", _Day):
+        _Day.current = date(2026, 3, 1)
+        legacy = Path(tmp, "cost_tracker.json")
+        legacy.write_text(json.dumps({
+            "date": "2026-03-01",
+            "global": {"spent_usd": 1.5, "tasks": 4},
+            "users": {"42": {"spent_usd": 1.0, "tasks": 3}},
+        }))
+        _tracker(tmp, legacy)
+        t = _tracker(tmp, legacy)
+        assert t.today_spent(42) == 1.0
+        assert t.today_spent() == 1.5 and t.today_tasks() == 4
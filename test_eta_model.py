@@ -0,0 +1,48 @@
+"""Tests for the persisted duration model (eta_model.py)."""
+
+import tempfile
+from pathlib import Path
+
+import eta_model
+
+
+def test_falls_back_from_exact_key_to_coarser_keys_and_priors():
+    with tempfile.TemporaryDirectory() as tmp:
+        model = eta_model.EtaModel(str(Path(tmp, "eta.db")), window=50, min_samples=3)
+        assert model.estimate("claude", platform="web", kind="fix").basis == "prior"
+
+        for d in (10, 20, 30):
+            model.record("claude", d, platform="web", kind="fix", prompt_chars=500)
+        exact = model.estimate("claude", platform="web", kind="fix", prompt_chars=800)
+        assert exact.basis == "exact" and exact.p50 == 20 and exact.p90 == 28
+        # Longer prompt: no samples in its size bucket yet → same platform/kind
+        assert model.estimate("claude", platform="web", kind="fix", prompt_chars=9000).basis == "kind"
+        # Other kind on the same platform → platform level
+        assert model.estimate("claude", platform="web", kind="initial").basis == "platform"
+        assert model.estimate("claude", platform="ios", kind="initial").basis == "op"
+
+
+def test_samples_persist_and_accuracy_is_tracked():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp, "eta.db"))
+        model = eta_model.EtaModel(path, window=50, min_samples=1)
+        with eta_model.labels(platform="android", kind=""):
+            model.record("build", 100)  # predicted from the 180s prior
+            model.record("build", 100)  # predicted 100 from the first sample
+
+        reopened = eta_model.EtaModel(path, window=50, min_samples=1)
+        est = reopened.estimate("build", platform="android", kind="")
+        assert est.basis == "exact" and est.p50 == 100
+        acc = reopened.accuracy()["build"]
+        assert acc["samples"] == 2 and acc["from_prior"] == 1
+        assert acc["mape"] == 0.4  # (0.8 + 0.0) / 2
+        assert acc["p90_coverage"] == 1.0
+
+
+def test_remaining_counts_down_to_p50_then_p90():
+    est = eta_model.Estimate(p50=60, p90=120, samples=5, basis="exact")
+    assert est.remaining(20) == 40
+    assert est.remaining(90) == 30
+    assert est.remaining(150) is None
+    assert eta_model.format_remaining(130) == "~2m 10s left"
+    assert eta_model.format_remaining(None) == "taking longer than usual"
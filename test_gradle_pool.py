@@ -0,0 +1,131 @@
+"""Tests for the warm Gradle daemon pool (gradle_pool.py)."""
+
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import gradle_pool
+
+
+def _workspace(root: str, name: str, gradle_version: str = "8.7") -> str:
+    """A project whose ./gradlew only records its arguments."""
+    ws = Path(root, name)
+    (ws / "gradle" / "wrapper").mkdir(parents=True)
+    (ws / "gradle" / "wrapper" / "gradle-wrapper.properties").write_text(
+        f"distributionUrl=https\\://services.gradle.org/distributions/gradle-{gradle_version}-bin.zip\n")
+    gradlew = ws / "gradlew"
+    gradlew.write_text(f'#!/bin/sh\necho "$@" >> "{root}/calls.txt"\n')
+    gradlew.chmod(0o755)
+    return str(ws)
+
+
+def _calls(root: str) -> list[str]:
+    path = Path(root, "calls.txt")
+    return path.read_text().splitlines() if path.exists() else []
+
+
+async def _build(pool, ws: str) -> gradle_pool.GradleSlot:
+    slot = await pool.acquire(ws)
+    slot.observe("BUILD SUCCESSFUL")
+    await pool.release(slot, ws)
+    return slot
+
+
+def test_leases_prefer_the_slot_that_last_built_the_workspace():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = gradle_pool.GradleDaemonPool(2, str(Path(tmp, "daemons")))
+        a, b = _workspace(tmp, "a"), _workspace(tmp, "b")
+        before = gradle_pool.metrics()["affinity_hits"]
+
+        async def main():
+            sa, sb = await pool.acquire(a), await pool.acquire(b)
+            assert sa is not sb and sa.registry_dir.is_dir()
+            for slot, ws in ((sa, a), (sb, b)):
+                slot.observe("Starting a Gradle Daemon")
+                await pool.release(slot, ws)
+            return sa, sb, await pool.acquire(b), await pool.acquire(a)
+
+        sa, sb, again_b, again_a = asyncio.run(main())
+        assert (again_a, again_b) == (sa, sb)
+        assert gradle_pool.metrics()["affinity_hits"] - before == 2
+
+
+def test_lease_waits_for_a_free_slot():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = gradle_pool.GradleDaemonPool(1, str(Path(tmp, "daemons")))
+        ws = _workspace(tmp, "a")
+        order = []
+
+        async def build(name, delay):
+            await asyncio.sleep(delay)
+            async with gradle_pool.lease(ws):
+                order.append(name)
+                await asyncio.sleep(0.05)
+                order.append(f"{name} done")
+
+        async def main():
+            await asyncio.gather(build("first", 0), build("second", 0.01))
+
+        with patch("gradle_pool._pool", pool):
+            asyncio.run(main())
+        assert order == ["first", "first done", "second", "second done"]
+        assert pool.metrics()["waiting"] == 0
+
+
+def test_incompatible_daemon_is_stopped_before_the_next_build():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = gradle_pool.GradleDaemonPool(1, str(Path(tmp, "daemons")))
+        old, new = _workspace(tmp, "old", "8.5"), _workspace(tmp, "new", "8.7")
+
+        async def main():
+            await _build(pool, old)
+            await _build(pool, old)  # same Gradle version: the daemon is reused
+            assert _calls(tmp) == []
+            return await _build(pool, new)
+
+        slot = asyncio.run(main())
+        # Stopped with the old project's wrapper, in the slot's own registry
+        assert _calls(tmp) == [f"--stop -Dorg.gradle.daemon.registry.base={slot.registry_dir}"]
+        assert slot.signature == gradle_pool.daemon_signature(new)
+
+
+def test_eviction_forgets_idle_daemons_and_stops_one_under_memory_pressure():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = gradle_pool.GradleDaemonPool(2, str(Path(tmp, "daemons")))
+        a, b = _workspace(tmp, "a"), _workspace(tmp, "b")
+
+        async def main():
+            sa, sb = await pool.acquire(a), await pool.acquire(b)
+            for slot, ws in ((sa, a), (sb, b)):
+                slot.observe("")
+                await pool.release(slot, ws)
+            sa.last_used = time.time() - 10  # least recently used
+            with patch("gradle_pool._available_memory_mb", return_value=100):
+                await pool.evict()
+            assert (sa.warm, sb.warm) == (False, True)
+            sb.last_used = time.time() - 10
+            with patch("config.GRADLE_DAEMON_IDLE_SECS", 5), \
+                 patch("gradle_pool._available_memory_mb", return_value=None):
+                await pool.evict()
+            assert not sb.warm
+
+        asyncio.run(main())
+        assert len(_calls(tmp)) == 1  # idle timeout needs no --stop; the daemon exits itself
+
+
+def test_shutdown_stops_daemons_and_removes_registries():
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = gradle_pool.GradleDaemonPool(2, str(Path(tmp, "daemons")))
+        a, b = _workspace(tmp, "a"), _workspace(tmp, "b", "8.5")
+
+        async def main():
+            await _build(pool, a)
+            busy = await pool.acquire(b)  # a build still running at exit, in the cold slot
+            await pool.shutdown()
+            return busy
+
+        busy = asyncio.run(main())
+        assert len(_calls(tmp)) == 1
+        assert [p.name for p in Path(tmp, "daemons").iterdir()] == [busy.registry_dir.name]
@@ -0,0 +1,48 @@
+"""Tests for background handoff-summary refreshes (handoff_summaries.py)."""
+
+import asyncio
+from unittest.mock import patch
+
+import scheduler
+from handoff_summaries import HandoffSummaryWorker
+
+
+def test_summary_yields_to_a_user_prompt_then_completes():
+    sched = scheduler.Scheduler({"claude": 1})
+    calls = []
+
+    async def generate(ws, path):
+        calls.append(ws)
+        await asyncio.sleep(0.3 if len(calls) == 1 else 0)
+        return True
+
+    async def main():
+        worker = HandoffSummaryWorker(generate, is_busy=lambda ws: False, max_queue=4, idle_secs=0)
+        worker.schedule("app", "/tmp/app")
+        await asyncio.sleep(0.05)  # summary is running and holds the only slot
+
+        # A user prompt queues for the slot → the summary is killed and re-queued
+        await asyncio.wait_for(sched.acquire("claude"), timeout=1)
+        sched.release(next(iter(sched._pools["claude"].running)))
+        await asyncio.sleep(0.1)  # re-queued summary runs once the slot is free
+        return worker.metrics()
+
+    with patch("handoff_summaries.scheduler.get_scheduler", return_value=sched), \
+         patch("handoff_summaries._PREEMPT_POLL_SECS", 0.01), \
+         patch("handoff_summaries._BUSY_RETRY_SECS", 0.01):
+        metrics = asyncio.run(main())
+
+    assert metrics["preempted"] == 1
+    assert metrics["generated"] == 1
+    assert calls == ["app", "app"]
+
+
+def test_queue_is_bounded_and_drops_oldest():
+    async def main():
+        worker = HandoffSummaryWorker(lambda ws, p: asyncio.sleep(0), is_busy=lambda ws: True,
+                                      max_queue=2, idle_secs=60)
+        for ws in ("a", "b", "c"):
+            worker.schedule(ws, f"/tmp/{ws}")
+        return list(worker._queue), worker.metrics()["dropped"]
+
+    assert asyncio.run(main()) == (["b", "c"], 1)
@@ -0,0 +1,86 @@
+"""Tests for provider routing, concurrency limits and failover (llm_router.py)."""
+
+import asyncio
+from unittest.mock import patch
+
+import llm_router
+
+
+class _FakeClient:
+    def __init__(self, reply="ok", error=None, delay=0.0):
+        self.reply, self.error, self.delay = reply, error, delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def query(self, model, messages, temperature=0.2, timeout=120.0, max_tokens=4096):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if self.error:
+            return {"error": True, "error_message": self.error}
+        return {"content": self.reply, "error": False}
+
+
+def _target(name, client, price=(0.0, 0.0), limit=4, latency=1.0):
+    return llm_router.Target(name, f"{name}-model", client, *price, limit=limit, latency=latency)
+
+
+def test_cheaper_provider_wins_when_latency_is_similar():
+    cheap, pricey = _FakeClient("cheap"), _FakeClient("pricey")
+    router = llm_router.LLMRouter([
+        _target("pricey", pricey, price=(15.0, 75.0)),
+        _target("cheap", cheap, price=(0.15, 0.60)),
+    ])
+    res = asyncio.run(router.complete("x" * 4000))
+    assert (res.text, res.provider) == ("cheap", "cheap")
+    assert pricey.calls == 0
+
+
+def test_errors_fail_over_and_trip_a_cooldown():
+    broken, backup = _FakeClient(error="HTTP 529 overloaded"), _FakeClient("backup")
+    router = llm_router.LLMRouter([_target("broken", broken, latency=0.1), _target("backup", backup)])
+
+    async def scenario():
+        return [await router.complete("hi") for _ in range(3)]
+
+    results = asyncio.run(scenario())
+    assert [r.text for r in results] == ["backup"] * 3
+    assert results[0].attempts == 2
+    # Two failures in a row put "broken" in cooldown; the third request skips it
+    assert broken.calls == 2
+    assert router.metrics()["providers"]["broken"]["cooling_down"]
+
+
+def test_slow_provider_times_out_to_the_next_one():
+    slow, fast = _FakeClient("slow", delay=5), _FakeClient("fast")
+    router = llm_router.LLMRouter([_target("slow", slow, latency=0.1), _target("fast", fast)])
+    with patch("config.LLM_ROUTER_TIMEOUT_SECS", 0.1):
+        res = asyncio.run(router.complete("hi"))
+    assert res.text == "fast" and res.attempts == 2
+
+
+def test_concurrency_is_capped_per_provider():
+    client = _FakeClient(delay=0.02)
+    router = llm_router.LLMRouter([_target("only", client, limit=2)])
+
+    async def scenario():
+        return await asyncio.gather(*(router.complete(f"p{i}") for i in range(6)))
+
+    results = asyncio.run(scenario())
+    assert all(r.text == "ok" for r in results)
+    assert client.max_active == 2
+
+
+def test_routing_runner_speaks_the_agent_protocol():
+    runner = llm_router.RoutingRunner(llm_router.LLMRouter([_target("a", _FakeClient("  save 3  "))]))
+    result = asyncio.run(runner.run("describe", "ws", "/ws"))
+    assert (result.stdout, result.exit_code) == ("save 3", 0)
+
+    empty = llm_router.RoutingRunner(llm_router.LLMRouter([]))
+    result = asyncio.run(empty.run("describe", "ws", "/ws"))
+    assert result.exit_code != 0 and "No LLM provider" in result.stderr
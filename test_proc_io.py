@@ -0,0 +1,69 @@
+"""Tests for bounded subprocess capture and log spooling (proc_io.py)."""
+
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import proc_io
+
+
+def _old_extract_build_error(raw_output: str, max_lines: int = 60) -> str:
+    """The pre-streaming implementation, kept as the reference."""
+    lines = raw_output.splitlines()
+    for i, line in enumerate(lines):
+        if "FAILURE:" in line or "BUILD FAILED" in line:
+            return "\n".join(lines[i:i + max_lines])
+    for i, line in enumerate(lines):
+        if "error:" in line.lower() or "** BUILD FAILED **" in line:
+            return "\n".join(lines[max(0, i - 5):i + max_lines])
+    error_lines = [l for l in lines if l.strip().startswith("e:") or "error:" in l.lower()]
+    if error_lines:
+        return "\n".join(error_lines[:max_lines])
+    return "\n".join(lines[-max_lines:])
+
+
+def test_scanner_matches_the_buffered_extractor():
+    noise = [f"> Task :composeApp:step{i}" for i in range(200)]
+    samples = [
+        noise + ["e: file:///ws/App.kt:3:5 Unresolved reference: foo"] + noise + ["FAILURE: Build failed"] + noise,
+        noise[:3] + ["/ws/iosApp/ContentView.swift:10:5: error: cannot find 'x'"] + noise,
+        noise + ["e: App.kt:1 boom", "  e: Other.kt:2 bang"] + noise,
+        noise,
+    ]
+    for raw in ("\n".join(s) for s in samples):
+        assert proc_io.scan_lines(raw.splitlines()) == _old_extract_build_error(raw)
+        assert proc_io.scan_lines(raw.splitlines(), 5) == _old_extract_build_error(raw, 5)
+
+
+def test_verbose_output_is_spooled_and_bounded_in_memory():
+    script = (
+        "import sys\n"
+        "for i in range(20000): print(f'> Task :step{i} ' + 'x' * 80)\n"
+        "print('e: App.kt:12 Unresolved reference: boom')\n"
+        "for i in range(20000): print(f'> Task :after{i} ' + 'x' * 80)\n"
+        "sys.exit(1)\n"
+    )
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch("config.LOG_SPOOL_DIR", tmp), \
+         patch("config.PROC_CAPTURE_HEAD_KB", 4), \
+         patch("config.PROC_CAPTURE_TAIL_KB", 8):
+        res = asyncio.run(proc_io.run([sys.executable, "-c", script], timeout=60, label="gradle-demo"))
+
+        assert res.returncode == 1
+        # The error sits in the middle of ~3.5MB of output: not in memory, but still found
+        assert len(res.stdout) < 16 * 1024
+        assert "bytes omitted" in res.stdout and str(res.log_path) in res.stdout
+        assert res.error == "e: App.kt:12 Unresolved reference: boom"
+        assert "Unresolved reference: boom" in Path(res.log_path).read_text()
+
+
+def test_spool_keeps_only_the_newest_files():
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch("config.LOG_SPOOL_DIR", tmp), patch("config.LOG_SPOOL_KEEP", 2):
+        for i in range(4):
+            spool = proc_io.LogSpool(f"run{i}")
+            spool.write(b"line\n")
+            spool.close()
+        assert len(list(Path(tmp).glob("*.log"))) == 2
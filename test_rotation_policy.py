@@ -0,0 +1,56 @@
+"""Tests for cost-based session rotation (rotation_policy.py)."""
+
+from unittest.mock import patch
+
+import rotation_policy
+
+
+def _result(context, cached_ratio, cost, turns=4):
+    total = context * turns
+    cached = int(total * cached_ratio)
+    return {
+        "num_turns": turns,
+        "total_cost_usd": cost,
+        "usage": {"input_tokens": 100, "cache_creation_input_tokens": total - cached - 100,
+                  "cache_read_input_tokens": cached},
+    }
+
+
+def _session(contexts, cached_ratio, cost):
+    usage = {}
+    for i, ctx in enumerate(contexts):
+        usage = rotation_policy.observe(usage, _result(ctx, cached_ratio, cost), new_session=i == 0)
+    return usage
+
+
+def test_small_well_cached_session_is_kept_past_resume_limit():
+    with patch("rotation_policy._fresh_base_tokens", None):
+        usage = _session([20_000 + 1_000 * i for i in range(12)], 0.95, 0.05)
+        rotate, reason = rotation_policy.should_rotate(usage, resumes=12, record=False)
+    assert not rotate, reason
+
+
+def test_large_growing_session_with_poor_cache_hits_rotates():
+    with patch("rotation_policy._fresh_base_tokens", None):
+        _session([20_000], 0.5, 0.1)  # a fresh session establishes the base context
+        usage = _session([40_000 + 15_000 * i for i in range(5)], 0.3, 0.8)
+        rotate, reason = rotation_policy.should_rotate(usage, resumes=5, record=False)
+    assert rotate and "resume $" in reason
+
+
+def test_context_cap_forces_rotation():
+    with patch("rotation_policy._fresh_base_tokens", None):
+        usage = _session([140_000, 150_000], 0.99, 0.2)
+        rotate, reason = rotation_policy.should_rotate(usage, resumes=1, record=False)
+    assert rotate and "context" in reason
+
+
+def test_background_summary_cost_counts_toward_rotation():
+    with patch("rotation_policy._fresh_base_tokens", None), patch("config.SUMMARY_QUEUE_SIZE", 64):
+        usage = _session([20_000 + 1_000 * i for i in range(12)], 0.95, 0.05)
+        usage = rotation_policy.observe_summary(usage, 0.5)  # each refresh re-reads the whole session
+        rotate, reason = rotation_policy.should_rotate(usage, resumes=12, record=False)
+        assert rotate, reason
+
+        with patch("config.SUMMARY_QUEUE_SIZE", 0):  # no background refreshes, nothing to save
+            assert not rotation_policy.should_rotate(usage, resumes=12, record=False)[0]
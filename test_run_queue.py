@@ -0,0 +1,131 @@
+"""Tests for per-workspace run serialization and coalescing (run_queue.py)."""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+import run_queue
+
+
+@pytest.fixture(autouse=True)
+def _lock_dir(tmp_path):
+    with patch("config.CLAUDE_RUN_LOCK_DIR", str(tmp_path)):
+        yield
+
+
+class _FakeExecute:
+    def __init__(self):
+        self.prompts: list[str] = []
+        self.active = 0
+        self.max_active = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, prompt, ws, path, prefix, on_progress):
+        self.prompts.append(prompt)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await self.release.wait()
+        self.active -= 1
+        return f"done: {prompt}"
+
+
+def test_runs_in_one_workspace_are_serialized_and_duplicates_share_a_run():
+    async def scenario():
+        execute = _FakeExecute()
+        queue = run_queue.WorkspaceRunQueue(execute, coalesce="identical")
+        notes = []
+
+        async def note(text):
+            notes.append(text)
+
+        first = asyncio.create_task(queue.run("app", "/ws", "a"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(queue.run("app", "/ws", "b", on_progress=note))
+        dup = asyncio.create_task(queue.run("app", "/ws", "b"))
+        await asyncio.sleep(0.01)
+        assert execute.prompts == ["a"] and queue.waiting("app") == 1
+        assert notes and "Waiting for 1 earlier run" in notes[0]
+
+        execute.release.set()
+        results = await asyncio.gather(first, second, dup)
+        assert results == ["done: a", "done: b", "done: b"]
+        assert execute.prompts == ["a", "b"] and execute.max_active == 1
+        assert not queue.busy("app")
+
+    asyncio.run(scenario())
+
+
+def test_stacked_prompts_go_out_as_one_run():
+    async def scenario():
+        execute = _FakeExecute()
+        queue = run_queue.WorkspaceRunQueue(execute, coalesce="stacked")
+        first = asyncio.create_task(queue.run("app", "/ws", "a"))
+        await asyncio.sleep(0)
+        rest = [asyncio.create_task(queue.run("app", "/ws", p)) for p in ("b", "c")]
+        await asyncio.sleep(0.01)
+        execute.release.set()
+        await first
+        merged = await asyncio.gather(*rest)
+        assert len(execute.prompts) == 2
+        assert "1. b" in execute.prompts[1] and "2. c" in execute.prompts[1]
+        assert merged[0] == merged[1]
+
+    asyncio.run(scenario())
+
+
+def test_cancel_drops_queued_runs_but_not_the_active_one():
+    async def scenario():
+        execute = _FakeExecute()
+        queue = run_queue.WorkspaceRunQueue(execute, coalesce="off")
+        active = asyncio.create_task(queue.run("app", "/ws", "a"))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(queue.run("app", "/ws", "b"))
+        await asyncio.sleep(0.01)
+
+        assert queue.cancel("app") == 1
+        with pytest.raises(run_queue.RunCancelled):
+            await queued
+        execute.release.set()
+        assert await active == "done: a"
+        assert execute.prompts == ["a"]
+
+    asyncio.run(scenario())
+
+
+def test_runners_in_other_processes_wait_for_the_workspace_lock():
+    async def scenario():
+        # Two queues stand in for the bot's and the API's runners
+        bot_exec, api_exec = _FakeExecute(), _FakeExecute()
+        bot, api = run_queue.WorkspaceRunQueue(bot_exec), run_queue.WorkspaceRunQueue(api_exec)
+        notes = []
+
+        async def note(text):
+            notes.append(text)
+
+        first = asyncio.create_task(bot.run("app", "/ws", "a"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(api.run("app", "/ws", "b", on_progress=note))
+        other_ws = asyncio.create_task(api.run("other", "/ws2", "c"))
+        await asyncio.sleep(0.05)
+        assert bot_exec.prompts == ["a"] and api_exec.prompts == ["c"]
+        assert notes and "Waiting for another run" in notes[0]
+
+        bot_exec.release.set()
+        api_exec.release.set()
+        assert await asyncio.gather(first, second, other_ws) == ["done: a", "done: b", "done: c"]
+        assert api_exec.prompts == ["c", "b"]
+
+        # Cancelling a run that waits on the lock doesn't wait for the lock
+        bot_exec.release.clear()
+        held = asyncio.create_task(bot.run("app", "/ws", "d"))
+        await asyncio.sleep(0)
+        blocked = asyncio.create_task(api.run("app", "/ws", "e"))
+        await asyncio.sleep(0.05)
+        assert api.cancel("app") == 1
+        with pytest.raises(run_queue.RunCancelled):
+            await asyncio.wait_for(blocked, 1)
+        bot_exec.release.set()
+        await held
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+"""Tests for scheduler.py admission control."""
+
+import asyncio
+
+import scheduler
+
+
+def _run_jobs(sched: scheduler.Scheduler, jobs: list[tuple[str, str, int]]) -> list[str]:
+    """Hold the only slot, queue `jobs` behind it, then release and record grant order."""
+    order = []
+
+    async def job(account, job_id, priority, gate):
+        scheduler.bind(account=account, job_id=job_id, priority=priority)
+        async with sched.slot("gradle"):
+            order.append(job_id)
+            await gate.wait()
+
+    async def main():
+        gate = asyncio.Event()
+        holder = asyncio.create_task(job("alice", "first", scheduler.PRIORITY_NORMAL, gate))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(job(a, j, p, gate)) for a, j, p in jobs]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holder, *waiters)
+
+    asyncio.run(main())
+    return order
+
+
+def test_priority_beats_fifo():
+    sched = scheduler.Scheduler({"gradle": 1})
+    order = _run_jobs(sched, [
+        ("bob", "normal", scheduler.PRIORITY_NORMAL),
+        ("carol", "admin", scheduler.PRIORITY_HIGH),
+    ])
+    assert order == ["first", "admin", "normal"]
+
+
+def test_queue_info_reports_position_and_eta():
+    sched = scheduler.Scheduler({"gradle": 1})
+
+    async def main():
+        gate = asyncio.Event()
+
+        async def job(job_id):
+            scheduler.bind(account=job_id, job_id=job_id)
+            async with sched.slot("gradle"):
+                await gate.wait()
+
+        tasks = [asyncio.create_task(job(j)) for j in ("a", "b", "c")]
+        await asyncio.sleep(0)
+        assert sched.get_queue_info("a") is None  # running, not queued
+        info = sched.get_queue_info("c")
+        gate.set()
+        await asyncio.gather(*tasks)
+        return info
+
+    info = asyncio.run(main())
+    assert info["resource"] == "gradle"
+    assert info["position"] == 2
+    assert info["eta_seconds"] > 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    sched = scheduler.Scheduler({"gradle": 1})
+
+    async def main():
+        held = await sched.acquire("gradle")
+        waiter = asyncio.create_task(sched.acquire("gradle"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        sched.release(held)
+        return sched.snapshot()["gradle"]
+
+    snap = asyncio.run(main())
+    assert snap["waiting"] == 0
+    assert snap["running"] == 0
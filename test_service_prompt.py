@@ -72,3 +72,29 @@ def test_send_prompt_tracks_workspace_slug_and_uses_request_webhook():
     webhook_url, payload = mock_webhook.await_args.args
     assert webhook_url == "http://localhost:9999/prompt"
     assert payload["detail"]["slug"] == "demo-app"
+
+
+def test_demo_workspace_publishes_progress():
+    scheduled = []
+
+    def fake_create_task(coro):
+        scheduled.append(coro)
+        return SimpleNamespace(cancel=lambda: None)
+
+    async def fake_demo(platform, ws_path, workspace_key="", on_status=None):
+        await on_status("🔨 Building web app...")
+        return SimpleNamespace(success=True, message="✅ Web app live!", demo_url="http://x")
+
+    registry = SimpleNamespace(get_path=lambda slug: "/tmp/demo-workspace")
+    with patch("service._get_registry", return_value=registry), \
+         patch("service.demo_platform", side_effect=fake_demo), \
+         patch("service._track_build"), \
+         patch("service.finish_build"), \
+         patch("service.build_events.publish") as mock_publish, \
+         patch("service.asyncio.create_task", side_effect=fake_create_task):
+        status = asyncio.run(service.demo_workspace("demo-app"))
+        asyncio.run(scheduled[0])
+
+    logs = [c.args[2]["message"] for c in mock_publish.call_args_list if c.args[1] == "log"]
+    assert logs == ["🔨 Building web app..."]
+    assert list(status.logs) == logs
@@ -0,0 +1,62 @@
+"""Tests for the Claude session-state store (session_store.py)."""
+
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+import config
+import session_store
+
+
+def test_updates_within_a_loop_are_coalesced_into_one_flush():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp, "sessions.db"))
+        store = session_store.SessionStore(db, flush_delay=0.01)
+
+        async def main():
+            for i in range(20):
+                store.update(f"ws{i % 4}", session_id=f"s{i}", resumes=i)
+            store.clear("ws3")
+            await asyncio.sleep(0.05)
+
+        asyncio.run(main())
+        assert store.metrics()["flushes"] == 1
+
+        reopened = session_store.SessionStore(db)
+        assert reopened.get("ws0") == session_store.SessionState("s16", 0, 16)
+        assert reopened.get("ws3").session_id is None
+
+
+def test_legacy_json_files_are_imported_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        Path(tmp, "claude_sessions.json").write_text(json.dumps({"a": "sa", "b": "sb"}))
+        Path(tmp, "claude_session_resumes.json").write_text(json.dumps({"a": 2}))
+        Path(tmp, "claude_session_tokens.json").write_text(json.dumps({"a": 1234}))
+        db = str(Path(tmp, "sessions.db"))
+
+        store = session_store.SessionStore(db, legacy_dir=tmp)
+        assert store.get("a") == session_store.SessionState("sa", 1234, 2)
+        # Sessions with no resume count are due for rotation
+        assert store.get("b").resumes == config.SESSION_MAX_RESUMES
+
+        store.clear("a")
+        assert session_store.SessionStore(db, legacy_dir=tmp).get("a").session_id is None
+
+
+def test_two_processes_share_a_workspace_row():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = str(Path(tmp, "sessions.db"))
+        bot, api = session_store.SessionStore(db), session_store.SessionStore(db)
+
+        bot.update("ws", session_id="s1", resumes=3)
+        # The API's next run picks up the bot's session instead of its stale copy
+        assert api.reload("ws") == session_store.SessionState("s1", 0, 3)
+
+        # Each only writes the columns it changed
+        api.update("ws", usage={"turns": 1})
+        bot.update("ws", resumes=4)
+        assert session_store.SessionStore(db).get("ws") == session_store.SessionState("s1", 0, 4, {"turns": 1})
+
+        bot.clear("ws")
+        assert api.reload("ws").session_id is None
@@ -0,0 +1,109 @@
+"""Tests for the transactional document store (storage.py) and the registry on top of it."""
+
+import json
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import storage
+from allowlist import Allowlist
+from workspaces import WorkspaceRegistry
+
+
+def _owner_index(doc: dict):
+    yield "owner_id", doc.get("owner_id")
+
+
+def test_put_find_and_rollback():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = storage.open_store(Path(tmp, "ws.json"), indexes={"workspaces": _owner_index})
+        store.put("workspaces", "a", {"owner_id": 1})
+        store.put("workspaces", "b", {"owner_id": 2})
+        store.put("workspaces", "b", {"owner_id": 1})
+        assert store.find("workspaces", "owner_id", 1) == ["a", "b"]
+        assert store.find("workspaces", "owner_id", 2) == []
+
+        with pytest.raises(RuntimeError):
+            with store.transaction():
+                store.delete("workspaces", "a")
+                store.put("workspaces", "c", {"owner_id": 1})
+                raise RuntimeError("half-done")
+        assert list(store.items("workspaces")) == ["a", "b"]
+        assert store.find("workspaces", "owner_id", 1) == ["a", "b"]
+
+
+def test_other_connections_get_just_the_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = storage.open_store(Path(tmp, "ws.json"))
+        reader = storage.open_store(Path(tmp, "ws.json"))
+        writer.put("workspaces", "a", {"n": 1})
+        writer.put("workspaces", "b", {"n": 1})
+        assert reader.changed() and not reader.changed()
+        seq, _ = reader.changes(0)
+
+        writer.put("workspaces", "b", {"n": 2})
+        writer.delete("workspaces", "a")
+        assert reader.changed()
+        seq, changes = reader.changes(seq)
+        assert changes == [("workspaces", "b", {"n": 2}), ("workspaces", "a", None)]
+        assert seq == writer.last_seq()
+
+
+def test_json_is_imported_once_and_exported_in_the_same_shape():
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = Path(tmp, "accounts.json")
+        legacy.write_text(json.dumps({"acc_1": {"display_name": "A"}}))
+        store = storage.open_store(legacy)
+        assert store.import_json("accounts", legacy) == 1
+        store.delete("accounts", "acc_1")
+        assert store.import_json("accounts", legacy) == 0  # deletions stick
+
+        store.put("accounts", "acc_2", {"display_name": "B"})
+        out = Path(tmp, "export.json")
+        store.export_json("accounts", out)
+        assert json.loads(out.read_text()) == {"acc_2": {"display_name": "B"}}
+
+
+def test_registry_reload_applies_the_other_process_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        ws_path = Path(tmp, "workspaces.json")
+        ws_path.write_text(json.dumps({"legacy": "/tmp/legacy"}))
+        Path(tmp, "user_tips.json").write_text(json.dumps([7]))
+        with patch("config.WORKSPACES_PATH", str(ws_path)):
+            bot, api = WorkspaceRegistry(), WorkspaceRegistry()
+        assert bot.get_path("legacy") == "/tmp/legacy" and not bot.show_tips(7)
+
+        api.add("app", "/tmp/app", owner_id=5)
+        api.rename("legacy", "old")
+        api.set_default(5, "app")
+        api.advance_tip(8)
+        bot.reload()
+        assert bot.list_keys() == ["app", "old"]
+        assert bot.list_keys(owner_id=5) == ["app"]
+        assert (bot.get_default(5), bot.get_tip_index(8)) == ("app", 1)
+
+
+def test_registry_and_allowlist_edits_from_two_processes_both_survive():
+    with tempfile.TemporaryDirectory() as tmp:
+        with patch("config.WORKSPACES_PATH", str(Path(tmp, "workspaces.json"))):
+            bot, api = WorkspaceRegistry(), WorkspaceRegistry()
+        api.add("app", "/tmp/app", owner_id=5)
+        bot.reload()
+        # Neither process reloads before its edit; neither may write back a stale copy
+        api.add_collaborator("app", "Ann", "ann@example.com")
+        bot.set_schema("app", "app_app")
+        with patch("config.WORKSPACES_PATH", str(Path(tmp, "workspaces.json"))):
+            fresh = WorkspaceRegistry()
+        assert fresh.get_schema("app") == "app_app"
+        assert [c["email"] for c in fresh.get_collaborators("app")] == ["ann@example.com"]
+
+        with patch("allowlist._DATA_FILE", Path(tmp, "allowlist.json")):
+            bot_users, api_users = Allowlist(), Allowlist()
+            bot_users.add(9, "Nine")
+            api_users.reload()
+            bot_users.set_daily_cap(9, 3.0)
+            api_users.set_email(9, "nine@example.com")
+            fresh_users = Allowlist()
+        assert (fresh_users.get_daily_cap(9), fresh_users.get_email(9)) == (3.0, "nine@example.com")
@@ -0,0 +1,54 @@
+"""Tests for the incremental stream-json decoder (stream_json.py)."""
+
+import json
+
+from stream_json import StreamJsonDecoder
+
+
+def _line(event: dict) -> bytes:
+    return json.dumps(event).encode() + b"\n"
+
+
+def _feed_in_chunks(decoder: StreamJsonDecoder, data: bytes, size: int) -> list[dict]:
+    events = []
+    for i in range(0, len(data), size):
+        events += decoder.feed(data[i:i + size])
+    return events + decoder.close()
+
+
+def test_skips_unwanted_events_across_chunk_boundaries():
+    tool_result = {"type": "user", "message": {"content": [{"type": "tool_result", "content": "x" * 50_000}]}}
+    data = (
+        _line({"type": "system", "subtype": "init"})
+        + _line({"type": "assistant", "message": {"content": []}})
+        + _line(tool_result)
+        + json.dumps({"type": "result", "result": "done"}).encode()  # no trailing newline
+    )
+    decoder = StreamJsonDecoder({"assistant", "result"})
+    events = _feed_in_chunks(decoder, data, 257)
+
+    assert [e["type"] for e in events] == ["assistant", "result"]
+    assert events[-1]["result"] == "done"
+    assert decoder.stats.events_skipped == 2
+    assert decoder.stats.bytes_skipped > 50_000
+    # The tool_result line was never buffered whole
+    assert len(decoder._buf) == 0
+
+
+def test_oversize_wanted_event_is_dropped_not_buffered():
+    decoder = StreamJsonDecoder({"assistant", "result"}, max_line_bytes=1024)
+    huge = _line({"type": "assistant", "message": {"content": "y" * 10_000}})
+    events = _feed_in_chunks(decoder, huge + _line({"type": "result", "result": "ok"}), 512)
+
+    assert [e["type"] for e in events] == ["result"]
+    assert decoder.stats.oversize_dropped == 1
+
+
+def test_oversize_result_event_is_kept():
+    decoder = StreamJsonDecoder({"assistant", "result"}, max_line_bytes=1024)
+    huge = _line({"type": "result", "result": "z" * 10_000})
+    events = _feed_in_chunks(decoder, _line({"type": "assistant", "message": {}}) + huge, 512)
+
+    assert [e["type"] for e in events] == ["assistant", "result"]
+    assert events[-1]["result"] == "z" * 10_000
+    assert (decoder.stats.oversize_kept, decoder.stats.oversize_dropped) == (1, 0)
@@ -0,0 +1,76 @@
+"""Tests for Management API batching and read fan-out (supabase_client.py)."""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import supabase_client
+
+
+class _FakeClient(supabase_client.SupabaseClient):
+    """Answers queries locally; any body containing "bad" fails."""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.bodies: list[str] = []
+        self.active = 0
+        self.max_active = 0
+
+    async def _send(self, method, url, body):
+        sql = body["query"]
+        self.bodies.append(sql)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if "bad" in sql:
+            return 400, "syntax error"
+        return 201, json.dumps([{"sql": sql.splitlines()[-1]}])
+
+
+def _run(client, coro):
+    async def scenario():
+        try:
+            return await coro
+        finally:
+            await client.aclose()
+
+    with patch("supabase_client._client", client):
+        return asyncio.run(scenario())
+
+
+def test_statements_share_requests_and_a_failed_batch_is_replayed():
+    client = _FakeClient()
+    stmts = [f"INSERT INTO t VALUES ({i})" for i in range(5)] + ["bad", "INSERT INTO t VALUES (9)"]
+    with patch("config.SUPABASE_BATCH_MAX_STATEMENTS", 5):
+        results = _run(client, supabase_client.run_sql_many(stmts, schema="app_x"))
+
+    assert [ok for ok, _ in results] == [True] * 5 + [False, True]
+    assert "syntax error" in results[5][1]
+    # One batch of five, one failing batch of two, then its two statements alone
+    assert len(client.bodies) == 4
+    assert all(b.startswith("SET search_path TO app_x, public;") for b in client.bodies)
+    m = client.metrics()
+    assert (m["batches"], m["batched_statements"], m["batch_fallbacks"]) == (2, 7, 1)
+
+
+def test_transaction_control_statements_are_sent_alone():
+    client = _FakeClient()
+    stmts = ["CREATE TABLE a (id int)", "CREATE INDEX CONCURRENTLY i ON a (id)", "CREATE TABLE b (id int)"]
+    results = _run(client, supabase_client.run_sql_many(stmts))
+    assert results == [(True, "")] * 3
+    assert client.bodies == stmts
+
+
+def test_reads_fan_out_under_the_connection_cap():
+    client = _FakeClient(delay=0.02)
+    queries = [f"SELECT {i}" for i in range(6)]
+    with patch("config.SUPABASE_MAX_CONNECTIONS", 2):
+        results = _run(client, supabase_client.query_many(queries))
+
+    assert [rows[0]["sql"] for _, rows in results] == queries
+    assert client.max_active == 2
+    assert client.metrics()["requests"] == 6
@@ -0,0 +1,66 @@
+"""Tests for the cost/latency event pipeline (telemetry.py)."""
+
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import telemetry
+
+
+def test_aggregator_counts_costs_and_percentiles():
+    with tempfile.TemporaryDirectory() as tmp:
+        t = telemetry.Telemetry(str(Path(tmp, "t.db")), window=100)
+        for i in range(1, 101):
+            t.record("claude", "run", float(i), cost_usd=0.01, ok=i % 10 != 0)
+        summary = t.summary()["claude/run"]
+        assert summary["count"] == 100 and summary["errors"] == 10
+        assert summary["cost_usd"] == 1.0
+        assert (summary["p50_secs"], summary["p95_secs"], summary["p99_secs"]) == (50, 95, 99)
+
+
+def test_prometheus_text_has_cumulative_histogram():
+    with tempfile.TemporaryDirectory() as tmp:
+        t = telemetry.Telemetry(str(Path(tmp, "t.db")))
+        t.record("build", "android", 0.3)
+        t.record("build", "android", 45.0, ok=False)
+        text = t.prometheus_text({"gradle_pool": {"daemon_hits": 3, "mode": "warm"}})
+    assert 'bridge_events_total{kind="build",name="android",status="error"} 1' in text
+    assert 'bridge_duration_seconds_bucket{kind="build",name="android",le="0.5"} 1' in text
+    assert 'bridge_duration_seconds_bucket{kind="build",name="android",le="60"} 2' in text
+    assert 'bridge_duration_seconds_bucket{kind="build",name="android",le="+Inf"} 2' in text
+    assert 'bridge_component{component="gradle_pool",metric="daemon_hits"} 3' in text
+    assert "mode" not in text
+
+
+def test_events_are_persisted_and_rolled_up():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp, "t.db"))
+        t = telemetry.Telemetry(path)
+        hour_start = (int(time.time()) // 3600 - 2) * 3600
+        with patch("time.time", return_value=hour_start + 30):
+            for d in (1.0, 2.0, 3.0):
+                t.record("demo", "web", d, workspace="app")
+        t.rollup()  # both the minute and the hour are complete by now
+
+        reopened = telemetry.Telemetry(path)
+        [minute] = reopened.series("demo", "web", resolution=telemetry.MINUTE)
+        [hour] = reopened.series("demo", resolution=telemetry.HOUR)
+        assert minute["bucket"] == hour_start and minute["count"] == 3 and minute["p50"] == 2.0
+        assert hour["duration_sum"] == 6.0 and hour["duration_max"] == 3.0
+
+
+def test_span_marks_exceptions_as_failures():
+    with tempfile.TemporaryDirectory() as tmp:
+        t = telemetry.Telemetry(str(Path(tmp, "t.db")))
+        with patch("telemetry._telemetry", t):
+            with pytest.raises(RuntimeError):
+                with telemetry.span("external_api", "webhook"):
+                    raise RuntimeError("boom")
+            with telemetry.span("sql_sync", "supabase") as span:
+                span.ok = False
+        summary = t.summary()
+    assert summary["external_api/webhook"]["errors"] == 1
+    assert summary["sql_sync/supabase"]["errors"] == 1
@@ -1,8 +1,12 @@
 """Tests for real-time webhook progress events in service.py."""
 
 import asyncio
+import json
+import tempfile
+from pathlib import Path
 from unittest.mock import AsyncMock, patch
 
+import webhook_dispatcher
 from service import _send_webhook_event, _infer_phase, _classify_event
 
 
@@ -13,29 +17,139 @@ def test_send_webhook_event_skips_none():
     asyncio.run(_send_webhook_event(None, {"event": "test"}))
 
 
+async def _send_and_drain(url, *events):
+    for event in events:
+        await _send_webhook_event(url, event)
+    await webhook_dispatcher.drain()
+
+
 @patch("httpx.AsyncClient")
 def test_send_webhook_event_posts(mock_client_cls):
-    """Posts event JSON to the webhook URL."""
+    """Posts event JSON to the webhook URL from the background dispatcher."""
     mock_client = AsyncMock()
-    mock_client_cls.return_value.__aenter__ = AsyncMock(return_value=mock_client)
-    mock_client_cls.return_value.__aexit__ = AsyncMock(return_value=False)
+    mock_client_cls.return_value = mock_client
 
     event = {"build_id": "abc", "event": "started"}
-    asyncio.run(_send_webhook_event("http://localhost:9999", event))
+    asyncio.run(_send_and_drain("http://localhost:9999", event))
 
     mock_client.post.assert_called_once_with("http://localhost:9999", json=event)
 
 
 @patch("httpx.AsyncClient")
 def test_send_webhook_event_swallows_errors(mock_client_cls):
-    """Exceptions are logged, not raised."""
+    """Exceptions are logged, not raised; exhausted events go to the dead-letter file."""
     mock_client = AsyncMock()
     mock_client.post.side_effect = Exception("connection refused")
-    mock_client_cls.return_value.__aenter__ = AsyncMock(return_value=mock_client)
-    mock_client_cls.return_value.__aexit__ = AsyncMock(return_value=False)
+    mock_client_cls.return_value = mock_client
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dead_letter = Path(tmp) / "dead.jsonl"
+        with patch("config.WEBHOOK_MAX_RETRIES", 1), \
+             patch("config.WEBHOOK_RETRY_BASE_SECS", 0.01), \
+             patch("config.WEBHOOK_DEAD_LETTER_PATH", str(dead_letter)):
+            # Should not raise
+            asyncio.run(_send_and_drain("http://localhost:9999", {"event": "test"}))
+        assert mock_client.post.await_count == 2
+        record = json.loads(dead_letter.read_text().splitlines()[-1])
+        assert record["event"] == {"event": "test"}
+        assert "connection refused" in record["error"]
+
+
+@patch("httpx.AsyncClient")
+def test_send_webhook_event_coalesces_queued_progress(mock_client_cls):
+    """Queued progress events collapse to the latest; other events are never merged."""
+    mock_client = AsyncMock()
+    mock_client_cls.return_value = mock_client
+
+    url = "http://localhost:9999"
+    events = [
+        {"build_id": "abc", "event": "progress", "phase": "building", "message": "1"},
+        {"build_id": "abc", "event": "progress", "phase": "building", "message": "2"},
+        {"build_id": "abc", "event": "issue", "phase": "building", "message": "3"},
+        {"build_id": "abc", "event": "progress", "phase": "building", "message": "4"},
+    ]
+    asyncio.run(_send_and_drain(url, *events))
+
+    sent = [c.kwargs["json"]["message"] for c in mock_client.post.call_args_list]
+    assert sent == ["2", "3", "4"]
+
+
+@patch("httpx.AsyncClient")
+def test_send_webhook_event_retry_keeps_receiver_order(mock_client_cls):
+    """A retried event holds later events for the same receiver until it lands."""
+    sent = []
+    failed = set()
+
+    async def post(url, json):
+        if json["message"] == "1" and "1" not in failed:
+            failed.add("1")
+            return type("Resp", (), {"status_code": 503})()
+        sent.append(json["message"])
+        return type("Resp", (), {"status_code": 200})()
+
+    mock_client = AsyncMock()
+    mock_client.post.side_effect = post
+    mock_client_cls.return_value = mock_client
 
-    # Should not raise
-    asyncio.run(_send_webhook_event("http://localhost:9999", {"event": "test"}))
+    events = [
+        {"build_id": "abc", "event": "issue", "phase": "building", "message": "1"},
+        {"build_id": "abc", "event": "issue", "phase": "building", "message": "2"},
+        {"build_id": "abc", "event": "complete", "phase": "done", "message": "3"},
+    ]
+    with patch("config.WEBHOOK_RETRY_BASE_SECS", 0.01):
+        asyncio.run(_send_and_drain("http://localhost:9999", *events))
+
+    assert sent == ["1", "2", "3"]
+
+
+@patch("httpx.AsyncClient")
+def test_send_webhook_event_down_receiver_backlog_is_bounded(mock_client_cls):
+    """Events held behind a retry are capped, and fail fast once the retry gives up."""
+    mock_client = AsyncMock()
+    mock_client.post.side_effect = Exception("connection refused")
+    mock_client_cls.return_value = mock_client
+
+    events = [{"build_id": "abc", "event": "issue", "message": str(i)} for i in range(5)]
+    with tempfile.TemporaryDirectory() as tmp:
+        dead_letter = Path(tmp) / "dead.jsonl"
+        with patch("config.WEBHOOK_MAX_RETRIES", 1), \
+             patch("config.WEBHOOK_RETRY_BASE_SECS", 0.01), \
+             patch("config.WEBHOOK_MAX_HELD", 2), \
+             patch("config.WEBHOOK_DEAD_LETTER_PATH", str(dead_letter)):
+            asyncio.run(_send_and_drain("http://localhost:9999", *events))
+        records = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+
+    # Only the first event is retried; the one held behind it is never posted
+    assert mock_client.post.await_count == 2
+    assert sorted(r["event"]["message"] for r in records) == ["0", "1", "2", "3", "4"]
+    assert sum(r["error"] == "receiver backlog full" for r in records) == 3
+
+
+@patch("httpx.AsyncClient")
+def test_webhook_aclose_dead_letters_after_deadline(mock_client_cls):
+    """Shutdown doesn't wait out a dead receiver's whole retry schedule."""
+    mock_client = AsyncMock()
+    mock_client.post.side_effect = Exception("connection refused")
+    mock_client_cls.return_value = mock_client
+
+    async def scenario():
+        dispatcher = webhook_dispatcher.WebhookDispatcher(workers=1, queue_size=10)
+        for i in range(3):
+            dispatcher.enqueue("http://localhost:9999", {"event": "issue", "message": str(i)})
+        await asyncio.sleep(0.05)
+        await dispatcher.aclose()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dead_letter = Path(tmp) / "dead.jsonl"
+        with patch("config.WEBHOOK_MAX_RETRIES", 10), \
+             patch("config.WEBHOOK_RETRY_BASE_SECS", 60), \
+             patch("config.WEBHOOK_CLOSE_TIMEOUT_SECS", 0.1), \
+             patch("config.WEBHOOK_DEAD_LETTER_PATH", str(dead_letter)):
+            asyncio.run(asyncio.wait_for(scenario(), 5))
+        records = [json.loads(line) for line in dead_letter.read_text().splitlines()]
+
+    assert [r["event"]["message"] for r in records] == ["0", "1", "2"]
+    assert all(r["error"] == "shutdown before delivery" for r in records)
 
 
 # ── _infer_phase ────────────────────────────────────────────────────────────
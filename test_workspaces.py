@@ -0,0 +1,48 @@
+"""Tests for WorkspaceRegistry's secondary indexes (workspaces.py)."""
+
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from workspaces import WorkspaceRegistry
+
+
+def _registry(tmp: str) -> WorkspaceRegistry:
+    with patch("config.WORKSPACES_PATH", str(Path(tmp, "workspaces.json"))):
+        return WorkspaceRegistry()
+
+
+def test_indexes_follow_mutations():
+    with tempfile.TemporaryDirectory() as tmp:
+        reg = _registry(tmp)
+        reg.add("a", "/ws/a", owner_id=1, account_id="acc_1")
+        reg.add("b", "/ws/b", owner_id=2)
+        assert reg.list_keys(owner_id=1) == ["a"]  # builds the indexes
+
+        reg.add_collaborator("b", "Ann", "Ann@Example.com")
+        assert reg.list_keys(owner_id=1, user_email="ann@example.com") == ["a", "b"]
+        assert reg.can_access("b", 1, False, user_email="ANN@example.com")
+        reg.add_collaborator("b", "Ann", "ann@example.com", user_id=1)
+        assert reg.list_keys(owner_id=1) == ["a", "b"]
+
+        reg.remove_collaborator("b", "ann@example.com")
+        assert not reg.can_access("b", 1, False, user_email="ann@example.com")
+
+        reg.rename("a", "c")
+        assert reg.list_keys(account_id="acc_1") == ["c"]
+        reg.set_active("c", False)
+        assert reg.list_keys(owner_id=1, active_only=True) == []
+        assert reg.list_keys(active_only=True) == ["b"]
+        reg.remove("c")
+        assert reg.list_keys(owner_id=1) == []
+
+
+def test_indexes_rebuild_after_reload():
+    with tempfile.TemporaryDirectory() as tmp:
+        bot, api = _registry(tmp), _registry(tmp)
+        assert bot.list_keys(owner_id=7) == []
+        api.add("shared", "/ws/shared", owner_id=7)
+        api.add_collaborator("shared", "Bo", "bo@example.com", user_id=8)
+        bot.reload()
+        assert bot.list_keys(owner_id=7) == ["shared"]
+        assert bot.can_access("shared", 8, False)
@@ -0,0 +1,307 @@
+"""
+webhook_dispatcher.py — Background delivery of build webhook events.
+
+service._send_webhook_event() only enqueues; builds never wait on webhook I/O.
+Delivery happens on a few worker tasks sharing one keep-alive httpx client.
+Events are sharded to workers by receiver host, so each receiver still sees
+its events in order.
+
+  * High-frequency "progress" events still waiting in the queue are coalesced:
+    a newer progress event for the same build, url and phase replaces the
+    pending one instead of queueing behind it.
+  * 5xx/429 responses and network errors are retried with exponential backoff.
+    While an event is being retried, later events for the same URL are held
+    behind it and sent in order once it settles, so a "complete" never
+    overtakes an earlier "progress". The retry runs in its own task, so
+    other receivers sharing the shard aren't held up. Held progress events
+    are coalesced too, at most WEBHOOK_MAX_HELD events are held per receiver,
+    and once one of them exhausts its retries the rest fail fast.
+    Anything that still fails, plus events dropped because a queue was full,
+    is appended to WEBHOOK_DEAD_LETTER_PATH (JSON lines). aclose() gives
+    delivery WEBHOOK_CLOSE_TIMEOUT_SECS, then dead-letters what is left.
+  * metrics() reports counts and enqueue-to-delivery latency.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+import zlib
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+import config
+import telemetry
+
+logger = logging.getLogger("webhooks")
+
+_COALESCABLE_EVENTS = ("progress",)
+_LATENCY_SAMPLES = 500
+
+
+@dataclass
+class _Delivery:
+    url: str
+    event: dict
+    enqueued_at: float = field(default_factory=time.time)
+    attempts: int = 0
+    coalesce_key: Optional[tuple] = None
+
+
+class WebhookDispatcher:
+    def __init__(self, workers: int, queue_size: int):
+        self._num_workers = max(1, workers)
+        self._queue_size = queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: list[asyncio.Queue] = []
+        self._workers: list[asyncio.Task] = []
+        self._client = None
+        self._pending_progress: dict[tuple, _Delivery] = {}
+        # url → its undelivered events, oldest (the one being retried) first
+        self._held: dict[str, deque[_Delivery]] = {}
+        self._retry_tasks: set[asyncio.Task] = set()
+        self._latencies: deque = deque(maxlen=_LATENCY_SAMPLES)
+        self._metrics = {
+            "enqueued": 0,
+            "delivered": 0,
+            "coalesced": 0,
+            "retries": 0,
+            "dead_lettered": 0,
+            "dropped": 0,
+            "held": 0,
+        }
+
+    # ── Lifecycle ────────────────────────────────────────────────────────
+
+    def _ensure_started(self) -> None:
+        # Rebind if the dispatcher outlives an event loop (tests, restarts)
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        import httpx
+        self._loop = loop
+        self._pending_progress.clear()
+        self._held.clear()
+        self._retry_tasks.clear()
+        self._client = httpx.AsyncClient(
+            timeout=config.WEBHOOK_TIMEOUT_SECS,
+            limits=httpx.Limits(
+                max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+                max_keepalive_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            ),
+        )
+        self._queues = [asyncio.Queue(maxsize=self._queue_size) for _ in range(self._num_workers)]
+        self._workers = [loop.create_task(self._worker(q)) for q in self._queues]
+
+    async def drain(self) -> None:
+        """Wait until every queued event (including pending retries) is settled."""
+        if self._loop is not asyncio.get_running_loop():
+            return
+        while True:
+            await asyncio.gather(*(q.join() for q in self._queues))
+            if not self._held:
+                return
+            await asyncio.sleep(0.05)
+
+    async def aclose(self) -> None:
+        try:
+            await asyncio.wait_for(self.drain(), config.WEBHOOK_CLOSE_TIMEOUT_SECS)
+        except asyncio.TimeoutError:
+            self._dead_letter_remaining("shutdown before delivery")
+        for w in [*self._workers, *self._retry_tasks]:
+            w.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+        self._loop = None
+
+    # ── Enqueue ──────────────────────────────────────────────────────────
+
+    def _queue_for(self, url: str) -> asyncio.Queue:
+        host = urlsplit(url).netloc
+        return self._queues[zlib.crc32(host.encode()) % len(self._queues)]
+
+    def enqueue(self, url: str, event: dict) -> None:
+        """Queue an event for delivery. Never blocks and never raises."""
+        self._ensure_started()
+        self._metrics["enqueued"] += 1
+        key = (url, event.get("build_id"))
+        if event.get("event") in _COALESCABLE_EVENTS:
+            coalesce_key = (*key, event.get("phase"))
+            pending = self._pending_progress.get(key)
+            if pending is not None and pending.coalesce_key == coalesce_key:
+                pending.event = event
+                self._metrics["coalesced"] += 1
+                return
+            delivery = _Delivery(url, event, coalesce_key=coalesce_key)
+        else:
+            delivery = _Delivery(url, event)
+        # Never merge a later progress event across this one
+        self._pending_progress.pop(key, None)
+        try:
+            self._queue_for(url).put_nowait(delivery)
+        except asyncio.QueueFull:
+            self._metrics["dropped"] += 1
+            if delivery.coalesce_key is None:
+                self._dead_letter(delivery, "queue full")
+            return
+        if delivery.coalesce_key is not None:
+            self._pending_progress[key] = delivery
+
+    # ── Delivery ─────────────────────────────────────────────────────────
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            delivery = await queue.get()
+            try:
+                key = (delivery.url, delivery.event.get("build_id"))
+                if self._pending_progress.get(key) is delivery:
+                    del self._pending_progress[key]
+                held = self._held.get(delivery.url)
+                if held is not None:
+                    self._hold(held, delivery)
+                elif await self._deliver(delivery) == "retry":
+                    self._held[delivery.url] = deque([delivery])
+                    task = self._loop.create_task(self._retry_receiver(delivery.url))
+                    self._retry_tasks.add(task)
+                    task.add_done_callback(self._retry_tasks.discard)
+            except Exception as e:
+                logger.warning(f"Webhook worker error: {e}")
+            finally:
+                queue.task_done()
+
+    def _hold(self, held: deque[_Delivery], delivery: _Delivery) -> None:
+        """Queue an event behind its receiver's retry (held[0] is in flight)."""
+        last = held[-1]
+        if (len(held) > 1 and delivery.coalesce_key is not None
+                and last.coalesce_key == delivery.coalesce_key):
+            last.event = delivery.event
+            self._metrics["coalesced"] += 1
+        elif len(held) >= config.WEBHOOK_MAX_HELD:
+            self._metrics["dropped"] += 1
+            self._dead_letter(delivery, "receiver backlog full")
+        else:
+            held.append(delivery)
+            self._metrics["held"] += 1
+
+    async def _retry_receiver(self, url: str) -> None:
+        """Send a receiver's held events in order. The oldest is retried with
+        backoff until it's delivered or dead-lettered before the next is tried;
+        if it's dead-lettered the receiver is treated as down and the rest follow."""
+        held = self._held[url]
+        try:
+            while held:
+                delivery = held[0]
+                if delivery.attempts:
+                    delay = config.WEBHOOK_RETRY_BASE_SECS * 2 ** (delivery.attempts - 1)
+                    await asyncio.sleep(delay * (1 + random.random() * 0.25))
+                outcome = await self._deliver(delivery)
+                if outcome == "failed":
+                    held.popleft()
+                    for rest in held:
+                        self._dead_letter(rest, "receiver unavailable")
+                    held.clear()
+                elif outcome == "delivered":
+                    held.popleft()
+        except Exception as e:
+            logger.warning(f"Webhook retry error: {e}")
+            for delivery in held:
+                self._dead_letter(delivery, f"retry failed: {e}")
+        finally:
+            self._held.pop(url, None)
+
+    async def _deliver(self, delivery: _Delivery) -> str:
+        """One attempt: "delivered", "retry", or "failed" (dead-lettered)."""
+        delivery.attempts += 1
+        error = None
+        start = time.monotonic()
+        try:
+            resp = await self._client.post(delivery.url, json=delivery.event)
+            code = getattr(resp, "status_code", 200)
+            if isinstance(code, int) and code >= 400:
+                error = f"HTTP {code}"
+                retryable = code >= 500 or code == 429
+            else:
+                self._metrics["delivered"] += 1
+                self._latencies.append(time.time() - delivery.enqueued_at)
+                telemetry.record("external_api", "webhook", time.monotonic() - start)
+                return "delivered"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            retryable = True
+        telemetry.record("external_api", "webhook", time.monotonic() - start, ok=False, error=error)
+
+        if retryable and delivery.attempts <= config.WEBHOOK_MAX_RETRIES:
+            self._metrics["retries"] += 1
+            return "retry"
+        logger.warning(f"Webhook delivery failed after {delivery.attempts} attempt(s): {error}")
+        self._dead_letter(delivery, error)
+        return "failed"
+
+    def _dead_letter_remaining(self, error: str) -> None:
+        """Dead-letter everything still held or queued (shutdown deadline passed)."""
+        for held in self._held.values():
+            for delivery in held:
+                self._dead_letter(delivery, error)
+        self._held.clear()
+        for q in self._queues:
+            while not q.empty():
+                self._dead_letter(q.get_nowait(), error)
+                q.task_done()
+        logger.warning(f"Webhook shutdown: dead-lettered undelivered events ({error})")
+
+    def _dead_letter(self, delivery: _Delivery, error: str) -> None:
+        self._metrics["dead_lettered"] += 1
+        record = {
+            "timestamp": time.time(),
+            "url": delivery.url,
+            "attempts": delivery.attempts,
+            "error": error,
+            "event": delivery.event,
+        }
+        try:
+            path = Path(config.WEBHOOK_DEAD_LETTER_PATH)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write webhook dead letter: {e}")
+
+    # ── Metrics ──────────────────────────────────────────────────────────
+
+    def metrics(self) -> dict:
+        lat = sorted(self._latencies)
+        return {
+            **self._metrics,
+            "queue_depth": sum(q.qsize() for q in self._queues),
+            "retrying": sum(len(h) for h in self._held.values()),
+            "latency_avg_ms": round(sum(lat) / len(lat) * 1000) if lat else 0,
+            "latency_p95_ms": round(lat[min(len(lat) - 1, int(len(lat) * 0.95))] * 1000) if lat else 0,
+        }
+
+
+_dispatcher: Optional[WebhookDispatcher] = None
+
+
+def get_dispatcher() -> WebhookDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = WebhookDispatcher(config.WEBHOOK_WORKERS, config.WEBHOOK_QUEUE_SIZE)
+    return _dispatcher
+
+
+def enqueue(url: str, event: dict) -> None:
+    get_dispatcher().enqueue(url, event)
+
+
+async def drain() -> None:
+    await get_dispatcher().drain()
+
+
+def metrics() -> dict:
+    return get_dispatcher().metrics()
@@ -1,15 +1,61 @@
 """
-workspaces.py — Workspace registry backed by workspaces.json.
-Supports per-user ownership with auto-migration from legacy format.
+workspaces.py — Workspace registry, backed by the workspaces store
+(storage.py, next to WORKSPACES_PATH). One document per workspace, per-user
+default, platform and tip state; workspaces.json and the user_*.json files
+are imported once. Supports per-user ownership with auto-migration from
+legacy format.
+
+Both the bot and the API process hold a registry. reload() is cheap: it
+asks the store whether the other process committed anything and applies
+just the documents that changed. Every mutation runs inside a store
+transaction that first catches up with the store, so an edit is applied to
+the current document rather than to this process's possibly stale copy.
+
+list_keys() and can_access() run on every message and API call, so they
+answer from secondary indexes (owner, account, collaborator id/email,
+inactive) instead of walking every workspace. Each mutation re-indexes its
+own workspace; after a reload() that changed workspaces the indexes are
+rebuilt on next use.
 """
 
 from __future__ import annotations
 
 import json
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, Union
+from typing import Iterator, Optional, Union
 
 import config
+import storage
+
+_COLLECTIONS = ("workspaces", "user_defaults", "user_platforms", "user_tips")
+
+
+def _workspace_index(entry: dict):
+    yield "owner_id", entry.get("owner_id")
+    yield "account_id", entry.get("account_id")
+    for c in entry.get("collaborators", []):
+        yield "collaborator_id", c.get("user_id")
+        yield "collaborator_email", (c.get("email") or "").lower()
+
+
+def _user_key(key: str) -> int | str:
+    """Stored keys are strings; Discord user ids go back to int, account ids stay str."""
+    try:
+        return int(key)
+    except ValueError:
+        return key
+
+
+def _legacy_tips(raw) -> dict[str, dict]:
+    """user_tips.json was a plain list of hidden ids, later {"hidden": [...], "index": {id: n}}."""
+    if isinstance(raw, list):
+        return {str(int(uid)): {"hidden": True, "index": 0} for uid in raw}
+    if not isinstance(raw, dict):
+        return {}
+    hidden = {int(uid) for uid in raw.get("hidden", [])}
+    index = {int(k): v for k, v in raw.get("index", {}).items()}
+    return {str(uid): {"hidden": uid in hidden, "index": index.get(uid, 0)} for uid in hidden | set(index)}
 
 
 class WorkspaceRegistry:
@@ -19,107 +65,157 @@ class WorkspaceRegistry:
         self._user_platforms: dict[int | str, str] = {}
         self._user_tips_hidden: set[int] = set()
         self._user_tip_index: dict[int, int] = {}
-        self._defaults_path = Path(config.WORKSPACES_PATH).parent / "user_defaults.json"
-        self._platforms_path = Path(config.WORKSPACES_PATH).parent / "user_platforms.json"
-        self._tips_path = Path(config.WORKSPACES_PATH).parent / "user_tips.json"
+        ws_path = Path(config.WORKSPACES_PATH)
+        self._store = storage.open_store(ws_path, indexes={"workspaces": _workspace_index})
+        self._store.import_json("workspaces", ws_path, self._migrate)
+        self._store.import_json("user_defaults", ws_path.parent / "user_defaults.json")
+        self._store.import_json("user_platforms", ws_path.parent / "user_platforms.json")
+        self._store.import_json("user_tips", ws_path.parent / "user_tips.json", _legacy_tips)
+        self._seq: Optional[int] = None  # last store sequence applied; None until loaded
+        self._index: Optional[dict[tuple, set[str]]] = None  # (field, value) -> keys; None = rebuild
+        self._postings: dict[str, set[tuple]] = {}  # key -> its (field, value) entries in _index
         self.reload()
         self._global_default = config.DEFAULT_WORKSPACE or None
 
     def reload(self):
-        path = Path(config.WORKSPACES_PATH)
-        if path.exists():
-            with open(path) as f:
-                raw = json.load(f)
-            self._workspaces = self._migrate(raw)
+        """Catch up with the store: everything on the first call, then only what changed."""
+        if self._seq is None:
+            self._store.changed()  # start watching from here
+            self._seq = self._store.last_seq()
+            self._workspaces = self._store.items("workspaces")
+            self._index = None
+            self._user_defaults = {_user_key(k): v for k, v in self._store.items("user_defaults").items()}
+            self._user_platforms = {_user_key(k): v for k, v in self._store.items("user_platforms").items()}
+            self._user_tips_hidden, self._user_tip_index = set(), {}
+            for k, tips in self._store.items("user_tips").items():
+                self._apply("user_tips", k, tips)
+            return
+        if not self._store.changed():
+            return
+        self._seq, changes = self._store.changes(self._seq, _COLLECTIONS)
+        for collection, key, doc in changes:
+            self._apply(collection, key, doc)
+            if collection == "workspaces":
+                self._index = None
+
+    def _apply(self, collection: str, key: str, doc):
+        """Mirror one stored document (None = deleted) into memory."""
+        if collection == "workspaces":
+            target, k = self._workspaces, key
+        elif collection == "user_defaults":
+            target, k = self._user_defaults, _user_key(key)
+        elif collection == "user_platforms":
+            target, k = self._user_platforms, _user_key(key)
+        else:
+            uid = int(key)
+            self._user_tips_hidden.discard(uid)
+            self._user_tip_index.pop(uid, None)
+            if doc and doc.get("hidden"):
+                self._user_tips_hidden.add(uid)
+            if doc and doc.get("index"):
+                self._user_tip_index[uid] = doc["index"]
+            return
+        if doc is None:
+            target.pop(k, None)
+        else:
+            target[k] = doc
+
+    def _write(self, collection: str, key, doc):
+        if doc is not None:
+            seq = self._store.put(collection, key, doc)
+        elif self._store.delete(collection, key):
+            seq = self._store.last_seq()
         else:
-            self._workspaces = {}
-        # Load persisted user defaults
-        if self._defaults_path.exists():
-            try:
-                with open(self._defaults_path) as f:
-                    raw = json.load(f)
-                self._user_defaults = {}
-                for k, v in raw.items():
-                    try:
-                        self._user_defaults[int(k)] = v
-                    except ValueError:
-                        self._user_defaults[k] = v  # account_id string key
-            except (json.JSONDecodeError, ValueError):
-                self._user_defaults = {}
-        # Load persisted platform preferences
-        if self._platforms_path.exists():
-            try:
-                with open(self._platforms_path) as f:
-                    raw = json.load(f)
-                self._user_platforms = {}
-                for k, v in raw.items():
-                    try:
-                        self._user_platforms[int(k)] = v
-                    except ValueError:
-                        self._user_platforms[k] = v  # account_id string key
-            except (json.JSONDecodeError, ValueError):
-                self._user_platforms = {}
-        # Load persisted tips preferences (backward-compat: old format was a plain list)
-        if self._tips_path.exists():
-            try:
-                with open(self._tips_path) as f:
-                    raw = json.load(f)
-                if isinstance(raw, list):
-                    # Legacy format: [user_id, ...]
-                    self._user_tips_hidden = {int(uid) for uid in raw}
-                    self._user_tip_index = {}
-                elif isinstance(raw, dict):
-                    # New format: {"hidden": [...], "index": {"user_id": N}}
-                    self._user_tips_hidden = {int(uid) for uid in raw.get("hidden", [])}
-                    self._user_tip_index = {int(k): v for k, v in raw.get("index", {}).items()}
+            return
+        if seq == self._seq + 1:
+            self._seq = seq  # our own write; nothing else happened in between
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Catch up with the store inside a write transaction, for read-modify-writes."""
+        with self._store.transaction():
+            self.reload()
+            yield
+
+    @contextmanager
+    def _edit(self, key: str) -> Iterator[dict]:
+        """Yield a copy of the stored workspace entry ({} if unknown) to modify.
+
+        On exit the entry is written back if it changed (an emptied entry is
+        deleted), inside the same transaction it was read in.
+        """
+        k = key.lower()
+        with self._locked():
+            before = json.dumps(self._workspaces.get(k) or {}, sort_keys=True)
+            entry = json.loads(before)
+            yield entry
+            if json.dumps(entry, sort_keys=True) != before:
+                if entry:
+                    self._workspaces[k] = entry
                 else:
-                    self._user_tips_hidden = set()
-                    self._user_tip_index = {}
-            except (json.JSONDecodeError, ValueError):
-                self._user_tips_hidden = set()
-                self._user_tip_index = {}
+                    self._workspaces.pop(k, None)
+                self._save(k)
 
-    def _migrate(self, raw: dict) -> dict[str, dict]:
+    @staticmethod
+    def _migrate(raw: dict) -> dict[str, dict]:
         """Auto-migrate legacy string values to {path, owner_id} dicts."""
-        migrated = False
         result = {}
         for key, value in raw.items():
             if isinstance(value, str):
                 # Legacy format: key -> path_string
                 result[key] = {"path": value, "owner_id": config.DISCORD_ALLOWED_USER_ID}
-                migrated = True
             elif isinstance(value, dict):
                 result[key] = value
             else:
                 continue  # skip invalid entries
-        if migrated:
-            self._workspaces = result
-            self._save()
         return result
 
+    def _indexed(self) -> dict[tuple, set[str]]:
+        if self._index is None:
+            self._index, self._postings = {}, {}
+            for key in self._workspaces:
+                self._reindex(key)
+        return self._index
+
+    def _reindex(self, key: str):
+        """Replace one workspace's index entries with ones for its current state."""
+        if self._index is None:
+            return  # rebuilt from scratch on next use
+        for posting in self._postings.pop(key, ()):
+            keys = self._index[posting]
+            keys.discard(key)
+            if not keys:
+                del self._index[posting]
+        entry = self._workspaces.get(key)
+        if entry is None:
+            return
+        postings = {(f, v) for f, v in _workspace_index(entry) if v is not None and v != ""}
+        if not entry.get("active", True):
+            postings.add(("inactive", True))
+        self._postings[key] = postings
+        for posting in postings:
+            self._index.setdefault(posting, set()).add(key)
+
+    def _lookup(self, field: str, value) -> set[str]:
+        return self._indexed().get((field, value), set())
+
     def list_keys(self, owner_id: Optional[int] = None, user_email: Optional[str] = None,
-                  account_id: Optional[str] = None) -> list[str]:
+                  account_id: Optional[str] = None, active_only: bool = False) -> list[str]:
         """List workspace keys. Filter by account_id or owner_id if given."""
         if owner_id is None and account_id is None:
-            return sorted(self._workspaces.keys())
-        result = []
-        for k, v in self._workspaces.items():
-            # Match by account_id first
-            if account_id and v.get("account_id") == account_id:
-                result.append(k)
-                continue
-            if owner_id is not None and v.get("owner_id") == owner_id:
-                result.append(k)
-                continue
-            # Check if user is a collaborator (by user_id or email)
+            result = set(self._workspaces)
+        else:
+            result = set()
+            if account_id:
+                result |= self._lookup("account_id", account_id)
             if owner_id is not None:
-                for c in v.get("collaborators", []):
-                    if c.get("user_id") == owner_id:
-                        result.append(k)
-                        break
-                    if user_email and c.get("email", "").lower() == user_email.lower():
-                        result.append(k)
-                        break
+                # Owned, or shared with this user as a collaborator (by user_id or email)
+                result |= self._lookup("owner_id", owner_id)
+                result |= self._lookup("collaborator_id", owner_id)
+                if user_email:
+                    result |= self._lookup("collaborator_email", user_email.lower())
+        if active_only:
+            result -= self._lookup("inactive", True)
         return sorted(result)
 
     def can_access(self, key: str, user_id: int, is_admin: bool, user_email: Optional[str] = None,
@@ -134,12 +230,10 @@ class WorkspaceRegistry:
             return True
         if entry.get("owner_id") == user_id:
             return True
-        for c in entry.get("collaborators", []):
-            if c.get("user_id") == user_id:
-                return True
-            if user_email and c.get("email", "").lower() == user_email.lower():
-                return True
-        return False
+        k = key.lower()
+        if k in self._lookup("collaborator_id", user_id):
+            return True
+        return bool(user_email) and k in self._lookup("collaborator_email", user_email.lower())
 
     def is_owner(self, key: str, user_id: int = 0, account_id: Optional[str] = None) -> bool:
         """Strict owner check — collaborators do not pass."""
@@ -160,27 +254,24 @@ class WorkspaceRegistry:
         return entry.get("account_id") if entry else None
 
     def add_collaborator(self, key: str, name: str, email: str, user_id: Optional[int] = None):
-        entry = self._workspaces.get(key.lower())
-        if not entry:
-            return
-        collabs = entry.setdefault("collaborators", [])
-        # Don't duplicate by email
-        for c in collabs:
-            if c.get("email", "").lower() == email.lower():
-                if user_id and not c.get("user_id"):
-                    c["user_id"] = user_id
-                    self._save()
+        with self._edit(key) as entry:
+            if not entry:
                 return
-        collabs.append({"name": name, "email": email, "user_id": user_id})
-        self._save()
+            collabs = entry.setdefault("collaborators", [])
+            # Don't duplicate by email
+            for c in collabs:
+                if c.get("email", "").lower() == email.lower():
+                    if user_id and not c.get("user_id"):
+                        c["user_id"] = user_id
+                    return
+            collabs.append({"name": name, "email": email, "user_id": user_id})
 
     def remove_collaborator(self, key: str, email: str):
-        entry = self._workspaces.get(key.lower())
-        if not entry:
-            return
-        collabs = entry.get("collaborators", [])
-        entry["collaborators"] = [c for c in collabs if c.get("email", "").lower() != email.lower()]
-        self._save()
+        with self._edit(key) as entry:
+            if not entry:
+                return
+            collabs = entry.get("collaborators", [])
+            entry["collaborators"] = [c for c in collabs if c.get("email", "").lower() != email.lower()]
 
     def get_collaborators(self, key: str) -> list[dict]:
         entry = self._workspaces.get(key.lower())
@@ -203,10 +294,7 @@ class WorkspaceRegistry:
 
     def set_schema(self, key: str, schema_name: str):
         """Store the Postgres schema name for a workspace."""
-        entry = self._workspaces.get(key.lower())
-        if entry and isinstance(entry, dict):
-            entry["supabase_schema"] = schema_name
-            self._save()
+        self._set_field(key, "supabase_schema", schema_name)
 
     def get_google_doc_id(self, key: str) -> Optional[str]:
         """Return the linked Google Doc ID for this workspace, or None."""
@@ -217,10 +305,7 @@ class WorkspaceRegistry:
 
     def set_google_doc_id(self, key: str, doc_id: str):
         """Store the Google Doc ID for a workspace."""
-        entry = self._workspaces.get(key.lower())
-        if entry and isinstance(entry, dict):
-            entry["google_doc_id"] = doc_id
-            self._save()
+        self._set_field(key, "google_doc_id", doc_id)
 
     def get_category(self, key: str) -> Optional[str]:
         """Return the category ('app', 'smoketest', 'experiment') or None."""
@@ -233,10 +318,7 @@ class WorkspaceRegistry:
         """Set workspace category. Must be 'app', 'smoketest', or 'experiment'."""
         if category not in ("app", "smoketest", "experiment"):
             raise ValueError(f"Invalid category: {category}")
-        entry = self._workspaces.get(key.lower())
-        if entry and isinstance(entry, dict):
-            entry["category"] = category
-            self._save()
+        self._set_field(key, "category", category)
 
     def is_active(self, key: str) -> bool:
         """Return whether the workspace is active. Defaults to True for backward compat."""
@@ -247,10 +329,16 @@ class WorkspaceRegistry:
 
     def set_active(self, key: str, active: bool):
         """Set workspace active flag."""
-        entry = self._workspaces.get(key.lower())
-        if entry and isinstance(entry, dict):
-            entry["active"] = active
-            self._save()
+        self._set_field(key, "active", active)
+
+    def set_account_id(self, key: str, account_id: str):
+        """Attach a workspace to an account."""
+        self._set_field(key, "account_id", account_id)
+
+    def _set_field(self, key: str, field: str, value):
+        with self._edit(key) as entry:
+            if entry:
+                entry[field] = value
 
     def exists(self, key: str) -> bool:
         return key.lower() in self._workspaces
@@ -262,53 +350,49 @@ class WorkspaceRegistry:
 
     def set_protected(self, key: str, protected: bool = True):
         """Mark a workspace as protected (or unprotected)."""
-        k = key.lower()
-        if k in self._workspaces:
-            self._workspaces[k]["protected"] = protected
-            self._save()
+        self._set_field(key, "protected", protected)
 
     def add(self, key: str, path: str, owner_id: Optional[int] = None,
             account_id: Optional[str] = None):
-        entry = {
-            "path": path,
-            "owner_id": owner_id or config.DISCORD_ALLOWED_USER_ID,
-        }
-        if account_id:
-            entry["account_id"] = account_id
-        self._workspaces[key.lower()] = entry
-        self._save()
+        with self._edit(key) as entry:
+            entry.clear()
+            entry["path"] = path
+            entry["owner_id"] = owner_id or config.DISCORD_ALLOWED_USER_ID
+            if account_id:
+                entry["account_id"] = account_id
 
     def remove(self, key: str, force: bool = False):
         """Remove a workspace. Raises ValueError if protected and force=False."""
-        k = key.lower()
-        if self.is_protected(k) and not force:
-            raise ValueError(f"Workspace '{key}' is protected. Use force=True to override.")
-        self._workspaces.pop(k, None)
-        self._save()
+        with self._edit(key) as entry:
+            if entry.get("protected") and not force:
+                raise ValueError(f"Workspace '{key}' is protected. Use force=True to override.")
+            entry.clear()
 
     def rename(self, old_key: str, new_key: str) -> bool:
         """Rename a workspace key. Returns False if old doesn't exist or new already taken."""
         old_key = old_key.lower()
         new_key = new_key.lower()
-        if old_key not in self._workspaces or new_key in self._workspaces:
-            return False
-        entry = self._workspaces.pop(old_key)
-        self._workspaces[new_key] = entry
-        # Update any user defaults pointing to the old key
-        for uid, default in self._user_defaults.items():
-            if default == old_key:
-                self._user_defaults[uid] = new_key
+        with self._locked():  # other processes see both keys move at once
+            if old_key not in self._workspaces or new_key in self._workspaces:
+                return False
+            self._workspaces[new_key] = self._workspaces.pop(old_key)
+            self._save(old_key)
+            self._save(new_key)
+            # Update any user defaults pointing to the old key
+            for uid, default in self._user_defaults.items():
+                if default == old_key:
+                    self._user_defaults[uid] = new_key
+                    self._save_defaults(uid)
         if self._global_default == old_key:
             self._global_default = new_key
-        self._save()
-        self._save_defaults()
         return True
 
     def set_default(self, user_id: int | str, key: str) -> bool:
-        if not self.exists(key):
-            return False
-        self._user_defaults[user_id] = key.lower()
-        self._save_defaults()
+        with self._locked():
+            if not self.exists(key):
+                return False
+            self._user_defaults[user_id] = key.lower()
+            self._save_defaults(user_id)
         return True
 
     def get_default(self, user_id: int | str) -> Optional[str]:
@@ -321,34 +405,34 @@ class WorkspaceRegistry:
         path = self.get_path(key)
         return (key, path) if path else (key, None)
 
-    def _save(self):
-        with open(config.WORKSPACES_PATH, "w") as f:
-            json.dump(self._workspaces, f, indent=2)
+    def _save(self, key: str):
+        self._reindex(key)
+        self._write("workspaces", key, self._workspaces.get(key))
 
-    def _save_defaults(self):
-        with open(self._defaults_path, "w") as f:
-            json.dump({str(k): v for k, v in self._user_defaults.items()}, f, indent=2)
+    def _save_defaults(self, user_id: int | str):
+        self._write("user_defaults", user_id, self._user_defaults.get(user_id))
 
     def set_platform(self, user_id: int | str, platform: str):
         self._user_platforms[user_id] = platform.lower()
-        self._save_platforms()
+        self._save_platforms(user_id)
 
     def get_platform(self, user_id: int | str) -> Optional[str]:
         return self._user_platforms.get(user_id)
 
-    def _save_platforms(self):
-        with open(self._platforms_path, "w") as f:
-            json.dump({str(k): v for k, v in self._user_platforms.items()}, f, indent=2)
+    def _save_platforms(self, user_id: int | str):
+        self._write("user_platforms", user_id, self._user_platforms.get(user_id))
 
     def reset_tips(self, user_id: int):
         """Unhide tips and reset tip index to 0 — makes the user see the full onboarding cycle."""
-        self._user_tips_hidden.discard(user_id)
-        self._user_tip_index.pop(user_id, None)
-        self._save_tips()
+        with self._locked():
+            self._user_tips_hidden.discard(user_id)
+            self._user_tip_index.pop(user_id, None)
+            self._save_tips(user_id)
 
     def hide_tips(self, user_id: int):
-        self._user_tips_hidden.add(user_id)
-        self._save_tips()
+        with self._locked():
+            self._user_tips_hidden.add(user_id)
+            self._save_tips(user_id)
 
     def show_tips(self, user_id: int) -> bool:
         """Returns True if tips should be shown (default)."""
@@ -359,18 +443,29 @@ class WorkspaceRegistry:
 
     def advance_tip(self, user_id: int, total_tips: int = 5):
         """Increment tip index. Auto-hides tips after cycling through all."""
-        idx = self._user_tip_index.get(user_id, 0) + 1
-        if idx >= total_tips:
-            self._user_tips_hidden.add(user_id)
-            self._user_tip_index.pop(user_id, None)
-        else:
-            self._user_tip_index[user_id] = idx
-        self._save_tips()
-
-    def _save_tips(self):
-        data = {
-            "hidden": list(self._user_tips_hidden),
-            "index": {str(k): v for k, v in self._user_tip_index.items()},
-        }
-        with open(self._tips_path, "w") as f:
-            json.dump(data, f)
+        with self._locked():
+            idx = self._user_tip_index.get(user_id, 0) + 1
+            if idx >= total_tips:
+                self._user_tips_hidden.add(user_id)
+                self._user_tip_index.pop(user_id, None)
+            else:
+                self._user_tip_index[user_id] = idx
+            self._save_tips(user_id)
+
+    def _save_tips(self, user_id: int):
+        hidden, index = user_id in self._user_tips_hidden, self._user_tip_index.get(user_id, 0)
+        self._write("user_tips", user_id, {"hidden": hidden, "index": index} if hidden or index else None)
+
+
+_registry: Optional[WorkspaceRegistry] = None
+
+
+def get_registry() -> WorkspaceRegistry:
+    """Shared registry for lookups outside the bot's and API's own instances
+    (fix-index scopes, billing background runs). Caught up on every call."""
+    global _registry
+    if _registry is None:
+        _registry = WorkspaceRegistry()
+    else:
+        _registry.reload()
+    return _registry